@@ -0,0 +1,419 @@
+"""
+Benchmark e verifica delle azioni registrate (ui.actions.ACTIONS).
+
+Esegue ogni azione attraverso il dispatcher contro un runtime finto in
+memoria (session manager, workspace su una directory temporanea, agenti
+che rispondono subito) e misura per azione:
+
+- latenza del dispatch (mediana e p95)
+- allocazioni di una chiamata (tracemalloc: picco e memoria trattenuta)
+- costo della validazione dei parametri contro l'ActionSpec
+
+Segnala le azioni presenti solo nel catalogo (build_default_actions) o
+solo nel registry degli handler, e quelle senza parametri di esempio.
+Con --baseline confronta le mediane con un run precedente (--save) e
+termina con codice 1 se una latenza peggiora oltre la soglia, o se
+catalogo e registry non coincidono.
+
+Esempi:
+    python benchmarks/bench_actions.py --save baseline.json
+    python benchmarks/bench_actions.py --baseline baseline.json --threshold 0.25
+    python benchmarks/bench_actions.py --actions "cv.*,workspace.*"
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import fnmatch
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+# stato (indici, cache, template) in una directory usa e getta: va
+# impostato prima di importare ice_api
+WORKDIR = Path(tempfile.mkdtemp(prefix="ice-actions-bench-"))
+os.environ["ICE_API_STATE_DIR"] = str(WORKDIR / "state")
+
+from ice_api.actions.catalog import build_default_actions  # noqa: E402
+from ice_api.actions.consistency import check_registry  # noqa: E402
+from ice_api.ipc.errors import error_message  # noqa: E402
+from ice_api.schema.validation import validate_params  # noqa: E402
+from ice_api.services.jobs import JOBS  # noqa: E402
+from ice_api.ui.actions import ACTIONS  # noqa: E402
+from ice_api.ui.dispatcher import dispatch  # noqa: E402
+
+VALIDATION_ROUNDS = 2000
+
+
+# ============================================================================
+# FAKE RUNTIME
+# ============================================================================
+
+class FakeWorkspace:
+    def __init__(self, wid: str, name: str, base_path: Path, workspace_type: str = "multi_agent") -> None:
+        self.id = wid
+        self.name = name
+        self.base_path = base_path
+        self.workspace_type = workspace_type
+
+    def list_backends(self) -> List[str]:
+        return ["memory"]
+
+
+class FakeSessionManager:
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self.workspaces: Dict[str, FakeWorkspace] = {}
+        self.current_workspace_id: Optional[str] = None
+        self._seq = 0
+
+    def add(self, name: str) -> FakeWorkspace:
+        self._seq += 1
+        wid = f"ws-{self._seq:04d}"
+        base = self.root / wid
+        base.mkdir(parents=True, exist_ok=True)
+        ws = self.workspaces[wid] = FakeWorkspace(wid, name, base)
+        return ws
+
+    async def create_workspace(self, *, name, description="", tags=None, settings=None):
+        ws = self.add(name)
+        ws.workspace_type = (settings or {}).get("workspace_type", ws.workspace_type)
+        return ws
+
+    def get_workspace(self, wid: str) -> FakeWorkspace:
+        return self.workspaces[wid]
+
+    def list_workspaces(self) -> List[FakeWorkspace]:
+        return list(self.workspaces.values())
+
+    async def activate_workspace(self, wid: str):
+        ws = self.workspaces[wid]
+        self.current_workspace_id = wid
+        return SimpleNamespace(
+            workspace=ws,
+            workspace_id=wid,
+            context_id=f"ctx-{wid}",
+            set_panel_context=lambda panel: None,
+        )
+
+    async def deactivate_workspace(self, wid: str) -> None:
+        if self.current_workspace_id == wid:
+            self.current_workspace_id = None
+
+    async def delete_workspace(self, wid: str, delete_files: bool) -> None:
+        ws = self.workspaces.pop(wid)
+        if delete_files:
+            shutil.rmtree(ws.base_path, ignore_errors=True)
+
+
+class FakeAgent:
+    """Risponde subito con risultati della forma attesa dagli handler."""
+
+    template_version = "bench"
+
+    async def chat(self, *, ctx=None, user_message="", history=None):
+        return SimpleNamespace(payload={"response": f"echo {user_message}"})
+
+    async def explain(self, *, code, language=None):
+        return {"ok": True, "explanation": f"{len(code)} chars of {language or 'code'}"}
+
+    async def plan(self, *, goal):
+        return {"ok": True, "plan": {"workflow_id": "bench", "steps": [
+            {"id": "status", "action": "system.job.status", "params": {}},
+        ]}}
+
+    async def generate_json(self, **params):
+        return {"ok": True, "cv_id": params.get("cv_id") or "cv-bench", "json": {"name": "Bench"}}
+
+    async def ocr(self, paths):
+        return {"ok": True, "text": " ".join(os.path.basename(p) for p in paths)}
+
+    async def render_html(self, cv_id):
+        return {"ok": True, "html": f"<html><body>{cv_id}</body></html>"}
+
+    async def export_pdf(self, cv_id):
+        return {"ok": True, "pdf": b"%PDF-1.4\n% bench\n"}
+
+    async def cleanup(self, cv_id):
+        return {"ok": True, "cv_id": cv_id}
+
+
+class FakeRuntime:
+    generation = 1
+
+    def __init__(self, root: Path) -> None:
+        self.session_manager = FakeSessionManager(root)
+        self._agent = FakeAgent()
+
+    def get_agent(self, agent_id: str) -> FakeAgent:
+        return self._agent
+
+
+# ============================================================================
+# FIXTURES / SAMPLE PARAMS
+# ============================================================================
+
+def build_env(root: Path) -> SimpleNamespace:
+    runtime = FakeRuntime(root / "workspaces")
+    ws = runtime.session_manager.add("bench")
+    runtime.session_manager.current_workspace_id = ws.id
+
+    src = ws.base_path / "pkg"
+    src.mkdir()
+    (src / "module.py").write_text(
+        "import os\n\n\nclass Widget:\n    def render(self):\n        return os.getcwd()\n\n\n"
+        "def build_widget():\n    return Widget()\n",
+        "utf-8",
+    )
+    docs = ws.base_path / "docs"
+    docs.mkdir()
+    (docs / "notes.md").write_text("# Notes\n\n" + "Widgets render the current directory.\n" * 40, "utf-8")
+    logs = ws.base_path / "logs"
+    logs.mkdir()
+    (logs / "app.log").write_text(
+        "".join(
+            f"2026-01-01T00:{i // 60:02d}:{i % 60:02d} {'ERROR' if i % 17 == 0 else 'INFO'} "
+            f"[api] request {i} completed timeout={i % 5}\n"
+            for i in range(600)
+        ),
+        "utf-8",
+    )
+    scan = root / "scan"
+    scan.mkdir()
+    (scan / "page.txt").write_text("Curriculum Vitae\n", "utf-8")
+
+    return SimpleNamespace(runtime=runtime, workspace=ws, root=ws.base_path, scan_file=str(scan / "page.txt"))
+
+
+def _first_doc() -> str:
+    """Primo documento sotto docs/ (docs.read fallisce se il repository non ne ha)."""
+    from ice_api.ui.actions import DOCS_ROOT
+
+    for path in sorted(DOCS_ROOT.rglob("*.md")):
+        return str(path.relative_to(DOCS_ROOT))
+    return "README.md"
+
+
+def _fresh_workspace(env) -> str:
+    return env.runtime.session_manager.add("to-delete").id
+
+
+# params per azione; i callable ricevono l'env e sono valutati a ogni chiamata
+SAMPLES: Dict[str, Any] = {
+    "docs.list": {},
+    "docs.read": lambda env: {"path": _first_doc()},
+    "system.chat.stream": {"message": "hello", "conversation_id": "bench"},
+    "system.workspace.list": {},
+    "system.job.status": {},
+    "system.job.cancel": {"job_id": "missing"},
+    "system.agents.stats": {},
+    "system.agents.configure": {"mode": "direct"},
+    "system.profile.slowest": {"limit": 5},
+    "system.profile.configure": {"slowest": 20},
+    "workspace.list": {"limit": 50},
+    "workspace.stats": lambda env: {"workspace_id": env.workspace.id},
+    "workspace.create": {"name": "bench-create"},
+    "workspace.create_many": {"count": 2, "name_prefix": "bench-many"},
+    "workspace.template.save": lambda env: {"name": "bench", "workspace_id": env.workspace.id},
+    "workspace.template.list": {},
+    "workspace.load": lambda env: {"workspace_id": env.workspace.id},
+    "workspace.unload": lambda env: {"workspace_id": env.workspace.id},
+    "workspace.delete": lambda env: {"workspace_id": _fresh_workspace(env), "delete_from_disk": False},
+    "logs.scan": lambda env: {"path": str(env.root / "logs")},
+    "logs.tail": lambda env: {"file": str(env.root / "logs" / "app.log"), "lines": 50},
+    "logs.parse": lambda env: {"file": str(env.root / "logs" / "app.log")},
+    "logs.index": lambda env: {"path": str(env.root / "logs")},
+    "logs.search": {"query": "error timeout", "limit": 20},
+    "code.read_file": lambda env: {"path": str(env.root / "pkg" / "module.py")},
+    "code.explain": {"code": "def f():\n    return 1\n", "language": "python"},
+    "code.index": lambda env: {"path": str(env.root)},
+    "code.symbols": lambda env: {"path": str(env.root), "name": "Widget", "include_refs": True},
+    "code.search": lambda env: {"path": str(env.root), "query": "render"},
+    "knowledge.ingest": lambda env: {"path": str(env.root / "docs")},
+    "knowledge.sync": lambda env: {"path": str(env.root / "docs")},
+    "knowledge.query": {"query": "widgets current directory", "k": 3},
+    "workflow.plan": {"goal": "show job status"},
+    "workflow.execute": {"plan": {"workflow_id": "bench", "steps": [
+        {"id": "status", "action": "system.job.status", "params": {}},
+    ]}},
+    "workflow.rollback": {"plan": {"workflow_id": "bench", "steps": [
+        {"id": "status", "action": "system.job.status", "params": {}},
+    ]}},
+    "cv.generate_json": {"cv_id": "cv-bench", "language": "it"},
+    "cv.ocr": lambda env: {"paths": [env.scan_file]},
+    "cv.render_html": {"cv_id": "cv-bench"},
+    "cv.export_pdf": {"cv_id": "cv-bench"},
+    "cv.cleanup": {"cv_id": "cv-bench"},
+    "cv.pipeline": lambda env: {"items": [{"paths": [env.scan_file], "cv_id": "cv-pipe"}]},
+}
+
+
+# ============================================================================
+# MEASUREMENT
+# ============================================================================
+
+async def _noop(_event: dict) -> None:
+    return None
+
+
+def _ok(result: Any) -> bool:
+    if result is None:
+        return True         # system.chat.stream: risposta tutta in eventi
+    return not (isinstance(result, dict) and result.get("ok") is False)
+
+
+async def _call(name: str, env) -> Any:
+    sample = SAMPLES.get(name, {})
+    params = sample(env) if callable(sample) else dict(sample)
+    return await dispatch({"action": name, "params": params}, env.runtime, emit_event=_noop)
+
+
+async def measure_action(name: str, env, specs: Dict[str, Any], repeat: int) -> Dict[str, Any]:
+    # warmup: import pigri, indici, cache
+    first = await _call(name, env)
+
+    samples = []
+    ok = _ok(first)
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = await _call(name, env)
+        samples.append((time.perf_counter() - t0) * 1000)
+        ok = ok and _ok(result)
+
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        await _call(name, env)
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    validation_us = None
+    spec = specs.get(name)
+    if spec is not None:
+        sample = SAMPLES.get(name, {})
+        params = sample(env) if callable(sample) else dict(sample)
+        t0 = time.perf_counter()
+        for _ in range(VALIDATION_ROUNDS):
+            validate_params(spec, params)
+        validation_us = (time.perf_counter() - t0) / VALIDATION_ROUNDS * 1e6
+
+    samples.sort()
+    return {
+        "ok": ok,
+        "error": None if ok else (error_message(first.get("error")) if isinstance(first, dict) else None),
+        "median_ms": statistics.median(samples),
+        "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        "alloc_peak_kib": (peak - before) / 1024,
+        "alloc_retained_kib": (after - before) / 1024,
+        "validation_us": validation_us,
+    }
+
+
+async def _drain_jobs() -> None:
+    for job in JOBS.list():
+        if not job.is_terminal():
+            await JOBS.wait(job.job_id)
+
+
+async def run(selected: List[str], repeat: int) -> Dict[str, Any]:
+    specs = {spec.name: spec for spec in build_default_actions()}
+    env = build_env(WORKDIR)
+    results = {}
+    for name in selected:
+        results[name] = await measure_action(name, env, specs, repeat)
+        await _drain_jobs()
+    return results
+
+
+# ============================================================================
+# REPORT
+# ============================================================================
+
+def regressions(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float, min_delta_ms: float) -> List[str]:
+    found = []
+    for name, current in results.items():
+        previous = baseline.get("actions", {}).get(name)
+        if not previous:
+            continue
+        before, now = previous["median_ms"], current["median_ms"]
+        if now > before * (1 + threshold) and now - before > min_delta_ms:
+            found.append(f"{name}: {before:.3f} ms -> {now:.3f} ms (+{(now / before - 1) * 100:.0f}%)")
+    return found
+
+
+def print_table(results: Dict[str, Any]) -> None:
+    print(f"{'action':<26} {'ok':>3} {'median_ms':>10} {'p95_ms':>9} "
+          f"{'peak_kib':>9} {'kept_kib':>9} {'valid_us':>9}")
+    for name, r in results.items():
+        valid = f"{r['validation_us']:.2f}" if r["validation_us"] is not None else "-"
+        print(
+            f"{name:<26} {'y' if r['ok'] else 'n':>3} {r['median_ms']:>10.3f} {r['p95_ms']:>9.3f} "
+            f"{r['alloc_peak_kib']:>9.1f} {r['alloc_retained_kib']:>9.1f} {valid:>9}"
+        )
+        if r["error"]:
+            print(f"{'':<26}     ! {r['error']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--actions", default="*", help="pattern separati da virgola (es. 'cv.*,logs.scan')")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--baseline", type=Path, default=None, help="risultati di un run precedente")
+    parser.add_argument("--save", type=Path, default=None, help="scrive i risultati (JSON)")
+    parser.add_argument("--threshold", type=float, default=0.25, help="peggioramento relativo tollerato")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5,
+                        help="peggioramento assoluto minimo per segnalare (rumore sulle azioni veloci)")
+    args = parser.parse_args()
+
+    report = check_registry(build_default_actions(), ACTIONS)
+    patterns = [p.strip() for p in args.actions.split(",") if p.strip()]
+    selected = sorted(n for n in ACTIONS if any(fnmatch.fnmatch(n, p) for p in patterns))
+
+    try:
+        results = asyncio.run(run(selected, args.repeat))
+    finally:
+        shutil.rmtree(WORKDIR, ignore_errors=True)
+
+    print_table(results)
+    failed = False
+
+    for label, names in (
+        ("in catalog without handler", report.missing_handlers),
+        ("registered without ActionSpec", report.missing_specs),
+        ("without sample params", [n for n in selected if n not in SAMPLES]),
+    ):
+        if names:
+            print(f"\n{label}: {', '.join(names)}")
+    failed |= not report.ok
+
+    if args.baseline is not None:
+        baseline = json.loads(args.baseline.read_text("utf-8"))
+        slower = regressions(results, baseline, args.threshold, args.min_delta_ms)
+        if slower:
+            print(f"\nlatency regressions (> {args.threshold * 100:.0f}%):")
+            for line in slower:
+                print(f"  {line}")
+            failed = True
+
+    if args.save is not None:
+        args.save.write_text(
+            json.dumps({"created_at": time.time(), "registry": report.to_dict(), "actions": results}, indent=2),
+            "utf-8",
+        )
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
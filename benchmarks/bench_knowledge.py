@@ -0,0 +1,148 @@
+"""
+Benchmark della knowledge base (knowledge.ingest / knowledge.query).
+
+Genera chunk sintetici, li ingerisce nel KnowledgeEngine (embedding,
+SQLite, indice vettoriale, BM25) e misura throughput di ingest e
+latenza delle query per modalità: vettoriale flat, vettoriale IVF,
+keyword (BM25) e ibrida.
+
+Richiede numpy (pip install 'ice-api[knowledge]').
+
+Esempi:
+    python benchmarks/bench_knowledge.py                        # 100k, 1M chunk
+    python benchmarks/bench_knowledge.py --chunks 10000 --repeat 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import shutil
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from ice_api.services.knowledge import IVFVectorIndex, KnowledgeEngine, TextChunk
+
+VOCABULARY = 5000
+WORDS_PER_CHUNK = (40, 120)
+CHUNKS_PER_SOURCE = 1000
+QUERIES = [
+    "connection pool timeout retry",
+    "deployment rollout replica",
+    "w17 w942 w3001",
+    "needle",
+]
+
+
+def generate_chunks(count: int, seed: int = 11):
+    """
+    Chunk come finestre casuali su un pool di parole a distribuzione
+    zipfiana, con qualche "needle" raro: generare il corpus non deve
+    pesare sul tempo di ingest misurato.
+    """
+    rng = random.Random(seed)
+    vocab = [f"w{i}" for i in range(VOCABULARY)] + [
+        "connection", "pool", "timeout", "retry", "deployment", "rollout", "replica",
+    ]
+    weights = [1.0 / (rank + 1) for rank in range(len(vocab))]
+    pool = rng.choices(vocab, weights=weights, k=1 << 20)
+    for i in range(count):
+        length = rng.randint(*WORDS_PER_CHUNK)
+        start = rng.randrange(len(pool) - length)
+        text = " ".join(pool[start:start + length])
+        if rng.random() < 1e-4:
+            text += " needle"
+        yield i // CHUNKS_PER_SOURCE, TextChunk(i % CHUNKS_PER_SOURCE, 0, text)
+
+
+def ingest(engine: KnowledgeEngine, count: int) -> float:
+    t0 = time.perf_counter()
+    current, batch = None, []
+
+    def flush():
+        for _ in engine.ingest_chunks(f"source-{current:06d}", batch):
+            pass
+
+    for source, chunk in generate_chunks(count):
+        if source != current and batch:
+            flush()
+            batch = []
+        current = source
+        batch.append(chunk)
+    if batch:
+        flush()
+    return time.perf_counter() - t0
+
+
+def measure(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+
+def run(counts, workdir: Path, repeat: int, k: int) -> None:
+    print(f"{'chunks':>9} {'ingest_s':>9} {'chunks/s':>9} {'bm25_s':>7} {'ivf_s':>7} "
+          f"{'flat_ms':>8} {'ivf_ms':>8} {'bm25_ms':>8} {'hybrid_ms':>10}")
+
+    for count in counts:
+        directory = workdir / f"kb-{count}"
+        shutil.rmtree(directory, ignore_errors=True)
+        engine = KnowledgeEngine(directory)
+
+        ingest_s = ingest(engine, count)
+
+        t0 = time.perf_counter()
+        engine._load_bm25()
+        bm25_s = time.perf_counter() - t0
+
+        # IVF sugli stessi vettori (addestramento incluso nel tempo)
+        t0 = time.perf_counter()
+        ivf = IVFVectorIndex(engine.dim, train_min=0)
+        ids, vecs = engine._load_vectors().live()
+        ivf.add(ids, vecs)
+        ivf.train()
+        ivf_s = time.perf_counter() - t0
+
+        qvecs = [engine._embed([q])[0] for q in QUERIES]
+
+        def each(fn):
+            return lambda: [fn(i) for i in range(len(QUERIES))]
+
+        flat_ms = measure(each(lambda i: engine._vectors.search(qvecs[i], k=k)), repeat)
+        ivf_ms = measure(each(lambda i: ivf.search(qvecs[i], k=k)), repeat)
+        bm25_ms = measure(each(lambda i: engine.query(QUERIES[i], k=k, mode="keyword")), repeat)
+        hybrid_ms = measure(each(lambda i: engine.query(QUERIES[i], k=k, mode="hybrid")), repeat)
+        n = len(QUERIES)
+
+        print(
+            f"{count:>9} {ingest_s:>9.1f} {count / ingest_s:>9.0f} {bm25_s:>7.1f} {ivf_s:>7.1f} "
+            f"{flat_ms / n:>8.2f} {ivf_ms / n:>8.2f} {bm25_ms / n:>8.2f} {hybrid_ms / n:>10.2f}"
+        )
+        engine.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--chunks", default="100000,1000000")
+    parser.add_argument("--workdir", type=Path, default=None)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--keep", action="store_true", help="non rimuovere le collezioni")
+    args = parser.parse_args()
+
+    counts = [int(c) for c in args.chunks.split(",") if c]
+    workdir = args.workdir or Path(tempfile.mkdtemp(prefix="ice-knowledge-bench-"))
+    try:
+        run(counts, workdir, args.repeat, args.k)
+    finally:
+        if not args.keep and args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
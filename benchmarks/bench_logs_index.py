@@ -0,0 +1,130 @@
+"""
+Benchmark dell'indice log (logs.index / logs.search).
+
+Genera corpora sintetici di dimensione crescente, li indicizza e misura
+la latenza di query tipiche. Con il pruning temporale e il merge lazy
+la latenza delle query "recenti" e "finestra fissa" deve restare
+piatta al crescere del corpus.
+
+Esempi:
+    python benchmarks/bench_logs_index.py                     # 16, 64, 256 MB
+    python benchmarks/bench_logs_index.py --sizes-mb 1024,4096 --workdir /data/bench
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import shutil
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from ice_api.services.logs.index import LogIndex
+
+FILE_SIZE = 64 * 1024 * 1024
+LINE_INTERVAL_MS = 5            # una riga ogni 5 ms: il corpus più grande copre più tempo
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+LEVELS = ["INFO"] * 8 + ["WARN"] * 2 + ["ERROR"]
+COMPONENTS = ["api", "db", "cache", "auth", "worker", "scheduler", "ingest", "router"]
+WORDS = (
+    "request completed started failed retry timeout connection pool user "
+    "session token query index segment flush commit rollback upstream "
+    "latency payload queue worker shard replica leader follower"
+).split()
+
+
+def generate_corpus(directory: Path, size_bytes: int, seed: int = 7) -> datetime:
+    """Scrive file da FILE_SIZE con righe timestampate; restituisce l'ultimo ts."""
+    rng = random.Random(seed)
+    directory.mkdir(parents=True, exist_ok=True)
+    ts = START
+    step = timedelta(milliseconds=LINE_INTERVAL_MS)
+    written = 0
+    file_no = 0
+
+    while written < size_bytes:
+        path = directory / f"app-{file_no:04d}.log"
+        with open(path, "w", encoding="utf-8") as fh:
+            file_written = 0
+            while file_written < FILE_SIZE and written + file_written < size_bytes:
+                words = " ".join(rng.choices(WORDS, k=rng.randint(4, 12)))
+                needle = " needle" if rng.random() < 1e-4 else ""
+                line = (
+                    f"{ts.strftime('%Y-%m-%dT%H:%M:%S')} {rng.choice(LEVELS)} "
+                    f"[{rng.choice(COMPONENTS)}] req={rng.getrandbits(32):08x} "
+                    f"{words}{needle}\n"
+                )
+                fh.write(line)
+                file_written += len(line)
+                ts += step
+        written += file_written
+        file_no += 1
+
+    return ts
+
+
+def measure(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+
+def run(sizes_mb, workdir: Path, repeat: int) -> None:
+    print(f"{'corpus':>10} {'index_s':>8} {'docs':>11} {'segs':>6} "
+          f"{'recent_ms':>10} {'window_ms':>10} {'rare_ms':>9}")
+
+    for size_mb in sizes_mb:
+        base = workdir / f"corpus-{size_mb}mb"
+        corpus, index_dir = base / "logs", base / "index"
+        shutil.rmtree(base, ignore_errors=True)
+
+        last_ts = generate_corpus(corpus, size_mb * 1024 * 1024)
+        index = LogIndex(index_dir)
+
+        t0 = time.perf_counter()
+        for _ in index.add_files(sorted(str(p) for p in corpus.iterdir())):
+            pass
+        index_s = time.perf_counter() - t0
+        stats = index.stats()
+
+        end = last_ts.timestamp()
+        window_start = START.timestamp() + 600          # finestra fissa di 10 minuti
+        recent = lambda: index.search("error timeout", since=end - 3600, limit=100)
+        window = lambda: index.search(
+            "db commit", since=window_start, until=window_start + 600, limit=100
+        )
+        rare = lambda: index.search("needle", since=end - 3600, limit=10)
+
+        print(
+            f"{size_mb:>8}MB {index_s:>8.1f} {stats['docs']:>11} {stats['segments']:>6} "
+            f"{measure(recent, repeat):>10.2f} {measure(window, repeat):>10.2f} "
+            f"{measure(rare, repeat):>9.2f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes-mb", default="16,64,256")
+    parser.add_argument("--workdir", type=Path, default=None)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--keep", action="store_true", help="non rimuovere i corpora")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes_mb.split(",") if s]
+    workdir = args.workdir or Path(tempfile.mkdtemp(prefix="ice-logs-bench-"))
+    try:
+        run(sizes, workdir, args.repeat)
+    finally:
+        if not args.keep and args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
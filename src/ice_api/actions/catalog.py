@@ -66,8 +66,18 @@ def build_logs_actions() -> List[ActionSpec]:
                     type=PrimitiveType.STRING,
                     description="Pattern opzionale per filtrare i file",
                 ),
+                _p(
+                    "incremental",
+                    type=PrimitiveType.BOOLEAN,
+                    default=False,
+                    description=(
+                        "Confronta con lo snapshot precedente e riporta "
+                        "solo sorgenti aggiunte, modificate e rimosse"
+                    ),
+                ),
             ],
             owner_agent="log-agent",
+            metadata={"calls_agent": False},
             tags=["logs", "scan"],
         ),
         ActionSpec(
@@ -93,12 +103,120 @@ def build_logs_actions() -> List[ActionSpec]:
                     "follow",
                     type=PrimitiveType.BOOLEAN,
                     default=False,
-                    description="Continua a seguire il file (tail -f)",
+                    description="Continua a seguire il file (tail -f, richiede emit_event)",
                 ),
             ],
             owner_agent="log-agent",
+            metadata={"calls_agent": False},
             tags=["logs", "tail"],
         ),
+        ActionSpec(
+            name="logs.parse",
+            description="Parsa e normalizza un file di log in record strutturati.",
+            domain=ActionDomain.LOGS,
+            kind=ActionKind.ANALYSIS,
+            parameters=[
+                _p(
+                    "file",
+                    type=PrimitiveType.FILE,
+                    required=True,
+                    description="File di log da parsare",
+                ),
+                _p(
+                    "format",
+                    type=PrimitiveType.CHOICE,
+                    default="auto",
+                    constraints=ValueConstraint(
+                        choices=["auto", "python", "iso", "syslog", "clf", "json", "plain"],
+                    ),
+                    description="Formato del log (auto = riconoscimento automatico)",
+                ),
+                _p(
+                    "columnar",
+                    type=PrimitiveType.BOOLEAN,
+                    default=False,
+                    description="Restituisce array paralleli invece di un record per riga",
+                ),
+                _p(
+                    "batch_size",
+                    type=PrimitiveType.INTEGER,
+                    default=1000,
+                    constraints=ValueConstraint(min_value=1, max_value=65_536),
+                    description="Righe per chunk in streaming",
+                ),
+            ],
+            owner_agent="log-agent",
+            metadata={"calls_agent": False},
+            tags=["logs", "parse", "normalize"],
+        ),
+        ActionSpec(
+            name="logs.index",
+            description="Indicizza (in modo incrementale) file o directory di log.",
+            domain=ActionDomain.LOGS,
+            kind=ActionKind.MUTATION,
+            parameters=[
+                _p(
+                    "path",
+                    type=PrimitiveType.PATH,
+                    required=True,
+                    description="File o directory di log da indicizzare",
+                ),
+                _p(
+                    "pattern",
+                    type=PrimitiveType.STRING,
+                    description="Pattern opzionale per filtrare i file (directory)",
+                ),
+                _p(
+                    "index",
+                    type=PrimitiveType.STRING,
+                    default="default",
+                    description="Nome dell'indice",
+                ),
+            ],
+            owner_agent="log-agent",
+            metadata={"calls_agent": False},
+            tags=["logs", "index"],
+        ),
+        ActionSpec(
+            name="logs.search",
+            description="Cerca righe di log nell'indice, dalle più recenti.",
+            domain=ActionDomain.LOGS,
+            kind=ActionKind.QUERY,
+            parameters=[
+                _p(
+                    "query",
+                    type=PrimitiveType.STRING,
+                    required=True,
+                    description="Termini da cercare (AND)",
+                ),
+                _p(
+                    "since",
+                    type=PrimitiveType.ANY,
+                    description="Inizio intervallo (ISO-8601 o epoch)",
+                ),
+                _p(
+                    "until",
+                    type=PrimitiveType.ANY,
+                    description="Fine intervallo (ISO-8601 o epoch)",
+                ),
+                _p(
+                    "limit",
+                    type=PrimitiveType.INTEGER,
+                    default=100,
+                    constraints=ValueConstraint(min_value=1, max_value=10_000),
+                    description="Numero massimo di risultati",
+                ),
+                _p(
+                    "index",
+                    type=PrimitiveType.STRING,
+                    default="default",
+                    description="Nome dell'indice",
+                ),
+            ],
+            owner_agent="log-agent",
+            metadata={"calls_agent": False},
+            tags=["logs", "search"],
+        ),
     ]
 
 
@@ -122,8 +240,40 @@ def build_code_actions() -> List[ActionSpec]:
                     default="utf-8",
                     description="Encoding del file",
                 ),
+                _p(
+                    "start_line",
+                    type=PrimitiveType.INTEGER,
+                    constraints=ValueConstraint(min_value=1),
+                    description="Prima riga da leggere (1-based, inclusiva)",
+                ),
+                _p(
+                    "end_line",
+                    type=PrimitiveType.INTEGER,
+                    constraints=ValueConstraint(min_value=1),
+                    description="Ultima riga da leggere (inclusiva)",
+                ),
+                _p(
+                    "start_byte",
+                    type=PrimitiveType.INTEGER,
+                    constraints=ValueConstraint(min_value=0),
+                    description="Offset iniziale in byte (alternativo alle righe)",
+                ),
+                _p(
+                    "end_byte",
+                    type=PrimitiveType.INTEGER,
+                    constraints=ValueConstraint(min_value=0),
+                    description="Offset finale in byte, escluso",
+                ),
+                _p(
+                    "max_bytes",
+                    type=PrimitiveType.INTEGER,
+                    default=16 * 1024 * 1024,
+                    constraints=ValueConstraint(min_value=1),
+                    description="Byte massimi restituiti (oltre: truncated + next_byte)",
+                ),
             ],
             owner_agent="code-agent",
+            metadata={"calls_agent": False},
             tags=["code", "read"],
         ),
         ActionSpec(
@@ -146,6 +296,222 @@ def build_code_actions() -> List[ActionSpec]:
             ],
             owner_agent="code-agent",
             tags=["code", "explain"],
+            metadata={"cache": {"ttl": 86400, "disk": True}},
+        ),
+        ActionSpec(
+            name="code.index",
+            description="Costruisce o aggiorna l'indice simboli del workspace.",
+            domain=ActionDomain.CODE,
+            kind=ActionKind.MUTATION,
+            parameters=[
+                _p(
+                    "path",
+                    type=PrimitiveType.DIRECTORY,
+                    description="Root da indicizzare (default: workspace attivo)",
+                ),
+                _p(
+                    "full",
+                    type=PrimitiveType.BOOLEAN,
+                    default=False,
+                    description="Ignora lo stato incrementale e rianalizza tutto",
+                ),
+            ],
+            owner_agent="code-agent",
+            metadata={"calls_agent": False},
+            tags=["code", "index", "analyze"],
+        ),
+        ActionSpec(
+            name="code.symbols",
+            description="Simboli di un file, o definizioni e riferimenti di un nome.",
+            domain=ActionDomain.CODE,
+            kind=ActionKind.QUERY,
+            parameters=[
+                _p(
+                    "file",
+                    type=PrimitiveType.FILE,
+                    description="File di cui elencare i simboli",
+                ),
+                _p(
+                    "name",
+                    type=PrimitiveType.STRING,
+                    description="Nome di cui cercare definizioni e riferimenti",
+                ),
+                _p(
+                    "include_refs",
+                    type=PrimitiveType.BOOLEAN,
+                    default=False,
+                    description="Include i riferimenti al nome",
+                ),
+                _p(
+                    "path",
+                    type=PrimitiveType.DIRECTORY,
+                    description="Root dell'indice (default: workspace attivo)",
+                ),
+            ],
+            owner_agent="code-agent",
+            metadata={"calls_agent": False},
+            tags=["code", "symbols", "analyze"],
+        ),
+        ActionSpec(
+            name="code.search",
+            description="Cerca simboli per nome (prefisso, poi sottostringa).",
+            domain=ActionDomain.CODE,
+            kind=ActionKind.QUERY,
+            parameters=[
+                _p(
+                    "query",
+                    type=PrimitiveType.STRING,
+                    required=True,
+                    constraints=ValueConstraint(min_length=1),
+                    description="Testo da cercare nei nomi dei simboli",
+                ),
+                _p(
+                    "kind",
+                    type=PrimitiveType.CHOICE,
+                    constraints=ValueConstraint(
+                        choices=["class", "function", "method", "variable"],
+                    ),
+                    description="Filtra per tipo di simbolo",
+                ),
+                _p(
+                    "limit",
+                    type=PrimitiveType.INTEGER,
+                    default=50,
+                    constraints=ValueConstraint(min_value=1, max_value=1000),
+                    description="Numero massimo di risultati",
+                ),
+                _p(
+                    "path",
+                    type=PrimitiveType.DIRECTORY,
+                    description="Root dell'indice (default: workspace attivo)",
+                ),
+            ],
+            owner_agent="code-agent",
+            metadata={"calls_agent": False},
+            tags=["code", "search"],
+        ),
+    ]
+
+
+def build_knowledge_actions() -> List[ActionSpec]:
+    return [
+        ActionSpec(
+            name="knowledge.ingest",
+            description="Indicizza file o directory nella knowledge base (chunk, embedding, BM25).",
+            domain=ActionDomain.KNOWLEDGE,
+            kind=ActionKind.MUTATION,
+            parameters=[
+                _p(
+                    "path",
+                    type=PrimitiveType.PATH,
+                    required=True,
+                    description="File o directory da indicizzare",
+                ),
+                _p(
+                    "pattern",
+                    type=PrimitiveType.STRING,
+                    description="Glob dei file da includere (directory)",
+                ),
+                _p(
+                    "chunk_size",
+                    type=PrimitiveType.INTEGER,
+                    default=1000,
+                    constraints=ValueConstraint(min_value=100, max_value=20_000),
+                    description="Dimensione obiettivo dei chunk (caratteri)",
+                ),
+                _p(
+                    "overlap",
+                    type=PrimitiveType.INTEGER,
+                    default=150,
+                    constraints=ValueConstraint(min_value=0, max_value=5_000),
+                    description="Caratteri condivisi tra chunk consecutivi",
+                ),
+                _p(
+                    "collection",
+                    type=PrimitiveType.STRING,
+                    description="Collezione (default: workspace attivo)",
+                ),
+            ],
+            owner_agent="knowledge-agent",
+            metadata={"calls_agent": False},
+            tags=["knowledge", "ingest", "rag"],
+        ),
+        ActionSpec(
+            name="knowledge.query",
+            description="Interroga la knowledge base (vettoriale, BM25 o ibrida).",
+            domain=ActionDomain.KNOWLEDGE,
+            kind=ActionKind.QUERY,
+            parameters=[
+                _p(
+                    "query",
+                    type=PrimitiveType.STRING,
+                    required=True,
+                    constraints=ValueConstraint(min_length=1),
+                    description="Testo della query",
+                ),
+                _p(
+                    "k",
+                    type=PrimitiveType.INTEGER,
+                    default=10,
+                    constraints=ValueConstraint(min_value=1, max_value=1000),
+                    description="Numero di chunk restituiti",
+                ),
+                _p(
+                    "mode",
+                    type=PrimitiveType.CHOICE,
+                    default="hybrid",
+                    constraints=ValueConstraint(choices=["hybrid", "vector", "keyword"]),
+                    description="Strategia di ranking",
+                ),
+                _p(
+                    "collection",
+                    type=PrimitiveType.STRING,
+                    description="Collezione (default: workspace attivo)",
+                ),
+            ],
+            owner_agent="knowledge-agent",
+            metadata={"calls_agent": False},
+            tags=["knowledge", "query", "rag"],
+        ),
+        ActionSpec(
+            name="knowledge.sync",
+            description="Allinea la knowledge base a una directory: riembedda solo i chunk cambiati.",
+            domain=ActionDomain.KNOWLEDGE,
+            kind=ActionKind.MUTATION,
+            parameters=[
+                _p(
+                    "path",
+                    type=PrimitiveType.DIRECTORY,
+                    description="Directory da sincronizzare (default: workspace attivo)",
+                ),
+                _p(
+                    "pattern",
+                    type=PrimitiveType.STRING,
+                    description="Glob dei file da includere",
+                ),
+                _p(
+                    "chunk_size",
+                    type=PrimitiveType.INTEGER,
+                    default=1000,
+                    constraints=ValueConstraint(min_value=100, max_value=20_000),
+                    description="Dimensione obiettivo dei chunk (caratteri)",
+                ),
+                _p(
+                    "overlap",
+                    type=PrimitiveType.INTEGER,
+                    default=150,
+                    constraints=ValueConstraint(min_value=0, max_value=5_000),
+                    description="Caratteri condivisi tra chunk consecutivi",
+                ),
+                _p(
+                    "collection",
+                    type=PrimitiveType.STRING,
+                    description="Collezione (default: workspace attivo)",
+                ),
+            ],
+            owner_agent="knowledge-agent",
+            metadata={"calls_agent": False},
+            tags=["knowledge", "sync", "rag"],
         ),
     ]
 
@@ -168,6 +534,407 @@ def build_workflow_actions() -> List[ActionSpec]:
             owner_agent="planner-agent",
             tags=["workflow", "plan"],
         ),
+        ActionSpec(
+            name="workflow.execute",
+            description="Esegue un piano di workflow (DAG di azioni) in parallelo.",
+            domain=ActionDomain.WORKFLOW,
+            kind=ActionKind.MUTATION,
+            parameters=[
+                _p(
+                    "plan",
+                    type=PrimitiveType.JSON,
+                    required=True,
+                    description="Piano: workflow_id e steps (id, action, params, depends_on)",
+                ),
+                _p(
+                    "max_workers",
+                    type=PrimitiveType.INTEGER,
+                    default=4,
+                    constraints=ValueConstraint(min_value=1, max_value=64),
+                    description="Step eseguiti in parallelo al massimo",
+                ),
+                _p(
+                    "skip",
+                    type=PrimitiveType.JSON,
+                    description="Id degli step da saltare",
+                ),
+                _p(
+                    "resume",
+                    type=PrimitiveType.BOOLEAN,
+                    default=True,
+                    description="Riprende dal checkpoint senza rieseguire step completati",
+                ),
+                _p(
+                    "rollback_on_failure",
+                    type=PrimitiveType.BOOLEAN,
+                    default=False,
+                    description="Esegue i rollback degli step completati se uno step fallisce",
+                ),
+            ],
+            owner_agent="planner-agent",
+            tags=["workflow", "execute"],
+        ),
+        ActionSpec(
+            name="workflow.rollback",
+            description="Annulla gli step completati di un workflow, in ordine inverso.",
+            domain=ActionDomain.WORKFLOW,
+            kind=ActionKind.MUTATION,
+            parameters=[
+                _p(
+                    "plan",
+                    type=PrimitiveType.JSON,
+                    required=True,
+                    description="Piano già eseguito (stesso workflow_id)",
+                ),
+            ],
+            owner_agent="planner-agent",
+            tags=["workflow", "rollback"],
+        ),
+    ]
+
+
+def build_workspace_actions() -> List[ActionSpec]:
+    return [
+        ActionSpec(
+            name="workspace.list",
+            description="Lista i workspace (paginata, versionata, con modalità diff).",
+            domain=ActionDomain.WORKSPACE,
+            kind=ActionKind.QUERY,
+            parameters=[
+                _p(
+                    "cursor",
+                    type=PrimitiveType.STRING,
+                    description="Cursore restituito dalla pagina precedente (next_cursor)",
+                ),
+                _p(
+                    "limit",
+                    type=PrimitiveType.INTEGER,
+                    constraints=ValueConstraint(min_value=1, max_value=10_000),
+                    description="Workspace per pagina (default: tutti)",
+                ),
+                _p(
+                    "since_version",
+                    type=PrimitiveType.INTEGER,
+                    constraints=ValueConstraint(min_value=0),
+                    description="Versione nota al client: restituisce solo le differenze",
+                ),
+            ],
+            owner_agent="system-agent",
+            metadata={"calls_agent": False},
+            tags=["workspace", "list"],
+        ),
+        ActionSpec(
+            name="workspace.stats",
+            description="Statistiche del workspace: file, byte per tipo, indici, backend.",
+            domain=ActionDomain.WORKSPACE,
+            kind=ActionKind.QUERY,
+            parameters=[
+                _p(
+                    "workspace_id",
+                    type=PrimitiveType.STRING,
+                    description="Workspace (default: workspace attivo)",
+                ),
+                _p(
+                    "refresh",
+                    type=PrimitiveType.BOOLEAN,
+                    default=False,
+                    description="Ricalcola gli aggregati in background, con progresso in streaming",
+                ),
+            ],
+            owner_agent="system-agent",
+            metadata={"calls_agent": False},
+            tags=["workspace", "stats"],
+        ),
+        ActionSpec(
+            name="workspace.create",
+            description="Crea un workspace, opzionalmente clonato da un template (file e indici).",
+            domain=ActionDomain.WORKSPACE,
+            kind=ActionKind.MUTATION,
+            parameters=[
+                _p("name", type=PrimitiveType.STRING, description="Nome del workspace"),
+                _p("description", type=PrimitiveType.STRING, description="Descrizione"),
+                _p("tags", type=PrimitiveType.JSON, description="Lista di tag"),
+                _p(
+                    "type",
+                    type=PrimitiveType.STRING,
+                    description="Tipo di workspace (default: quello del template, o multi_agent)",
+                ),
+                _p(
+                    "template",
+                    type=PrimitiveType.STRING,
+                    description="Template da cui clonare file e indici (vedi workspace.template.list)",
+                ),
+                _p(
+                    "clone_mode",
+                    type=PrimitiveType.CHOICE,
+                    default="auto",
+                    constraints=ValueConstraint(choices=["auto", "reflink", "hardlink", "copy"]),
+                    description="Clonazione del template: reflink se supportato, hardlink o copia parallela",
+                ),
+            ],
+            owner_agent="system-agent",
+            metadata={"calls_agent": False},
+            tags=["workspace", "create"],
+        ),
+        ActionSpec(
+            name="workspace.create_many",
+            description="Crea più workspace in parallelo, con un numero limitato di creazioni concorrenti.",
+            domain=ActionDomain.WORKSPACE,
+            kind=ActionKind.MUTATION,
+            parameters=[
+                _p(
+                    "workspaces",
+                    type=PrimitiveType.JSON,
+                    description="Lista di {name, description, tags, type, template}",
+                ),
+                _p(
+                    "count",
+                    type=PrimitiveType.INTEGER,
+                    constraints=ValueConstraint(min_value=1, max_value=500),
+                    description="In alternativa a workspaces: numero di workspace identici",
+                ),
+                _p(
+                    "name_prefix",
+                    type=PrimitiveType.STRING,
+                    description="Prefisso dei nomi generati con count",
+                ),
+                _p("template", type=PrimitiveType.STRING, description="Template per tutte le voci"),
+                _p(
+                    "clone_mode",
+                    type=PrimitiveType.CHOICE,
+                    default="auto",
+                    constraints=ValueConstraint(choices=["auto", "reflink", "hardlink", "copy"]),
+                    description="Clonazione del template",
+                ),
+                _p(
+                    "concurrency",
+                    type=PrimitiveType.INTEGER,
+                    default=4,
+                    constraints=ValueConstraint(min_value=1, max_value=64),
+                    description="Creazioni in parallelo",
+                ),
+            ],
+            owner_agent="system-agent",
+            metadata={"calls_agent": False},
+            tags=["workspace", "create", "batch"],
+        ),
+        ActionSpec(
+            name="workspace.template.save",
+            description="Salva un workspace (file e indici) come template.",
+            domain=ActionDomain.WORKSPACE,
+            kind=ActionKind.MUTATION,
+            parameters=[
+                _p("name", type=PrimitiveType.STRING, required=True, description="Nome del template"),
+                _p(
+                    "workspace_id",
+                    type=PrimitiveType.STRING,
+                    description="Workspace sorgente (default: workspace attivo)",
+                ),
+                _p("description", type=PrimitiveType.STRING, description="Descrizione del template"),
+            ],
+            owner_agent="system-agent",
+            metadata={"calls_agent": False},
+            tags=["workspace", "template"],
+        ),
+        ActionSpec(
+            name="workspace.template.list",
+            description="Lista i template di workspace disponibili.",
+            domain=ActionDomain.WORKSPACE,
+            kind=ActionKind.QUERY,
+            owner_agent="system-agent",
+            metadata={"calls_agent": False},
+            tags=["workspace", "template"],
+        ),
+        ActionSpec(
+            name="workspace.load",
+            description="Attiva un workspace nella sessione corrente.",
+            domain=ActionDomain.WORKSPACE,
+            kind=ActionKind.MUTATION,
+            parameters=[
+                _p("workspace_id", type=PrimitiveType.STRING, required=True, description="Workspace da attivare"),
+            ],
+            owner_agent="system-agent",
+            metadata={"calls_agent": False},
+            tags=["workspace", "session"],
+        ),
+        ActionSpec(
+            name="workspace.unload",
+            description="Disattiva un workspace nella sessione corrente.",
+            domain=ActionDomain.WORKSPACE,
+            kind=ActionKind.MUTATION,
+            parameters=[
+                _p("workspace_id", type=PrimitiveType.STRING, required=True, description="Workspace da disattivare"),
+            ],
+            owner_agent="system-agent",
+            metadata={"calls_agent": False},
+            tags=["workspace", "session"],
+        ),
+        ActionSpec(
+            name="workspace.delete",
+            description="Elimina un workspace: tombstone immediato, cancellazione su disco in background.",
+            domain=ActionDomain.WORKSPACE,
+            kind=ActionKind.MUTATION,
+            parameters=[
+                _p(
+                    "workspace_id",
+                    type=PrimitiveType.STRING,
+                    required=True,
+                    description="Workspace da eliminare",
+                ),
+                _p(
+                    "delete_from_disk",
+                    type=PrimitiveType.BOOLEAN,
+                    default=True,
+                    description="Cancella anche i file (job in background, vedi system.job.status)",
+                ),
+                _p(
+                    "io_rate",
+                    type=PrimitiveType.FLOAT,
+                    default=2000,
+                    constraints=ValueConstraint(min_value=0),
+                    description="Operazioni su disco al secondo durante la cancellazione (0 = senza limite)",
+                ),
+            ],
+            owner_agent="system-agent",
+            metadata={"calls_agent": False},
+            tags=["workspace", "delete", "job"],
+        ),
+    ]
+
+
+def build_cv_actions() -> List[ActionSpec]:
+    return [
+        ActionSpec(
+            name="cv.generate_json",
+            description="Genera (o aggiorna) il JSON strutturato di un CV. "
+            "I parametri sono inoltrati a cv-agent.generate_json.",
+            domain=ActionDomain.OTHER,
+            kind=ActionKind.GENERATION,
+            owner_agent="cv-agent",
+            tags=["cv", "json"],
+        ),
+        ActionSpec(
+            name="cv.ocr",
+            description="OCR per pagina in streaming, con cache delle pagine già viste.",
+            domain=ActionDomain.OTHER,
+            kind=ActionKind.ANALYSIS,
+            parameters=[
+                _p("paths", type=PrimitiveType.JSON, required=True, description="File (PDF o immagini) da leggere"),
+                _p(
+                    "ocr_version",
+                    type=PrimitiveType.STRING,
+                    description="Versione del backend OCR (default: quella dichiarata da cv-agent)",
+                ),
+            ],
+            owner_agent="cv-agent",
+            tags=["cv", "ocr", "streaming"],
+        ),
+        ActionSpec(
+            name="cv.render_html",
+            description="HTML del CV, dalla cache degli artifact se già renderizzato.",
+            domain=ActionDomain.OTHER,
+            kind=ActionKind.GENERATION,
+            parameters=[
+                _p("cv_id", type=PrimitiveType.STRING, required=True, description="CV di riferimento"),
+                _p(
+                    "template_version",
+                    type=PrimitiveType.STRING,
+                    description="Versione del template (default: quella dichiarata da cv-agent)",
+                ),
+                _p(
+                    "if_none_match",
+                    type=PrimitiveType.STRING,
+                    description="Etag già in possesso del client: se invariato, niente contenuto",
+                ),
+            ],
+            owner_agent="cv-agent",
+            tags=["cv", "render", "html"],
+        ),
+        ActionSpec(
+            name="cv.export_pdf",
+            description="PDF del CV, dalla cache degli artifact se già esportato.",
+            domain=ActionDomain.OTHER,
+            kind=ActionKind.GENERATION,
+            parameters=[
+                _p("cv_id", type=PrimitiveType.STRING, required=True, description="CV di riferimento"),
+                _p(
+                    "template_version",
+                    type=PrimitiveType.STRING,
+                    description="Versione del template (default: quella dichiarata da cv-agent)",
+                ),
+                _p(
+                    "if_none_match",
+                    type=PrimitiveType.STRING,
+                    description="Etag già in possesso del client: se invariato, niente contenuto",
+                ),
+            ],
+            owner_agent="cv-agent",
+            tags=["cv", "render", "pdf"],
+        ),
+        ActionSpec(
+            name="cv.cleanup",
+            description="Rimuove i dati di un CV e i suoi artifact in cache.",
+            domain=ActionDomain.OTHER,
+            kind=ActionKind.MUTATION,
+            parameters=[
+                _p("cv_id", type=PrimitiveType.STRING, required=True, description="CV di riferimento"),
+            ],
+            owner_agent="cv-agent",
+            tags=["cv", "cleanup"],
+        ),
+        ActionSpec(
+            name="cv.pipeline",
+            description="Pipeline CV (OCR, JSON, HTML, PDF) come job in background, anche in batch.",
+            domain=ActionDomain.OTHER,
+            kind=ActionKind.GENERATION,
+            parameters=[
+                _p(
+                    "items",
+                    type=PrimitiveType.JSON,
+                    description="Lista di {paths, cv_id, ...parametri di generate_json}; "
+                    "senza items la richiesta descrive un solo CV",
+                ),
+                _p(
+                    "paths",
+                    type=PrimitiveType.JSON,
+                    description="File da OCR per il singolo CV",
+                ),
+                _p(
+                    "stages",
+                    type=PrimitiveType.JSON,
+                    description="Sottoinsieme di [ocr, json, html, pdf] (default: tutti)",
+                ),
+                _p(
+                    "concurrency",
+                    type=PrimitiveType.JSON,
+                    description="Chiamate contemporanee per stage, es. {\"pdf\": 2}",
+                ),
+            ],
+            owner_agent="cv-agent",
+            tags=["cv", "pipeline", "job"],
+        ),
+    ]
+
+
+def build_docs_actions() -> List[ActionSpec]:
+    return [
+        ActionSpec(
+            name="docs.list",
+            description="Albero della documentazione (file markdown).",
+            domain=ActionDomain.UI,
+            kind=ActionKind.QUERY,
+            tags=["docs"],
+        ),
+        ActionSpec(
+            name="docs.read",
+            description="Contenuto di un documento.",
+            domain=ActionDomain.UI,
+            kind=ActionKind.QUERY,
+            parameters=[
+                _p("path", type=PrimitiveType.STRING, required=True, description="Percorso relativo a docs/"),
+            ],
+            tags=["docs"],
+        ),
     ]
 
 
@@ -179,8 +946,150 @@ def build_system_actions() -> List[ActionSpec]:
             domain=ActionDomain.SYSTEM,
             kind=ActionKind.QUERY,
             owner_agent="system-agent",
+            metadata={"calls_agent": False},
             tags=["system", "workspace"],
         ),
+        ActionSpec(
+            name="system.chat.stream",
+            description="Chat con il system agent, risposta in streaming (richiede emit_event).",
+            domain=ActionDomain.SYSTEM,
+            kind=ActionKind.GENERATION,
+            parameters=[
+                _p("message", type=PrimitiveType.STRING, required=True, description="Messaggio dell'utente"),
+                _p(
+                    "conversation_id",
+                    type=PrimitiveType.STRING,
+                    default="default",
+                    description="Conversazione (storia degli ultimi messaggi)",
+                ),
+            ],
+            owner_agent="system-agent",
+            tags=["system", "chat", "streaming"],
+        ),
+        ActionSpec(
+            name="system.job.status",
+            description="Stato e progresso dei job in background.",
+            domain=ActionDomain.SYSTEM,
+            kind=ActionKind.QUERY,
+            parameters=[
+                _p(
+                    "job_id",
+                    type=PrimitiveType.STRING,
+                    description="Job da consultare (default: tutti i job noti)",
+                ),
+                _p(
+                    "kind",
+                    type=PrimitiveType.STRING,
+                    description="Filtra per tipo di job (es. workspace.delete)",
+                ),
+            ],
+            owner_agent="system-agent",
+            metadata={"calls_agent": False},
+            tags=["system", "job"],
+        ),
+        ActionSpec(
+            name="system.job.cancel",
+            description="Richiede la cancellazione di un job in background.",
+            domain=ActionDomain.SYSTEM,
+            kind=ActionKind.MUTATION,
+            parameters=[
+                _p("job_id", type=PrimitiveType.STRING, required=True, description="Job da cancellare"),
+            ],
+            owner_agent="system-agent",
+            metadata={"calls_agent": False},
+            tags=["system", "job"],
+        ),
+        ActionSpec(
+            name="system.profile.slowest",
+            description="Richieste più lente con il tempo per fase e i profili cProfile catturati.",
+            domain=ActionDomain.SYSTEM,
+            kind=ActionKind.QUERY,
+            parameters=[
+                _p(
+                    "limit",
+                    type=PrimitiveType.INTEGER,
+                    constraints=ValueConstraint(min_value=1),
+                    description="Numero massimo di richieste",
+                ),
+                _p("request_id", type=PrimitiveType.STRING, description="Solo questa richiesta, con il profilo"),
+                _p(
+                    "include_profile",
+                    type=PrimitiveType.BOOLEAN,
+                    default=False,
+                    description="Include l'output di pstats",
+                ),
+            ],
+            owner_agent="system-agent",
+            metadata={"calls_agent": False},
+            tags=["system", "profiling"],
+        ),
+        ActionSpec(
+            name="system.profile.configure",
+            description="Abilita il profiling del dispatch e imposta le regole di campionamento.",
+            domain=ActionDomain.SYSTEM,
+            kind=ActionKind.MUTATION,
+            parameters=[
+                _p("enabled", type=PrimitiveType.BOOLEAN, description="Misura delle fasi e richieste più lente"),
+                _p(
+                    "slowest",
+                    type=PrimitiveType.INTEGER,
+                    constraints=ValueConstraint(min_value=1, max_value=1000),
+                    description="Richieste più lente conservate",
+                ),
+                _p(
+                    "threshold_ms",
+                    type=PrimitiveType.FLOAT,
+                    constraints=ValueConstraint(min_value=0),
+                    description="Profilo cProfile conservato solo oltre questa latenza (0 = disattiva)",
+                ),
+                _p(
+                    "sample_rate",
+                    type=PrimitiveType.FLOAT,
+                    constraints=ValueConstraint(min_value=0, max_value=1),
+                    description="Frazione di richieste profilate per la regola threshold_ms",
+                ),
+                _p("clear", type=PrimitiveType.BOOLEAN, default=False, description="Svuota i buffer"),
+            ],
+            owner_agent="system-agent",
+            metadata={"calls_agent": False},
+            tags=["system", "profiling"],
+        ),
+        ActionSpec(
+            name="system.agents.stats",
+            description="Routing verso gli agenti: chiamate, coda e carico per agente.",
+            domain=ActionDomain.SYSTEM,
+            kind=ActionKind.QUERY,
+            parameters=[
+                _p("agent", type=PrimitiveType.STRING, description="Solo questo agente"),
+                _p(
+                    "include_routes",
+                    type=PrimitiveType.BOOLEAN,
+                    description="Include la tabella azione -> agente",
+                    default=False,
+                ),
+            ],
+            owner_agent="system-agent",
+            metadata={"calls_agent": False},
+            tags=["system", "agents"],
+        ),
+        ActionSpec(
+            name="system.agents.configure",
+            description="Imposta la modalità di routing verso gli agenti.",
+            domain=ActionDomain.SYSTEM,
+            kind=ActionKind.MUTATION,
+            parameters=[
+                _p(
+                    "mode",
+                    type=PrimitiveType.CHOICE,
+                    required=True,
+                    description="Modalità di routing",
+                    constraints=ValueConstraint(choices=["direct", "load_aware"]),
+                ),
+            ],
+            owner_agent="system-agent",
+            metadata={"calls_agent": False},
+            tags=["system", "agents"],
+        ),
     ]
 
 
@@ -202,7 +1111,11 @@ def build_default_actions() -> List[ActionSpec]:
 
     actions.extend(build_logs_actions())
     actions.extend(build_code_actions())
+    actions.extend(build_knowledge_actions())
     actions.extend(build_workflow_actions())
+    actions.extend(build_workspace_actions())
+    actions.extend(build_cv_actions())
+    actions.extend(build_docs_actions())
     actions.extend(build_system_actions())
 
     return actions
@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List
+
+from ice_api.actions.base import ActionSpec
+from ice_api.types.identifiers import ActionName
+
+
+# ============================================================================
+# CATALOG / REGISTRY CONSISTENCY
+# ============================================================================
+
+@dataclass
+class RegistryReport:
+    """
+    Confronto tra il catalogo dichiarativo (ActionSpec) e gli handler
+    registrati. NON contiene logica di correzione: solo le differenze.
+    """
+
+    missing_handlers: List[ActionName] = field(default_factory=list)   # spec senza handler
+    missing_specs: List[ActionName] = field(default_factory=list)      # handler senza spec
+    without_owner: List[ActionName] = field(default_factory=list)      # spec senza owner_agent
+
+    @property
+    def ok(self) -> bool:
+        return not self.missing_handlers and not self.missing_specs
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "ok": self.ok,
+            "missing_handlers": self.missing_handlers,
+            "missing_specs": self.missing_specs,
+            "without_owner": self.without_owner,
+        }
+
+
+def check_registry(actions: Iterable[ActionSpec], handlers: Iterable[str]) -> RegistryReport:
+    specs = {spec.name: spec for spec in actions}
+    registered = set(handlers)
+    return RegistryReport(
+        missing_handlers=sorted(set(specs) - registered),
+        missing_specs=sorted(registered - set(specs)),
+        without_owner=sorted(name for name, spec in specs.items() if not spec.owner_agent),
+    )
@@ -0,0 +1,7 @@
+from ice_api.agents.catalog import build_agents_from_actions
+from ice_api.agents.spec import AgentSpec
+
+__all__ = [
+    "AgentSpec",
+    "build_agents_from_actions",
+]
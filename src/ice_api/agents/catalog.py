@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Optional
+
+from ice_api.actions.base import ActionSpec
+from ice_api.agents.spec import DEFAULT_AGENT_CONCURRENCY, AgentSpec
+
+# chiamate contemporanee per replica, per gli agenti noti
+AGENT_CONCURRENCY: Dict[str, int] = {
+    "system-agent": 16,
+    "log-agent": 8,
+    "code-agent": 8,
+    "knowledge-agent": 8,
+    "planner-agent": 4,
+    "cv-agent": 4,
+}
+
+
+def build_agents_from_actions(
+    actions: Iterable[ActionSpec],
+    *,
+    concurrency: Optional[Dict[str, int]] = None,
+) -> List[AgentSpec]:
+    """
+    Un AgentSpec per ogni owner_agent dichiarato nel catalogo,
+    con le azioni possedute (ordinate) e i domini coperti.
+    """
+    limits = {**AGENT_CONCURRENCY, **(concurrency or {})}
+    by_agent: Dict[str, AgentSpec] = {}
+    for action in actions:
+        if not action.owner_agent:
+            continue
+        agent = by_agent.get(action.owner_agent)
+        if agent is None:
+            agent = by_agent[action.owner_agent] = AgentSpec(
+                name=action.owner_agent,
+                max_concurrency=limits.get(action.owner_agent, DEFAULT_AGENT_CONCURRENCY),
+            )
+        agent.actions.append(action.name)
+        if action.domain not in agent.domains:
+            agent.domains.append(action.domain)
+
+    for agent in by_agent.values():
+        agent.actions.sort()
+    return [by_agent[name] for name in sorted(by_agent)]
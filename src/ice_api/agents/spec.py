@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+
+from ice_api.types.enums import ActionDomain
+from ice_api.types.identifiers import ActionName, AgentName
+
+DEFAULT_AGENT_CONCURRENCY = 8
+
+
+# ============================================================================
+# AGENT SPEC
+# ============================================================================
+
+@dataclass
+class AgentSpec:
+    """
+    Contratto dichiarativo di un agente ICE.
+
+    Derivato dal catalogo delle azioni (ActionSpec.owner_agent):
+    - quali azioni l'agente possiede
+    - quante chiamate contemporanee accetta per replica
+    - quante repliche ci si aspetta dal runtime
+
+    NON contiene implementazione: l'handle dell'agente lo fornisce il runtime.
+    """
+
+    name: AgentName
+    description: str = ""
+
+    actions: List[ActionName] = field(default_factory=list)
+    domains: List[ActionDomain] = field(default_factory=list)
+
+    # routing
+    max_concurrency: int = DEFAULT_AGENT_CONCURRENCY
+    replicas: int = 1
+
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+    def owns(self, action: ActionName) -> bool:
+        return action in self.actions
@@ -1,11 +1,54 @@
 from __future__ import annotations
 
-from typing import Any, Dict, Optional
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+# ============================================================================
+# ERROR CODES
+# ============================================================================
+# Codici preallocati: il confronto lato client (e nei test) è sul codice,
+# il messaggio è solo per le persone.
+
+API_ERROR = "api.error"
+ACTION_NOT_FOUND = "api.action.not_found"
+AGENT_NOT_FOUND = "api.agent.not_found"
+WORKSPACE_NOT_FOUND = "api.workspace.not_found"
+WORKSPACE_REQUIRED = "api.workspace.required"
+PARAMS_INVALID = "api.params.invalid"
+ACTION_EXECUTION = "api.action.execution"
+ORCHESTRATOR_ROUTING = "api.orchestrator.routing"
+PERMISSION_DENIED = "api.permission.denied"
+STREAM_UNAVAILABLE = "api.stream.unavailable"
+
+WIRE_CACHE_SIZE = 1024          # payload memorizzati da ApiError.wire
 
 
 # ============================================================================
 # BASE IPC / API ERROR
 # ============================================================================
+# Il costo di un errore è nel dict details: il messaggio (italiano) è
+# ottenuto da template.format_map(details) solo quando qualcuno lo legge
+# (str(), log, to_dict). Chi deve solo rispondere al client usa:
+#
+#   exc.to_dict()            {"code", "message", "details"}
+#   Cls.wire(**details)      lo stesso payload senza creare l'eccezione,
+#                            memorizzato per details uguali (hashable)
+#   error_response(payload)  {"ok": False, "error": payload}
+#
+# I payload restituiti da wire() sono condivisi: non vanno modificati.
+# error_response() ne restituisce una copia, quindi le risposte del
+# dispatcher si possono annotare (request id, ...) senza toccare la cache.
+# ============================================================================
+
+_WIRE: Dict[Tuple[Any, ...], Dict[str, Any]] = {}
+_WIRE_GUARD = threading.Lock()
+
+
+def _rebuild(cls: type, message: Optional[str], details: Dict[str, Any]) -> "ApiError":
+    exc = cls.__new__(cls)
+    ApiError.__init__(exc, message, details=details)
+    return exc
+
 
 class ApiError(Exception):
     """
@@ -17,12 +60,22 @@ class ApiError(Exception):
     - consumabile da CLI / GUI / LLM
     """
 
-    code: str = "api.error"
+    code: str = API_ERROR
+    template: str = "Errore API."
 
-    def __init__(self, message: str, *, details: Optional[Dict[str, Any]] = None):
-        super().__init__(message)
-        self.message = message
-        self.details = details or {}
+    def __init__(self, message: Optional[str] = None, *, details: Optional[Dict[str, Any]] = None):
+        super().__init__()
+        self._message = message
+        self.details = details if details is not None else {}
+
+    @property
+    def message(self) -> str:
+        if self._message is None:
+            try:
+                self._message = self.template.format_map(self.details)
+            except (KeyError, IndexError, ValueError):
+                self._message = self.template
+        return self._message
 
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -31,10 +84,53 @@ class ApiError(Exception):
             "details": self.details,
         }
 
+    @classmethod
+    def wire(cls, **details: Any) -> Dict[str, Any]:
+        """Payload di to_dict() per questi details, senza istanziare l'errore."""
+        try:
+            key = (cls, *details.items())
+            payload = _WIRE.get(key)
+        except TypeError:
+            # details non hashable: niente cache
+            return _rebuild(cls, None, details).to_dict()
+        if payload is None:
+            payload = _rebuild(cls, None, details).to_dict()
+            with _WIRE_GUARD:
+                if len(_WIRE) >= WIRE_CACHE_SIZE:
+                    _WIRE.clear()
+                _WIRE[key] = payload
+        return payload
+
+    def __reduce__(self) -> Any:
+        # i costruttori delle sottoclassi hanno firme diverse
+        return _rebuild, (type(self), self._message, self.details)
+
     def __str__(self) -> str:
         return f"{self.code}: {self.message}"
 
 
+def error_response(error: ApiError | Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Risposta di errore nel formato del dispatcher.
+
+    Il payload è sempre una copia (details compresi): chi riceve la risposta
+    può modificarla liberamente anche se viene dalla cache di wire().
+    """
+    if isinstance(error, ApiError):
+        return {"ok": False, "error": error.to_dict()}
+    payload = dict(error)
+    if isinstance(payload.get("details"), dict):
+        payload["details"] = dict(payload["details"])
+    return {"ok": False, "error": payload}
+
+
+def error_message(error: Any) -> str:
+    """Testo di un campo "error": payload strutturato o stringa degli handler."""
+    if isinstance(error, dict):
+        return f"{error.get('code')}: {error.get('message')}"
+    return str(error)
+
+
 class IPCError(ApiError):
     """
     Alias semantico di ApiError per il layer IPC.
@@ -52,33 +148,35 @@ class IPCError(ApiError):
 # ============================================================================
 
 class ActionNotFoundError(ApiError):
-    code = "api.action.not_found"
+    code = ACTION_NOT_FOUND
+    template = "Azione '{action}' non trovata."
 
     def __init__(self, action: str):
-        super().__init__(
-            f"Azione '{action}' non trovata.",
-            details={"action": action},
-        )
+        super().__init__(details={"action": action})
 
 
 class AgentNotFoundError(ApiError):
-    code = "api.agent.not_found"
+    code = AGENT_NOT_FOUND
+    template = "Agente '{agent}' non trovato."
 
     def __init__(self, agent: str):
-        super().__init__(
-            f"Agente '{agent}' non trovato.",
-            details={"agent": agent},
-        )
+        super().__init__(details={"agent": agent})
 
 
 class WorkspaceNotFoundError(ApiError):
-    code = "api.workspace.not_found"
+    code = WORKSPACE_NOT_FOUND
+    template = "Workspace '{workspace_id}' non trovato."
 
     def __init__(self, workspace_id: str):
-        super().__init__(
-            f"Workspace '{workspace_id}' non trovato.",
-            details={"workspace_id": workspace_id},
-        )
+        super().__init__(details={"workspace_id": workspace_id})
+
+
+class WorkspaceRequiredError(ApiError):
+    code = WORKSPACE_REQUIRED
+    template = "L'azione '{action}' richiede un workspace attivo."
+
+    def __init__(self, action: str):
+        super().__init__(details={"action": action})
 
 
 # ============================================================================
@@ -86,13 +184,11 @@ class WorkspaceNotFoundError(ApiError):
 # ============================================================================
 
 class InvalidParametersError(ApiError):
-    code = "api.params.invalid"
+    code = PARAMS_INVALID
+    template = "Parametri non validi per '{action}'."
 
     def __init__(self, action: str, errors: Dict[str, str]):
-        super().__init__(
-            f"Parametri non validi per '{action}'.",
-            details={"action": action, "errors": errors},
-        )
+        super().__init__(details={"action": action, "errors": errors})
 
 
 class IPCValidationError(InvalidParametersError):
@@ -112,7 +208,8 @@ class IPCValidationError(InvalidParametersError):
 # ============================================================================
 
 class ActionExecutionError(ApiError):
-    code = "api.action.execution"
+    code = ACTION_EXECUTION
+    template = "Errore durante l'esecuzione di '{action}' da parte di '{agent}'."
 
     def __init__(
         self,
@@ -123,7 +220,6 @@ class ActionExecutionError(ApiError):
         partial_result: Optional[Dict[str, Any]] = None,
     ):
         super().__init__(
-            f"Errore durante l'esecuzione di '{action}' da parte di '{agent}'.",
             details={
                 "action": action,
                 "agent": agent,
@@ -135,20 +231,24 @@ class ActionExecutionError(ApiError):
 
 
 class OrchestratorRoutingError(ApiError):
-    code = "api.orchestrator.routing"
+    code = ORCHESTRATOR_ROUTING
+    template = "Impossibile determinare l'agente per '{action}'."
 
     def __init__(self, action: str):
-        super().__init__(
-            f"Impossibile determinare l'agente per '{action}'.",
-            details={"action": action},
-        )
+        super().__init__(details={"action": action})
 
 
 class PermissionDeniedError(ApiError):
-    code = "api.permission.denied"
+    code = PERMISSION_DENIED
+    template = "Permesso negato per '{action}'."
 
     def __init__(self, action: str):
-        super().__init__(
-            f"Permesso negato per '{action}'.",
-            details={"action": action},
-        )
+        super().__init__(details={"action": action})
+
+
+class StreamUnavailableError(ApiError):
+    code = STREAM_UNAVAILABLE
+    template = "L'azione '{action}' richiede un canale di eventi (emit_event)."
+
+    def __init__(self, action: str):
+        super().__init__(details={"action": action})
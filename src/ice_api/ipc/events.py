@@ -5,6 +5,7 @@ from typing import Any, Dict, Optional
 
 from ice_api.types.enums import IPCMessageKind
 from ice_api.types.identifiers import WorkspaceId, SessionId, UserId
+from ice_api.utils.tracing import current_correlation_id
 
 
 @dataclass
@@ -12,7 +13,8 @@ class EventHeader:
     kind: IPCMessageKind = IPCMessageKind.EVENT
 
     event_id: Optional[str] = None
-    correlation_id: Optional[str] = None
+    # default: correlation_id della richiesta in corso (utils.tracing)
+    correlation_id: Optional[str] = field(default_factory=current_correlation_id)
 
     workspace_id: Optional[WorkspaceId] = None
     session_id: Optional[SessionId] = None
@@ -10,6 +10,7 @@ from ice_api.types.identifiers import (
     SessionId,
     UserId,
 )
+from ice_api.utils.tracing import current_correlation_id
 
 
 # ============================================================================
@@ -25,7 +26,8 @@ class MessageHeader:
     kind: IPCMessageKind
 
     request_id: Optional[str] = None
-    correlation_id: Optional[str] = None
+    # default: correlation_id della richiesta in corso (utils.tracing)
+    correlation_id: Optional[str] = field(default_factory=current_correlation_id)
 
     workspace_id: Optional[WorkspaceId] = None
     session_id: Optional[SessionId] = None
@@ -0,0 +1,7 @@
+# ============================================================================
+# ICE API SERVICES
+# ============================================================================
+# Implementazioni di supporto dietro le azioni del dispatcher UI
+# (ice_api.ui.actions). Nessun modulo qui definisce contratti:
+# i contratti restano in ice_api.actions / ice_api.ipc.
+# ============================================================================
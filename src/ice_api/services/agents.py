@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import logging
+import threading
+import weakref
+from contextvars import ContextVar, Token
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ice_api.ipc.errors import AgentNotFoundError, OrchestratorRoutingError
+
+logger = logging.getLogger("ice.api.services.agents")
+
+# ============================================================================
+# AGENT RESOLVER
+# ============================================================================
+# Gli handle degli agenti sono risolti una volta e riusati finché il
+# runtime non cambia generazione:
+#
+#   - runtime diverso, o runtime.generation diverso -> cache svuotata
+#   - invalidate(agent_id) al restart di un singolo agente: registrato
+#     una volta per runtime con runtime.on_agent_restart(callback), se
+#     il runtime lo espone
+#
+# Gli handler risolvono l'agente dall'azione (for_action, da
+# ActionSpec.owner_agent), non da un id scritto nell'handler.
+#
+# Ricerca (solo al primo uso): runtime.get_agent(id), poi
+# runtime.system_service.get_agent(id) e, per system-agent,
+# runtime.system_service.system_agent.
+#
+# Repliche: se il runtime espone get_agent_replicas(id) l'agente può
+# avere più handle; il routing (services.routing) ne sceglie uno per
+# chiamata e lo fissa con pin() per la durata dell'handler, così
+# resolve()/method() restituiscono la replica scelta.
+# ============================================================================
+
+# (agent_id, indice replica, handle) fissato per la chiamata corrente
+_PINNED: ContextVar[Optional[Tuple[str, int, Any]]] = ContextVar("ice_api_pinned_agent", default=None)
+
+
+def _lookup(runtime: Any, agent_id: str) -> Any:
+    if hasattr(runtime, "get_agent"):
+        try:
+            agent = runtime.get_agent(agent_id)
+        except Exception:
+            agent = None
+        if agent is not None:
+            return agent
+
+    system_service = getattr(runtime, "system_service", None)
+    if system_service is None:
+        return None
+    if agent_id == "system-agent":
+        agent = getattr(system_service, "system_agent", None)
+        if agent is not None:
+            return agent
+    if hasattr(system_service, "get_agent"):
+        try:
+            return system_service.get_agent(agent_id)
+        except Exception:
+            return None
+    return None
+
+
+class AgentResolver:
+    def __init__(self) -> None:
+        self._runtime: Optional[Callable[[], Any]] = None
+        self._generation: Any = None
+        self._agents: Dict[str, Any] = {}
+        self._methods: Dict[Tuple[str, str, int], Callable[..., Any]] = {}
+        self._replicas: Dict[str, List[Any]] = {}
+        self._subscribed: set = set()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "lookups": 0, "invalidations": 0}
+
+    # ------------------------------------------------------------------
+    # generation
+    # ------------------------------------------------------------------
+
+    def _check_generation(self, runtime: Any) -> None:
+        generation = getattr(runtime, "generation", None)
+        current = self._runtime() if self._runtime is not None else None
+        if current is runtime and generation == self._generation:
+            return
+        with self._lock:
+            current = self._runtime() if self._runtime is not None else None
+            if current is runtime and generation == self._generation:
+                return
+            if self._agents:
+                self.stats["invalidations"] += 1
+                logger.info("Runtime generation changed, agent handles dropped")
+            self._agents.clear()
+            self._methods.clear()
+            self._replicas.clear()
+            try:
+                self._runtime = weakref.ref(runtime)
+            except TypeError:
+                self._runtime = lambda runtime=runtime: runtime
+            self._generation = generation
+            self._subscribe_restarts(runtime)
+
+    def _subscribe_restarts(self, runtime: Any) -> None:
+        """invalidate(agent_id) sul restart di un agente, una volta per runtime."""
+        if id(runtime) in self._subscribed:
+            return
+        subscribe = getattr(runtime, "on_agent_restart", None)
+        if not callable(subscribe):
+            return
+        try:
+            subscribe(self.invalidate)
+        except Exception:
+            logger.warning("Agent restart subscription failed", exc_info=True)
+            return
+        self._subscribed.add(id(runtime))
+        try:
+            weakref.finalize(runtime, self._subscribed.discard, id(runtime))
+        except TypeError:
+            pass
+
+    def invalidate(self, agent_id: Optional[str] = None) -> None:
+        """Agente riavviato (o tutti, senza agent_id): il prossimo uso lo risolve di nuovo."""
+        with self._lock:
+            self.stats["invalidations"] += 1
+            if agent_id is None:
+                self._agents.clear()
+                self._methods.clear()
+                self._replicas.clear()
+                return
+            self._agents.pop(agent_id, None)
+            self._replicas.pop(agent_id, None)
+            for key in [k for k in self._methods if k[0] == agent_id]:
+                del self._methods[key]
+
+    # ------------------------------------------------------------------
+    # resolution
+    # ------------------------------------------------------------------
+
+    def resolve(self, runtime: Any, agent_id: str) -> Any:
+        pinned = _PINNED.get()
+        if pinned is not None and pinned[0] == agent_id:
+            return pinned[2]
+        self._check_generation(runtime)
+        agent = self._agents.get(agent_id)
+        if agent is not None:
+            self.stats["hits"] += 1
+            return agent
+        with self._lock:
+            agent = self._agents.get(agent_id)
+            if agent is None:
+                self.stats["lookups"] += 1
+                agent = _lookup(runtime, agent_id)
+                if agent is None:
+                    raise AgentNotFoundError(agent_id)
+                self._agents[agent_id] = agent
+        return agent
+
+    def method(self, runtime: Any, agent_id: str, name: str) -> Callable[..., Any]:
+        """Metodo già legato all'handle dell'agente (un solo getattr per generazione)."""
+        pinned = _PINNED.get()
+        replica = pinned[1] if pinned is not None and pinned[0] == agent_id else 0
+        self._check_generation(runtime)
+        bound = self._methods.get((agent_id, name, replica))
+        if bound is not None:
+            self.stats["hits"] += 1
+            return bound
+        agent = self.resolve(runtime, agent_id)
+        bound = getattr(agent, name, None)
+        if bound is None:
+            raise AttributeError(f"Agent '{agent_id}' has no method '{name}'")
+        with self._lock:
+            self._methods[(agent_id, name, replica)] = bound
+        return bound
+
+    # ------------------------------------------------------------------
+    # replicas
+    # ------------------------------------------------------------------
+
+    def replicas(self, runtime: Any, agent_id: str) -> List[Any]:
+        """Handle delle repliche dell'agente (almeno uno), risolti una volta per generazione."""
+        self._check_generation(runtime)
+        replicas = self._replicas.get(agent_id)
+        if replicas is not None:
+            return replicas
+        found: List[Any] = []
+        if hasattr(runtime, "get_agent_replicas"):
+            try:
+                found = [agent for agent in runtime.get_agent_replicas(agent_id) or () if agent is not None]
+            except Exception:
+                found = []
+        if not found:
+            found = [self.resolve(runtime, agent_id)]
+        with self._lock:
+            self._replicas[agent_id] = found
+        return found
+
+    def pin(self, agent_id: str, replica: int, agent: Any) -> Token:
+        """Fissa la replica per il contesto corrente (vedi unpin)."""
+        return _PINNED.set((agent_id, replica, agent))
+
+    def unpin(self, token: Token) -> None:
+        _PINNED.reset(token)
+
+    def for_action(self, runtime: Any, spec: Any, name: Optional[str] = None) -> Any:
+        """Agente (o suo metodo `name`) proprietario di un'azione, da ActionSpec.owner_agent."""
+        owner = getattr(spec, "owner_agent", None)
+        if not owner:
+            raise OrchestratorRoutingError(str(getattr(spec, "name", spec)))
+        if name is None:
+            return self.resolve(runtime, owner)
+        return self.method(runtime, owner, name)
+
+    def cached(self) -> Dict[str, str]:
+        return {agent_id: type(agent).__name__ for agent_id, agent in self._agents.items()}
+
+
+AGENTS = AgentResolver()
@@ -0,0 +1,8 @@
+from ice_api.services.code.reader import read_file_range
+from ice_api.services.code.symbols import SymbolIndex, extract_file
+
+__all__ = [
+    "read_file_range",
+    "SymbolIndex",
+    "extract_file",
+]
@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import bisect
+import codecs
+import mmap
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+# ============================================================================
+# TUNING
+# ============================================================================
+
+CHECKPOINT_BYTES = 64 * 1024         # un checkpoint di riga ogni ~64 KiB
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024  # limite di default di una singola risposta
+LINE_INDEX_CACHE_SIZE = 256          # indici di riga tenuti in memoria
+
+
+# ============================================================================
+# SPARSE LINE INDEX
+# ============================================================================
+
+class LineIndex:
+    """
+    Indice di riga sparso: (numero di riga, offset) del primo inizio riga
+    dopo ogni blocco di CHECKPOINT_BYTES.
+
+    "righe 50000-50100" diventa: bisect sui checkpoint + scansione di
+    al massimo un blocco, invece di una scansione dall'inizio del file.
+    """
+
+    def __init__(self, lines: array, offsets: array, total_lines: int) -> None:
+        self.lines = lines          # array Q: numero di riga (0-based) al checkpoint
+        self.offsets = offsets      # array Q: offset in byte del checkpoint
+        self.total_lines = total_lines
+
+    @classmethod
+    def build(cls, mm: mmap.mmap, *, step: int = CHECKPOINT_BYTES) -> "LineIndex":
+        size = len(mm)
+        lines = array("Q", [0])
+        offsets = array("Q", [0])
+        line_no = 0
+        pos = 0
+
+        while pos < size:
+            target = pos + step
+            if target >= size:
+                line_no += mm[pos:size].count(b"\n")
+                break
+            nl = mm.find(b"\n", target)
+            if nl < 0:
+                line_no += mm[pos:size].count(b"\n")
+                break
+            line_no += mm[pos:nl + 1].count(b"\n")
+            pos = nl + 1
+            lines.append(line_no)
+            offsets.append(pos)
+
+        # l'ultima riga senza newline finale conta comunque
+        if size and mm[size - 1:size] != b"\n":
+            line_no += 1
+        return cls(lines, offsets, line_no)
+
+    def offset_of(self, mm: mmap.mmap, line: int) -> int:
+        """Offset in byte dell'inizio della riga `line` (0-based)."""
+        if line <= 0:
+            return 0
+        if line >= self.total_lines:
+            return len(mm)
+
+        i = bisect.bisect_right(self.lines, line) - 1
+        current, pos = self.lines[i], self.offsets[i]
+        while current < line:
+            nl = mm.find(b"\n", pos)
+            if nl < 0:
+                return len(mm)
+            pos = nl + 1
+            current += 1
+        return pos
+
+
+class _LineIndexCache:
+    """Indici di riga per (path, mtime_ns, size): invalidati da ogni modifica."""
+
+    def __init__(self, size: int = LINE_INDEX_CACHE_SIZE) -> None:
+        self._size = size
+        self._entries: "OrderedDict[Tuple[str, int, int], LineIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[str, int, int], mm: mmap.mmap) -> LineIndex:
+        with self._lock:
+            index = self._entries.get(key)
+            if index is not None:
+                self._entries.move_to_end(key)
+                return index
+
+        index = LineIndex.build(mm)
+        with self._lock:
+            # una sola versione per path: rimuove quelle con mtime/size vecchi
+            for stale in [k for k in self._entries if k[0] == key[0]]:
+                del self._entries[stale]
+            self._entries[key] = index
+            while len(self._entries) > self._size:
+                self._entries.popitem(last=False)
+        return index
+
+
+LINE_INDEX_CACHE = _LineIndexCache()
+
+
+# ============================================================================
+# ENCODING-AWARE SLICING
+# ============================================================================
+
+def _is_utf8(encoding: str) -> bool:
+    return codecs.lookup(encoding).name == "utf-8"
+
+
+def _align_utf8(mm: mmap.mmap, start: int, end: int) -> Tuple[int, int]:
+    """
+    Allinea [start, end) ai confini di carattere UTF-8:
+    start avanza oltre i byte di continuazione (10xxxxxx),
+    end arretra se taglierebbe un carattere multibyte. Se lo slice
+    non contiene nemmeno un carattere intero (end - start più piccolo
+    del carattere in start) end avanza fino alla sua fine: chi pagina
+    con next_byte procede sempre di almeno un carattere.
+    """
+    size = len(mm)
+    while start < size and start < end and (mm[start] & 0xC0) == 0x80:
+        start += 1
+
+    if end < size:
+        back = end
+        # al massimo 3 byte di continuazione prima del lead byte
+        while back > start and end - back < 4 and (mm[back] & 0xC0) == 0x80:
+            back -= 1
+        if back == start and end > start:
+            back = start + 1
+            while back < size and (mm[back] & 0xC0) == 0x80:
+                back += 1
+        end = back
+    return start, end
+
+
+def _decode(data: bytes, encoding: str) -> str:
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    return decoder.decode(data, final=True)
+
+
+# ============================================================================
+# RANGED READ
+# ============================================================================
+
+def read_file_range(
+    path: str,
+    *,
+    encoding: str = "utf-8",
+    start_line: Optional[int] = None,
+    end_line: Optional[int] = None,
+    start_byte: Optional[int] = None,
+    end_byte: Optional[int] = None,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+) -> Dict[str, Any]:
+    """
+    Lettura a intervallo via mmap: viene copiato e decodificato solo lo slice.
+
+    - righe: start_line / end_line, 1-based e inclusive
+    - byte:  start_byte / end_byte, [start, end)
+    - max_bytes limita comunque lo slice (truncated=True, next_byte per
+      proseguire); in UTF-8 lo supera al massimo di 3 byte quando il
+      primo carattere non ci sta
+    """
+    if max_bytes <= 0:
+        raise ValueError(f"max_bytes must be positive, got {max_bytes}")
+    codecs.lookup(encoding)   # LookupError subito, prima di aprire il file
+
+    st = os.stat(path)
+    size = st.st_size
+    result: Dict[str, Any] = {"path": path, "encoding": encoding, "size": size}
+
+    if size == 0:
+        result.update(content="", start_byte=0, end_byte=0, truncated=False)
+        return result
+
+    line_mode = start_line is not None or end_line is not None
+
+    with open(path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if line_mode:
+            index = LINE_INDEX_CACHE.get((os.path.abspath(path), st.st_mtime_ns, size), mm)
+            first = max((start_line or 1) - 1, 0)
+            last = index.total_lines if end_line is None else min(end_line, index.total_lines)
+            start = index.offset_of(mm, first)
+            end = index.offset_of(mm, last) if last > first else start
+            result.update(
+                start_line=first + 1,
+                end_line=max(last, first),
+                total_lines=index.total_lines,
+            )
+        else:
+            start = min(max(start_byte or 0, 0), size)
+            end = size if end_byte is None else min(max(end_byte, start), size)
+
+        truncated = end - start > max_bytes
+        if truncated:
+            end = start + max_bytes
+
+        if _is_utf8(encoding):
+            start, end = _align_utf8(mm, start, end)
+
+        content = _decode(mm[start:end], encoding)
+
+    result.update(
+        content=content,
+        start_byte=start,
+        end_byte=end,
+        truncated=truncated,
+    )
+    if truncated:
+        result["next_byte"] = end
+    return result
@@ -0,0 +1,470 @@
+from __future__ import annotations
+
+import ast
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from ice_api.services.logs.scan import default_state_dir
+from ice_api.utils.process_pool import SharedProcessPool
+
+logger = logging.getLogger("ice.api.services.code.symbols")
+
+# ============================================================================
+# TUNING
+# ============================================================================
+
+INDEX_SCHEMA_VERSION = 2
+POOL_MIN_FILES = 64          # sotto questa soglia il process pool non conviene
+POOL_CHUNKSIZE = 32
+SKIP_DIRS = {".git", ".hg", ".svn", "__pycache__", ".venv", "venv", "node_modules", ".tox"}
+
+
+# ============================================================================
+# EXTRACTION (eseguita nei worker del process pool)
+# ============================================================================
+
+Symbol = Tuple[str, str, str, int, int, int]     # name, kind, qualname, line, col, end_line
+Reference = Tuple[str, int, int]                 # name, line, col
+Import = Tuple[str, Optional[str], Optional[str], int]  # module, name, alias, line
+
+
+class _SymbolVisitor(ast.NodeVisitor):
+    def __init__(self) -> None:
+        self.scope: List[Tuple[str, str]] = []
+        self.symbols: List[Symbol] = []
+        self.refs: List[Reference] = []
+        self.imports: List[Import] = []
+
+    def _qualname(self, name: str) -> str:
+        return ".".join([s for s, _ in self.scope] + [name])
+
+    def _define(self, node: ast.AST, name: str, kind: str) -> None:
+        self.symbols.append(
+            (
+                name,
+                kind,
+                self._qualname(name),
+                node.lineno,
+                node.col_offset,
+                getattr(node, "end_lineno", None) or node.lineno,
+            )
+        )
+
+    def visit_ClassDef(self, node: ast.ClassDef) -> None:
+        self._define(node, node.name, "class")
+        self.scope.append((node.name, "class"))
+        self.generic_visit(node)
+        self.scope.pop()
+
+    def _visit_function(self, node) -> None:
+        in_class = bool(self.scope) and self.scope[-1][1] == "class"
+        self._define(node, node.name, "method" if in_class else "function")
+        self.scope.append((node.name, "function"))
+        self.generic_visit(node)
+        self.scope.pop()
+
+    visit_FunctionDef = _visit_function
+    visit_AsyncFunctionDef = _visit_function
+
+    def visit_Assign(self, node: ast.Assign) -> None:
+        if not self.scope or self.scope[-1][1] == "class":
+            for target in node.targets:
+                if isinstance(target, ast.Name):
+                    self._define(target, target.id, "variable")
+        self.generic_visit(node)
+
+    def visit_AnnAssign(self, node: ast.AnnAssign) -> None:
+        if isinstance(node.target, ast.Name) and (not self.scope or self.scope[-1][1] == "class"):
+            self._define(node.target, node.target.id, "variable")
+        self.generic_visit(node)
+
+    def visit_Import(self, node: ast.Import) -> None:
+        for alias in node.names:
+            self.imports.append((alias.name, None, alias.asname, node.lineno))
+
+    def visit_ImportFrom(self, node: ast.ImportFrom) -> None:
+        module = "." * node.level + (node.module or "")
+        for alias in node.names:
+            self.imports.append((module, alias.name, alias.asname, node.lineno))
+
+    def visit_Name(self, node: ast.Name) -> None:
+        if isinstance(node.ctx, ast.Load):
+            self.refs.append((node.id, node.lineno, node.col_offset))
+
+    def visit_Attribute(self, node: ast.Attribute) -> None:
+        if isinstance(node.ctx, ast.Load):
+            self.refs.append((node.attr, node.lineno, node.col_offset))
+        self.generic_visit(node)
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def extract_file(path: str) -> Tuple[str, Optional[str], List[Symbol], List[Reference], List[Import]]:
+    """
+    Legge e analizza un file Python.
+
+    Restituisce (path, hash, simboli, riferimenti, import); hash None se
+    il file non è leggibile. Errori di sintassi: hash valido, tabelle vuote.
+    """
+    try:
+        data = Path(path).read_bytes()
+    except OSError:
+        return path, None, [], [], []
+
+    digest = content_hash(data)
+    try:
+        tree = ast.parse(data, filename=path)
+    except (SyntaxError, ValueError):
+        return path, digest, [], [], []
+
+    visitor = _SymbolVisitor()
+    visitor.visit(tree)
+    return path, digest, visitor.symbols, visitor.refs, visitor.imports
+
+
+# ============================================================================
+# ON-DISK TABLE
+# ============================================================================
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    hash TEXT,
+    mtime_ns INTEGER,
+    size INTEGER
+);
+CREATE TABLE IF NOT EXISTS symbols (
+    file_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    name_lower TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    qualname TEXT NOT NULL,
+    line INTEGER,
+    col INTEGER,
+    end_line INTEGER
+);
+CREATE TABLE IF NOT EXISTS refs (
+    file_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    line INTEGER,
+    col INTEGER
+);
+CREATE TABLE IF NOT EXISTS imports (
+    file_id INTEGER NOT NULL,
+    module TEXT NOT NULL,
+    name TEXT,
+    alias TEXT,
+    line INTEGER
+);
+CREATE INDEX IF NOT EXISTS symbols_name ON symbols (name_lower);
+CREATE INDEX IF NOT EXISTS symbols_file ON symbols (file_id);
+CREATE INDEX IF NOT EXISTS refs_name ON refs (name);
+CREATE INDEX IF NOT EXISTS refs_file ON refs (file_id);
+CREATE INDEX IF NOT EXISTS imports_module ON imports (module);
+CREATE INDEX IF NOT EXISTS imports_file ON imports (file_id);
+"""
+
+# indice trigram sui nomi per la ricerca per sottostringa; i trigger lo
+# tengono allineato a `symbols` (rowid implicito: l'indice non fa mai VACUUM)
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS symbols_fts USING fts5 (name_lower, tokenize = 'trigram');
+CREATE TRIGGER IF NOT EXISTS symbols_fts_insert AFTER INSERT ON symbols BEGIN
+    INSERT INTO symbols_fts (rowid, name_lower) VALUES (new.rowid, new.name_lower);
+END;
+CREATE TRIGGER IF NOT EXISTS symbols_fts_delete AFTER DELETE ON symbols BEGIN
+    DELETE FROM symbols_fts WHERE rowid = old.rowid;
+END;
+"""
+TRIGRAM_MIN = 3              # il tokenizer trigram non trova query più corte
+
+
+# process pool condiviso tra gli aggiornamenti (vedi utils.process_pool)
+_POOL = SharedProcessPool("code.index")
+
+
+def default_index_path(root: str) -> Path:
+    digest = hashlib.sha1(os.path.abspath(root).encode("utf-8")).hexdigest()
+    return default_state_dir() / "code-index" / f"{digest}.sqlite"
+
+
+def _iter_python_files(root: str) -> Iterable[Tuple[str, int, int]]:
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS]
+        for name in filenames:
+            if name.endswith(".py"):
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                yield path, st.st_mtime_ns, st.st_size
+
+
+class SymbolIndex:
+    """
+    Indice simboli persistente per workspace (SQLite, stdlib).
+
+    Aggiornamento incrementale:
+    - (mtime, size) invariati          -> file saltato senza leggerlo
+    - contenuto con lo stesso hash     -> solo mtime aggiornato
+    - hash diverso / file nuovo        -> ri-analisi (process pool)
+    - file spariti                     -> righe eliminate
+
+    La ricerca per sottostringa usa un indice FTS5 trigram (symbols_fts);
+    dove SQLite non ha FTS5 resta solo la ricerca per prefisso.
+    """
+
+    _locks: Dict[str, threading.Lock] = {}
+    _locks_guard = threading.Lock()
+
+    def __init__(self, root: str, *, db_path: Optional[Path] = None) -> None:
+        self.root = os.path.abspath(root)
+        self.db_path = Path(db_path) if db_path is not None else default_index_path(self.root)
+        with self._locks_guard:
+            self._lock = self._locks.setdefault(str(self.db_path), threading.Lock())
+
+    def _connect(self) -> sqlite3.Connection:
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        self._ensure_fts(conn)
+        conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('schema', ?)",
+            (str(INDEX_SCHEMA_VERSION),),
+        )
+        return conn
+
+    @staticmethod
+    def _ensure_fts(conn: sqlite3.Connection) -> None:
+        existed = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'symbols_fts'"
+        ).fetchone()
+        try:
+            conn.executescript(_FTS_SCHEMA)
+        except sqlite3.OperationalError as exc:
+            logger.debug("FTS5 trigram unavailable, substring search disabled: %s", exc)
+            return
+        if not existed:
+            # indice creato da una versione precedente: popola le righe esistenti
+            with conn:
+                conn.execute(
+                    "INSERT INTO symbols_fts (rowid, name_lower) "
+                    "SELECT rowid, name_lower FROM symbols"
+                )
+
+    # ------------------------------------------------------------------
+    # build / update
+    # ------------------------------------------------------------------
+
+    def update(
+        self,
+        *,
+        full: bool = False,
+        pool: Optional[ProcessPoolExecutor] = None,
+    ) -> Dict[str, Any]:
+        with self._lock:
+            conn = self._connect()
+            try:
+                return self._update(conn, full=full, pool=pool)
+            finally:
+                conn.close()
+
+    def _update(
+        self,
+        conn: sqlite3.Connection,
+        *,
+        full: bool,
+        pool: Optional[ProcessPoolExecutor],
+    ) -> Dict[str, Any]:
+        known = {
+            path: (file_id, digest, mtime, size)
+            for file_id, path, digest, mtime, size in conn.execute(
+                "SELECT id, path, hash, mtime_ns, size FROM files"
+            )
+        }
+
+        seen: set = set()
+        candidates: List[str] = []
+        stat_of: Dict[str, Tuple[int, int]] = {}
+        for path, mtime, size in _iter_python_files(self.root):
+            seen.add(path)
+            stat_of[path] = (mtime, size)
+            old = known.get(path)
+            if full or old is None or (old[2], old[3]) != (mtime, size):
+                candidates.append(path)
+
+        if len(candidates) >= POOL_MIN_FILES:
+            if pool is not None:
+                results = list(pool.map(extract_file, candidates, chunksize=POOL_CHUNKSIZE))
+            else:
+                results = _POOL.map(extract_file, candidates, chunksize=POOL_CHUNKSIZE)
+        else:
+            results = [extract_file(path) for path in candidates]
+
+        counts = {"files": len(seen), "parsed": 0, "unchanged": 0, "removed": 0}
+
+        with conn:
+            for path, digest, symbols, refs, imports in results:
+                if digest is None:
+                    continue
+                mtime, size = stat_of[path]
+                old = known.get(path)
+                if old is not None and old[1] == digest and not full:
+                    conn.execute(
+                        "UPDATE files SET mtime_ns = ?, size = ? WHERE id = ?",
+                        (mtime, size, old[0]),
+                    )
+                    counts["unchanged"] += 1
+                    continue
+
+                if old is not None:
+                    file_id = old[0]
+                    self._delete_rows(conn, file_id)
+                    conn.execute(
+                        "UPDATE files SET hash = ?, mtime_ns = ?, size = ? WHERE id = ?",
+                        (digest, mtime, size, file_id),
+                    )
+                else:
+                    file_id = conn.execute(
+                        "INSERT INTO files (path, hash, mtime_ns, size) VALUES (?, ?, ?, ?)",
+                        (path, digest, mtime, size),
+                    ).lastrowid
+
+                conn.executemany(
+                    "INSERT INTO symbols VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (file_id, name, name.lower(), kind, qual, line, col, end)
+                        for name, kind, qual, line, col, end in symbols
+                    ],
+                )
+                conn.executemany(
+                    "INSERT INTO refs VALUES (?, ?, ?, ?)",
+                    [(file_id, name, line, col) for name, line, col in refs],
+                )
+                conn.executemany(
+                    "INSERT INTO imports VALUES (?, ?, ?, ?, ?)",
+                    [(file_id, mod, name, alias, line) for mod, name, alias, line in imports],
+                )
+                counts["parsed"] += 1
+
+            for path, (file_id, *_rest) in known.items():
+                if path not in seen:
+                    self._delete_rows(conn, file_id)
+                    conn.execute("DELETE FROM files WHERE id = ?", (file_id,))
+                    counts["removed"] += 1
+
+        counts["symbols"] = conn.execute("SELECT COUNT(*) FROM symbols").fetchone()[0]
+        return counts
+
+    @staticmethod
+    def _delete_rows(conn: sqlite3.Connection, file_id: int) -> None:
+        conn.execute("DELETE FROM symbols WHERE file_id = ?", (file_id,))
+        conn.execute("DELETE FROM refs WHERE file_id = ?", (file_id,))
+        conn.execute("DELETE FROM imports WHERE file_id = ?", (file_id,))
+
+    # ------------------------------------------------------------------
+    # queries
+    # ------------------------------------------------------------------
+
+    def _query(self, sql: str, args: Tuple[Any, ...]) -> List[sqlite3.Row]:
+        if not self.db_path.exists():
+            return []
+        conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+        conn.row_factory = sqlite3.Row
+        try:
+            return conn.execute(sql, args).fetchall()
+        finally:
+            conn.close()
+
+    def file_symbols(self, path: str) -> List[Dict[str, Any]]:
+        rows = self._query(
+            "SELECT s.name, s.kind, s.qualname, s.line, s.col, s.end_line, f.path "
+            "FROM symbols s JOIN files f ON f.id = s.file_id "
+            "WHERE f.path = ? ORDER BY s.line",
+            (os.path.abspath(os.path.join(self.root, path)),),
+        )
+        return [dict(r) for r in rows]
+
+    def definitions(self, name: str, *, limit: int = 100) -> List[Dict[str, Any]]:
+        rows = self._query(
+            "SELECT s.name, s.kind, s.qualname, s.line, s.col, s.end_line, f.path "
+            "FROM symbols s JOIN files f ON f.id = s.file_id "
+            "WHERE s.name_lower = ? AND s.name = ? LIMIT ?",
+            (name.lower(), name, limit),
+        )
+        return [dict(r) for r in rows]
+
+    def references(self, name: str, *, limit: int = 1000) -> List[Dict[str, Any]]:
+        rows = self._query(
+            "SELECT r.name, r.line, r.col, f.path FROM refs r "
+            "JOIN files f ON f.id = r.file_id WHERE r.name = ? LIMIT ?",
+            (name, limit),
+        )
+        return [dict(r) for r in rows]
+
+    def importers(self, module: str, *, limit: int = 1000) -> List[Dict[str, Any]]:
+        rows = self._query(
+            "SELECT i.module, i.name, i.alias, i.line, f.path FROM imports i "
+            "JOIN files f ON f.id = i.file_id WHERE i.module = ? LIMIT ?",
+            (module, limit),
+        )
+        return [dict(r) for r in rows]
+
+    def search(
+        self,
+        query: str,
+        *,
+        kind: Optional[str] = None,
+        limit: int = 50,
+    ) -> List[Dict[str, Any]]:
+        """
+        Ricerca per nome: prima i match di prefisso (range sull'indice
+        name_lower), poi i match per sottostringa (indice trigram, query di
+        almeno TRIGRAM_MIN caratteri) fino a `limit`.
+        """
+        q = query.lower()
+        kind_sql, kind_args = ("AND s.kind = ? ", (kind,)) if kind else ("", ())
+        select = (
+            "SELECT s.name, s.kind, s.qualname, s.line, s.col, s.end_line, f.path "
+            "FROM symbols s JOIN files f ON f.id = s.file_id "
+        )
+
+        prefix = self._query(
+            select + "WHERE s.name_lower >= ? AND s.name_lower < ? " + kind_sql
+            + "ORDER BY length(s.name), s.name LIMIT ?",
+            (q, q + "\uffff", *kind_args, limit),
+        )
+        results = [dict(r) for r in prefix]
+        if len(results) >= limit or len(q) < TRIGRAM_MIN:
+            return results
+
+        seen = {(r["path"], r["line"], r["col"]) for r in results}
+        phrase = '"' + q.replace('"', '""') + '"'
+        try:
+            contains = self._query(
+                select + "JOIN symbols_fts t ON t.rowid = s.rowid "
+                + "WHERE t.name_lower MATCH ? " + kind_sql
+                + "ORDER BY length(s.name), s.name LIMIT ?",
+                (phrase, *kind_args, limit * 2),
+            )
+        except sqlite3.OperationalError:
+            # SQLite senza FTS5: solo prefissi
+            return results
+        for r in contains:
+            if (r["path"], r["line"], r["col"]) not in seen:
+                results.append(dict(r))
+                if len(results) >= limit:
+                    break
+        return results
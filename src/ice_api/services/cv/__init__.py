@@ -0,0 +1,26 @@
+from ice_api.services.cv.artifacts import ARTIFACTS, ArtifactCache, template_version
+from ice_api.services.cv.ocr import PageCache, ocr_documents, ocr_pages, ocr_version
+from ice_api.services.cv.pipeline import (
+    CV_PIPELINE_KIND,
+    CVItem,
+    CVPipeline,
+    CVPipelineError,
+    items_from_params,
+    submit_pipeline,
+)
+
+__all__ = [
+    "ARTIFACTS",
+    "ArtifactCache",
+    "template_version",
+    "CV_PIPELINE_KIND",
+    "CVItem",
+    "CVPipeline",
+    "CVPipelineError",
+    "PageCache",
+    "items_from_params",
+    "ocr_documents",
+    "ocr_pages",
+    "ocr_version",
+    "submit_pipeline",
+]
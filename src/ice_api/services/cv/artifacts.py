@@ -0,0 +1,348 @@
+from __future__ import annotations
+
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from ice_api.services.logs.scan import default_state_dir
+
+logger = logging.getLogger("ice.api.services.cv.artifacts")
+
+ARTIFACT_MAX_BYTES = 1024 * 1024 * 1024     # tetto su disco, oltre si elimina in ordine LRU
+ARTIFACT_KINDS = {"html": ".html", "pdf": ".pdf"}
+DEFAULT_TEMPLATE_VERSION = "default"
+
+# campi del risultato dell'agente che contengono l'artifact stesso
+_CONTENT_FIELDS = ("html", "pdf", "content", "data")
+_PATH_FIELDS = ("path", "pdf_path", "html_path", "file")
+
+# ============================================================================
+# CV ARTIFACT CACHE
+# ============================================================================
+# HTML e PDF renderizzati, per (cv_id, revisione, versione template, tipo):
+#
+#   <state>/cv-artifacts/revisions.json    revisione corrente per cv_id
+#   <state>/cv-artifacts/ab/<key>.pdf      artifact
+#   <state>/cv-artifacts/ab/<key>.json     metadati (etag, size, risultato)
+#
+# La revisione cresce a ogni modifica del contenuto (generate_json) e a
+# ogni cv.cleanup: le chiavi vecchie non sono più raggiungibili e i loro
+# file sono eliminati subito. L'mtime dei metadati è l'ultimo accesso e
+# ordina la LRU anche tra un riavvio e l'altro.
+# ============================================================================
+
+
+def artifact_key(cv_id: str, revision: int, template_version: str, kind: str) -> str:
+    raw = "\0".join([cv_id, str(revision), template_version, kind])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:40]
+
+
+def template_version(params: Dict[str, Any], agent: Any = None) -> str:
+    """Versione template della richiesta, altrimenti quella dichiarata dall'agente."""
+    return str(
+        params.get("template_version")
+        or getattr(agent, "template_version", None)
+        or DEFAULT_TEMPLATE_VERSION
+    )
+
+
+def _extract(kind: str, result: Any) -> Optional[Tuple[bytes, Dict[str, Any]]]:
+    """(byte dell'artifact, resto del risultato), None se non estraibile."""
+    if isinstance(result, bytes):
+        return result, {}
+    if isinstance(result, str):
+        if kind == "pdf" and os.path.isfile(result):
+            return Path(result).read_bytes(), {}
+        return result.encode("utf-8"), {}
+    if not isinstance(result, dict) or result.get("ok") is False:
+        return None
+
+    rest = {k: v for k, v in result.items() if k not in _CONTENT_FIELDS and k not in _PATH_FIELDS}
+    for name in _CONTENT_FIELDS:
+        value = result.get(name)
+        if isinstance(value, bytes):
+            return value, rest
+        if isinstance(value, str) and value:
+            if kind == "pdf":
+                try:
+                    return base64.b64decode(value, validate=True), rest
+                except ValueError:
+                    continue
+            return value.encode("utf-8"), rest
+    for name in _PATH_FIELDS:
+        value = result.get(name)
+        if isinstance(value, str) and os.path.isfile(value):
+            return Path(value).read_bytes(), rest
+    return None
+
+
+class ArtifactCache:
+    def __init__(self, directory: Optional[Path] = None, *, max_bytes: int = ARTIFACT_MAX_BYTES) -> None:
+        self.directory = Path(directory) if directory is not None else default_state_dir() / "cv-artifacts"
+        self.max_bytes = max_bytes
+        # key -> (cv_id, byte su disco), in ordine LRU
+        self._index: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()
+        self._by_cv: Dict[str, Set[str]] = {}
+        self._bytes = 0
+        self._revisions: Dict[str, int] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "evicted": 0}
+
+    # ------------------------------------------------------------------
+    # index
+    # ------------------------------------------------------------------
+
+    def _ensure_loaded(self) -> None:
+        with self._lock:
+            if self._loaded:
+                return
+            try:
+                self._revisions = json.loads((self.directory / "revisions.json").read_text("utf-8"))
+            except (OSError, ValueError):
+                self._revisions = {}
+            entries = []
+            for meta_path in self.directory.glob("??/*.json"):
+                try:
+                    meta = json.loads(meta_path.read_text("utf-8"))
+                    entries.append((meta_path.stat().st_mtime, meta_path.stem, meta["cv_id"], meta["bytes"]))
+                except (OSError, ValueError, KeyError):
+                    continue
+            for _mtime, key, cv_id, size in sorted(entries):
+                self._index[key] = (cv_id, size)
+                self._by_cv.setdefault(cv_id, set()).add(key)
+                self._bytes += size
+            self._loaded = True
+
+    def _paths(self, key: str, kind: str) -> Tuple[Path, Path]:
+        base = self.directory / key[:2] / key
+        return base.with_suffix(ARTIFACT_KINDS[kind]), base.with_suffix(".json")
+
+    def _drop(self, keys: List[str]) -> List[str]:
+        """Toglie le chiavi dall'indice (lock preso); restituisce quelle rimosse."""
+        dropped = []
+        for key in keys:
+            entry = self._index.pop(key, None)
+            if entry is None:
+                continue
+            cv_id, size = entry
+            self._bytes -= size
+            keys_of_cv = self._by_cv.get(cv_id)
+            if keys_of_cv is not None:
+                keys_of_cv.discard(key)
+                if not keys_of_cv:
+                    del self._by_cv[cv_id]
+            dropped.append(key)
+        return dropped
+
+    def _unlink(self, keys: List[str]) -> None:
+        for key in keys:
+            for suffix in (*ARTIFACT_KINDS.values(), ".json"):
+                try:
+                    (self.directory / key[:2] / key).with_suffix(suffix).unlink()
+                except OSError:
+                    pass
+
+    # ------------------------------------------------------------------
+    # revisions / invalidation
+    # ------------------------------------------------------------------
+
+    def revision(self, cv_id: str) -> int:
+        self._ensure_loaded()
+        with self._lock:
+            return self._revisions.get(cv_id, 0)
+
+    def invalidate(self, cv_id: str) -> int:
+        """Contenuto del CV cambiato (o CV rimosso): nuova revisione, artifact eliminati."""
+        self._ensure_loaded()
+        with self._lock:
+            revision = self._revisions[cv_id] = self._revisions.get(cv_id, 0) + 1
+            dropped = self._drop(list(self._by_cv.get(cv_id, ())))
+            payload = json.dumps(self._revisions)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp = self.directory / f"revisions.{os.getpid()}.{threading.get_ident()}.tmp"
+        tmp.write_text(payload, "utf-8")
+        os.replace(tmp, self.directory / "revisions.json")
+        self._unlink(dropped)
+        return revision
+
+    # ------------------------------------------------------------------
+    # read / write
+    # ------------------------------------------------------------------
+
+    def _read(self, key: str, kind: str, with_content: bool) -> Optional[Dict[str, Any]]:
+        artifact, meta_path = self._paths(key, kind)
+        with self._lock:
+            if key not in self._index:
+                return None
+            self._index.move_to_end(key)
+        try:
+            meta = json.loads(meta_path.read_text("utf-8"))
+            if with_content:
+                meta["content"] = artifact.read_text("utf-8")
+            # l'mtime dei metadati è l'ultimo accesso (ordine LRU al riavvio)
+            os.utime(meta_path)
+        except (OSError, ValueError):
+            with self._lock:
+                self._drop([key])
+            return None
+        return meta
+
+    def _write(self, key: str, cv_id: str, kind: str, revision: int, template_version: str,
+               data: bytes, rest: Dict[str, Any]) -> Dict[str, Any]:
+        artifact, meta_path = self._paths(key, kind)
+        artifact.parent.mkdir(parents=True, exist_ok=True)
+        meta = {
+            "cv_id": cv_id,
+            "kind": kind,
+            "revision": revision,
+            "template_version": template_version,
+            "etag": hashlib.sha256(data).hexdigest()[:32],
+            "size": len(data),
+            "created_at": time.time(),
+            "result": rest,
+        }
+        encoded = json.dumps(meta, default=str)
+        meta["bytes"] = len(data) + len(encoded)
+        encoded = json.dumps(meta, default=str)
+        tmp = artifact.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, artifact)
+        tmp.write_text(encoded, "utf-8")
+        os.replace(tmp, meta_path)
+
+        with self._lock:
+            self._drop([key])
+            self._index[key] = (cv_id, meta["bytes"])
+            self._by_cv.setdefault(cv_id, set()).add(key)
+            self._bytes += meta["bytes"]
+            evicted = []
+            while self._bytes > self.max_bytes and len(self._index) > 1:
+                evicted.extend(self._drop([next(iter(self._index))]))
+        if evicted:
+            self.stats["evicted"] += len(evicted)
+            self._unlink(evicted)
+        return meta
+
+    def _response(self, key: str, meta: Dict[str, Any], *, cached: bool, if_none_match: Optional[str]) -> Dict[str, Any]:
+        kind = meta["kind"]
+        response = {
+            **meta.get("result", {}),
+            "ok": True,
+            "cv_id": meta["cv_id"],
+            "kind": kind,
+            "revision": meta["revision"],
+            "template_version": meta["template_version"],
+            "etag": meta["etag"],
+            "size": meta["size"],
+            "path": str(self._paths(key, kind)[0]),
+            "cached": cached,
+        }
+        if if_none_match and if_none_match == meta["etag"]:
+            response["not_modified"] = True
+        elif kind == "html" and "content" in meta:
+            response["html"] = meta["content"]
+        return response
+
+    # ------------------------------------------------------------------
+    # public API
+    # ------------------------------------------------------------------
+
+    async def get_or_render(
+        self,
+        cv_id: str,
+        kind: str,
+        render: Callable[[], Awaitable[Any]],
+        *,
+        template_version: Optional[str] = None,
+        if_none_match: Optional[str] = None,
+    ) -> Any:
+        """
+        Artifact dalla cache o renderizzato (una sola volta anche con
+        richieste concorrenti). Con if_none_match uguale all'etag la
+        risposta ha not_modified e nessun contenuto.
+        """
+        if kind not in ARTIFACT_KINDS:
+            raise ValueError(f"Unknown artifact kind: {kind!r}")
+        template_version = str(template_version or DEFAULT_TEMPLATE_VERSION)
+        revision = await asyncio.to_thread(self.revision, cv_id)
+        key = artifact_key(cv_id, revision, template_version, kind)
+        with_content = kind == "html"
+
+        while True:
+            meta = await asyncio.to_thread(self._read, key, kind, with_content)
+            if meta is not None:
+                self.stats["hits"] += 1
+                return self._response(key, meta, cached=True, if_none_match=if_none_match)
+
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            self.stats["coalesced"] += 1
+            try:
+                response = await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise
+                # rendering del leader cancellato (client disconnesso): si riprova
+                continue
+            if isinstance(response, dict):
+                response = dict(response)
+                if if_none_match and if_none_match == response.get("etag"):
+                    response.pop("html", None)
+                    response["not_modified"] = True
+            return response
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            self.stats["misses"] += 1
+            result = await render()
+            extracted = await asyncio.to_thread(_extract, kind, result)
+            if extracted is None or await asyncio.to_thread(self.revision, cv_id) != revision:
+                # risultato non memorizzabile, o contenuto cambiato durante il rendering
+                future.set_result(result)
+                return result
+            data, rest = extracted
+            meta = await asyncio.to_thread(
+                self._write, key, cv_id, kind, revision, template_version, data, rest
+            )
+            if with_content:
+                meta["content"] = data.decode("utf-8", "replace")
+            response = self._response(key, meta, cached=False, if_none_match=if_none_match)
+            future.set_result(response)
+            return dict(response)
+        except asyncio.CancelledError:
+            if not future.done():
+                future.cancel()
+            raise
+        except BaseException as exc:
+            if not future.done():
+                future.set_exception(exc)
+                future.exception()
+            raise
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def usage(self) -> Dict[str, Any]:
+        self._ensure_loaded()
+        with self._lock:
+            return {
+                "entries": len(self._index),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                **self.stats,
+            }
+
+
+ARTIFACTS = ArtifactCache()
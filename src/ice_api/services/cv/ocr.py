@@ -0,0 +1,282 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from ice_api.services.logs.scan import default_state_dir
+from ice_api.utils.process_pool import SharedProcessPool
+
+logger = logging.getLogger("ice.api.services.cv.ocr")
+
+OCR_CACHE_VERSION = 1
+DEFAULT_OCR_VERSION = "default"
+PAGES_PER_TASK = 8              # pagine estratte per task del process pool
+HASH_BLOCK = 1024 * 1024
+
+OcrCall = Callable[[List[str]], Awaitable[Any]]
+
+# ============================================================================
+# PAGE-LEVEL OCR
+# ============================================================================
+# I documenti sono divisi in pagine e ogni pagina è un task OCR separato:
+#
+#   1. process pool: hash del file e numero di pagine
+#   2. cache: le pagine già viste (hash documento + pagina + versione
+#      del backend OCR) non vengono rifatte; un PDF ricaricato tale e
+#      quale è immediato, un cambio di modello OCR le invalida
+#   3. process pool: estrazione delle sole pagine mancanti in PDF da
+#      una pagina, a gruppi di PAGES_PER_TASK
+#   4. OCR di ogni pagina (agent.ocr([pagina])), con al massimo
+#      os.cpu_count() chiamate in volo; i risultati escono man mano
+#
+# La divisione in pagine richiede pypdf (extra "cv"); senza pypdf, e
+# per i file che non sono PDF, il file intero è una sola pagina.
+# ============================================================================
+
+
+def _pypdf():
+    try:
+        import pypdf
+    except ImportError:
+        return None
+    return pypdf
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _is_pdf(path: str) -> bool:
+    try:
+        with open(path, "rb") as handle:
+            return handle.read(5) == b"%PDF-"
+    except OSError:
+        return False
+
+
+def inspect_document(path: str) -> Tuple[str, int]:
+    """(sha256, pagine). Eseguita nel process pool."""
+    digest = _file_sha256(path)
+    pypdf = _pypdf()
+    if pypdf is None or not _is_pdf(path):
+        return digest, 1
+    try:
+        return digest, len(pypdf.PdfReader(path).pages)
+    except Exception:
+        # PDF che pypdf non legge: lo si passa intero all'OCR
+        return digest, 1
+
+
+def extract_pages(path: str, pages: Sequence[int], out_dir: str) -> List[Tuple[int, str]]:
+    """Scrive le pagine richieste come PDF da una pagina. Eseguita nel process pool."""
+    pypdf = _pypdf()
+    reader = pypdf.PdfReader(path)
+    written = []
+    for number in pages:
+        writer = pypdf.PdfWriter()
+        writer.add_page(reader.pages[number])
+        target = os.path.join(out_dir, f"page-{number:05d}.pdf")
+        with open(target, "wb") as handle:
+            writer.write(handle)
+        written.append((number, target))
+    return written
+
+
+# ============================================================================
+# CACHE
+# ============================================================================
+
+def ocr_version(params: Dict[str, Any], agent: Any = None) -> str:
+    """Versione OCR della richiesta, altrimenti quella dichiarata dall'agente."""
+    return str(
+        params.get("ocr_version")
+        or getattr(agent, "ocr_version", None)
+        or getattr(agent, "version", None)
+        or DEFAULT_OCR_VERSION
+    )
+
+
+def page_key(document_hash: str, page: int, version: str = DEFAULT_OCR_VERSION) -> str:
+    raw = f"{OCR_CACHE_VERSION}:{version}:{document_hash}:{page}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class PageCache:
+    """Risultati OCR per pagina, un file JSON per chiave (scrittura atomica)."""
+
+    def __init__(self, directory: Optional[Path] = None) -> None:
+        self.directory = Path(directory) if directory is not None else default_state_dir() / "cv-ocr"
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Any]:
+        try:
+            return json.loads(self._path(key).read_text("utf-8"))["result"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def put(self, key: str, result: Any) -> None:
+        try:
+            payload = json.dumps({"result": result})
+        except (TypeError, ValueError):
+            # risultato non serializzabile: semplicemente non in cache
+            return
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".tmp-{os.getpid()}-{threading.get_ident()}")
+        tmp.write_text(payload, "utf-8")
+        os.replace(tmp, path)
+
+
+# ============================================================================
+# RUNNER
+# ============================================================================
+
+# process pool condiviso (un worker per core, vedi utils.process_pool)
+_POOL = SharedProcessPool("cv.ocr")
+
+
+def _failed(result: Any) -> bool:
+    return isinstance(result, dict) and result.get("ok") is False
+
+
+async def ocr_pages(
+    ocr: OcrCall,
+    paths: Sequence[str],
+    *,
+    cache: Optional[PageCache] = None,
+    concurrency: Optional[int] = None,
+    pool: Optional[ProcessPoolExecutor] = None,
+    version: str = DEFAULT_OCR_VERSION,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Async generator: un evento per pagina, nell'ordine di completamento
+
+        {"path", "page", "pages", "cached", "result"}
+
+    e infine {"summary": {...}}. Le pagine fallite (eccezione o
+    {"ok": False}) hanno "error" e non vanno in cache. version (modello
+    o versione del backend OCR) fa parte della chiave di cache.
+    """
+    cache = cache or PageCache()
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(max(1, concurrency or os.cpu_count() or 2))
+    queue: asyncio.Queue = asyncio.Queue()
+    workdir = tempfile.mkdtemp(prefix="ice-cv-ocr-")
+    totals = {"files": len(paths), "pages": 0, "cached": 0, "ocr": 0, "failed": 0}
+
+    async def ocr_page(path: str, page: int, pages: int, key: str, source: str) -> None:
+        async with slots:
+            try:
+                result = await ocr([source])
+            except Exception as exc:
+                result = {"ok": False, "error": str(exc)}
+        if _failed(result):
+            await queue.put({"path": path, "page": page, "pages": pages, "cached": False,
+                             "error": result.get("error"), "result": result})
+            return
+        await asyncio.to_thread(cache.put, key, result)
+        await queue.put({"path": path, "page": page, "pages": pages, "cached": False, "result": result})
+
+    async def in_pool(fn: Callable[..., Any], *args: Any) -> Any:
+        if pool is not None:
+            return await loop.run_in_executor(pool, fn, *args)
+        return await _POOL.run(fn, *args)
+
+    async def document(index: int, path: str) -> None:
+        digest, pages = await in_pool(inspect_document, path)
+        keys = [page_key(digest, page, version) for page in range(pages)]
+        cached = await asyncio.to_thread(lambda: [cache.get(key) for key in keys])
+
+        missing = []
+        for page, result in enumerate(cached):
+            if result is None:
+                missing.append(page)
+            else:
+                await queue.put({"path": path, "page": page, "pages": pages, "cached": True, "result": result})
+        if not missing:
+            return
+
+        if pages == 1:
+            await ocr_page(path, 0, 1, keys[0], path)
+            return
+
+        # estrazione a gruppi nel pool: l'OCR di un gruppo parte appena è pronto
+        out_dir = os.path.join(workdir, str(index))
+        os.makedirs(out_dir, exist_ok=True)
+        groups = [missing[i:i + PAGES_PER_TASK] for i in range(0, len(missing), PAGES_PER_TASK)]
+        pending = []
+        for extraction in asyncio.as_completed(
+            [in_pool(extract_pages, path, group, out_dir) for group in groups]
+        ):
+            for page, source in await extraction:
+                pending.append(asyncio.ensure_future(ocr_page(path, page, pages, keys[page], source)))
+        await asyncio.gather(*pending)
+
+    async def guarded(index: int, path: str) -> None:
+        try:
+            await document(index, path)
+        except Exception as exc:
+            logger.warning("OCR of document failed", extra={"path": path, "error": str(exc)})
+            await queue.put({"path": path, "page": None, "pages": None, "cached": False, "error": str(exc)})
+
+    async def run_all() -> None:
+        try:
+            await asyncio.gather(*(guarded(i, path) for i, path in enumerate(paths)))
+        finally:
+            await queue.put(None)
+
+    runner = asyncio.ensure_future(run_all())
+    try:
+        while True:
+            event = await queue.get()
+            if event is None:
+                break
+            totals["pages"] += event["page"] is not None
+            if "error" in event:
+                totals["failed"] += 1
+            elif event["cached"]:
+                totals["cached"] += 1
+            else:
+                totals["ocr"] += 1
+            yield event
+        await runner
+        yield {"summary": totals}
+    finally:
+        # client disconnesso o errore: niente OCR orfani
+        runner.cancel()
+        await asyncio.to_thread(shutil.rmtree, workdir, True)
+
+
+async def ocr_documents(ocr: OcrCall, paths: Sequence[str], **kwargs: Any) -> List[Dict[str, Any]]:
+    """Variante non in streaming: per ogni file le pagine in ordine."""
+    by_path: Dict[str, Dict[int, Any]] = {path: {} for path in paths}
+    errors: Dict[str, str] = {}
+    async for event in ocr_pages(ocr, paths, **kwargs):
+        if "summary" in event:
+            continue
+        if "error" in event:
+            errors[event["path"]] = event["error"]
+            continue
+        by_path[event["path"]][event["page"]] = event["result"]
+    if errors:
+        path, error = next(iter(errors.items()))
+        raise RuntimeError(f"OCR failed for {path}: {error}")
+    return [
+        {"path": path, "pages": [pages[n] for n in sorted(pages)]}
+        for path, pages in by_path.items()
+    ]
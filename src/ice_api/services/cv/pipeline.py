@@ -0,0 +1,270 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+from ice_api.services.cv.artifacts import ARTIFACTS, template_version
+from ice_api.services.cv.ocr import ocr_documents, ocr_version
+from ice_api.services.jobs import JOBS, Job, JobCancelled, JobContext
+
+logger = logging.getLogger("ice.api.services.cv.pipeline")
+
+CV_PIPELINE_KIND = "cv.pipeline"
+STAGES = ("ocr", "json", "html", "pdf")
+MAX_ITEMS = 1000
+
+
+def default_concurrency() -> Dict[str, int]:
+    """Chiamate in volo per stage: l'OCR scala con i core, il PDF è il più pesante."""
+    cores = os.cpu_count() or 2
+    return {"ocr": cores, "json": 4, "html": 4, "pdf": max(1, cores // 2)}
+
+
+# ============================================================================
+# CV PIPELINE
+# ============================================================================
+# Ogni CV (item) attraversa gli stage in ordine:
+#
+#   ocr   agent.ocr([pagina]) per ogni pagina, con cache (services.cv.ocr)
+#   json  agent.generate_json(**params, ocr=[{path, pages}])  -> cv_id
+#   html  agent.render_html(cv_id)    (cache degli artifact)
+#   pdf   agent.export_pdf(cv_id)     (cache degli artifact)
+#
+# Gli item non si aspettano tra loro: ognuno passa allo stage successivo
+# appena il precedente è finito, e ogni stage ha un proprio limite di
+# chiamate contemporanee. In un import batch l'OCR del CV n+1 gira
+# mentre il CV n è in rendering. Un item fallito salta gli stage
+# rimanenti; gli altri proseguono.
+# ============================================================================
+
+
+class CVPipelineError(ValueError):
+    """Richiesta cv.pipeline non valida."""
+
+
+@dataclass
+class CVItem:
+    index: int
+    paths: List[str] = field(default_factory=list)
+    cv_id: Optional[str] = None
+    params: Dict[str, Any] = field(default_factory=dict)
+    status: str = "pending"             # pending | running | succeeded | failed | cancelled
+    stage: Optional[str] = None
+    results: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    def summary(self) -> Dict[str, Any]:
+        return {"index": self.index, "cv_id": self.cv_id, "status": self.status, "stage": self.stage}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {**self.summary(), "results": self.results, "error": self.error}
+
+
+def items_from_params(params: Dict[str, Any]) -> List[CVItem]:
+    """
+    `items`: lista di {paths, cv_id, ...parametri di generate_json};
+    senza items la richiesta stessa descrive un solo CV.
+    """
+    raw = params.get("items")
+    if raw is None:
+        raw = [{k: v for k, v in params.items() if k not in ("stages", "concurrency")}]
+    if not isinstance(raw, list) or not raw:
+        raise CVPipelineError("items must be a non-empty list")
+    if len(raw) > MAX_ITEMS:
+        raise CVPipelineError(f"Too many items (max {MAX_ITEMS})")
+
+    items = []
+    for index, entry in enumerate(raw):
+        if not isinstance(entry, dict):
+            raise CVPipelineError(f"Item {index} is not an object")
+        entry = dict(entry)
+        paths = entry.pop("paths", None) or []
+        if isinstance(paths, str):
+            paths = [paths]
+        items.append(CVItem(index=index, paths=list(paths), cv_id=entry.pop("cv_id", None), params=entry))
+    return items
+
+
+def parse_stages(raw: Optional[Sequence[str]]) -> List[str]:
+    if not raw:
+        return list(STAGES)
+    unknown = [s for s in raw if s not in STAGES]
+    if unknown:
+        raise CVPipelineError(f"Unknown stages: {', '.join(unknown)} (expected {', '.join(STAGES)})")
+    # l'ordine è quello della pipeline, non quello della richiesta
+    return [s for s in STAGES if s in raw]
+
+
+def _failure(result: Any) -> Optional[str]:
+    if isinstance(result, dict) and result.get("ok") is False:
+        return str(result.get("error") or "failed")
+    return None
+
+
+class CVPipeline:
+    def __init__(
+        self,
+        agent: Any,
+        *,
+        stages: Optional[Sequence[str]] = None,
+        concurrency: Optional[Dict[str, int]] = None,
+    ) -> None:
+        self.agent = agent
+        self.stages = parse_stages(stages)
+        limits = {**default_concurrency(), **(concurrency or {})}
+        self._slots = {stage: asyncio.Semaphore(max(1, int(limits[stage]))) for stage in STAGES}
+        self._running = {stage: 0 for stage in STAGES}
+        self._done = {stage: 0 for stage in STAGES}
+        self._ctx: Optional[JobContext] = None
+
+    # ------------------------------------------------------------------
+    # stages
+    # ------------------------------------------------------------------
+
+    async def _ocr(self, item: CVItem) -> Any:
+        if not item.paths:
+            raise CVPipelineError("Missing paths for ocr")
+
+        async def call(paths: List[str]) -> Any:
+            async with self._slots["ocr"]:
+                # le pagine in coda non partono dopo un cancel
+                if self._ctx is not None:
+                    self._ctx.check_cancelled()
+                return await self.agent.ocr(paths)
+
+        # stessa chiave di cache di cv.ocr: cambiare modello invalida le pagine
+        return await ocr_documents(
+            call,
+            item.paths,
+            version=ocr_version(item.params, self.agent),
+        )
+
+    async def _json(self, item: CVItem) -> Any:
+        params = dict(item.params)
+        if "ocr" in item.results:
+            params["ocr"] = item.results["ocr"]
+        if item.cv_id and "cv_id" not in params:
+            params["cv_id"] = item.cv_id
+        async with self._slots["json"]:
+            result = await self.agent.generate_json(**params)
+        if isinstance(result, dict) and result.get("cv_id"):
+            item.cv_id = result["cv_id"]
+        if item.cv_id and _failure(result) is None:
+            # contenuto nuovo: HTML/PDF in cache non più validi
+            await asyncio.to_thread(ARTIFACTS.invalidate, item.cv_id)
+        return result
+
+    async def _render(self, stage: str, item: CVItem) -> Any:
+        if not item.cv_id:
+            raise CVPipelineError(f"Missing cv_id for {stage}")
+        method = self.agent.render_html if stage == "html" else self.agent.export_pdf
+
+        async def render() -> Any:
+            async with self._slots[stage]:
+                return await method(item.cv_id)
+
+        return await ARTIFACTS.get_or_render(
+            item.cv_id,
+            stage,
+            render,
+            template_version=template_version(item.params, self.agent),
+        )
+
+    async def _run_stage(self, stage: str, item: CVItem) -> Any:
+        if stage == "ocr":
+            return await self._ocr(item)
+        if stage == "json":
+            return await self._json(item)
+        return await self._render(stage, item)
+
+    # ------------------------------------------------------------------
+    # run
+    # ------------------------------------------------------------------
+
+    def _progress(self, items: List[CVItem]) -> Dict[str, Any]:
+        return {
+            "total": len(items),
+            "succeeded": sum(1 for i in items if i.status == "succeeded"),
+            "failed": sum(1 for i in items if i.status == "failed"),
+            "stages": {
+                stage: {"running": self._running[stage], "done": self._done[stage]}
+                for stage in self.stages
+            },
+            "items": [i.summary() for i in items],
+        }
+
+    async def _run_item(self, item: CVItem, items: List[CVItem], ctx: Optional[JobContext]) -> None:
+        item.status = "running"
+        for stage in self.stages:
+            if ctx is not None and ctx.cancel_requested:
+                item.status = "cancelled"
+                return
+            item.stage = stage
+            self._running[stage] += 1
+            if ctx is not None:
+                ctx.report(**self._progress(items))
+            try:
+                result = await self._run_stage(stage, item)
+                error = _failure(result)
+            except JobCancelled:
+                item.status = "cancelled"
+                return
+            except Exception as exc:
+                if self._ctx is not None and self._ctx.cancel_requested:
+                    item.status = "cancelled"
+                    return
+                result, error = None, str(exc)
+                logger.warning(
+                    "CV pipeline stage failed",
+                    extra={"stage": stage, "item": item.index, "cv_id": item.cv_id, "error": error},
+                )
+            finally:
+                self._running[stage] -= 1
+            if error:
+                item.status, item.error = "failed", f"{stage}: {error}"
+                break
+            item.results[stage] = result
+            self._done[stage] += 1
+        else:
+            item.status, item.stage = "succeeded", None
+        if ctx is not None:
+            ctx.report(**self._progress(items))
+
+    async def run(self, items: List[CVItem], ctx: Optional[JobContext] = None) -> Dict[str, Any]:
+        self._ctx = ctx
+        await asyncio.gather(*(self._run_item(item, items, ctx) for item in items))
+        if ctx is not None:
+            ctx.job.progress.update(self._progress(items))
+            ctx.check_cancelled()
+        progress = self._progress(items)
+        return {
+            "total": progress["total"],
+            "succeeded": progress["succeeded"],
+            "failed": progress["failed"],
+            "stages": self.stages,
+            "items": [item.to_dict() for item in items],
+        }
+
+
+def submit_pipeline(
+    agent: Any,
+    items: List[CVItem],
+    *,
+    stages: Optional[Sequence[str]] = None,
+    concurrency: Optional[Dict[str, int]] = None,
+) -> Job:
+    """Avvia la pipeline come job (cv.pipeline.progress / cv.pipeline.finished)."""
+    pipeline = CVPipeline(agent, stages=stages, concurrency=concurrency)
+
+    async def run(ctx: JobContext) -> Dict[str, Any]:
+        return await pipeline.run(items, ctx)
+
+    return JOBS.submit(
+        CV_PIPELINE_KIND,
+        run,
+        metadata={"items": len(items), "stages": pipeline.stages},
+    )
+
@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from ice_api.types.enums import JobStatus
+from ice_api.utils.tracing import TRACER, current_correlation_id
+
+logger = logging.getLogger("ice.api.services.jobs")
+
+# ============================================================================
+# BACKGROUND JOBS
+# ============================================================================
+# Operazioni lunghe (cancellazioni, pipeline) girano come job: l'azione
+# restituisce subito {"job_id": ...}, il dispatcher collega il proprio
+# emit_event al job e il client riceve:
+#
+#   {"event": "<kind>.progress", "job": {...}}
+#   {"event": "<kind>.finished", "job": {...}}
+#
+# Lo stato resta consultabile (system.job.status) finché il job non
+# esce dalla finestra di retention.
+# ============================================================================
+
+MAX_FINISHED_JOBS = 1000
+PROGRESS_MIN_INTERVAL = 0.25    # secondi minimi tra due eventi di progresso per job
+
+EventListener = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class JobCancelled(Exception):
+    """Sollevata da JobContext.check_cancelled() dopo una richiesta di cancel."""
+
+
+@dataclass
+class Job:
+    job_id: str
+    kind: str
+    status: JobStatus = JobStatus.PENDING
+    progress: Dict[str, Any] = field(default_factory=dict)
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    result: Any = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    # richiesta che ha avviato il job (eventi e log del job la riportano)
+    correlation_id: Optional[str] = field(default_factory=current_correlation_id)
+
+    def is_terminal(self) -> bool:
+        return self.status in (JobStatus.SUCCEEDED, JobStatus.FAILED, JobStatus.CANCELLED)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "status": self.status.value,
+            "progress": dict(self.progress),
+            "metadata": dict(self.metadata),
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "correlation_id": self.correlation_id,
+        }
+
+
+class JobContext:
+    """
+    Passato alla funzione del job: progresso e cancellazione cooperativa.
+    report() e check_cancelled() sono utilizzabili anche dai thread worker.
+    """
+
+    def __init__(self, registry: "JobRegistry", job: Job, loop: asyncio.AbstractEventLoop) -> None:
+        self._registry = registry
+        self._loop = loop
+        self.job = job
+        self.cancel_requested = False
+        self._last_emit = 0.0
+
+    def report(self, **progress: Any) -> None:
+        """Aggiorna il progresso; gli eventi sono limitati a PROGRESS_MIN_INTERVAL."""
+        self.job.progress.update(progress)
+        now = time.monotonic()
+        if now - self._last_emit >= PROGRESS_MIN_INTERVAL:
+            self._last_emit = now
+            self._loop.call_soon_threadsafe(self._registry._publish, self.job, "progress")
+
+    def check_cancelled(self) -> None:
+        if self.cancel_requested:
+            raise JobCancelled(self.job.job_id)
+
+
+class JobRegistry:
+    def __init__(self, *, max_finished: int = MAX_FINISHED_JOBS) -> None:
+        self.max_finished = max_finished
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._contexts: Dict[str, JobContext] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._listeners: Dict[str, List[EventListener]] = {}
+
+    # ------------------------------------------------------------------
+    # lifecycle
+    # ------------------------------------------------------------------
+
+    def submit(
+        self,
+        kind: str,
+        fn: Callable[[JobContext], Awaitable[Any]],
+        *,
+        metadata: Optional[Dict[str, Any]] = None,
+        job_id: Optional[str] = None,
+    ) -> Job:
+        loop = asyncio.get_running_loop()
+        job = Job(job_id=job_id or uuid.uuid4().hex, kind=kind, metadata=dict(metadata or {}))
+        ctx = JobContext(self, job, loop)
+        self._jobs[job.job_id] = job
+        self._contexts[job.job_id] = ctx
+        self._tasks[job.job_id] = loop.create_task(self._run(ctx, fn))
+        return job
+
+    async def _run(self, ctx: JobContext, fn: Callable[[JobContext], Awaitable[Any]]) -> None:
+        job = ctx.job
+        job.status = JobStatus.RUNNING
+        job.started_at = time.time()
+        self._publish(job, "progress")
+        # il task eredita lo span della richiesta: il job resta nello stesso trace
+        with TRACER.span(f"job {job.kind}", attributes={"ice.job_id": job.job_id}) as span:
+            try:
+                job.result = await fn(ctx)
+                job.status = JobStatus.SUCCEEDED
+            except (JobCancelled, asyncio.CancelledError):
+                job.status = JobStatus.CANCELLED
+            except Exception as exc:
+                logger.exception("Job failed", extra={"job_id": job.job_id, "kind": job.kind})
+                job.status = JobStatus.FAILED
+                job.error = str(exc)
+                span.fail(job.error)
+            finally:
+                span.set("ice.job_status", job.status.value)
+                job.finished_at = time.time()
+                self._tasks.pop(job.job_id, None)
+                self._contexts.pop(job.job_id, None)
+                self._publish(job, "finished")
+                self._listeners.pop(job.job_id, None)
+                self._evict()
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel cooperativo (check_cancelled) con fallback su Task.cancel()."""
+        ctx = self._contexts.get(job_id)
+        if ctx is None:
+            return False
+        ctx.cancel_requested = True
+        task = self._tasks.get(job_id)
+        if task is not None and ctx.job.status == JobStatus.PENDING:
+            task.cancel()
+        return True
+
+    async def wait(self, job_id: str) -> Optional[Job]:
+        task = self._tasks.get(job_id)
+        if task is not None:
+            await asyncio.shield(task)
+        return self._jobs.get(job_id)
+
+    def _evict(self) -> None:
+        finished = [jid for jid, job in self._jobs.items() if job.is_terminal()]
+        for jid in finished[: max(0, len(finished) - self.max_finished)]:
+            del self._jobs[jid]
+
+    # ------------------------------------------------------------------
+    # query
+    # ------------------------------------------------------------------
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def list(self, *, kind: Optional[str] = None) -> List[Job]:
+        return [job for job in self._jobs.values() if kind is None or job.kind == kind]
+
+    # ------------------------------------------------------------------
+    # events
+    # ------------------------------------------------------------------
+
+    def listen(self, job_id: str, listener: EventListener) -> None:
+        job = self._jobs.get(job_id)
+        if job is None or job.is_terminal():
+            return
+        self._listeners.setdefault(job_id, []).append(listener)
+
+    def _publish(self, job: Job, phase: str) -> None:
+        listeners = self._listeners.get(job.job_id)
+        if not listeners:
+            return
+        payload = {"event": f"{job.kind}.{phase}", "correlation_id": job.correlation_id, "job": job.to_dict()}
+        loop = asyncio.get_running_loop()
+        for listener in list(listeners):
+            loop.create_task(self._deliver(job.job_id, listener, payload))
+
+    async def _deliver(self, job_id: str, listener: EventListener, payload: Dict[str, Any]) -> None:
+        try:
+            await listener(payload)
+        except Exception:
+            # connessione chiusa o emitter rotto: il job continua senza di lui
+            listeners = self._listeners.get(job_id)
+            if listeners and listener in listeners:
+                listeners.remove(listener)
+            logger.debug("Job event listener dropped", extra={"job_id": job_id}, exc_info=True)
+
+
+JOBS = JobRegistry()
@@ -0,0 +1,24 @@
+from ice_api.services.knowledge.bm25 import BM25Index
+from ice_api.services.knowledge.chunking import TextChunk, chunk_stream, iter_file_text
+from ice_api.services.knowledge.engine import KnowledgeEngine, chunk_hash, file_hash, get_engine
+from ice_api.services.knowledge.vectors import (
+    FlatVectorIndex,
+    HashingEmbedder,
+    IVFVectorIndex,
+    has_numpy,
+)
+
+__all__ = [
+    "BM25Index",
+    "TextChunk",
+    "chunk_stream",
+    "iter_file_text",
+    "KnowledgeEngine",
+    "chunk_hash",
+    "file_hash",
+    "get_engine",
+    "FlatVectorIndex",
+    "HashingEmbedder",
+    "IVFVectorIndex",
+    "has_numpy",
+]
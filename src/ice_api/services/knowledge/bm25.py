@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import heapq
+import math
+import re
+from array import array
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+_TOKEN_RE = re.compile(r"\w{2,}", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+class BM25Index:
+    """
+    Indice BM25 in memoria.
+
+    Posting list per termine come coppia di array (id chunk, tf):
+    con milioni di chunk due array compatti pesano molto meno di un
+    dict per termine. Le cancellazioni sono tombstone, compattate da
+    compact().
+    """
+
+    def __init__(self, *, k1: float = 1.2, b: float = 0.75) -> None:
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._doc_len: Dict[int, int] = {}
+        self._total_len = 0
+        self._deleted: Set[int] = set()
+
+    def __len__(self) -> int:
+        return len(self._doc_len)
+
+    def add(self, doc_id: int, tokens: Iterable[str]) -> None:
+        counts: Dict[str, int] = {}
+        length = 0
+        for tok in tokens:
+            counts[tok] = counts.get(tok, 0) + 1
+            length += 1
+
+        self._deleted.discard(doc_id)
+        self._doc_len[doc_id] = length
+        self._total_len += length
+        for term, tf in counts.items():
+            entry = self._postings.get(term)
+            if entry is None:
+                entry = self._postings[term] = (array("Q"), array("I"))
+            entry[0].append(doc_id)
+            entry[1].append(tf)
+
+    def remove(self, doc_ids: Iterable[int]) -> None:
+        for doc_id in doc_ids:
+            length = self._doc_len.pop(doc_id, None)
+            if length is not None:
+                self._total_len -= length
+                self._deleted.add(doc_id)
+
+    def compact(self) -> None:
+        if not self._deleted:
+            return
+        deleted = self._deleted
+        for term in list(self._postings):
+            ids, tfs = self._postings[term]
+            keep = [(i, t) for i, t in zip(ids, tfs) if i not in deleted]
+            if not keep:
+                del self._postings[term]
+                continue
+            self._postings[term] = (array("Q", (i for i, _ in keep)), array("I", (t for _, t in keep)))
+        self._deleted = set()
+
+    def search(
+        self,
+        query: str,
+        *,
+        k: int = 10,
+        allowed: Optional[Set[int]] = None,
+    ) -> List[Tuple[int, float]]:
+        n = len(self._doc_len)
+        if not n:
+            return []
+        avg_len = self._total_len / n
+        k1, b = self.k1, self.b
+        scores: Dict[int, float] = {}
+
+        for term in set(tokenize(query)):
+            entry = self._postings.get(term)
+            if entry is None:
+                continue
+            ids, tfs = entry
+            df = len(ids) - (sum(1 for i in ids if i in self._deleted) if self._deleted else 0)
+            if df <= 0:
+                continue
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for doc_id, tf in zip(ids, tfs):
+                length = self._doc_len.get(doc_id)
+                if length is None or (allowed is not None and doc_id not in allowed):
+                    continue
+                norm = tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / avg_len))
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * norm
+
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
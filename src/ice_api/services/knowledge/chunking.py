@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import codecs
+import re
+import zlib
+from typing import Iterable, Iterator, List, NamedTuple
+
+READ_BLOCK = 1024 * 1024
+CHUNK_SIZE = 1000            # caratteri per chunk (obiettivo)
+CHUNK_OVERLAP = 150          # caratteri ripetuti tra chunk consecutivi
+
+# ============================================================================
+# CONTENT-DEFINED CHUNKING
+# ============================================================================
+# Il testo è diviso in unità (righe o frasi). Un hash rolling sulle ultime
+# BOUNDARY_BITS unità decide dove tagliare: i confini dipendono solo dal
+# contenuto locale, quindi una modifica a metà documento cambia i chunk
+# vicini e non sposta tutti i successivi (niente re-embedding del file
+# intero). min/max limitano la dimensione attorno all'obiettivo.
+# ============================================================================
+
+BOUNDARY_BITS = 3            # taglio atteso ogni ~8 unità oltre la dimensione minima
+_BOUNDARY_MASK = (1 << BOUNDARY_BITS) - 1
+_UNIT_RE = re.compile(r"[^\n.!?]*(?:[.!?]+\s|\n)")
+
+
+class TextChunk(NamedTuple):
+    ordinal: int
+    start: int       # offset in caratteri nel documento
+    text: str
+
+
+def iter_file_text(path: str, *, encoding: str = "utf-8", block: int = READ_BLOCK) -> Iterator[str]:
+    """Testo del file a blocchi, con decoding incrementale (memoria limitata)."""
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    with open(path, "rb") as fh:
+        while True:
+            data = fh.read(block)
+            if not data:
+                tail = decoder.decode(b"", final=True)
+                if tail:
+                    yield tail
+                return
+            text = decoder.decode(data)
+            if text:
+                yield text
+
+
+def _iter_units(blocks: Iterable[str], max_unit: int) -> Iterator[str]:
+    """Unità terminate da newline o fine frase; testo senza terminatori a pezzi di max_unit."""
+    buf = ""
+    for block in blocks:
+        buf += block
+        end = 0
+        for match in _UNIT_RE.finditer(buf):
+            unit = match.group()
+            end = match.end()
+            while len(unit) > max_unit:
+                yield unit[:max_unit]
+                unit = unit[max_unit:]
+            yield unit
+        buf = buf[end:]
+        while len(buf) > max_unit:
+            yield buf[:max_unit]
+            buf = buf[max_unit:]
+    if buf:
+        yield buf
+
+
+def _overlap_tail(text: str, overlap: int) -> str:
+    if overlap <= 0 or len(text) <= overlap:
+        return text if overlap > 0 else ""
+    tail = text[-overlap:]
+    cut = tail.find(" ")
+    return tail[cut + 1:] if 0 <= cut < len(tail) - 1 else tail
+
+
+def chunk_stream(
+    blocks: Iterable[str],
+    *,
+    size: int = CHUNK_SIZE,
+    overlap: int = CHUNK_OVERLAP,
+) -> Iterator[TextChunk]:
+    """
+    Chunking in streaming con confini definiti dal contenuto.
+
+    Ogni chunk è preceduto dalla coda (overlap caratteri) del chunk
+    precedente per dare contesto al retrieval: una modifica cambia al
+    più il chunk successivo oltre a quelli toccati.
+    """
+    min_size = size // 2
+    max_size = size * 2
+    overlap = min(overlap, size // 2)
+
+    ordinal = 0
+    offset = 0              # offset del documento all'inizio di `parts`
+    parts: List[str] = []
+    length = 0
+    roll = 0
+    previous = ""
+
+    def emit() -> Iterator[TextChunk]:
+        nonlocal ordinal, offset, parts, length, previous
+        body = "".join(parts)
+        if body.strip():
+            prefix = _overlap_tail(previous, overlap)
+            yield TextChunk(ordinal, offset - len(prefix), (prefix + body).strip())
+            ordinal += 1
+            previous = body
+        offset += len(body)
+        parts, length = [], 0
+
+    for unit in _iter_units(blocks, size):
+        if parts and length + len(unit) > max_size:
+            yield from emit()
+        parts.append(unit)
+        length += len(unit)
+        roll = ((roll << 1) + zlib.crc32(unit.encode("utf-8"))) & 0xFFFFFFFF
+        if length >= min_size and roll & _BOUNDARY_MASK == _BOUNDARY_MASK:
+            yield from emit()
+
+    if parts:
+        yield from emit()
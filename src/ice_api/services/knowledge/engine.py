@@ -0,0 +1,639 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from ice_api.services.knowledge.bm25 import BM25Index, tokenize
+from ice_api.services.knowledge.chunking import (
+    CHUNK_OVERLAP,
+    CHUNK_SIZE,
+    READ_BLOCK,
+    TextChunk,
+    chunk_stream,
+    iter_file_text,
+)
+from ice_api.services.knowledge.vectors import (
+    FlatVectorIndex,
+    HashingEmbedder,
+    _numpy,
+    make_vector_index,
+)
+from ice_api.services.logs.scan import default_state_dir
+
+logger = logging.getLogger("ice.api.services.knowledge")
+
+# ============================================================================
+# LAYOUT SU DISCO
+# ============================================================================
+#
+#   <dir>/chunks.sqlite   testo, metadati e hash dei chunk (fonte di verità)
+#                         + manifest dei file (path, size, mtime, hash)
+#   <dir>/vectors.f32     vettori float32, solo append
+#   <dir>/vectors.ids     id chunk int64, allineati a vectors.f32
+#
+# I vettori di chunk cancellati restano nei file finché la quota di righe
+# morte non supera COMPACT_RATIO: al caricamento vengono filtrati contro
+# la tabella chunks.
+# ============================================================================
+
+EMBED_BATCH = 256
+DELETE_BATCH = 500            # sotto il limite di variabili SQLite
+COMPACT_RATIO = 0.5
+RRF_K = 60                  # costante della reciprocal rank fusion
+QUERY_MODES = ("hybrid", "vector", "keyword")
+
+Embedder = Callable[[Sequence[str]], Any]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    id      INTEGER PRIMARY KEY AUTOINCREMENT,
+    source  TEXT NOT NULL,
+    ordinal INTEGER NOT NULL,
+    start   INTEGER NOT NULL,
+    hash    TEXT NOT NULL DEFAULT '',
+    text    TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS chunks_source ON chunks(source, ordinal);
+CREATE TABLE IF NOT EXISTS files (
+    path     TEXT PRIMARY KEY,
+    size     INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    hash     TEXT NOT NULL
+);
+"""
+
+
+def chunk_hash(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def is_binary(path: str, *, sniff: int = 8192) -> bool:
+    with open(path, "rb") as fh:
+        return b"\0" in fh.read(sniff)
+
+
+def file_hash(path: str, *, salt: str = "") -> str:
+    """Hash del contenuto a blocchi; salt = parametri che cambiano il chunking."""
+    h = hashlib.blake2b(salt.encode("utf-8"), digest_size=16)
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(READ_BLOCK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class KnowledgeEngine:
+    """
+    Motore RAG locale: chunk in SQLite, indice vettoriale (flat o IVF)
+    e indice BM25 in memoria, ranking ibrido.
+
+    L'indice vettoriale è caricato dai file al primo uso, il BM25 è
+    ricostruito dalla tabella chunks al primo uso; entrambi sono poi
+    aggiornati in modo incrementale da ingest e delete.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        *,
+        embedder: Optional[Embedder] = None,
+        index_kind: str = "flat",
+    ) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+
+        self._db = sqlite3.connect(
+            str(self.directory / "chunks.sqlite"),
+            check_same_thread=False,
+        )
+        self._db.executescript(_SCHEMA)
+        columns = {r[1] for r in self._db.execute("PRAGMA table_info(chunks)")}
+        if "hash" not in columns:
+            # collezioni create prima del sync: i chunk senza hash saranno riembeddati
+            self._db.execute("ALTER TABLE chunks ADD COLUMN hash TEXT NOT NULL DEFAULT ''")
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+
+        self.embedder = embedder or HashingEmbedder()
+        meta = dict(self._db.execute("SELECT key, value FROM meta"))
+        # embedder senza .dim: la dimensione è presa dal primo batch (_embed)
+        self.dim = int(meta.get("dim") or 0) or int(getattr(self.embedder, "dim", 0) or 0)
+        self.index_kind = meta.get("index_kind") or index_kind
+        self._db.executemany(
+            "INSERT OR REPLACE INTO meta(key, value) VALUES (?, ?)",
+            [("dim", str(self.dim)), ("index_kind", self.index_kind)],
+        )
+        self._db.commit()
+
+        self._vectors: Optional[FlatVectorIndex] = None
+        self._bm25: Optional[BM25Index] = None
+        self._stored_rows = 0
+
+    # ------------------------------------------------------------------
+    # files vettori
+    # ------------------------------------------------------------------
+
+    @property
+    def _vec_path(self) -> Path:
+        return self.directory / "vectors.f32"
+
+    @property
+    def _ids_path(self) -> Path:
+        return self.directory / "vectors.ids"
+
+    def _load_vectors(self) -> FlatVectorIndex:
+        if self._vectors is not None:
+            return self._vectors
+        np = _numpy()
+        index = make_vector_index(self.index_kind, self.dim)
+        rows = 0
+        if self._ids_path.exists() and self.dim:
+            ids = np.fromfile(self._ids_path, dtype=np.int64)
+            vecs = np.fromfile(self._vec_path, dtype=np.float32)
+            rows = min(len(ids), len(vecs) // self.dim)
+            ids = ids[:rows]
+            vecs = vecs[: rows * self.dim].reshape(rows, self.dim)
+            live = np.fromiter(
+                (r[0] for r in self._db.execute("SELECT id FROM chunks")),
+                dtype=np.int64,
+            )
+            keep = np.isin(ids, live)
+            if keep.any():
+                index.add(ids[keep], vecs[keep])
+        self._stored_rows = rows
+        self._vectors = index
+        return index
+
+    def _append_vectors(self, ids: Sequence[int], vecs: Any) -> None:
+        np = _numpy()
+        with open(self._vec_path, "ab") as fh:
+            np.asarray(vecs, dtype=np.float32).tofile(fh)
+        with open(self._ids_path, "ab") as fh:
+            np.asarray(ids, dtype=np.int64).tofile(fh)
+        self._stored_rows += len(ids)
+
+    def _maybe_compact(self) -> None:
+        index = self._vectors
+        if index is None or not self._stored_rows:
+            return
+        if len(index) >= self._stored_rows * (1 - COMPACT_RATIO):
+            return
+        ids, vecs = index.live()
+        for final, data in ((self._vec_path, vecs), (self._ids_path, ids)):
+            tmp = final.with_suffix(final.suffix + ".tmp")
+            data.tofile(str(tmp))
+            os.replace(tmp, final)
+        self._stored_rows = len(ids)
+        logger.info(
+            "Knowledge vectors compacted",
+            extra={"directory": str(self.directory), "rows": len(ids)},
+        )
+
+    def _load_bm25(self) -> BM25Index:
+        if self._bm25 is not None:
+            return self._bm25
+        index = BM25Index()
+        for chunk_id, text in self._db.execute("SELECT id, text FROM chunks"):
+            index.add(chunk_id, tokenize(text))
+        self._bm25 = index
+        return index
+
+    # ------------------------------------------------------------------
+    # ingest
+    # ------------------------------------------------------------------
+
+    def _embed(self, texts: Sequence[str]) -> Any:
+        np = _numpy()
+        vecs = np.asarray(self.embedder(texts), dtype=np.float32)
+        if not self.dim and vecs.ndim == 2 and vecs.shape[1]:
+            self._set_dim(int(vecs.shape[1]))
+        if vecs.ndim != 2 or vecs.shape[1] != self.dim:
+            raise ValueError(
+                f"Embedder returned shape {vecs.shape}, expected (n, {self.dim})"
+            )
+        return vecs
+
+    def _set_dim(self, dim: int) -> None:
+        """Prima dimensione vista: salvata nel meta, indice vettoriale (vuoto) ricreato."""
+        self.dim = dim
+        self._vectors = None
+        # committato con il batch che l'ha rivelata
+        self._db.execute("INSERT OR REPLACE INTO meta(key, value) VALUES ('dim', ?)", (str(dim),))
+
+    def _insert_batch(self, source: str, batch: List[Tuple[TextChunk, str]]) -> List[int]:
+        vecs = self._embed([c.text for c, _ in batch])
+        vectors = self._load_vectors()
+        cur = self._db.cursor()
+        ids: List[int] = []
+        for c, digest in batch:
+            cur.execute(
+                "INSERT INTO chunks(source, ordinal, start, hash, text) VALUES (?, ?, ?, ?, ?)",
+                (source, c.ordinal, c.start, digest, c.text),
+            )
+            ids.append(cur.lastrowid)
+
+        self._append_vectors(ids, vecs)
+        vectors.add(ids, vecs)
+        if self._bm25 is not None:
+            for chunk_id, (c, _) in zip(ids, batch):
+                self._bm25.add(chunk_id, tokenize(c.text))
+        return ids
+
+    def ingest_chunks(
+        self,
+        source: str,
+        chunks: Iterable[TextChunk],
+        *,
+        batch_size: int = EMBED_BATCH,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Ingest incrementale di una sorgente, diff a livello di chunk:
+
+        - chunk con hash già presente per la sorgente: riusati, cambiano
+          solo ordinal/offset (nessun embedding)
+        - chunk nuovi: embeddati e scritti a batch, un evento per batch
+        - chunk non più presenti: cancellati in blocco alla fine
+
+        Il lock è preso per batch e mai tenuto attraverso uno yield: il
+        generatore può essere ripreso da thread diversi.
+        """
+        existing: Dict[str, List[int]] = {}
+        with self._lock:
+            for chunk_id, digest in self._db.execute(
+                "SELECT id, hash FROM chunks WHERE source = ?", (source,)
+            ):
+                existing.setdefault(digest, []).append(chunk_id)
+
+        batch: List[Tuple[TextChunk, str]] = []
+        reused: List[Tuple[int, int, int]] = []
+        added = 0
+        for chunk in chunks:
+            digest = chunk_hash(chunk.text)
+            same = existing.get(digest)
+            if same:
+                reused.append((chunk.ordinal, chunk.start, same.pop()))
+                continue
+            batch.append((chunk, digest))
+            if len(batch) >= batch_size:
+                with self._lock:
+                    added += len(self._insert_batch(source, batch))
+                    self._db.commit()
+                batch = []
+                yield {"source": source, "added": added, "reused": len(reused)}
+
+        orphans = [chunk_id for ids in existing.values() for chunk_id in ids]
+        with self._lock:
+            if batch:
+                added += len(self._insert_batch(source, batch))
+            self._db.executemany(
+                "UPDATE chunks SET ordinal = ?, start = ? WHERE id = ?",
+                reused,
+            )
+            self._delete_ids(orphans)
+            self._db.commit()
+        yield {
+            "source": source,
+            "added": added,
+            "reused": len(reused),
+            "removed": len(orphans),
+            "done": True,
+        }
+
+    def ingest_file(
+        self,
+        path: str,
+        *,
+        chunk_size: int = CHUNK_SIZE,
+        overlap: int = CHUNK_OVERLAP,
+        encoding: str = "utf-8",
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Ingest di un file registrato nel manifest. Se il contenuto (e i
+        parametri di chunking) non sono cambiati non si ri-chunka nulla.
+        """
+        source = os.path.abspath(path)
+        st = os.stat(source)
+        digest = file_hash(source, salt=f"{chunk_size}:{overlap}:{encoding}")
+
+        with self._lock:
+            row = self._db.execute(
+                "SELECT hash FROM files WHERE path = ?", (source,)
+            ).fetchone()
+        if row is not None and row[0] == digest:
+            yield {"source": source, "unchanged": True, "done": True}
+        elif is_binary(source):
+            # registrato nel manifest per non rileggerlo al prossimo sync
+            self.delete_source(source)
+            yield {"source": source, "skipped": "binary", "done": True}
+        else:
+            chunks = chunk_stream(
+                iter_file_text(source, encoding=encoding),
+                size=chunk_size,
+                overlap=overlap,
+            )
+            yield from self.ingest_chunks(source, chunks)
+
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO files(path, size, mtime_ns, hash) VALUES (?, ?, ?, ?)",
+                (source, st.st_size, st.st_mtime_ns, digest),
+            )
+            self._db.commit()
+
+    # ------------------------------------------------------------------
+    # sync
+    # ------------------------------------------------------------------
+
+    def sync_sources(
+        self,
+        sources: Iterable[Any],
+        *,
+        root: Optional[str] = None,
+        chunk_size: int = CHUNK_SIZE,
+        overlap: int = CHUNK_OVERLAP,
+        encoding: str = "utf-8",
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Allinea la collezione ai file correnti (oggetti con path, size,
+        mtime_ns, es. LogSource di walk_sources).
+
+        - (size, mtime) invariati nel manifest: file saltato senza leggerlo
+        - altrimenti hash del contenuto e, se diverso, diff dei chunk
+        - file del manifest sotto root non più presenti: chunk e voci del
+          manifest cancellati in blocco
+        """
+        with self._lock:
+            if root:
+                prefix = os.path.join(os.path.abspath(root), "")
+                rows = self._db.execute(
+                    "SELECT path, size, mtime_ns FROM files WHERE path >= ? AND path < ?",
+                    (prefix, prefix + "\U0010ffff"),
+                )
+            else:
+                rows = self._db.execute("SELECT path, size, mtime_ns FROM files")
+            manifest = {path: (size, mtime_ns) for path, size, mtime_ns in rows}
+
+        totals = {"files": 0, "unchanged": 0, "updated": 0, "added": 0, "reused": 0, "removed": 0}
+        seen = set()
+        for src in sources:
+            path = os.path.abspath(src.path)
+            seen.add(path)
+            totals["files"] += 1
+            if manifest.get(path) == (src.size, src.mtime_ns):
+                totals["unchanged"] += 1
+                continue
+
+            record: Dict[str, Any] = {}
+            for record in self.ingest_file(path, chunk_size=chunk_size, overlap=overlap, encoding=encoding):
+                pass
+            if record.get("unchanged") or record.get("skipped"):
+                totals["unchanged"] += 1
+                continue
+            totals["updated"] += 1
+            for key in ("added", "reused", "removed"):
+                totals[key] += record.get(key, 0)
+            yield {"file": path, **{k: record.get(k, 0) for k in ("added", "reused", "removed")}}
+
+        gone = [path for path in manifest if path not in seen]
+        removed = self.delete_sources(gone)
+        totals["removed"] += removed
+        yield {"summary": {**totals, "removed_files": len(gone), **self.stats()}}
+
+    # ------------------------------------------------------------------
+    # delete
+    # ------------------------------------------------------------------
+
+    def _delete_ids(self, chunk_ids: Sequence[int]) -> None:
+        """Cancellazione in blocco (lock già preso, commit a carico del chiamante)."""
+        if not chunk_ids:
+            return
+        for start in range(0, len(chunk_ids), DELETE_BATCH):
+            part = [int(i) for i in chunk_ids[start:start + DELETE_BATCH]]
+            self._db.execute(
+                f"DELETE FROM chunks WHERE id IN ({','.join('?' * len(part))})",
+                part,
+            )
+        if self._vectors is not None:
+            self._vectors.remove(chunk_ids)
+            self._maybe_compact()
+        if self._bm25 is not None:
+            self._bm25.remove(chunk_ids)
+
+    def delete_chunks(self, chunk_ids: Sequence[int]) -> int:
+        with self._lock:
+            self._delete_ids(chunk_ids)
+            self._db.commit()
+            return len(chunk_ids)
+
+    def delete_sources(self, sources: Sequence[str]) -> int:
+        """Cancella sorgenti e voci del manifest; restituisce i chunk rimossi."""
+        if not sources:
+            return 0
+        with self._lock:
+            ids: List[int] = []
+            for start in range(0, len(sources), DELETE_BATCH):
+                part = list(sources[start:start + DELETE_BATCH])
+                marks = ",".join("?" * len(part))
+                ids.extend(
+                    r[0]
+                    for r in self._db.execute(f"SELECT id FROM chunks WHERE source IN ({marks})", part)
+                )
+                self._db.execute(f"DELETE FROM files WHERE path IN ({marks})", part)
+            self._delete_ids(ids)
+            self._db.commit()
+            return len(ids)
+
+    def delete_source(self, source: str) -> int:
+        return self.delete_sources([source])
+
+    # ------------------------------------------------------------------
+    # query
+    # ------------------------------------------------------------------
+
+    def query(
+        self,
+        text: str,
+        *,
+        k: int = 10,
+        mode: str = "hybrid",
+        candidates: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Ricerca vettoriale, keyword (BM25) o ibrida.
+
+        In modalità hybrid le due liste di candidati sono fuse con
+        reciprocal rank fusion: robusta a scale di score diverse.
+        """
+        if mode not in QUERY_MODES:
+            raise ValueError(f"Unknown query mode: {mode}")
+        candidates = candidates or max(k * 5, 50)
+
+        with self._lock:
+            vector_hits: List[Tuple[int, float]] = []
+            keyword_hits: List[Tuple[int, float]] = []
+            if mode in ("hybrid", "vector"):
+                query_vec = self._embed([text])[0]
+                vector_hits = self._load_vectors().search(query_vec, k=candidates)
+            if mode in ("hybrid", "keyword"):
+                keyword_hits = self._load_bm25().search(text, k=candidates)
+
+            if mode == "vector":
+                ranked = vector_hits[:k]
+            elif mode == "keyword":
+                ranked = keyword_hits[:k]
+            else:
+                fused: Dict[int, float] = {}
+                for hits in (vector_hits, keyword_hits):
+                    for rank, (chunk_id, _score) in enumerate(hits):
+                        fused[chunk_id] = fused.get(chunk_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+                ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:k]
+
+            return self._fetch(ranked, dict(vector_hits), dict(keyword_hits))
+
+    def _fetch(
+        self,
+        ranked: List[Tuple[int, float]],
+        vector_scores: Dict[int, float],
+        keyword_scores: Dict[int, float],
+    ) -> List[Dict[str, Any]]:
+        if not ranked:
+            return []
+        ids = [chunk_id for chunk_id, _ in ranked]
+        marks = ",".join("?" * len(ids))
+        rows = {
+            r[0]: r
+            for r in self._db.execute(
+                f"SELECT id, source, ordinal, start, text FROM chunks WHERE id IN ({marks})",
+                ids,
+            )
+        }
+        results = []
+        for chunk_id, score in ranked:
+            row = rows.get(chunk_id)
+            if row is None:
+                continue
+            results.append({
+                "id": chunk_id,
+                "source": row[1],
+                "ordinal": row[2],
+                "start": row[3],
+                "text": row[4],
+                "score": round(score, 6),
+                "vector_score": vector_scores.get(chunk_id),
+                "keyword_score": keyword_scores.get(chunk_id),
+            })
+        return results
+
+    # ------------------------------------------------------------------
+    # stats
+    # ------------------------------------------------------------------
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            chunks, sources = self._db.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT source) FROM chunks"
+            ).fetchone()
+            return {
+                "directory": str(self.directory),
+                "chunks": chunks,
+                "sources": sources,
+                "dim": self.dim,
+                "index_kind": self.index_kind,
+            }
+
+    def export_to(self, directory: Path) -> None:
+        """Copia coerente della collezione (backup SQLite e file vettori) in directory."""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            target = sqlite3.connect(str(directory / "chunks.sqlite"))
+            try:
+                self._db.backup(target)
+            finally:
+                target.close()
+            for path in (self._vec_path, self._ids_path):
+                if path.exists():
+                    shutil.copyfile(path, directory / path.name)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+# ============================================================================
+# REGISTRY
+# ============================================================================
+
+_ENGINES: Dict[str, KnowledgeEngine] = {}
+_ENGINES_GUARD = threading.Lock()
+
+
+def default_knowledge_dir(name: str) -> Path:
+    return default_state_dir() / "knowledge" / name
+
+
+def export_collection(name: str, directory: Path) -> bool:
+    """
+    Copia della collezione `name` in directory senza registrare un engine
+    (che fisserebbe l'embedder): usa quello già aperto se c'è, altrimenti
+    backup SQLite e poi file vettori (righe in più sono scartate al load).
+    """
+    source = default_knowledge_dir(name)
+    if not (source / "chunks.sqlite").exists():
+        return False
+    with _ENGINES_GUARD:
+        engine = _ENGINES.get(str(source.resolve()))
+    if engine is not None:
+        engine.export_to(directory)
+        return True
+
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    db = sqlite3.connect(str(source / "chunks.sqlite"))
+    try:
+        target = sqlite3.connect(str(directory / "chunks.sqlite"))
+        try:
+            db.backup(target)
+        finally:
+            target.close()
+    finally:
+        db.close()
+    for filename in ("vectors.f32", "vectors.ids"):
+        if (source / filename).exists():
+            shutil.copyfile(source / filename, directory / filename)
+    return True
+
+
+def get_engine(
+    name: str = "default",
+    *,
+    directory: Optional[Path] = None,
+    embedder: Optional[Embedder] = None,
+    index_kind: str = "flat",
+) -> KnowledgeEngine:
+    """
+    KnowledgeEngine condiviso per directory: indici in memoria caricati
+    una volta per processo. embedder e index_kind valgono solo alla
+    creazione della collezione.
+    """
+    target = Path(directory) if directory is not None else default_knowledge_dir(name)
+    key = str(target.resolve())
+    with _ENGINES_GUARD:
+        engine = _ENGINES.get(key)
+        if engine is None:
+            engine = _ENGINES[key] = KnowledgeEngine(
+                target,
+                embedder=embedder,
+                index_kind=index_kind,
+            )
+        return engine
@@ -0,0 +1,313 @@
+from __future__ import annotations
+
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from ice_api.services.knowledge.bm25 import tokenize
+
+# ============================================================================
+# NUMPY (DIPENDENZA OPZIONALE: pip install ice-api[knowledge])
+# ============================================================================
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError as exc:  # pragma: no cover - dipende dall'ambiente
+        raise RuntimeError(
+            "Vector search requires numpy (pip install 'ice-api[knowledge]')"
+        ) from exc
+    return numpy
+
+
+def has_numpy() -> bool:
+    """True se l'extra `knowledge` è installato (controllo prima di avviare uno stream)."""
+    try:
+        _numpy()
+    except RuntimeError:
+        return False
+    return True
+
+
+SCORE_BATCH_ROWS = 262_144      # righe per batch di scoring (limita la memoria temporanea)
+IVF_TRAIN_SAMPLE = 65_536
+IVF_TRAIN_ITERATIONS = 10
+
+
+# ============================================================================
+# HASHING EMBEDDER
+# ============================================================================
+
+class HashingEmbedder:
+    """
+    Embedder locale deterministico (feature hashing di token e bigrammi).
+
+    Non sostituisce un modello semantico: è il default senza dipendenze
+    esterne. Il runtime può fornire il proprio embedder con la stessa
+    interfaccia: __call__(texts) -> ndarray (n, dim).
+
+    L'hash dei token è memorizzato (il vocabolario reale è limitato),
+    quello dei bigrammi è combinato in modo vettoriale: l'unico lavoro
+    per-token in Python è la tokenizzazione.
+    """
+
+    TOKEN_CACHE_MAX = 1_000_000
+
+    def __init__(self, dim: int = 256) -> None:
+        self.dim = dim
+        self._token_hash: Dict[str, int] = {}
+
+    def _hash(self, token: str) -> int:
+        cache = self._token_hash
+        if len(cache) >= self.TOKEN_CACHE_MAX:
+            cache.clear()
+        value = cache[token] = zlib.crc32(token.encode("utf-8"))
+        return value
+
+    def __call__(self, texts: Sequence[str]) -> Any:
+        np = _numpy()
+        cache = self._token_hash
+        features: List[Any] = []
+        lengths: List[int] = []
+        for text in texts:
+            tokens = tokenize(text)
+            h = np.array(
+                [cache[t] if t in cache else self._hash(t) for t in tokens],
+                dtype=np.uint64,
+            )
+            bigrams = (h[:-1] * np.uint64(0x9E3779B1) + h[1:]) & np.uint64(0xFFFFFFFF)
+            features.append(h)
+            features.append(bigrams)
+            lengths.append(len(h) + len(bigrams))
+
+        n = len(texts)
+        if not n:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        flat = np.concatenate(features) if features else np.zeros(0, dtype=np.uint64)
+        rows = np.repeat(np.arange(n, dtype=np.int64), lengths)
+        signs = np.where(flat & np.uint64(0x80000000), -1.0, 1.0)
+        cells = rows * self.dim + (flat % np.uint64(self.dim)).astype(np.int64)
+        out = np.bincount(cells, weights=signs, minlength=n * self.dim).reshape(n, self.dim)
+
+        # log-tf e normalizzazione L2 (cosine = prodotto scalare)
+        out = (np.sign(out) * np.log1p(np.abs(out))).astype(np.float32)
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return out / norms
+
+
+# ============================================================================
+# FLAT INDEX
+# ============================================================================
+
+class FlatVectorIndex:
+    """
+    Indice vettoriale esatto: matrice float32 (righe L2-normalizzate),
+    cosine similarity come prodotto matrice-vettore a batch.
+    """
+
+    kind = "flat"
+
+    def __init__(self, dim: int) -> None:
+        np = _numpy()
+        self.dim = dim
+        self._vecs = np.zeros((0, dim), dtype=np.float32)
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._alive = np.zeros(0, dtype=bool)
+        self._n = 0
+        self._row_of: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._row_of)
+
+    def _reserve(self, extra: int) -> None:
+        np = _numpy()
+        need = self._n + extra
+        if need <= len(self._ids):
+            return
+        capacity = max(need, len(self._ids) * 2, 1024)
+        vecs = np.zeros((capacity, self.dim), dtype=np.float32)
+        vecs[: self._n] = self._vecs[: self._n]
+        ids = np.zeros(capacity, dtype=np.int64)
+        ids[: self._n] = self._ids[: self._n]
+        alive = np.zeros(capacity, dtype=bool)
+        alive[: self._n] = self._alive[: self._n]
+        self._vecs, self._ids, self._alive = vecs, ids, alive
+        self._on_resize(capacity)
+
+    def _on_resize(self, capacity: int) -> None:
+        pass
+
+    def add(self, ids: Sequence[int], vectors: Any) -> None:
+        np = _numpy()
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        vectors = vectors / norms
+
+        self.remove(ids)
+        self._reserve(len(ids))
+        start, end = self._n, self._n + len(ids)
+        self._vecs[start:end] = vectors
+        self._ids[start:end] = ids
+        self._alive[start:end] = True
+        for offset, doc_id in enumerate(ids):
+            self._row_of[int(doc_id)] = start + offset
+        self._n = end
+        self._on_add(start, end)
+
+    def _on_add(self, start: int, end: int) -> None:
+        pass
+
+    def remove(self, ids: Iterable[int]) -> None:
+        for doc_id in ids:
+            row = self._row_of.pop(int(doc_id), None)
+            if row is not None:
+                self._alive[row] = False
+
+    def _block_top_k(self, rows: Any, scores: Any, k: int) -> Tuple[Any, Any]:
+        np = _numpy()
+        if len(scores) > k:
+            top = np.argpartition(-scores, k)[:k]
+            rows, scores = rows[top], scores[top]
+        return self._ids[rows], scores
+
+    @staticmethod
+    def _merge_top_k(parts: List[Tuple[Any, Any]], k: int) -> List[Tuple[int, float]]:
+        np = _numpy()
+        parts = [(ids, scores) for ids, scores in parts if len(ids)]
+        if not parts:
+            return []
+        ids = np.concatenate([p[0] for p in parts])
+        scores = np.concatenate([p[1] for p in parts])
+        order = np.argsort(-scores, kind="stable")[:k]
+        return [(int(ids[i]), float(scores[i])) for i in order]
+
+    def _filter(self, rows: Any, allowed: Optional[set]) -> Any:
+        np = _numpy()
+        rows = rows[self._alive[rows]]
+        if allowed is not None:
+            rows = rows[np.isin(self._ids[rows], list(allowed))]
+        return rows
+
+    def _normalize_query(self, query: Any) -> Any:
+        np = _numpy()
+        q = np.asarray(query, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(q)
+        return q / norm if norm else q
+
+    def search(self, query: Any, *, k: int = 10, allowed: Optional[set] = None) -> List[Tuple[int, float]]:
+        """
+        Scoring esatto a blocchi contigui di righe: matmul su viste della
+        matrice (nessuna copia), top-k parziale per blocco e merge finale.
+        """
+        np = _numpy()
+        q = self._normalize_query(query)
+        parts = []
+        for start in range(0, self._n, SCORE_BATCH_ROWS):
+            end = min(self._n, start + SCORE_BATCH_ROWS)
+            scores = self._vecs[start:end] @ q
+            rows = np.arange(start, end)
+            keep = self._alive[start:end]
+            if allowed is not None:
+                keep &= np.isin(self._ids[start:end], list(allowed))
+            if not keep.all():
+                rows, scores = rows[keep], scores[keep]
+            parts.append(self._block_top_k(rows, scores, k))
+        return self._merge_top_k(parts, k)
+
+    def live(self) -> Tuple[Any, Any]:
+        """(ids, vettori) delle righe vive, nell'ordine di inserimento."""
+        alive = self._alive[: self._n]
+        return self._ids[: self._n][alive], self._vecs[: self._n][alive]
+
+
+# ============================================================================
+# IVF INDEX
+# ============================================================================
+
+class IVFVectorIndex(FlatVectorIndex):
+    """
+    Inverted file index: k-means sui vettori, ricerca limitata alle
+    nprobe liste più vicine alla query.
+
+    Finché non ci sono abbastanza vettori per l'addestramento si
+    comporta come il flat index.
+    """
+
+    kind = "ivf"
+
+    def __init__(self, dim: int, *, nlist: int = 1024, nprobe: int = 16, train_min: int = 50_000) -> None:
+        super().__init__(dim)
+        np = _numpy()
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_min = train_min
+        self._centroids = None
+        self._assign = np.zeros(0, dtype=np.int32)
+
+    def _on_resize(self, capacity: int) -> None:
+        np = _numpy()
+        assign = np.full(capacity, -1, dtype=np.int32)
+        assign[: len(self._assign)] = self._assign[: capacity]
+        self._assign = assign
+
+    def _nearest_centroid(self, vectors: Any) -> Any:
+        np = _numpy()
+        out = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), SCORE_BATCH_ROWS // 16):
+            block = vectors[start:start + SCORE_BATCH_ROWS // 16]
+            out[start:start + len(block)] = np.argmax(block @ self._centroids.T, axis=1)
+        return out
+
+    def _on_add(self, start: int, end: int) -> None:
+        if self._centroids is None:
+            if self._n >= self.train_min:
+                self.train()
+            return
+        self._assign[start:end] = self._nearest_centroid(self._vecs[start:end])
+
+    def train(self) -> None:
+        """Spherical k-means su un campione dei vettori vivi."""
+        np = _numpy()
+        rows = np.nonzero(self._alive[: self._n])[0]
+        if not len(rows):
+            return
+        rng = np.random.default_rng(0)
+        sample = self._vecs[rng.choice(rows, size=min(IVF_TRAIN_SAMPLE, len(rows)), replace=False)]
+        nlist = min(self.nlist, len(sample))
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+
+        for _ in range(IVF_TRAIN_ITERATIONS):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            empty = norms[:, 0] == 0
+            sums[empty] = centroids[empty]
+            norms[empty] = 1.0
+            centroids = sums / norms
+
+        self._centroids = centroids
+        self._assign[: self._n] = self._nearest_centroid(self._vecs[: self._n])
+
+    def search(self, query: Any, *, k: int = 10, allowed: Optional[set] = None) -> List[Tuple[int, float]]:
+        if self._centroids is None:
+            return super().search(query, k=k, allowed=allowed)
+        np = _numpy()
+        q = self._normalize_query(query)
+        nprobe = min(self.nprobe, len(self._centroids))
+        probe = np.argpartition(-(self._centroids @ q), nprobe - 1)[:nprobe]
+        rows = self._filter(np.nonzero(np.isin(self._assign[: self._n], probe))[0], allowed)
+        parts = []
+        for start in range(0, len(rows), SCORE_BATCH_ROWS):
+            block = rows[start:start + SCORE_BATCH_ROWS]
+            parts.append(self._block_top_k(block, self._vecs[block] @ q, k))
+        return self._merge_top_k(parts, k)
+
+
+def make_vector_index(kind: str, dim: int) -> FlatVectorIndex:
+    if kind == "ivf":
+        return IVFVectorIndex(dim)
+    if kind == "flat":
+        return FlatVectorIndex(dim)
+    raise ValueError(f"Unknown vector index: {kind}")
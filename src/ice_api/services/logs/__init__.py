@@ -0,0 +1,25 @@
+from ice_api.services.logs.index import LogIndex, get_index
+from ice_api.services.logs.parse import (
+    ColumnBatch,
+    LogRecord,
+    detect_format,
+    parse_columns,
+    parse_records,
+)
+from ice_api.services.logs.scan import LogSource, ScanSnapshot, scan_logs
+from ice_api.services.logs.tail import follow_file, tail_lines
+
+__all__ = [
+    "LogIndex",
+    "get_index",
+    "ColumnBatch",
+    "LogRecord",
+    "detect_format",
+    "parse_columns",
+    "parse_records",
+    "LogSource",
+    "ScanSnapshot",
+    "scan_logs",
+    "follow_file",
+    "tail_lines",
+]
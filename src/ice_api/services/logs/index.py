@@ -0,0 +1,597 @@
+from __future__ import annotations
+
+import heapq
+import json
+import logging
+import os
+import re
+import threading
+from array import array
+from collections import OrderedDict
+from datetime import datetime, timezone
+from itertools import accumulate
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from ice_api.services.logs.parse import iso_to_epoch
+from ice_api.services.logs.scan import default_state_dir
+
+logger = logging.getLogger("ice.api.services.logs.index")
+
+# ============================================================================
+# TUNING
+# ============================================================================
+
+INDEX_VERSION = 1
+
+BUCKET_SECONDS = 3600            # un bucket temporale = un'ora
+SEGMENT_MAX_DOCS = 200_000       # righe massime per segmento (memoria di build)
+SEGMENT_CACHE_SIZE = 64          # dizionari di segmento tenuti in memoria
+COMPACT_MIN_SEGMENTS = 4         # segmenti piccoli nello stesso bucket prima del merge
+READ_BLOCK = 1024 * 1024
+
+_TOKEN_RE = re.compile(rb"[0-9A-Za-z_]{2,}")
+
+# ============================================================================
+# LAYOUT SU DISCO
+# ============================================================================
+# <index_dir>/manifest.json
+#     sources:  [{"path", "offset", "inode", "last_ts", "retired"?}]   (id = posizione)
+#               una sorgente ruotata/troncata viene ritirata (retired) e il
+#               path riparte con un nuovo id: i postings del vecchio file
+#               restano nei segmenti ma vengono scartati in ricerca
+#     segments: [{"id", "docs", "terms", "t_min", "t_max"}]
+#     next_id:  prossimo id di segmento (mai riusato)
+#     garbage:  id di segmenti fusi, cancellati alla build successiva
+# <index_dir>/seg-<id>.docs   array d[docs] ts | I[docs] source | Q[docs] offset
+# <index_dir>/seg-<id>.terms  termini ordinati, separati da "\n"
+# <index_dir>/seg-<id>.tidx   array I[terms] start | I[terms] count
+# <index_dir>/seg-<id>.post   array I: doc id delta-encoded per termine
+#
+# Nei segmenti i doc id sono ordinati per timestamp: la posting list
+# di un termine è quindi anche in ordine temporale.
+# ============================================================================
+
+
+def default_index_dir(name: str = "default") -> Path:
+    return default_state_dir() / "logs-index" / name
+
+
+def tokenize(line: bytes) -> List[str]:
+    return [t.decode("ascii").lower() for t in _TOKEN_RE.findall(line)]
+
+
+def parse_timestamp(line: bytes) -> Optional[float]:
+    """Timestamp ISO-8601 in testa alla riga (UTC se senza offset)."""
+    return iso_to_epoch(line[1:] if line[:1] == b"[" else line)
+
+
+def to_epoch(value: Any) -> Optional[float]:
+    """Accetta epoch (int/float) o stringa ISO-8601."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    dt = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+# ============================================================================
+# SEGMENT (READ SIDE)
+# ============================================================================
+
+class _Segment:
+    """
+    Segmento immutabile caricato in modo lazy:
+    dizionario termini e array dei documenti, postings letti on-demand.
+    """
+
+    def __init__(self, base: Path, meta: Dict[str, Any]) -> None:
+        self.base = base
+        self.meta = meta
+        n = meta["docs"]
+
+        docs = (base / f"seg-{meta['id']}.docs").read_bytes()
+        self.ts = array("d")
+        self.source = array("I")
+        self.offset = array("Q")
+        pos = 0
+        for arr in (self.ts, self.source, self.offset):
+            size = n * arr.itemsize
+            arr.frombytes(docs[pos:pos + size])
+            pos += size
+
+        terms = (base / f"seg-{meta['id']}.terms").read_bytes().decode("utf-8")
+        self.terms = {t: i for i, t in enumerate(terms.split("\n"))} if terms else {}
+
+        tidx = array("I")
+        tidx.frombytes((base / f"seg-{meta['id']}.tidx").read_bytes())
+        half = len(tidx) // 2
+        self.starts = tidx[:half]
+        self.counts = tidx[half:]
+
+    def postings(self, term: str) -> Optional[List[int]]:
+        i = self.terms.get(term)
+        if i is None:
+            return None
+        count = self.counts[i]
+        deltas = array("I")
+        with open(self.base / f"seg-{self.meta['id']}.post", "rb") as fh:
+            fh.seek(self.starts[i] * deltas.itemsize)
+            deltas.frombytes(fh.read(count * deltas.itemsize))
+        return list(accumulate(deltas))
+
+
+def _intersect(lists: List[List[int]]) -> List[int]:
+    lists = sorted(lists, key=len)
+    result = lists[0]
+    for other in lists[1:]:
+        members = set(other)
+        result = [d for d in result if d in members]
+        if not result:
+            break
+    return result
+
+
+# ============================================================================
+# LOG INDEX
+# ============================================================================
+
+class LogIndex:
+    """
+    Indice invertito su disco delle righe di log.
+
+    - indicizzazione incrementale: per ogni sorgente si riparte dall'offset
+      già indicizzato (una sorgente ruotata/troncata viene ritirata e il
+      file riparte da zero con un nuovo id di sorgente)
+    - segmenti immutabili per bucket temporale: la ricerca scarta i
+      segmenti fuori da [since, until] usando solo il manifest
+    - merge lazy: i segmenti vengono aperti dal più recente, solo quando
+      la frontiera della ricerca scende sotto il loro t_max
+    - compattazione: i segmenti piccoli lasciati dalle build incrementali
+      nello stesso bucket vengono fusi (compact(), a fine add_files)
+    - ogni flush salva nel manifest anche l'offset raggiunto da ogni
+      sorgente: dopo un errore la build riparte da lì, senza duplicati
+    """
+
+    _locks: Dict[str, threading.Lock] = {}
+    _locks_guard = threading.Lock()
+
+    def __init__(
+        self,
+        directory: Path,
+        *,
+        bucket_seconds: int = BUCKET_SECONDS,
+        segment_max_docs: int = SEGMENT_MAX_DOCS,
+    ) -> None:
+        self.directory = Path(directory)
+        self.bucket_seconds = bucket_seconds
+        self.segment_max_docs = segment_max_docs
+        self._cache: "OrderedDict[int, _Segment]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+        with self._locks_guard:
+            self._lock = self._locks.setdefault(str(self.directory.resolve()), threading.Lock())
+
+    # ------------------------------------------------------------------
+    # manifest
+    # ------------------------------------------------------------------
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        try:
+            manifest = json.loads((self.directory / "manifest.json").read_text("utf-8"))
+        except FileNotFoundError:
+            return {"version": INDEX_VERSION, "sources": [], "segments": []}
+        if manifest.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported log index version: {manifest.get('version')}")
+        return manifest
+
+    def _save_manifest(self, manifest: Dict[str, Any]) -> None:
+        tmp = self.directory / "manifest.json.tmp"
+        tmp.write_text(json.dumps(manifest), "utf-8")
+        os.replace(tmp, self.directory / "manifest.json")
+
+    def stats(self) -> Dict[str, Any]:
+        manifest = self._load_manifest()
+        return {
+            "sources": sum(1 for s in manifest["sources"] if not s.get("retired")),
+            "segments": len(manifest["segments"]),
+            "docs": sum(s["docs"] for s in manifest["segments"]),
+        }
+
+    # ------------------------------------------------------------------
+    # build
+    # ------------------------------------------------------------------
+
+    def add_files(self, paths: Iterable[str]) -> Iterator[Dict[str, Any]]:
+        """
+        Indicizza (in modo incrementale) i file indicati.
+
+        Generator sincrono: produce un record di progresso per file (e
+        uno per la compattazione, se c'è stata). Da eseguire fuori
+        dall'event loop.
+        """
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            manifest = self._load_manifest()
+            self._collect_garbage(manifest)
+            by_path = {
+                s["path"]: i
+                for i, s in enumerate(manifest["sources"])
+                if not s.get("retired")
+            }
+            buckets: Dict[int, List[Tuple[float, int, int, List[str]]]] = {}
+            buffered = 0
+
+            for path in paths:
+                path = os.path.abspath(path)
+                try:
+                    fh = open(path, "rb")
+                except FileNotFoundError:
+                    yield {"file": path, "lines": 0}
+                    continue
+
+                with fh:
+                    st = os.fstat(fh.fileno())
+                    sid = by_path.get(path)
+                    if sid is not None:
+                        old = manifest["sources"][sid]
+                        if old["inode"] != st.st_ino or st.st_size < old["offset"]:
+                            # gli offset nei postings si riferiscono al vecchio
+                            # file: la sorgente viene ritirata, non riusata
+                            old["retired"] = True
+                            sid = None
+                    if sid is None:
+                        sid = len(manifest["sources"])
+                        by_path[path] = sid
+                        manifest["sources"].append(
+                            {"path": path, "offset": 0, "inode": st.st_ino, "last_ts": 0.0}
+                        )
+                    source = manifest["sources"][sid]
+
+                    added = 0
+                    for ts, offset, end, terms in self._read_new_lines(source, fh):
+                        bucket = int(ts // self.bucket_seconds)
+                        buckets.setdefault(bucket, []).append((ts, sid, offset, terms))
+                        added += 1
+                        buffered += 1
+                        if buffered >= self.segment_max_docs:
+                            # checkpoint della sorgente: tutte le righe prima di
+                            # end sono nei segmenti che il flush sta salvando
+                            source["offset"] = end
+                            source["last_ts"] = ts
+                            self._flush(manifest, buckets)
+                            buffered = 0
+
+                yield {"file": path, "lines": added}
+
+            self._flush(manifest, buckets)
+            merged = self._compact(manifest)
+            if merged:
+                yield {"compacted": merged}
+
+    def compact(self) -> Dict[str, int]:
+        """Fonde i segmenti piccoli dello stesso bucket temporale."""
+        with self._lock:
+            manifest = self._load_manifest()
+            self._collect_garbage(manifest)
+            return self._compact(manifest)
+
+    def _read_new_lines(
+        self,
+        source: Dict[str, Any],
+        fh: Any,
+    ) -> Iterator[Tuple[float, int, int, List[str]]]:
+        """(ts, offset della riga, offset della riga successiva, termini)."""
+        last_ts = source["last_ts"]
+        fh.seek(source["offset"])
+        offset = source["offset"]
+        pending = b""
+        while True:
+            block = fh.read(READ_BLOCK)
+            if not block:
+                break
+            lines = (pending + block).split(b"\n")
+            pending = lines.pop()
+            for line in lines:
+                ts = parse_timestamp(line)
+                if ts is None:
+                    # righe di continuazione (stack trace) ereditano il ts
+                    ts = last_ts
+                last_ts = ts
+                terms = tokenize(line)
+                end = offset + len(line) + 1
+                if terms:
+                    yield ts, offset, end, terms
+                offset = end
+        # una riga senza newline finale verrà indicizzata al prossimo giro
+        source["offset"] = offset
+        source["last_ts"] = last_ts
+
+    def _flush(
+        self,
+        manifest: Dict[str, Any],
+        buckets: Dict[int, List[Tuple[float, int, int, List[str]]]],
+    ) -> None:
+        for bucket in sorted(buckets):
+            docs = buckets[bucket]
+            if docs:
+                manifest["segments"].append(self._write_segment(manifest, docs))
+        buckets.clear()
+        self._save_manifest(manifest)
+
+    def _write_segment(
+        self,
+        manifest: Dict[str, Any],
+        docs: List[Tuple[float, int, int, List[str]]],
+    ) -> Dict[str, Any]:
+        seg_id = manifest.get("next_id")
+        if seg_id is None:
+            seg_id = max((s["id"] for s in manifest["segments"]), default=-1) + 1
+        manifest["next_id"] = seg_id + 1
+        docs.sort(key=lambda d: (d[0], d[1], d[2]))
+
+        ts = array("d")
+        source = array("I")
+        offset = array("Q")
+        postings: Dict[str, List[int]] = {}
+        for doc_id, (t, sid, off, terms) in enumerate(docs):
+            ts.append(t)
+            source.append(sid)
+            offset.append(off)
+            for term in set(terms):
+                postings.setdefault(term, []).append(doc_id)
+
+        terms_sorted = sorted(postings)
+        starts = array("I")
+        counts = array("I")
+        deltas = array("I")
+        for term in terms_sorted:
+            ids = postings[term]
+            starts.append(len(deltas))
+            counts.append(len(ids))
+            prev = 0
+            for doc_id in ids:
+                deltas.append(doc_id - prev)
+                prev = doc_id
+
+        base = self.directory / f"seg-{seg_id}"
+        with open(f"{base}.docs", "wb") as fh:
+            ts.tofile(fh)
+            source.tofile(fh)
+            offset.tofile(fh)
+        Path(f"{base}.terms").write_bytes("\n".join(terms_sorted).encode("utf-8"))
+        with open(f"{base}.tidx", "wb") as fh:
+            starts.tofile(fh)
+            counts.tofile(fh)
+        with open(f"{base}.post", "wb") as fh:
+            deltas.tofile(fh)
+
+        return {
+            "id": seg_id,
+            "docs": len(docs),
+            "terms": len(terms_sorted),
+            "t_min": ts[0],
+            "t_max": ts[-1],
+        }
+
+    # ------------------------------------------------------------------
+    # compaction
+    # ------------------------------------------------------------------
+
+    def _compact(self, manifest: Dict[str, Any]) -> Dict[str, int]:
+        """
+        Per ogni bucket con almeno COMPACT_MIN_SEGMENTS segmenti piccoli li
+        fonde (fino a segment_max_docs righe per segmento). I file dei
+        segmenti fusi restano su disco fino alla build successiva: le
+        ricerche in corso con il manifest precedente possono ancora
+        leggerli.
+        """
+        by_bucket: Dict[int, List[Dict[str, Any]]] = {}
+        for meta in manifest["segments"]:
+            if meta["docs"] < self.segment_max_docs:
+                by_bucket.setdefault(int(meta["t_min"] // self.bucket_seconds), []).append(meta)
+
+        merged_segments = 0
+        created = 0
+        for bucket in sorted(by_bucket):
+            metas = sorted(by_bucket[bucket], key=lambda m: m["docs"])
+            if len(metas) < COMPACT_MIN_SEGMENTS:
+                continue
+            group: List[Dict[str, Any]] = []
+            total = 0
+            groups = []
+            for meta in metas:
+                if group and total + meta["docs"] > self.segment_max_docs:
+                    groups.append(group)
+                    group, total = [], 0
+                group.append(meta)
+                total += meta["docs"]
+            groups.append(group)
+
+            for group in groups:
+                if len(group) < 2:
+                    continue
+                docs: List[Tuple[float, int, int, List[str]]] = []
+                for meta in group:
+                    docs.extend(self._segment_docs(meta))
+                merged_ids = {m["id"] for m in group}
+                manifest["segments"] = [s for s in manifest["segments"] if s["id"] not in merged_ids]
+                manifest["segments"].append(self._write_segment(manifest, docs))
+                manifest.setdefault("garbage", []).extend(sorted(merged_ids))
+                merged_segments += len(group)
+                created += 1
+
+        if created:
+            self._save_manifest(manifest)
+            logger.debug(
+                "Log index compacted",
+                extra={"merged": merged_segments, "created": created, "index": str(self.directory)},
+            )
+        return {"merged": merged_segments, "created": created} if created else {}
+
+    def _segment_docs(self, meta: Dict[str, Any]) -> List[Tuple[float, int, int, List[str]]]:
+        """Righe di un segmento con i loro termini (postings invertite)."""
+        seg = _Segment(self.directory, meta)
+        terms_by_doc: List[List[str]] = [[] for _ in range(meta["docs"])]
+        for term in seg.terms:
+            for doc_id in seg.postings(term) or ():
+                terms_by_doc[doc_id].append(term)
+        return [
+            (seg.ts[i], seg.source[i], seg.offset[i], terms_by_doc[i])
+            for i in range(meta["docs"])
+        ]
+
+    def _collect_garbage(self, manifest: Dict[str, Any]) -> None:
+        garbage = manifest.pop("garbage", None)
+        if not garbage:
+            return
+        with self._cache_lock:
+            for seg_id in garbage:
+                self._cache.pop(seg_id, None)
+        for seg_id in garbage:
+            for ext in ("docs", "terms", "tidx", "post"):
+                try:
+                    (self.directory / f"seg-{seg_id}.{ext}").unlink()
+                except FileNotFoundError:
+                    pass
+        self._save_manifest(manifest)
+
+    # ------------------------------------------------------------------
+    # search
+    # ------------------------------------------------------------------
+
+    def _segment(self, meta: Dict[str, Any]) -> _Segment:
+        with self._cache_lock:
+            seg = self._cache.get(meta["id"])
+            if seg is not None:
+                self._cache.move_to_end(meta["id"])
+                return seg
+
+        seg = _Segment(self.directory, meta)
+        with self._cache_lock:
+            self._cache[meta["id"]] = seg
+            if len(self._cache) > SEGMENT_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return seg
+
+    def _segment_hits(
+        self,
+        meta: Dict[str, Any],
+        terms: List[str],
+        since: Optional[float],
+        until: Optional[float],
+        retired: frozenset,
+    ) -> Iterator[Tuple[float, int, int]]:
+        seg = self._segment(meta)
+        lists = []
+        for term in terms:
+            ids = seg.postings(term)
+            if ids is None:
+                return
+            lists.append(ids)
+
+        # dal più recente al più vecchio (doc id in ordine di ts)
+        for doc_id in reversed(_intersect(lists)):
+            t = seg.ts[doc_id]
+            if until is not None and t > until:
+                continue
+            if since is not None and t < since:
+                break
+            if seg.source[doc_id] in retired:
+                continue
+            yield t, seg.source[doc_id], seg.offset[doc_id]
+
+    def search(
+        self,
+        query: str,
+        *,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: int = 100,
+    ) -> List[Dict[str, Any]]:
+        """
+        Ricerca AND sui termini della query, risultati dal più recente.
+        """
+        terms = tokenize(query.encode("utf-8"))
+        if not terms:
+            return []
+
+        manifest = self._load_manifest()
+        segments = [
+            s for s in manifest["segments"]
+            if (since is None or s["t_max"] >= since)
+            and (until is None or s["t_min"] <= until)
+        ]
+        segments.sort(key=lambda s: s["t_max"], reverse=True)
+        retired = frozenset(
+            i for i, s in enumerate(manifest["sources"]) if s.get("retired")
+        )
+
+        heap: List[Tuple[float, int, int, int, Iterator]] = []
+        hits: List[Tuple[float, int, int]] = []
+        next_seg = 0
+
+        def activate(meta: Dict[str, Any]) -> None:
+            it = self._segment_hits(meta, terms, since, until, retired)
+            first = next(it, None)
+            if first is not None:
+                t, sid, off = first
+                heapq.heappush(heap, (-t, -off, sid, meta["id"], it))
+
+        while len(hits) < limit:
+            # apre solo i segmenti che possono contenere hit più recenti
+            while next_seg < len(segments) and (
+                not heap or segments[next_seg]["t_max"] >= -heap[0][0]
+            ):
+                activate(segments[next_seg])
+                next_seg += 1
+            if not heap:
+                break
+
+            neg_t, neg_off, sid, seg_id, it = heapq.heappop(heap)
+            hits.append((-neg_t, sid, -neg_off))
+            following = next(it, None)
+            if following is not None:
+                t, s, o = following
+                heapq.heappush(heap, (-t, -o, s, seg_id, it))
+
+        sources = manifest["sources"]
+        return [
+            {
+                "file": sources[sid]["path"],
+                "offset": off,
+                "timestamp": t,
+                "line": _read_line(sources[sid]["path"], off),
+            }
+            for t, sid, off in hits
+        ]
+
+
+_INDEXES: Dict[str, LogIndex] = {}
+_INDEXES_GUARD = threading.Lock()
+
+
+def get_index(name: str = "default", *, directory: Optional[Path] = None) -> LogIndex:
+    """
+    LogIndex condiviso per directory: la cache dei segmenti sopravvive
+    tra una richiesta e l'altra.
+    """
+    target = Path(directory) if directory is not None else default_index_dir(name)
+    key = str(target.resolve())
+    with _INDEXES_GUARD:
+        index = _INDEXES.get(key)
+        if index is None:
+            index = _INDEXES[key] = LogIndex(target)
+        return index
+
+
+def _read_line(path: str, offset: int) -> Optional[str]:
+    try:
+        with open(path, "rb") as fh:
+            fh.seek(offset)
+            return fh.readline().rstrip(b"\r\n").decode("utf-8", errors="replace")
+    except OSError:
+        return None
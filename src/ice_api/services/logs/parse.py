@@ -0,0 +1,550 @@
+from __future__ import annotations
+
+import calendar
+import json
+import logging
+import os
+import re
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Pattern, Tuple
+
+logger = logging.getLogger("ice.api.services.logs.parse")
+
+# ============================================================================
+# TUNING
+# ============================================================================
+
+CHUNK_SIZE = 1024 * 1024         # lettura a blocchi: memoria limitata per file
+MAX_LINE_BYTES = 1024 * 1024     # righe più lunghe vengono spezzate
+DETECT_SAMPLE_LINES = 50         # righe campione per il riconoscimento formato
+DETECT_MIN_RATIO = 0.5           # quota minima di righe che devono combaciare
+FORMAT_CACHE_SIZE = 4096         # sorgenti con formato memorizzato
+COLUMN_BATCH_LINES = 65_536      # righe per batch colonnare
+
+
+# ============================================================================
+# STAGE 1-2: READ -> SPLIT
+# ============================================================================
+
+def read_chunks(path: str, *, chunk_size: int = CHUNK_SIZE, start: int = 0) -> Iterator[bytes]:
+    with open(path, "rb") as fh:
+        fh.seek(start)
+        while True:
+            chunk = fh.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def split_lines(
+    chunks: Iterable[bytes],
+    *,
+    start: int = 0,
+    max_line: int = MAX_LINE_BYTES,
+) -> Iterator[Tuple[int, bytes]]:
+    """
+    (offset, riga senza newline) da uno stream di chunk.
+
+    Solo la riga a cavallo tra due chunk resta in memoria.
+    """
+    offset = start
+    pending = b""
+    for chunk in chunks:
+        data = pending + chunk if pending else chunk
+        pos = 0
+        while True:
+            nl = data.find(b"\n", pos)
+            if nl < 0:
+                break
+            yield offset, data[pos:nl].rstrip(b"\r")
+            offset += nl - pos + 1
+            pos = nl + 1
+        pending = data[pos:]
+        if len(pending) > max_line:
+            yield offset, pending
+            offset += len(pending)
+            pending = b""
+    if pending:
+        yield offset, pending.rstrip(b"\r")
+
+
+# ============================================================================
+# NORMALIZATION
+# ============================================================================
+
+LEVELS: Tuple[str, ...] = ("", "TRACE", "DEBUG", "INFO", "WARN", "ERROR", "FATAL")
+LEVEL_CODES: Dict[str, int] = {name: i for i, name in enumerate(LEVELS)}
+
+_LEVEL_ALIASES: Dict[str, str] = {
+    "trace": "TRACE",
+    "debug": "DEBUG",
+    "dbg": "DEBUG",
+    "info": "INFO",
+    "information": "INFO",
+    "notice": "INFO",
+    "warn": "WARN",
+    "warning": "WARN",
+    "err": "ERROR",
+    "error": "ERROR",
+    "crit": "FATAL",
+    "critical": "FATAL",
+    "fatal": "FATAL",
+    "alert": "FATAL",
+    "emerg": "FATAL",
+    "panic": "FATAL",
+}
+
+_LEVEL_WORDS = rb"(?i:trace|debug|info|notice|warn(?:ing)?|err(?:or)?|crit(?:ical)?|fatal)"
+# nel testo libero solo parole maiuscole, per non confondere "error" nel messaggio
+_PLAIN_LEVEL_RE = re.compile(
+    rb"\b(TRACE|DEBUG|INFO|NOTICE|WARN(?:ING)?|ERR(?:OR)?|CRIT(?:ICAL)?|FATAL)\b"
+)
+
+_MONTHS = {
+    m: i for i, m in enumerate(
+        ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"],
+        start=1,
+    )
+}
+
+
+def normalize_level(value: Any) -> str:
+    if not value:
+        return ""
+    if isinstance(value, bytes):
+        value = value.decode("ascii", errors="ignore")
+    return _LEVEL_ALIASES.get(str(value).strip().lower(), "")
+
+
+def _tz_offset(tz: bytes) -> int:
+    if not tz or tz in (b"Z", b"z"):
+        return 0
+    sign = -1 if tz[:1] == b"-" else 1
+    digits = tz[1:].replace(b":", b"")
+    return sign * (int(digits[:2]) * 3600 + int(digits[2:4]) * 60)
+
+
+_ISO_PARTS = re.compile(
+    rb"(\d{4})-(\d{2})-(\d{2})[T ](\d{2}):(\d{2}):(\d{2})(?:[.,](\d+))?\s*(Z|[+-]\d{2}:?\d{2})?"
+)
+
+
+def iso_to_epoch(raw: bytes) -> Optional[float]:
+    """ISO-8601 -> epoch UTC senza passare da datetime.strptime."""
+    m = _ISO_PARTS.match(raw)
+    if not m:
+        return None
+    y, mo, d, h, mi, s, frac, tz = m.groups()
+    try:
+        epoch = calendar.timegm((int(y), int(mo), int(d), int(h), int(mi), int(s), 0, 0, 0))
+    except ValueError:
+        return None
+    if frac:
+        epoch += int(frac) / (10 ** len(frac))
+    return float(epoch - _tz_offset(tz or b""))
+
+
+def syslog_to_epoch(raw: bytes, *, year: Optional[int] = None) -> Optional[float]:
+    # "Jan  2 03:04:05" (syslog BSD non ha l'anno)
+    month = _MONTHS.get(raw[:3].decode("ascii", errors="ignore"))
+    if month is None:
+        return None
+    try:
+        day = int(raw[4:6])
+        h, mi, s = (int(x) for x in raw[7:15].split(b":"))
+    except ValueError:
+        return None
+    return float(calendar.timegm((year or time.gmtime().tm_year, month, day, h, mi, s, 0, 0, 0)))
+
+
+def clf_to_epoch(raw: bytes) -> Optional[float]:
+    # "10/Oct/2000:13:55:36 -0700"
+    try:
+        day = int(raw[0:2])
+        month = _MONTHS[raw[3:6].decode("ascii")]
+        year = int(raw[7:11])
+        h, mi, s = int(raw[12:14]), int(raw[15:17]), int(raw[18:20])
+    except (ValueError, KeyError):
+        return None
+    epoch = calendar.timegm((year, month, day, h, mi, s, 0, 0, 0))
+    return float(epoch - _tz_offset(raw[21:].strip()))
+
+
+# ============================================================================
+# FORMATS
+# ============================================================================
+
+@dataclass
+class LogFormat:
+    """
+    Formato di log riconoscibile: regex compilata una sola volta,
+    gruppi nominati ts / level / msg, parser del timestamp.
+    """
+
+    name: str
+    regex: Optional[Pattern[bytes]]
+    parse_ts: Callable[[bytes], Optional[float]] = iso_to_epoch
+    level_of: Optional[Callable[[Dict[str, bytes]], str]] = None
+
+    def match(self, line: bytes) -> bool:
+        if self.regex is None:
+            return True
+        return self.regex.match(line) is not None
+
+
+def _clf_level(groups: Dict[str, bytes]) -> str:
+    status = groups.get("status") or b""
+    if status[:1] == b"5":
+        return "ERROR"
+    if status[:1] == b"4":
+        return "WARN"
+    return "INFO"
+
+
+FORMATS: List[LogFormat] = [
+    LogFormat(
+        "python",
+        re.compile(
+            rb"^(?P<ts>\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}(?:,\d+)?) - (?P<logger>\S+) - "
+            rb"(?P<level>[A-Z]+) - (?P<msg>.*)$"
+        ),
+    ),
+    LogFormat(
+        "iso",
+        re.compile(
+            rb"^\[?(?P<ts>\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?"
+            rb"(?:Z|[+-]\d{2}:?\d{2})?)\]?\s+(?:\[?(?P<level>" + _LEVEL_WORDS + rb")\]?:?\s+)?(?P<msg>.*)$"
+        ),
+    ),
+    LogFormat(
+        "syslog",
+        re.compile(
+            rb"^(?P<ts>[A-Z][a-z]{2} [ \d]\d \d{2}:\d{2}:\d{2}) (?P<host>\S+) "
+            rb"(?P<proc>[^:\[\s]+)(?:\[(?P<pid>\d+)\])?: (?P<msg>.*)$"
+        ),
+        parse_ts=syslog_to_epoch,
+    ),
+    LogFormat(
+        "clf",
+        re.compile(
+            rb'^(?P<host>\S+) \S+ \S+ \[(?P<ts>[^\]]+)\] "(?P<msg>[^"]*)" '
+            rb"(?P<status>\d{3}) (?P<size>\S+)"
+        ),
+        parse_ts=clf_to_epoch,
+        level_of=_clf_level,
+    ),
+    LogFormat("json", None),
+    LogFormat("plain", None, parse_ts=lambda _raw: None),
+]
+
+FORMATS_BY_NAME: Dict[str, LogFormat] = {f.name: f for f in FORMATS}
+
+_JSON_TS_KEYS = ("timestamp", "@timestamp", "time", "ts")
+_JSON_LEVEL_KEYS = ("level", "severity", "lvl", "levelname")
+_JSON_MSG_KEYS = ("message", "msg")
+
+
+def _is_json_line(line: bytes) -> bool:
+    if not line.startswith(b"{"):
+        return False
+    try:
+        return isinstance(json.loads(line), dict)
+    except ValueError:
+        return False
+
+
+def detect_format(lines: List[bytes]) -> LogFormat:
+    """Formato con più righe combacianti nel campione (altrimenti plain)."""
+    sample = [line for line in lines if line.strip()][:DETECT_SAMPLE_LINES]
+    if not sample:
+        return FORMATS_BY_NAME["plain"]
+
+    best, best_hits = FORMATS_BY_NAME["plain"], 0
+    for fmt in FORMATS:
+        if fmt.name == "plain":
+            continue
+        if fmt.name == "json":
+            hits = sum(1 for line in sample if _is_json_line(line))
+        else:
+            hits = sum(1 for line in sample if fmt.regex.match(line))
+        if hits > best_hits:
+            best, best_hits = fmt, hits
+
+    if best_hits < len(sample) * DETECT_MIN_RATIO:
+        return FORMATS_BY_NAME["plain"]
+    return best
+
+
+class _FormatCache:
+    """Formato riconosciuto per (path, inode): il riconoscimento avviene una volta."""
+
+    def __init__(self, size: int = FORMAT_CACHE_SIZE) -> None:
+        self._size = size
+        self._entries: "OrderedDict[Tuple[str, int], str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[str, int]) -> Optional[LogFormat]:
+        with self._lock:
+            name = self._entries.get(key)
+            if name is None:
+                return None
+            self._entries.move_to_end(key)
+        return FORMATS_BY_NAME[name]
+
+    def put(self, key: Tuple[str, int], fmt: LogFormat) -> None:
+        with self._lock:
+            self._entries[key] = fmt.name
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._size:
+                self._entries.popitem(last=False)
+
+
+FORMAT_CACHE = _FormatCache()
+
+
+def format_for(path: str, *, forced: Optional[str] = None) -> LogFormat:
+    if forced and forced != "auto":
+        try:
+            return FORMATS_BY_NAME[forced]
+        except KeyError:
+            raise ValueError(f"Unknown log format: {forced}") from None
+
+    key = (os.path.abspath(path), os.stat(path).st_ino)
+    fmt = FORMAT_CACHE.get(key)
+    if fmt is None:
+        sample: List[bytes] = []
+        for _offset, line in split_lines(read_chunks(path, chunk_size=64 * 1024)):
+            sample.append(line)
+            if len(sample) >= DETECT_SAMPLE_LINES:
+                break
+        fmt = detect_format(sample)
+        FORMAT_CACHE.put(key, fmt)
+    return fmt
+
+
+# ============================================================================
+# STAGE 3-5: PARSE -> NORMALIZE
+# ============================================================================
+
+_Parsed = Tuple[Optional[float], str, int, int, Dict[str, Any]]
+
+
+def _parse_line(fmt: LogFormat, line: bytes) -> Optional[_Parsed]:
+    """
+    (ts, level, inizio e fine del messaggio nella riga, gruppi) oppure
+    None se la riga non appartiene al formato (continuazione).
+    """
+    if fmt.name == "json":
+        return None if not line.startswith(b"{") else _parse_json(line)
+
+    if fmt.regex is None:
+        m = _PLAIN_LEVEL_RE.search(line)
+        return None, normalize_level(m.group(1)) if m else "", 0, len(line), {}
+
+    m = fmt.regex.match(line)
+    if m is None:
+        return None
+
+    groups = m.groupdict()
+    ts = fmt.parse_ts(groups["ts"]) if groups.get("ts") else None
+    if fmt.level_of is not None:
+        level = fmt.level_of(groups)
+    else:
+        level = normalize_level(groups.get("level"))
+    msg_start, msg_end = m.span("msg")
+    return ts, level, msg_start, msg_end, groups
+
+
+def _parse_json(line: bytes) -> Optional[_Parsed]:
+    try:
+        obj = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(obj, dict):
+        return None
+
+    ts = None
+    for key in _JSON_TS_KEYS:
+        value = obj.get(key)
+        if isinstance(value, (int, float)):
+            ts = float(value)
+            break
+        if isinstance(value, str):
+            ts = iso_to_epoch(value.encode("ascii", errors="ignore"))
+            break
+    level = next((normalize_level(obj[k]) for k in _JSON_LEVEL_KEYS if k in obj), "")
+    return ts, level, 0, len(line), {"json": obj}
+
+
+@dataclass
+class LogRecord:
+    source: str
+    offset: int
+    ts: Optional[float]
+    level: str
+    message: str
+    format: str
+    continuation: bool = False
+    fields: Dict[str, Any] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "source": self.source,
+            "offset": self.offset,
+            "ts": self.ts,
+            "level": self.level,
+            "message": self.message,
+            "format": self.format,
+            "continuation": self.continuation,
+            "fields": self.fields,
+        }
+
+
+def parse_records(
+    path: str,
+    *,
+    log_format: Optional[str] = None,
+    start: int = 0,
+    encoding: str = "utf-8",
+) -> Iterator[LogRecord]:
+    """
+    Pipeline a generatori: read -> split -> detect -> parse -> normalize.
+
+    Le righe che non combaciano col formato (stack trace, continuazioni)
+    ereditano timestamp e livello della riga precedente.
+    """
+    fmt = format_for(path, forced=log_format)
+    last_ts: Optional[float] = None
+    last_level = ""
+
+    for offset, line in split_lines(read_chunks(path, start=start), start=start):
+        if not line:
+            continue
+        parsed = _parse_line(fmt, line)
+        if parsed is None:
+            yield LogRecord(
+                source=path,
+                offset=offset,
+                ts=last_ts,
+                level=last_level,
+                message=line.decode(encoding, errors="replace"),
+                format=fmt.name,
+                continuation=True,
+            )
+            continue
+
+        ts, level, msg_start, msg_end, groups = parsed
+        if ts is None:
+            ts = last_ts
+        last_ts, last_level = ts, level
+
+        if fmt.name == "json":
+            obj = groups["json"]
+            message = next((str(obj[k]) for k in _JSON_MSG_KEYS if k in obj), "")
+            fields = obj
+        else:
+            message = line[msg_start:msg_end].decode(encoding, errors="replace")
+            fields = {
+                k: v.decode(encoding, errors="replace")
+                for k, v in groups.items()
+                if v is not None and k not in ("ts", "level", "msg")
+            }
+
+        yield LogRecord(
+            source=path,
+            offset=offset,
+            ts=ts,
+            level=level,
+            message=message,
+            format=fmt.name,
+            fields=fields,
+        )
+
+
+# ============================================================================
+# BATCH (COLUMNAR) MODE
+# ============================================================================
+
+@dataclass
+class ColumnBatch:
+    """
+    Batch colonnare: array paralleli invece di un dict per riga.
+
+    - ts:          array d  (NaN se assente)
+    - level:       array B  (indice in LEVELS)
+    - offset:      array Q  (inizio riga nel file)
+    - msg_offset:  array Q  (inizio messaggio nel file)
+    - msg_length:  array I  (byte del messaggio)
+
+    Il testo resta sul disco: si recupera con (msg_offset, msg_length).
+    """
+
+    source: str
+    format: str
+    ts: array = field(default_factory=lambda: array("d"))
+    level: array = field(default_factory=lambda: array("B"))
+    offset: array = field(default_factory=lambda: array("Q"))
+    msg_offset: array = field(default_factory=lambda: array("Q"))
+    msg_length: array = field(default_factory=lambda: array("I"))
+
+    def __len__(self) -> int:
+        return len(self.offset)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "source": self.source,
+            "format": self.format,
+            "levels": list(LEVELS),
+            "ts": [None if t != t else t for t in self.ts],
+            "level": self.level.tolist(),
+            "offset": self.offset.tolist(),
+            "msg_offset": self.msg_offset.tolist(),
+            "msg_length": self.msg_length.tolist(),
+        }
+
+
+def parse_columns(
+    path: str,
+    *,
+    log_format: Optional[str] = None,
+    start: int = 0,
+    batch_lines: int = COLUMN_BATCH_LINES,
+) -> Iterator[ColumnBatch]:
+    """
+    Variante batch della pipeline: nessun oggetto per riga,
+    memoria proporzionale a batch_lines.
+    """
+    fmt = format_for(path, forced=log_format)
+    nan = float("nan")
+    last_ts = nan
+    last_level = 0
+    batch = ColumnBatch(source=path, format=fmt.name)
+
+    for offset, line in split_lines(read_chunks(path, start=start), start=start):
+        if not line:
+            continue
+        parsed = _parse_line(fmt, line)
+        if parsed is None:
+            ts, level, msg_start, msg_end = last_ts, last_level, 0, len(line)
+        else:
+            raw_ts, raw_level, msg_start, msg_end, _groups = parsed
+            ts = last_ts if raw_ts is None else raw_ts
+            level = LEVEL_CODES.get(raw_level, 0)
+            last_ts, last_level = ts, level
+
+        batch.ts.append(ts)
+        batch.level.append(level)
+        batch.offset.append(offset)
+        batch.msg_offset.append(offset + msg_start)
+        batch.msg_length.append(msg_end - msg_start)
+
+        if len(batch) >= batch_lines:
+            yield batch
+            batch = ColumnBatch(source=path, format=fmt.name)
+
+    if len(batch):
+        yield batch
@@ -0,0 +1,367 @@
+from __future__ import annotations
+
+import asyncio
+import fnmatch
+import hashlib
+import logging
+import os
+import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+logger = logging.getLogger("ice.api.services.logs.scan")
+
+# ============================================================================
+# TUNING
+# ============================================================================
+
+SCAN_WORKERS = min(32, (os.cpu_count() or 1) * 4)   # I/O bound: più thread dei core
+SCAN_BATCH_SIZE = 500                               # sorgenti per chunk in streaming
+
+SNAPSHOT_VERSION = "2"
+
+
+def default_state_dir() -> Path:
+    """
+    Directory in cui persistere gli snapshot di scansione.
+
+    Override con ICE_API_STATE_DIR; default ~/.cache/ice-api.
+    """
+    root = os.environ.get("ICE_API_STATE_DIR")
+    if root:
+        return Path(root)
+    return Path.home() / ".cache" / "ice-api"
+
+
+# ============================================================================
+# LOG SOURCE
+# ============================================================================
+
+class LogSource(NamedTuple):
+    """
+    Sorgente di log individuata dalla scansione.
+
+    NamedTuple e non dataclass: uno snapshot può contenere milioni di voci.
+    """
+
+    path: str
+    mtime_ns: int
+    size: int
+    inode: int
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "mtime_ns": self.mtime_ns,
+            "size": self.size,
+            "inode": self.inode,
+        }
+
+
+# ============================================================================
+# PATTERN PUSHDOWN
+# ============================================================================
+
+Matcher = Callable[[str, str], bool]
+
+
+def compile_pattern(pattern: Optional[str]) -> Optional[Matcher]:
+    """
+    Compila un glob (o più glob separati da ',') in un matcher (name, relpath).
+
+    I pattern senza '/' sono confrontati con il solo nome del file,
+    così il filtro avviene dentro scandir senza stat dei file scartati.
+    """
+    if not pattern:
+        return None
+
+    name_globs: List[str] = []
+    path_globs: List[str] = []
+    for part in (p.strip() for p in pattern.split(",")):
+        if not part:
+            continue
+        (path_globs if "/" in part else name_globs).append(fnmatch.translate(part))
+
+    name_re = re.compile("|".join(name_globs)).match if name_globs else None
+    path_re = re.compile("|".join(path_globs)).match if path_globs else None
+
+    def match(name: str, relpath: str) -> bool:
+        if name_re is not None and name_re(name):
+            return True
+        return path_re is not None and path_re(relpath) is not None
+
+    return match
+
+
+# ============================================================================
+# DIRECTORY WALK
+# ============================================================================
+
+def _scan_dir(
+    directory: str,
+    root: str,
+    matcher: Optional[Matcher],
+    recursive: bool,
+) -> Tuple[List[LogSource], List[str]]:
+    """
+    Scansiona UNA directory (eseguita nel thread pool).
+
+    Restituisce (sorgenti trovate, sottodirectory da visitare).
+    """
+    sources: List[LogSource] = []
+    subdirs: List[str] = []
+
+    try:
+        it = os.scandir(directory)
+    except OSError:
+        return sources, subdirs
+
+    with it:
+        for entry in it:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if recursive:
+                        subdirs.append(entry.path)
+                    continue
+                if not entry.is_file():
+                    continue
+                if matcher is not None:
+                    relpath = os.path.relpath(entry.path, root).replace(os.sep, "/")
+                    if not matcher(entry.name, relpath):
+                        continue
+                st = entry.stat()
+            except OSError:
+                # file sparito durante la scansione (rotazione)
+                continue
+            sources.append(LogSource(entry.path, st.st_mtime_ns, st.st_size, st.st_ino))
+
+    return sources, subdirs
+
+
+async def walk_sources(
+    root: str,
+    *,
+    recursive: bool = True,
+    pattern: Optional[str] = None,
+    workers: int = SCAN_WORKERS,
+    batch_size: int = SCAN_BATCH_SIZE,
+) -> AsyncIterator[List[LogSource]]:
+    """
+    Visita parallela: ogni directory è un task del thread pool,
+    le sottodirectory vengono sottomesse appena scoperte.
+
+    Produce batch di LogSource man mano che vengono trovati.
+    """
+    loop = asyncio.get_running_loop()
+    matcher = compile_pattern(pattern)
+    root = os.path.abspath(root)
+
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ice-logs-scan")
+    pending = {loop.run_in_executor(executor, _scan_dir, root, root, matcher, recursive)}
+    batch: List[LogSource] = []
+
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for fut in done:
+                sources, subdirs = fut.result()
+                for sub in subdirs:
+                    pending.add(
+                        loop.run_in_executor(executor, _scan_dir, sub, root, matcher, recursive)
+                    )
+                batch.extend(sources)
+
+            while len(batch) >= batch_size:
+                yield batch[:batch_size]
+                batch = batch[batch_size:]
+
+        if batch:
+            yield batch
+    finally:
+        for fut in pending:
+            fut.cancel()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+# ============================================================================
+# PERSISTED SNAPSHOT
+# ============================================================================
+
+class ScanSnapshot:
+    """
+    Snapshot (path -> mtime, size, inode) dell'ultima scansione.
+
+    Formato su disco: testo, una riga per sorgente
+        mtime_ns \\t size \\t inode \\t path
+    con \\, tab, newline e CR nel path scritti come \\\\, \\t, \\n, \\r.
+    Scritto in modo atomico (tmp univoco + os.replace); uno snapshot
+    illeggibile vale come vuoto (la scansione lo riscrive).
+    """
+
+    def __init__(self, file: Path) -> None:
+        self.file = file
+        self.entries: Dict[str, Tuple[int, int, int]] = {}
+
+    @classmethod
+    def for_scan(
+        cls,
+        root: str,
+        *,
+        recursive: bool,
+        pattern: Optional[str],
+        state_dir: Optional[Path] = None,
+    ) -> "ScanSnapshot":
+        key = "\0".join([os.path.abspath(root), str(recursive), pattern or ""])
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        base = state_dir or default_state_dir()
+        return cls(base / "logs-scan" / f"{digest}.snap")
+
+    def load(self) -> "ScanSnapshot":
+        self.entries = {}
+        try:
+            fh = open(self.file, "r", encoding="utf-8", errors="surrogateescape")
+        except FileNotFoundError:
+            return self
+
+        entries: Dict[str, Tuple[int, int, int]] = {}
+        try:
+            with fh:
+                if fh.readline().rstrip("\n") != SNAPSHOT_VERSION:
+                    return self
+                for line in fh:
+                    mtime, size, inode, path = line.rstrip("\n").split("\t", 3)
+                    entries[_unescape(path)] = (int(mtime), int(size), int(inode))
+        except (OSError, ValueError):
+            logger.warning("Corrupt scan snapshot ignored", exc_info=True, extra={"file": str(self.file)})
+            return self
+        self.entries = entries
+        return self
+
+    def save(self, sources: Dict[str, Tuple[int, int, int]]) -> None:
+        self.file.parent.mkdir(parents=True, exist_ok=True)
+        # tmp univoco: due scansioni della stessa root non si pestano
+        fd, tmp = tempfile.mkstemp(dir=self.file.parent, prefix=self.file.stem, suffix=".tmp")
+        try:
+            with open(fd, "w", encoding="utf-8", errors="surrogateescape") as fh:
+                fh.write(SNAPSHOT_VERSION + "\n")
+                for path, (mtime, size, inode) in sources.items():
+                    fh.write(f"{mtime}\t{size}\t{inode}\t{_escape(path)}\n")
+            os.replace(tmp, self.file)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+        self.entries = sources
+
+
+_ESCAPES = {"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"}
+_UNESCAPES = {"\\": "\\", "t": "\t", "n": "\n", "r": "\r"}
+_ESCAPE_RE = re.compile(r"[\\\t\n\r]")
+_UNESCAPE_RE = re.compile(r"\\(.)")
+
+
+def _escape(path: str) -> str:
+    return _ESCAPE_RE.sub(lambda m: _ESCAPES[m.group()], path)
+
+
+def _unescape(value: str) -> str:
+    if "\\" not in value:
+        return value
+    return _UNESCAPE_RE.sub(lambda m: _UNESCAPES.get(m.group(1), m.group(1)), value)
+
+
+# ============================================================================
+# SCAN (FULL / INCREMENTAL)
+# ============================================================================
+
+async def scan_logs(
+    path: str,
+    *,
+    recursive: bool = True,
+    pattern: Optional[str] = None,
+    incremental: bool = False,
+    state_dir: Optional[Path] = None,
+    workers: int = SCAN_WORKERS,
+    batch_size: int = SCAN_BATCH_SIZE,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Async generator per `logs.scan`.
+
+    - full:        chunk {"sources": [...]}
+    - incremental: chunk {"added": [...], "changed": [...]} durante la visita,
+                   poi {"removed": [...]} in coda, confrontando con lo
+                   snapshot precedente (che viene poi aggiornato)
+
+    L'ultimo chunk è sempre {"summary": {...}}.
+    """
+    if not os.path.isdir(path):
+        raise NotADirectoryError(f"Not a directory: {path}")
+
+    snapshot = ScanSnapshot.for_scan(
+        path, recursive=recursive, pattern=pattern, state_dir=state_dir
+    )
+    if incremental:
+        await asyncio.to_thread(snapshot.load)
+
+    previous = snapshot.entries
+    current: Dict[str, Tuple[int, int, int]] = {}
+    counts = {"sources": 0, "added": 0, "changed": 0, "removed": 0}
+
+    async for batch in walk_sources(
+        path,
+        recursive=recursive,
+        pattern=pattern,
+        workers=workers,
+        batch_size=batch_size,
+    ):
+        added: List[Dict[str, Any]] = []
+        changed: List[Dict[str, Any]] = []
+
+        for src in batch:
+            state = (src.mtime_ns, src.size, src.inode)
+            current[src.path] = state
+            if not incremental:
+                continue
+            old = previous.get(src.path)
+            if old is None:
+                added.append(src.to_dict())
+            elif old != state:
+                changed.append(src.to_dict())
+
+        counts["sources"] += len(batch)
+        if not incremental:
+            yield {"sources": [src.to_dict() for src in batch]}
+        elif added or changed:
+            counts["added"] += len(added)
+            counts["changed"] += len(changed)
+            yield {"added": added, "changed": changed}
+
+    if incremental:
+        removed = [p for p in previous if p not in current]
+        counts["removed"] = len(removed)
+        for start in range(0, len(removed), batch_size):
+            yield {"removed": removed[start:start + batch_size]}
+
+    await asyncio.to_thread(snapshot.save, current)
+
+    yield {
+        "summary": {
+            "path": os.path.abspath(path),
+            "incremental": incremental,
+            "had_snapshot": incremental and bool(previous),
+            **counts,
+        }
+    }
@@ -0,0 +1,430 @@
+from __future__ import annotations
+
+import asyncio
+import ctypes
+import logging
+import os
+import weakref
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from ice_api.utils.inotify import (
+    DIR_MASK,
+    IN_CLOEXEC,
+    IN_NONBLOCK,
+    IN_Q_OVERFLOW,
+    iter_events,
+    load_libc,
+)
+
+logger = logging.getLogger("ice.api.services.logs.tail")
+
+# ============================================================================
+# TUNING
+# ============================================================================
+
+BLOCK_SIZE = 64 * 1024          # lettura a blocchi fissi (backward e forward)
+MAX_READ_BYTES = 4 * 1024 * 1024  # massimo letto per ciclo di follow
+BATCH_WINDOW = 0.05             # secondi per coalescere un burst di scritture
+MAX_BATCH_LINES = 1000          # righe massime per evento
+
+POLL_MIN_INTERVAL = 0.1         # stat poll: intervallo iniziale
+POLL_MAX_INTERVAL = 2.0         # stat poll: backoff massimo a file fermo
+
+
+# ============================================================================
+# BACKWARD TAIL
+# ============================================================================
+
+def _read_last_lines(
+    fh,
+    n: int,
+    end: int,
+    *,
+    block_size: int = BLOCK_SIZE,
+) -> Tuple[List[bytes], bytes]:
+    """
+    Legge le ultime n righe complete prima di `end` andando a ritroso
+    a blocchi fissi: il costo dipende da n, non dalla dimensione del file.
+
+    Restituisce (righe complete, eventuale riga finale senza newline).
+    """
+    pos = end
+    blocks: List[bytes] = []
+    newlines = 0
+    # n righe complete richiedono n+1 newline (o l'inizio del file)
+    while pos > 0 and newlines <= n:
+        step = min(block_size, pos)
+        pos -= step
+        fh.seek(pos)
+        block = fh.read(step)
+        newlines += block.count(b"\n")
+        blocks.append(block)
+
+    buf = b"".join(reversed(blocks))
+
+    parts = buf.split(b"\n")
+    partial = parts.pop()
+    if pos > 0:
+        # la prima parte è una riga troncata dal blocco
+        parts = parts[1:]
+    return parts[-n:] if n else [], partial
+
+
+def tail_lines(
+    path: str,
+    lines: int = 100,
+    *,
+    encoding: str = "utf-8",
+) -> List[str]:
+    """
+    Equivalente di `tail -n`: ultime N righe senza leggere l'intero file.
+    """
+    if lines <= 0:
+        return []
+    with open(path, "rb") as fh:
+        end = os.fstat(fh.fileno()).st_size
+        complete, partial = _read_last_lines(fh, lines, end)
+
+    if partial:
+        complete = (complete + [partial])[-lines:]
+    return [_decode(line, encoding) for line in complete]
+
+
+def _decode(line: bytes, encoding: str) -> str:
+    return line.rstrip(b"\r").decode(encoding, errors="replace")
+
+
+# ============================================================================
+# FOLLOWED FILE STATE
+# ============================================================================
+
+@dataclass
+class TailBatch:
+    lines: List[str] = field(default_factory=list)
+    rotated: bool = False
+    truncated: bool = False
+
+    def __bool__(self) -> bool:
+        return bool(self.lines) or self.rotated or self.truncated
+
+
+class _FollowedFile:
+    """
+    Stato di un file seguito: handle aperto, identità (dev, inode),
+    offset letto e riga parziale in attesa di newline.
+
+    Gestisce:
+    - rotazione (inode diverso o file ricreato): svuota il vecchio
+      handle fino a EOF (MAX_READ_BYTES per giro), poi riparte dal
+      nuovo file dall'inizio
+    - truncation (size < offset): riparte dall'inizio
+    """
+
+    def __init__(self, path: str, *, encoding: str = "utf-8") -> None:
+        self.path = path
+        self.encoding = encoding
+        self._fh = None
+        self._identity: Optional[Tuple[int, int]] = None
+        self._offset = 0
+        self._partial = b""
+        # True se l'ultimo drain si è fermato a MAX_READ_BYTES
+        self.pending = False
+
+    # ------------------------------------------------------------------
+
+    def open_at_tail(self, lines: int) -> List[str]:
+        self._fh = open(self.path, "rb")
+        st = os.fstat(self._fh.fileno())
+        self._identity = (st.st_dev, st.st_ino)
+        complete, self._partial = _read_last_lines(self._fh, lines, st.st_size)
+        self._offset = st.st_size
+        return [_decode(line, self.encoding) for line in complete]
+
+    def close(self) -> None:
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+    # ------------------------------------------------------------------
+
+    def read_new(self) -> TailBatch:
+        batch = TailBatch()
+
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            # rotazione in corso: il nuovo file non esiste ancora
+            st = None
+
+        if self._fh is None:
+            if st is None:
+                return batch
+            self._reopen()
+            batch.rotated = True
+        elif st is not None and (st.st_dev, st.st_ino) != self._identity:
+            batch.lines.extend(self._drain())
+            if self.pending:
+                # vecchio file oltre MAX_READ_BYTES: il prossimo giro (pending,
+                # senza attesa) continua a svuotarlo prima di riaprire
+                return batch
+            self._flush_partial(batch)
+            self._reopen()
+            batch.rotated = True
+        elif st is not None and st.st_size < self._offset:
+            self._fh.seek(0)
+            self._offset = 0
+            self._partial = b""
+            batch.truncated = True
+
+        batch.lines.extend(self._drain())
+        return batch
+
+    # ------------------------------------------------------------------
+
+    def _reopen(self) -> None:
+        self.close()
+        self._fh = open(self.path, "rb")
+        st = os.fstat(self._fh.fileno())
+        self._identity = (st.st_dev, st.st_ino)
+        self._offset = 0
+        self._partial = b""
+
+    def _drain(self) -> List[str]:
+        if self._fh is None:
+            return []
+
+        self._fh.seek(self._offset)
+        data = self._fh.read(MAX_READ_BYTES)
+        self.pending = len(data) == MAX_READ_BYTES
+        if not data:
+            return []
+        self._offset += len(data)
+
+        parts = (self._partial + data).split(b"\n")
+        self._partial = parts.pop()
+        return [_decode(line, self.encoding) for line in parts]
+
+    def _flush_partial(self, batch: TailBatch) -> None:
+        if self._partial:
+            batch.lines.append(_decode(self._partial, self.encoding))
+            self._partial = b""
+
+
+# ============================================================================
+# INOTIFY HUB
+# ============================================================================
+
+class _InotifyHub:
+    """
+    Un solo fd inotify per event loop, condiviso da tutti i file seguiti.
+
+    Osserva le DIRECTORY (non i file): così creazione, rename e delete
+    dovuti alla rotazione arrivano sullo stesso watch. Una directory
+    con molti log seguiti costa un solo watch.
+
+    L'fd viene chiuso quando esce l'ultimo sottoscrittore, o quando il
+    loop viene raccolto se qualche generator non è mai stato chiuso.
+    """
+
+    def __init__(self, libc, loop: asyncio.AbstractEventLoop) -> None:
+        self._libc = libc
+        self._loop = weakref.ref(loop)
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._close_fd = weakref.finalize(loop, os.close, self._fd)
+        self.closed = False
+
+        self._wd_by_dir: Dict[str, int] = {}
+        self._dir_by_wd: Dict[int, str] = {}
+        self._waiters: Dict[Tuple[str, str], Set[asyncio.Event]] = {}
+
+        loop.add_reader(self._fd, self._on_readable)
+
+    def subscribe(self, path: str) -> asyncio.Event:
+        directory, name = os.path.split(os.path.abspath(path))
+        if directory not in self._wd_by_dir:
+            wd = self._libc.inotify_add_watch(
+                self._fd, os.fsencode(directory), DIR_MASK
+            )
+            if wd < 0:
+                err = ctypes.get_errno()
+                if not self._waiters:
+                    self.close()
+                raise OSError(err, f"inotify_add_watch failed: {directory}")
+            self._wd_by_dir[directory] = wd
+            self._dir_by_wd[wd] = directory
+
+        event = asyncio.Event()
+        self._waiters.setdefault((directory, name), set()).add(event)
+        return event
+
+    def unsubscribe(self, path: str, event: asyncio.Event) -> None:
+        directory, name = os.path.split(os.path.abspath(path))
+        waiters = self._waiters.get((directory, name))
+        if waiters is not None:
+            waiters.discard(event)
+            if not waiters:
+                del self._waiters[(directory, name)]
+
+        if self.closed or any(d == directory for d, _ in self._waiters):
+            return
+        if not self._waiters:
+            # ultimo sottoscrittore: via anche i watch rimasti
+            self.close()
+            return
+        wd = self._wd_by_dir.pop(directory, None)
+        if wd is not None:
+            self._dir_by_wd.pop(wd, None)
+            self._libc.inotify_rm_watch(self._fd, wd)
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        loop = self._loop()
+        if loop is not None:
+            if _HUBS.get(loop) is self:
+                del _HUBS[loop]
+            if not loop.is_closed():
+                loop.remove_reader(self._fd)
+        self._wd_by_dir.clear()
+        self._dir_by_wd.clear()
+        self._close_fd()
+
+    def _on_readable(self) -> None:
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return
+
+        for wd, mask, name in iter_events(data):
+            if mask & IN_Q_OVERFLOW:
+                self._wake_all()
+                continue
+
+            directory = self._dir_by_wd.get(wd)
+            if directory is None:
+                continue
+            for event in self._waiters.get((directory, os.fsdecode(name)), ()):
+                event.set()
+
+    def _wake_all(self) -> None:
+        for waiters in self._waiters.values():
+            for event in waiters:
+                event.set()
+
+
+_HUBS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Optional[_InotifyHub]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _get_hub() -> Optional[_InotifyHub]:
+    loop = asyncio.get_running_loop()
+    if loop in _HUBS:
+        return _HUBS[loop]
+    # hub chiusi (ultimo sottoscrittore uscito) vengono tolti da _HUBS:
+    # il prossimo follow ne apre uno nuovo
+
+    hub: Optional[_InotifyHub] = None
+    libc = load_libc()
+    if libc is not None:
+        try:
+            hub = _InotifyHub(libc, loop)
+        except (OSError, NotImplementedError):
+            logger.debug("inotify unavailable, falling back to stat polling")
+            hub = None
+    _HUBS[loop] = hub
+    return hub
+
+
+# ============================================================================
+# FOLLOW (tail -f)
+# ============================================================================
+
+def _batch_events(path: str, batch: TailBatch, max_lines: int) -> List[Dict[str, Any]]:
+    """Spezza un batch in eventi da al massimo max_lines righe."""
+    events: List[Dict[str, Any]] = []
+    lines = batch.lines
+    for start in range(0, max(len(lines), 1), max_lines):
+        events.append(
+            {
+                "file": path,
+                "lines": lines[start:start + max_lines],
+                "rotated": batch.rotated and start == 0,
+                "truncated": batch.truncated and start == 0,
+            }
+        )
+    return events
+
+
+async def follow_file(
+    path: str,
+    *,
+    lines: int = 100,
+    encoding: str = "utf-8",
+    use_inotify: bool = True,
+    batch_window: float = BATCH_WINDOW,
+    max_batch_lines: int = MAX_BATCH_LINES,
+    poll_min_interval: float = POLL_MIN_INTERVAL,
+    poll_max_interval: float = POLL_MAX_INTERVAL,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Async generator per `logs.tail` con follow=True.
+
+    Primo evento: ultime `lines` righe (initial=True).
+    Eventi successivi: righe aggiunte, raggruppate per burst.
+
+    Con inotify il task dorme finché il kernel non segnala una modifica
+    nella directory del file; senza inotify usa uno stat poll con backoff
+    esponenziale (poll_min_interval -> poll_max_interval) quando il file
+    resta fermo.
+    """
+    followed = _FollowedFile(path, encoding=encoding)
+    initial = await asyncio.to_thread(followed.open_at_tail, lines)
+
+    hub = _get_hub() if use_inotify else None
+    wake: Optional[asyncio.Event] = None
+
+    try:
+        if hub is not None:
+            try:
+                wake = hub.subscribe(path)
+            except OSError:
+                # es. ENOSPC (limite di watch): stat poll come senza inotify
+                logger.warning("inotify watch failed, falling back to stat polling", exc_info=True)
+        yield {"file": path, "lines": initial, "initial": True}
+
+        delay = poll_min_interval
+        while True:
+            if followed.pending:
+                # backlog oltre MAX_READ_BYTES: continua senza attendere
+                await asyncio.sleep(0)
+            elif wake is not None:
+                try:
+                    # timeout = rete di sicurezza (fs di rete, eventi persi)
+                    await asyncio.wait_for(wake.wait(), timeout=poll_max_interval)
+                except asyncio.TimeoutError:
+                    pass
+                else:
+                    # lascia accumulare il resto del burst
+                    await asyncio.sleep(batch_window)
+                wake.clear()
+            else:
+                await asyncio.sleep(delay)
+
+            # fino a MAX_READ_BYTES per giro: lettura e decodifica in un thread
+            batch = await asyncio.to_thread(followed.read_new)
+            if not batch:
+                delay = min(delay * 2, poll_max_interval)
+                continue
+
+            delay = poll_min_interval
+            for event in _batch_events(path, batch, max_batch_lines):
+                yield event
+    finally:
+        if wake is not None and hub is not None:
+            hub.unsubscribe(path, wake)
+        followed.close()
@@ -0,0 +1,282 @@
+from __future__ import annotations
+
+import asyncio
+import copy
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from ice_api.actions.base import ActionSpec
+from ice_api.services.logs.scan import default_state_dir
+from ice_api.types.enums import ActionKind
+
+logger = logging.getLogger("ice.api.services.result_cache")
+
+# ============================================================================
+# CACHE POLICY (ActionSpec.metadata["cache"])
+# ============================================================================
+# Un'azione è cacheabile solo se lo dichiara:
+#
+#   metadata={"cache": {"ttl": 86400, "disk": True}}
+#
+# - ttl:   secondi di validità (default DEFAULT_TTL)
+# - disk:  abilita il tier su disco oltre a quello in memoria
+#
+# Solo azioni pure: kind GENERATION / ANALYSIS / QUERY.
+# ============================================================================
+
+DEFAULT_TTL = 3600.0
+MEMORY_MAX_ENTRIES = 1024
+MEMORY_MAX_BYTES = 64 * 1024 * 1024
+
+CACHEABLE_KINDS = {ActionKind.GENERATION, ActionKind.ANALYSIS, ActionKind.QUERY}
+
+# parametri di routing/UI che non cambiano il risultato
+_ROUTING_PARAMS = {"workspace_id", "panel_context"}
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    ttl: float = DEFAULT_TTL
+    disk: bool = False
+
+
+def cache_policy(spec: Optional[ActionSpec]) -> Optional[CachePolicy]:
+    if spec is None or spec.kind not in CACHEABLE_KINDS:
+        return None
+    raw = spec.metadata.get("cache")
+    if not raw:
+        return None
+    if raw is True:
+        return CachePolicy()
+    return CachePolicy(
+        ttl=float(raw.get("ttl", DEFAULT_TTL)),
+        disk=bool(raw.get("disk", False)),
+    )
+
+
+def cache_key(spec: ActionSpec, params: Dict[str, Any], model_id: Optional[str]) -> str:
+    """
+    Hash di (nome, versione, parametri normalizzati, modello).
+
+    Normalizzazione: default della spec applicati, valori None e
+    parametri di routing rimossi, JSON canonico (chiavi ordinate).
+    """
+    normalized: Dict[str, Any] = {}
+    for p in spec.parameters:
+        if p.default is not None:
+            normalized[p.name] = p.default
+    for name, value in params.items():
+        if name in _ROUTING_PARAMS or name == "model":
+            continue
+        normalized[name] = value
+    normalized = {k: v for k, v in normalized.items() if v is not None}
+
+    payload = json.dumps(
+        [spec.name, spec.version, normalized, model_id],
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=20).hexdigest()
+
+
+# ============================================================================
+# RESULT CACHE
+# ============================================================================
+
+class ResultCache:
+    """
+    Cache content-addressed dei risultati di azioni pure.
+
+    - tier in memoria: LRU limitata per numero di voci e byte stimati
+    - tier su disco opzionale: un file JSON per chiave, promosso in
+      memoria al primo hit
+    - single-flight: chiamate concorrenti con la stessa chiave attendono
+      la stessa esecuzione invece di ripeterla
+    - si memorizzano solo risultati dict con ok=True
+    """
+
+    def __init__(
+        self,
+        *,
+        max_entries: int = MEMORY_MAX_ENTRIES,
+        max_bytes: int = MEMORY_MAX_BYTES,
+        disk_dir: Optional[Path] = None,
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir or (default_state_dir() / "result-cache")
+
+        # key -> (expires_at, size, value)
+        self._memory: "OrderedDict[str, Tuple[float, int, Any]]" = OrderedDict()
+        self._bytes = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "coalesced": 0}
+
+    # ------------------------------------------------------------------
+    # memory tier
+    # ------------------------------------------------------------------
+
+    def _get_memory(self, key: str) -> Any:
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        expires, size, value = entry
+        if expires < time.time():
+            del self._memory[key]
+            self._bytes -= size
+            return None
+        self._memory.move_to_end(key)
+        return value
+
+    def _put_memory(self, key: str, value: Any, expires: float, size: int) -> None:
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._bytes -= old[1]
+        self._memory[key] = (expires, size, value)
+        self._bytes += size
+        while self._memory and (
+            len(self._memory) > self.max_entries or self._bytes > self.max_bytes
+        ):
+            _key, (_exp, evicted, _val) = self._memory.popitem(last=False)
+            self._bytes -= evicted
+
+    # ------------------------------------------------------------------
+    # disk tier
+    # ------------------------------------------------------------------
+
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / key[:2] / f"{key}.json"
+
+    def _get_disk(self, key: str) -> Optional[Tuple[float, Any, int]]:
+        path = self._disk_path(key)
+        try:
+            raw = path.read_text("utf-8")
+            entry = json.loads(raw)
+        except (OSError, ValueError):
+            return None
+        if entry.get("expires", 0) < time.time():
+            try:
+                path.unlink()
+            except OSError:
+                pass
+            return None
+        return entry["expires"], entry["value"], len(raw)
+
+    def _put_disk(self, key: str, encoded: str) -> None:
+        path = self._disk_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(encoded, "utf-8")
+        os.replace(tmp, path)
+
+    # ------------------------------------------------------------------
+    # public API
+    # ------------------------------------------------------------------
+
+    async def get_or_compute(
+        self,
+        key: str,
+        policy: CachePolicy,
+        compute: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        while True:
+            value = self._get_memory(key)
+            if value is not None:
+                self.stats["hits"] += 1
+                return _mark_cached(value)
+
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            self.stats["coalesced"] += 1
+            try:
+                return _copy(await asyncio.shield(inflight))
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise
+                # il leader è stato cancellato (client disconnesso): questa
+                # richiesta non lo era, riprova e al limite calcola lei
+                continue
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            if policy.disk:
+                hit = await asyncio.to_thread(self._get_disk, key)
+                if hit is not None:
+                    expires, value, size = hit
+                    self._put_memory(key, value, expires, size)
+                    self.stats["disk_hits"] += 1
+                    future.set_result(_mark_cached(value))
+                    return _copy(future.result())
+
+            self.stats["misses"] += 1
+            value = await compute()
+            if isinstance(value, dict) and value.get("ok"):
+                await self._store(key, policy, value)
+            future.set_result(value)
+            # il valore è in cache: al chiamante (e ai follower) va una copia
+            return _copy(value)
+        except asyncio.CancelledError:
+            if not future.done():
+                future.cancel()
+            raise
+        except BaseException as exc:
+            if not future.done():
+                future.set_exception(exc)
+                # evita "exception was never retrieved" se nessuno attende
+                future.exception()
+            raise
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    async def _store(self, key: str, policy: CachePolicy, value: Dict[str, Any]) -> None:
+        expires = time.time() + policy.ttl
+        try:
+            encoded_value = json.dumps(value, default=str)
+        except (TypeError, ValueError):
+            return
+        self._put_memory(key, value, expires, len(encoded_value))
+        if policy.disk:
+            encoded = json.dumps({"expires": expires, "value": value}, default=str)
+            try:
+                await asyncio.to_thread(self._put_disk, key, encoded)
+            except OSError:
+                logger.warning("Result cache disk write failed", exc_info=True)
+
+    def invalidate(self, key: str) -> None:
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+        try:
+            self._disk_path(key).unlink()
+        except OSError:
+            pass
+
+    def clear(self) -> None:
+        self._memory.clear()
+        self._bytes = 0
+
+
+def _copy(value: Any) -> Any:
+    # copia profonda: liste/dict annidati del risultato restano della cache
+    return copy.deepcopy(value) if isinstance(value, (dict, list)) else value
+
+
+def _mark_cached(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {**_copy(value), "cached": True}
+    return _copy(value)
+
+
+RESULT_CACHE = ResultCache()
@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from ice_api.actions.base import ActionSpec
+from ice_api.agents import AgentSpec, build_agents_from_actions
+from ice_api.ipc.errors import error_message
+from ice_api.services.agents import AGENTS
+from ice_api.utils.tracing import SPAN_CLIENT, TRACER
+
+logger = logging.getLogger("ice.api.services.routing")
+
+# azioni che non chiamano un agente: senza owner_agent nel catalogo
+# (docs.*) o con metadata={"calls_agent": False} (workspace.*, system.*
+# amministrative, logs.*, knowledge.* e code.* locali, servite dal
+# runtime e dai servizi locali)
+API_LANE = "api"
+
+ROUTING_MODES = ("direct", "load_aware")
+
+# ============================================================================
+# ROUTING TABLE
+# ============================================================================
+# Compilata una volta dal catalogo (ActionSpec.owner_agent) e dal registry
+# degli handler:
+#
+#   azione -> Route(agente, handler)      lookup O(1) nel dispatch
+#   agente -> AgentLane                   limite di chiamate + statistiche
+#
+# Ogni agente ha una corsia con al massimo max_concurrency chiamate per
+# replica; le chiamate oltre il limite aspettano in coda (queued, wait_ms).
+#
+# Modalità:
+#   direct      l'handler usa sempre l'handle principale dell'agente
+#   load_aware  con più repliche (runtime.get_agent_replicas) la chiamata
+#               va alla replica con meno chiamate attive, a parità in
+#               round-robin; la replica è fissata con AGENTS.pin per la
+#               durata dell'handler
+#
+# Gli handler in streaming restituiscono subito l'async generator: la
+# corsia conta solo la chiamata iniziale, non la durata dello stream.
+# ============================================================================
+
+
+def calls_agent(spec: Optional[ActionSpec]) -> bool:
+    return bool(spec is not None and spec.owner_agent and spec.metadata.get("calls_agent", True))
+
+
+def default_mode() -> str:
+    mode = os.environ.get("ICE_API_AGENT_ROUTING", "direct")
+    return mode if mode in ROUTING_MODES else "direct"
+
+
+@dataclass
+class Route:
+    action: str
+    agent: str
+    handler: Callable[..., Any]
+    spec: Optional[ActionSpec] = None
+
+
+class AgentLane:
+    def __init__(self, spec: AgentSpec) -> None:
+        self.spec = spec
+        self.name = spec.name
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._limit = 0
+        self._active: List[int] = [0]
+        self._rotation = itertools.count()
+        self.stats = {
+            "calls": 0,
+            "errors": 0,
+            "queued": 0,
+            "max_queued": 0,
+            "wait_ms": 0.0,
+            "busy_ms": 0.0,
+        }
+
+    # ------------------------------------------------------------------
+    # limits / replicas
+    # ------------------------------------------------------------------
+
+    def _ensure_slots(self, replicas: int) -> asyncio.Semaphore:
+        """Limite = max_concurrency per replica; ricreato se cambia il numero di repliche."""
+        limit = max(1, self.spec.max_concurrency) * max(1, replicas)
+        if self._slots is None or limit != self._limit:
+            if self._slots is not None and self.active:
+                # chiamate in corso sul vecchio semaforo: lo si tiene finché non finiscono
+                return self._slots
+            self._slots = asyncio.Semaphore(limit)
+            self._limit = limit
+            self._active = [0] * max(1, replicas)
+        return self._slots
+
+    def _pick(self, replicas: int) -> int:
+        """Replica con meno chiamate attive; a parità, round-robin."""
+        if replicas <= 1:
+            return 0
+        active = self._active[:replicas]
+        least = min(active)
+        candidates = [i for i, n in enumerate(active) if n == least]
+        return candidates[next(self._rotation) % len(candidates)]
+
+    @property
+    def active(self) -> int:
+        return sum(self._active)
+
+    # ------------------------------------------------------------------
+    # call
+    # ------------------------------------------------------------------
+
+    async def run(self, call: Callable[[], Any], *, runtime: Any = None, load_aware: bool = False) -> Any:
+        handles = AGENTS.replicas(runtime, self.name) if load_aware and runtime is not None else None
+        slots = self._ensure_slots(len(handles) if handles else 1)
+
+        self.stats["calls"] += 1
+        self.stats["queued"] += 1
+        self.stats["max_queued"] = max(self.stats["max_queued"], self.stats["queued"])
+        queued_at = time.perf_counter()
+        try:
+            await slots.acquire()
+        finally:
+            self.stats["queued"] -= 1
+        started = time.perf_counter()
+        self.stats["wait_ms"] += (started - queued_at) * 1000
+
+        replica = self._pick(len(handles)) if handles and len(handles) == len(self._active) else 0
+        self._active[replica] += 1
+        token = AGENTS.pin(self.name, replica, handles[replica]) if handles and len(handles) > 1 else None
+        try:
+            result = call()
+            if asyncio.iscoroutine(result):
+                result = await result
+            if isinstance(result, dict) and result.get("ok") is False:
+                self.stats["errors"] += 1
+            return result
+        except BaseException:
+            self.stats["errors"] += 1
+            raise
+        finally:
+            if token is not None:
+                AGENTS.unpin(token)
+            self._active[replica] -= 1
+            self.stats["busy_ms"] += (time.perf_counter() - started) * 1000
+            slots.release()
+
+    def snapshot(self) -> Dict[str, Any]:
+        calls = self.stats["calls"]
+        return {
+            "agent": self.name,
+            "actions": len(self.spec.actions),
+            "max_concurrency": self.spec.max_concurrency,
+            "limit": self._limit,
+            "active": self.active,
+            "replicas": list(self._active),
+            **{k: round(v, 3) if isinstance(v, float) else v for k, v in self.stats.items()},
+            "avg_wait_ms": round(self.stats["wait_ms"] / calls, 3) if calls else 0.0,
+            "avg_busy_ms": round(self.stats["busy_ms"] / calls, 3) if calls else 0.0,
+        }
+
+
+class RoutingTable:
+    def __init__(self, *, mode: Optional[str] = None) -> None:
+        self.mode = mode or default_mode()
+        self._routes: Dict[str, Route] = {}
+        self._lanes: Dict[str, AgentLane] = {}
+
+    # ------------------------------------------------------------------
+    # compile
+    # ------------------------------------------------------------------
+
+    def compile(
+        self,
+        actions: Iterable[ActionSpec],
+        handlers: Dict[str, Callable[..., Any]],
+        *,
+        concurrency: Optional[Dict[str, int]] = None,
+    ) -> "RoutingTable":
+        """
+        Costruisce le route per ogni handler registrato. Le azioni senza
+        spec, senza owner_agent o che non chiamano l'agente finiscono
+        nella corsia "api": non occupano gli slot dell'agente.
+        """
+        specs = {spec.name: spec for spec in actions}
+        agents = build_agents_from_actions(
+            [spec for spec in specs.values() if calls_agent(spec)], concurrency=concurrency
+        )
+        lanes = {agent.name: AgentLane(agent) for agent in agents}
+        # la corsia "api" non ha un limite significativo: solo statistiche
+        lanes[API_LANE] = AgentLane(AgentSpec(name=API_LANE, max_concurrency=1 << 16))
+
+        routes: Dict[str, Route] = {}
+        for name, handler in handlers.items():
+            spec = specs.get(name)
+            owner = spec.owner_agent if calls_agent(spec) else API_LANE
+            routes[name] = Route(action=name, agent=owner, handler=handler, spec=spec)
+            if owner == API_LANE:
+                lanes[API_LANE].spec.actions.append(name)
+
+        self._routes, self._lanes = routes, lanes
+        logger.debug(
+            "Routing table compiled",
+            extra={"routes": len(routes), "agents": len(lanes) - 1, "mode": self.mode},
+        )
+        return self
+
+    def set_mode(self, mode: str) -> None:
+        if mode not in ROUTING_MODES:
+            raise ValueError(f"Unknown routing mode: {mode!r} (expected {', '.join(ROUTING_MODES)})")
+        self.mode = mode
+
+    # ------------------------------------------------------------------
+    # lookup / call
+    # ------------------------------------------------------------------
+
+    def route(self, action: str) -> Optional[Route]:
+        return self._routes.get(action)
+
+    async def call(self, route: Route, params: dict, runtime: Any) -> Any:
+        lane = self._lanes[route.agent]
+        with TRACER.span(f"{route.agent} {route.action}", kind=SPAN_CLIENT) as span:
+            span.set("ice.agent", route.agent)
+            span.set("ice.action", route.action)
+            result = await lane.run(
+                lambda: route.handler(params, runtime),
+                runtime=runtime,
+                load_aware=self.mode == "load_aware" and route.agent != API_LANE,
+            )
+            if isinstance(result, dict) and result.get("ok") is False:
+                span.fail(error_message(result.get("error")))
+            return result
+
+    # ------------------------------------------------------------------
+    # introspection
+    # ------------------------------------------------------------------
+
+    def stats(self, agent: Optional[str] = None) -> Dict[str, Any]:
+        if agent and agent not in self._lanes:
+            raise ValueError(f"Unknown agent: {agent!r}")
+        lanes = [self._lanes[agent]] if agent else list(self._lanes.values())
+        return {"mode": self.mode, "agents": [lane.snapshot() for lane in lanes]}
+
+    def table(self) -> Dict[str, str]:
+        """azione -> agente."""
+        return {name: route.agent for name, route in sorted(self._routes.items())}
+
+
+ROUTES = RoutingTable()
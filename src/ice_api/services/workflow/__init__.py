@@ -0,0 +1,13 @@
+from ice_api.services.workflow.engine import (
+    WorkflowEngine,
+    WorkflowPlanError,
+    current_step_id,
+    plan_from_dict,
+)
+
+__all__ = [
+    "WorkflowEngine",
+    "WorkflowPlanError",
+    "current_step_id",
+    "plan_from_dict",
+]
@@ -0,0 +1,406 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import heapq
+import json
+import logging
+import os
+import time
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set
+
+from ice_api.services.logs.scan import default_state_dir
+from ice_api.types.common import ActionCall, WorkflowPlan, WorkflowStep
+from ice_api.types.enums import StepStatus
+
+logger = logging.getLogger("ice.api.services.workflow.engine")
+
+DEFAULT_MAX_WORKERS = 4
+
+StepExecutor = Callable[[ActionCall], Awaitable[Any]]
+
+# step in esecuzione (anche in rollback), visibile all'executor
+_CURRENT_STEP: ContextVar[Optional[str]] = ContextVar("ice_api_workflow_step", default=None)
+
+
+def current_step_id() -> Optional[str]:
+    """Id dello step che l'executor sta eseguendo, None fuori da un workflow."""
+    return _CURRENT_STEP.get()
+
+
+class WorkflowPlanError(ValueError):
+    """Piano non valido: step duplicati, dipendenze mancanti o cicli."""
+
+
+# ============================================================================
+# PLAN PARSING / VALIDATION
+# ============================================================================
+
+def _call_from_dict(raw: Dict[str, Any]) -> ActionCall:
+    return ActionCall(name=raw["action"], params=dict(raw.get("params") or {}))
+
+
+def plan_from_dict(raw: Dict[str, Any]) -> WorkflowPlan:
+    """
+    {"workflow_id": "...", "steps": [
+        {"id": "a", "action": "logs.scan", "params": {...},
+         "depends_on": [], "rollback": {"action": ..., "params": ...}, "cost": 1.0},
+    ]}
+    """
+    steps = []
+    for item in raw.get("steps") or []:
+        if "id" not in item or "action" not in item:
+            raise WorkflowPlanError("Every step needs 'id' and 'action'")
+        steps.append(
+            WorkflowStep(
+                id=str(item["id"]),
+                call=_call_from_dict(item),
+                depends_on=[str(d) for d in item.get("depends_on") or []],
+                rollback=_call_from_dict(item["rollback"]) if item.get("rollback") else None,
+                cost=float(item.get("cost", 1.0)),
+            )
+        )
+
+    workflow_id = raw.get("workflow_id") or _plan_hash_of(raw)[:16]
+    plan = WorkflowPlan(workflow_id=str(workflow_id), steps=steps)
+    _validate(plan)
+    return plan
+
+
+def _validate(plan: WorkflowPlan) -> None:
+    ids = [s.id for s in plan.steps]
+    if len(ids) != len(set(ids)):
+        raise WorkflowPlanError("Duplicate step ids")
+    known = set(ids)
+    for step in plan.steps:
+        missing = [d for d in step.depends_on if d not in known]
+        if missing:
+            raise WorkflowPlanError(f"Step '{step.id}' depends on unknown steps: {missing}")
+
+    # Kahn: se non si consumano tutti i nodi c'è un ciclo
+    indegree = {s.id: len(s.depends_on) for s in plan.steps}
+    children = _children(plan)
+    ready = [sid for sid, deg in indegree.items() if deg == 0]
+    visited = 0
+    while ready:
+        sid = ready.pop()
+        visited += 1
+        for child in children[sid]:
+            indegree[child] -= 1
+            if indegree[child] == 0:
+                ready.append(child)
+    if visited != len(plan.steps):
+        raise WorkflowPlanError("Workflow plan contains a cycle")
+
+
+def _children(plan: WorkflowPlan) -> Dict[str, List[str]]:
+    children: Dict[str, List[str]] = {s.id: [] for s in plan.steps}
+    for step in plan.steps:
+        for dep in step.depends_on:
+            children[dep].append(step.id)
+    return children
+
+
+def critical_path_lengths(plan: WorkflowPlan) -> Dict[str, float]:
+    """
+    Per ogni step: costo del cammino più lungo da lui a un nodo finale.
+
+    Gli step con valore più alto sono sul critical path e vanno
+    schedulati per primi.
+    """
+    children = _children(plan)
+    by_id = {s.id: s for s in plan.steps}
+    memo: Dict[str, float] = {}
+
+    def length(sid: str) -> float:
+        if sid not in memo:
+            memo[sid] = by_id[sid].cost + max((length(c) for c in children[sid]), default=0.0)
+        return memo[sid]
+
+    for sid in by_id:
+        length(sid)
+    return memo
+
+
+def _plan_hash_of(raw: Any) -> str:
+    payload = json.dumps(raw, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def _plan_hash(plan: WorkflowPlan) -> str:
+    return _plan_hash_of(
+        [
+            [s.id, s.call.name, s.call.params, sorted(s.depends_on)]
+            for s in sorted(plan.steps, key=lambda s: s.id)
+        ]
+    )
+
+
+# ============================================================================
+# CHECKPOINT
+# ============================================================================
+
+class _Checkpoint:
+    """
+    Stato persistito di un run: status e risultato di ogni step.
+
+    Scritto in modo atomico dopo ogni transizione; un run ripreso con
+    lo stesso piano non riesegue gli step già SUCCEEDED. Un run concluso
+    con successo marca il checkpoint come finished: non viene più ripreso
+    (lo stesso piano riparte da capo) ma resta disponibile per rollback.
+    """
+
+    def __init__(self, directory: Path, plan: WorkflowPlan) -> None:
+        self.file = directory / f"{plan.workflow_id}.json"
+        self.plan_hash = _plan_hash(plan)
+        self.status: Dict[str, StepStatus] = {s.id: StepStatus.PENDING for s in plan.steps}
+        self.results: Dict[str, Any] = {}
+        self.completed: List[str] = []      # ordine di completamento (per rollback)
+        self.finished = False
+
+    def load(self, *, include_finished: bool = False) -> bool:
+        try:
+            raw = json.loads(self.file.read_text("utf-8"))
+        except (OSError, ValueError):
+            return False
+        if raw.get("plan_hash") != self.plan_hash:
+            return False
+        if raw.get("finished") and not include_finished:
+            return False
+        self.finished = bool(raw.get("finished"))
+        for sid, status in raw.get("status", {}).items():
+            # solo gli step completati sopravvivono: interrotti, falliti
+            # e saltati per dipendenza vengono ritentati
+            if sid in self.status and status == StepStatus.SUCCEEDED.value:
+                self.status[sid] = StepStatus.SUCCEEDED
+        self.results = {
+            sid: res for sid, res in raw.get("results", {}).items()
+            if self.status.get(sid) == StepStatus.SUCCEEDED
+        }
+        self.completed = [
+            sid for sid in raw.get("completed", [])
+            if self.status.get(sid) == StepStatus.SUCCEEDED
+        ]
+        return True
+
+    def save(self) -> None:
+        self.file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.file.with_suffix(".tmp")
+        tmp.write_text(
+            json.dumps(
+                {
+                    "plan_hash": self.plan_hash,
+                    "updated_at": time.time(),
+                    "status": {sid: st.value for sid, st in self.status.items()},
+                    "results": self.results,
+                    "completed": self.completed,
+                    "finished": self.finished,
+                },
+                default=str,
+            ),
+            "utf-8",
+        )
+        os.replace(tmp, self.file)
+
+
+# ============================================================================
+# ENGINE
+# ============================================================================
+
+def _is_failure(result: Any) -> bool:
+    return isinstance(result, dict) and result.get("ok") is False
+
+
+class WorkflowEngine:
+    """
+    Esecutore di WorkflowPlan come DAG.
+
+    - al massimo max_workers step in esecuzione contemporanea
+    - tra gli step pronti parte prima quello col critical path più lungo
+    - step che falliscono: i discendenti vengono SKIPPED; con
+      rollback_on_failure si eseguono i rollback degli step completati
+      in ordine inverso
+    - checkpoint dopo ogni transizione, resume senza ripetere step finiti
+    """
+
+    def __init__(
+        self,
+        execute: StepExecutor,
+        *,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        checkpoint_dir: Optional[Path] = None,
+    ) -> None:
+        self.execute = execute
+        self.max_workers = max(1, max_workers)
+        self.checkpoint_dir = checkpoint_dir or (default_state_dir() / "workflows")
+
+    def _event(self, plan: WorkflowPlan, event: str, **fields: Any) -> Dict[str, Any]:
+        return {"event": event, "workflow_id": plan.workflow_id, "ts": time.time(), **fields}
+
+    async def run(
+        self,
+        plan: WorkflowPlan,
+        *,
+        skip: Optional[Set[str]] = None,
+        resume: bool = True,
+        rollback_on_failure: bool = False,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Async generator di eventi di progresso (streaming verso il client)."""
+        checkpoint = _Checkpoint(self.checkpoint_dir, plan)
+        resumed = resume and await asyncio.to_thread(checkpoint.load)
+
+        by_id = {s.id: s for s in plan.steps}
+        children = _children(plan)
+        priority = critical_path_lengths(plan)
+        status = checkpoint.status
+
+        for sid in skip or ():
+            if sid in status and status[sid] == StepStatus.PENDING:
+                status[sid] = StepStatus.SKIPPED
+
+        yield self._event(
+            plan,
+            "workflow.started",
+            steps=len(plan.steps),
+            resumed=resumed,
+            done=[sid for sid, st in status.items() if st == StepStatus.SUCCEEDED],
+        )
+
+        satisfied = {StepStatus.SUCCEEDED, StepStatus.SKIPPED}
+        remaining_deps = {
+            sid: sum(1 for d in by_id[sid].depends_on if status[d] not in satisfied)
+            for sid in by_id
+        }
+        ready: List[tuple] = [
+            (-priority[sid], sid)
+            for sid, st in status.items()
+            if st == StepStatus.PENDING and remaining_deps[sid] == 0
+        ]
+        heapq.heapify(ready)
+
+        running: Dict[asyncio.Task, str] = {}
+        failed = False
+
+        async def run_step(step: WorkflowStep) -> Any:
+            # task dedicato: il contesto è già una copia
+            _CURRENT_STEP.set(step.id)
+            return await self.execute(step.call)
+
+        try:
+            while ready or running:
+                while ready and len(running) < self.max_workers and not (
+                    failed and rollback_on_failure
+                ):
+                    _neg, sid = heapq.heappop(ready)
+                    status[sid] = StepStatus.RUNNING
+                    running[asyncio.create_task(run_step(by_id[sid]))] = sid
+                    yield self._event(plan, "step.started", step_id=sid, action=by_id[sid].call.name)
+
+                if not running:
+                    break
+
+                done, _pending = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    sid = running.pop(task)
+                    exc = task.exception()
+                    result = None if exc else task.result()
+
+                    if exc is not None or _is_failure(result):
+                        failed = True
+                        status[sid] = StepStatus.FAILED
+                        error = str(exc) if exc else result.get("error")
+                        checkpoint.results[sid] = {"ok": False, "error": error}
+                        yield self._event(plan, "step.failed", step_id=sid, error=error)
+                        for skipped in self._skip_descendants(sid, children, status):
+                            yield self._event(
+                                plan, "step.skipped", step_id=skipped, reason="dependency_failed"
+                            )
+                    else:
+                        status[sid] = StepStatus.SUCCEEDED
+                        checkpoint.results[sid] = result
+                        checkpoint.completed.append(sid)
+                        yield self._event(plan, "step.succeeded", step_id=sid, result=result)
+                        for child in children[sid]:
+                            remaining_deps[child] -= 1
+                            if remaining_deps[child] == 0 and status[child] == StepStatus.PENDING:
+                                heapq.heappush(ready, (-priority[child], child))
+
+                    await asyncio.to_thread(checkpoint.save)
+        finally:
+            for task in running:
+                task.cancel()
+
+        if failed and rollback_on_failure:
+            async for event in self.rollback(plan, checkpoint=checkpoint):
+                yield event
+
+        final = "failed" if failed else "succeeded"
+        if not failed:
+            checkpoint.finished = True
+            await asyncio.to_thread(checkpoint.save)
+        yield self._event(
+            plan,
+            "workflow.finished",
+            status=final,
+            steps={sid: st.value for sid, st in status.items()},
+        )
+
+    @staticmethod
+    def _skip_descendants(
+        sid: str,
+        children: Dict[str, List[str]],
+        status: Dict[str, StepStatus],
+    ) -> List[str]:
+        skipped = []
+        stack = list(children[sid])
+        while stack:
+            child = stack.pop()
+            if status[child] == StepStatus.PENDING:
+                status[child] = StepStatus.SKIPPED
+                skipped.append(child)
+                stack.extend(children[child])
+        return skipped
+
+    async def rollback(
+        self,
+        plan: WorkflowPlan,
+        *,
+        checkpoint: Optional[_Checkpoint] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Rollback degli step SUCCEEDED in ordine inverso di completamento.
+
+        Senza checkpoint esplicito usa quello persistito del workflow.
+        """
+        if checkpoint is None:
+            checkpoint = _Checkpoint(self.checkpoint_dir, plan)
+            if not await asyncio.to_thread(checkpoint.load, include_finished=True):
+                yield self._event(plan, "workflow.rollback.unavailable")
+                return
+
+        by_id = {s.id: s for s in plan.steps}
+        for sid in reversed(checkpoint.completed):
+            step = by_id.get(sid)
+            if step is None or checkpoint.status.get(sid) != StepStatus.SUCCEEDED:
+                continue
+            if step.rollback is None:
+                continue
+            # ripristinato prima di ogni yield: il contesto è quello del consumer
+            token = _CURRENT_STEP.set(sid)
+            try:
+                result = await self.execute(step.rollback)
+            except Exception as exc:
+                _CURRENT_STEP.reset(token)
+                yield self._event(plan, "step.rollback_failed", step_id=sid, error=str(exc))
+                continue
+            _CURRENT_STEP.reset(token)
+            if _is_failure(result):
+                yield self._event(
+                    plan, "step.rollback_failed", step_id=sid, error=result.get("error")
+                )
+                continue
+            checkpoint.status[sid] = StepStatus.ROLLED_BACK
+            await asyncio.to_thread(checkpoint.save)
+            yield self._event(plan, "step.rolled_back", step_id=sid)
@@ -0,0 +1,44 @@
+from ice_api.services.workspace.deletion import (
+    DELETE_JOB_KIND,
+    delete_tree,
+    move_to_trash,
+    restore_from_trash,
+    resume_pending,
+    submit_delete,
+)
+from ice_api.services.workspace.listing import WORKSPACE_LIST, WorkspaceListCache
+from ice_api.services.workspace.stats import (
+    FileAggregates,
+    WorkspaceStats,
+    drop_workspace_stats,
+    get_workspace_stats,
+)
+from ice_api.services.workspace.templates import (
+    clone_tree,
+    instantiate_template,
+    list_templates,
+    load_template,
+    save_template,
+)
+from ice_api.services.workspace.watch import TreeWatcher
+
+__all__ = [
+    "DELETE_JOB_KIND",
+    "delete_tree",
+    "move_to_trash",
+    "restore_from_trash",
+    "resume_pending",
+    "submit_delete",
+    "WORKSPACE_LIST",
+    "WorkspaceListCache",
+    "FileAggregates",
+    "WorkspaceStats",
+    "drop_workspace_stats",
+    "get_workspace_stats",
+    "clone_tree",
+    "instantiate_template",
+    "list_templates",
+    "load_template",
+    "save_template",
+    "TreeWatcher",
+]
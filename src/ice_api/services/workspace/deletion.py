@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from ice_api.services.jobs import JOBS, Job, JobContext
+from ice_api.services.logs.scan import default_state_dir
+
+logger = logging.getLogger("ice.api.services.workspace.deletion")
+
+DELETE_JOB_KIND = "workspace.delete"
+DELETE_CHUNK = 500              # voci rimosse tra un controllo di rate/cancel e l'altro
+DEFAULT_IO_RATE = 2000          # operazioni (unlink/rmdir) al secondo; 0 = senza limite
+
+# ============================================================================
+# TOMBSTONE
+# ============================================================================
+# La cancellazione logica è immediata: la directory del workspace viene
+# rinominata in un nome "trash" accanto all'originale (rename atomico,
+# lo stesso path è subito riutilizzabile) e un tombstone nello state dir
+# registra cosa resta da cancellare. Al riavvio i tombstone rimasti sono
+# ripresi da resume_pending().
+# ============================================================================
+
+
+def _tombstone_dir() -> Path:
+    return default_state_dir() / "workspace-tombstones"
+
+
+def _write_tombstone(job_id: str, data: Dict[str, Any]) -> None:
+    directory = _tombstone_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    tmp = directory / f"{job_id}.tmp"
+    tmp.write_text(json.dumps(data), "utf-8")
+    os.replace(tmp, directory / f"{job_id}.json")
+
+
+def _remove_tombstone(job_id: str) -> None:
+    try:
+        (_tombstone_dir() / f"{job_id}.json").unlink()
+    except OSError:
+        pass
+
+
+def move_to_trash(path: str, job_id: str) -> Optional[str]:
+    """Rinomina la directory in `.<nome>.deleting-<job>`; None se non esiste."""
+    path = os.path.abspath(path)
+    if not os.path.lexists(path):
+        return None
+    parent, name = os.path.split(path)
+    trash = os.path.join(parent, f".{name}.deleting-{job_id[:12]}")
+    os.rename(path, trash)
+    return trash
+
+
+def restore_from_trash(trash: str, path: str) -> None:
+    """Annulla move_to_trash (deregistrazione fallita)."""
+    os.rename(trash, os.path.abspath(path))
+
+
+# ============================================================================
+# THROTTLED DELETE
+# ============================================================================
+
+class _RateLimiter:
+    """Token bucket: al massimo `rate` operazioni al secondo (burst di un secondo)."""
+
+    def __init__(self, rate: float) -> None:
+        self.rate = rate
+        self._tokens = rate
+        self._last = time.monotonic()
+
+    def acquire(self, n: int) -> None:
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        self._tokens = min(self.rate, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+        self._tokens -= n
+        if self._tokens < 0:
+            # debito: si dorme il tempo necessario a ripagarlo
+            time.sleep(-self._tokens / self.rate)
+
+
+def delete_tree(
+    root: str,
+    ctx: Optional[JobContext] = None,
+    *,
+    io_rate: float = DEFAULT_IO_RATE,
+    chunk: int = DELETE_CHUNK,
+) -> Dict[str, int]:
+    """
+    Cancella un albero bottom-up a blocchi di `chunk` voci, limitando le
+    operazioni al secondo: sul disco condiviso la cancellazione non deve
+    affamare le altre richieste. Eseguita in un thread.
+    """
+    limiter = _RateLimiter(io_rate)
+    counts = {"files": 0, "dirs": 0, "bytes": 0, "errors": 0}
+    pending = 0
+
+    def account(n: int = 1) -> None:
+        nonlocal pending
+        pending += n
+        if pending >= chunk:
+            limiter.acquire(pending)
+            pending = 0
+            if ctx is not None:
+                ctx.report(**counts)
+                ctx.check_cancelled()
+
+    if os.path.islink(root) or os.path.isfile(root):
+        os.unlink(root)
+        counts["files"] += 1
+        return counts
+
+    for dirpath, dirnames, filenames in os.walk(root, topdown=False):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            try:
+                size = os.lstat(path).st_size
+                os.unlink(path)
+            except FileNotFoundError:
+                continue
+            except OSError:
+                counts["errors"] += 1
+                continue
+            counts["files"] += 1
+            counts["bytes"] += size
+            account()
+        for name in dirnames:
+            path = os.path.join(dirpath, name)
+            if os.path.islink(path):
+                # symlink a directory: os.walk non vi entra, va solo scollegato
+                try:
+                    os.unlink(path)
+                    counts["files"] += 1
+                except OSError:
+                    counts["errors"] += 1
+                account()
+        try:
+            os.rmdir(dirpath)
+            counts["dirs"] += 1
+        except FileNotFoundError:
+            pass
+        except OSError:
+            counts["errors"] += 1
+        account()
+
+    if ctx is not None:
+        ctx.report(**counts)
+    return counts
+
+
+# ============================================================================
+# JOBS
+# ============================================================================
+
+def submit_delete(
+    workspace_id: str,
+    trash_path: Optional[str],
+    *,
+    io_rate: float = DEFAULT_IO_RATE,
+    job_id: Optional[str] = None,
+    on_finished=None,
+) -> Job:
+    """Avvia la cancellazione fisica in background; restituisce il job."""
+    job_id = job_id or uuid.uuid4().hex
+    if trash_path:
+        _write_tombstone(job_id, {
+            "workspace_id": workspace_id,
+            "trash_path": trash_path,
+            "io_rate": io_rate,
+            "created_at": time.time(),
+        })
+
+    async def run(ctx: JobContext) -> Dict[str, Any]:
+        try:
+            if not trash_path or not os.path.lexists(trash_path):
+                return {"files": 0, "dirs": 0, "bytes": 0, "errors": 0}
+            counts = await asyncio.to_thread(delete_tree, trash_path, ctx, io_rate=io_rate)
+            if counts["errors"]:
+                raise OSError(f"{counts['errors']} entries could not be deleted under {trash_path}")
+            _remove_tombstone(job_id)
+            return counts
+        finally:
+            if on_finished is not None:
+                on_finished(workspace_id)
+
+    return JOBS.submit(
+        DELETE_JOB_KIND,
+        run,
+        metadata={"workspace_id": workspace_id, "trash_path": trash_path, "io_rate": io_rate},
+        job_id=job_id,
+    )
+
+
+def resume_pending(on_finished=None) -> List[Job]:
+    """Riprende le cancellazioni interrotte (tombstone rimasti da un processo precedente)."""
+    jobs: List[Job] = []
+    directory = _tombstone_dir()
+    if not directory.is_dir():
+        return jobs
+    for path in sorted(directory.glob("*.json")):
+        job_id = path.stem
+        if JOBS.get(job_id) is not None:
+            continue
+        try:
+            data = json.loads(path.read_text("utf-8"))
+        except (OSError, ValueError):
+            continue
+        logger.info(
+            "Resuming workspace deletion",
+            extra={"workspace_id": data.get("workspace_id"), "job_id": job_id},
+        )
+        jobs.append(
+            submit_delete(
+                data.get("workspace_id", ""),
+                data.get("trash_path"),
+                io_rate=float(data.get("io_rate", DEFAULT_IO_RATE)),
+                job_id=job_id,
+                on_finished=on_finished,
+            )
+        )
+    return jobs
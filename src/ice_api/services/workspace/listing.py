@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import base64
+import bisect
+import json
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+SNAPSHOT_TTL = 30.0             # secondi: oltre, il prossimo accesso riverifica la lista
+HISTORY_VERSIONS = 256          # versioni per cui è possibile un diff
+
+
+def workspace_entry(ws: Any) -> Dict[str, Any]:
+    wid = getattr(ws, "workspace_id", None) or getattr(ws, "id", None)
+    return {
+        "id": wid,
+        "name": getattr(ws, "name", wid),
+        "path": str(getattr(ws, "base_path", "")),
+    }
+
+
+def encode_cursor(after: str, version: int) -> str:
+    raw = json.dumps({"a": after, "v": version}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return str(data["a"]), int(data["v"])
+    except (ValueError, KeyError, TypeError) as exc:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from exc
+
+
+class WorkspaceListCache:
+    """
+    Snapshot versionato della lista workspace.
+
+    - la lista è ricostruita solo se invalidata (create/delete/...) o
+      più vecchia di SNAPSHOT_TTL; la versione cresce solo se il
+      contenuto è davvero cambiato
+    - paginazione keyset sull'id (ordinato): stabile anche se la lista
+      cambia tra una pagina e l'altra
+    - diff: per le ultime HISTORY_VERSIONS versioni si conoscono gli id
+      aggiunti, rimossi e modificati
+    """
+
+    def __init__(self) -> None:
+        # parte dal clock (ms): resta crescente anche tra un riavvio e l'altro,
+        # così la versione di un client di un processo precedente non collide
+        self.version = time.time_ns() // 1_000_000
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._order: List[str] = []
+        self._built_at = 0.0
+        self._stale = True
+        self._hidden: Set[str] = set()
+        # (versione, aggiunti, rimossi, modificati) per passare da versione-1 a versione
+        self._history: Deque[Tuple[int, Set[str], Set[str], Set[str]]] = deque(maxlen=HISTORY_VERSIONS)
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # invalidation
+    # ------------------------------------------------------------------
+
+    def invalidate(self) -> None:
+        self._stale = True
+
+    def hide(self, workspace_id: str) -> None:
+        """Esclude subito un workspace dalla lista (tombstone di una cancellazione)."""
+        self._hidden.add(workspace_id)
+        self._stale = True
+
+    def unhide(self, workspace_id: str) -> None:
+        self._hidden.discard(workspace_id)
+        self._stale = True
+
+    # ------------------------------------------------------------------
+    # snapshot
+    # ------------------------------------------------------------------
+
+    def refresh(self, list_workspaces: Callable[[], Iterable[Any]], *, force: bool = False) -> int:
+        """Ricostruisce la lista se serve; restituisce la versione corrente."""
+        with self._lock:
+            if not (force or self._stale or time.monotonic() - self._built_at > SNAPSHOT_TTL):
+                return self.version
+
+            entries = {}
+            for ws in list_workspaces():
+                entry = workspace_entry(ws)
+                if entry["id"] and entry["id"] not in self._hidden:
+                    entries[entry["id"]] = entry
+
+            old = self._entries
+            added = set(entries) - set(old)
+            removed = set(old) - set(entries)
+            changed = {wid for wid in set(entries) & set(old) if entries[wid] != old[wid]}
+
+            if added or removed or changed or not self._built_at:
+                self.version += 1
+                self._history.append((self.version, added, removed, changed))
+                self._entries = entries
+                self._order = sorted(entries)
+
+            self._built_at = time.monotonic()
+            self._stale = False
+            return self.version
+
+    def page(self, *, cursor: Optional[str] = None, limit: Optional[int] = None) -> Dict[str, Any]:
+        with self._lock:
+            start = 0
+            if cursor:
+                after, _version = decode_cursor(cursor)
+                start = bisect.bisect_right(self._order, after)
+            ids = self._order[start:start + limit] if limit else self._order[start:]
+            result: Dict[str, Any] = {
+                "version": self.version,
+                "total": len(self._order),
+                "workspaces": [self._entries[wid] for wid in ids],
+            }
+            if limit and start + limit < len(self._order):
+                result["next_cursor"] = encode_cursor(ids[-1], self.version)
+            return result
+
+    def diff(self, since_version: int) -> Optional[Dict[str, Any]]:
+        """
+        Modifiche da since_version alla versione corrente; None se la
+        versione è troppo vecchia (o futura): serve la lista completa.
+        """
+        with self._lock:
+            if since_version == self.version:
+                return {"version": self.version, "added": [], "removed": [], "changed": []}
+            oldest = self._history[0][0] if self._history else self.version + 1
+            if since_version > self.version or since_version < oldest - 1:
+                return None
+
+            added: Set[str] = set()
+            removed: Set[str] = set()
+            changed: Set[str] = set()
+            for version, v_added, v_removed, v_changed in self._history:
+                if version <= since_version:
+                    continue
+                for wid in v_added:
+                    if wid in removed:
+                        # rimosso e ricreato: per il client è una modifica
+                        removed.discard(wid)
+                        changed.add(wid)
+                    else:
+                        added.add(wid)
+                for wid in v_removed:
+                    if wid in added:
+                        added.discard(wid)
+                    else:
+                        changed.discard(wid)
+                        removed.add(wid)
+                changed.update(wid for wid in v_changed if wid not in added)
+
+            return {
+                "version": self.version,
+                "added": [self._entries[wid] for wid in sorted(added) if wid in self._entries],
+                "removed": sorted(removed),
+                "changed": [self._entries[wid] for wid in sorted(changed) if wid in self._entries],
+            }
+
+
+WORKSPACE_LIST = WorkspaceListCache()
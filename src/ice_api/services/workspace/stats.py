@@ -0,0 +1,409 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import stat
+import threading
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+
+from ice_api.services.code.symbols import default_index_path
+from ice_api.services.knowledge.engine import default_knowledge_dir
+from ice_api.services.logs.scan import default_state_dir
+from ice_api.services.workspace.watch import IGNORED_DIRS, TreeWatcher, iter_tree_files
+
+logger = logging.getLogger("ice.api.services.workspace.stats")
+
+STATS_VERSION = 1
+SAVE_INTERVAL = 30.0            # secondi minimi tra due salvataggi dopo eventi
+PROGRESS_EVERY = 5000           # file per evento di progresso durante il refresh
+
+
+def file_type(name: str) -> str:
+    ext = os.path.splitext(name)[1]
+    return ext[1:].lower() if ext else "(none)"
+
+
+def path_size(path: Path) -> int:
+    """Dimensione di un file o di una directory (ricorsiva); 0 se assente."""
+    try:
+        if path.is_file():
+            return path.stat().st_size
+        return sum(entry.stat(follow_symlinks=False).st_size for entry in iter_tree_files(str(path)))
+    except OSError:
+        return 0
+
+
+# ============================================================================
+# AGGREGATES
+# ============================================================================
+
+class FileAggregates:
+    """
+    Conteggi e byte per tipo, mantenuti per differenza: ogni file
+    ricorda (size, tipo) per poter sottrarre il vecchio contributo.
+    """
+
+    def __init__(self) -> None:
+        self.files: Dict[str, Tuple[int, str]] = {}
+        self.total_bytes = 0
+        self.by_type: Dict[str, List[int]] = {}   # tipo -> [file, byte]
+
+    def upsert(self, rel: str, size: int) -> None:
+        self.remove(rel)
+        kind = file_type(rel)
+        self.files[rel] = (size, kind)
+        self.total_bytes += size
+        bucket = self.by_type.setdefault(kind, [0, 0])
+        bucket[0] += 1
+        bucket[1] += size
+
+    def remove(self, rel: str) -> None:
+        old = self.files.pop(rel, None)
+        if old is None:
+            return
+        size, kind = old
+        self.total_bytes -= size
+        bucket = self.by_type[kind]
+        bucket[0] -= 1
+        bucket[1] -= size
+        if not bucket[0]:
+            del self.by_type[kind]
+
+    def remove_tree(self, rel_dir: str) -> None:
+        prefix = rel_dir.rstrip("/") + "/"
+        for rel in [r for r in self.files if r.startswith(prefix)]:
+            self.remove(rel)
+
+    def summary(self, top_types: int = 50) -> Dict[str, Any]:
+        ranked = sorted(self.by_type.items(), key=lambda item: item[1][1], reverse=True)
+        return {
+            "files": len(self.files),
+            "bytes": self.total_bytes,
+            "by_type": {
+                kind: {"files": files, "bytes": size}
+                for kind, (files, size) in ranked[:top_types]
+            },
+        }
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[Tuple[str, int]]) -> "FileAggregates":
+        agg = cls()
+        for rel, size in entries:
+            agg.upsert(rel, size)
+        return agg
+
+
+# ============================================================================
+# WORKSPACE STATS
+# ============================================================================
+
+class WorkspaceStats:
+    """
+    Statistiche di un workspace servite dagli aggregati in memoria.
+
+    - all'avvio: snapshot su disco (se presente) + refresh in background
+    - poi: aggiornamenti incrementali dagli eventi del TreeWatcher (o da
+      apply_paths() per runtime che hanno già i propri eventi file)
+    - refresh(): ricalcolo completo, con progresso in streaming; le
+      richieste concorrenti si agganciano allo stesso ricalcolo
+    """
+
+    def __init__(self, workspace_id: str, root: str, *, state_dir: Optional[Path] = None) -> None:
+        self.workspace_id = workspace_id
+        self.root = os.path.abspath(root)
+        self.state_path = (state_dir or default_state_dir()) / "workspace-stats" / f"{workspace_id}.json"
+
+        self.aggregates = FileAggregates()
+        self.updated_at: Optional[float] = None
+        self.source = "empty"             # empty | snapshot | scan
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_save = 0.0
+
+        self._watcher: Optional[TreeWatcher] = None
+        self._watch_task: Optional[asyncio.Task] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._apply_tasks: Set[asyncio.Task] = set()
+        self._subscribers: List[asyncio.Queue] = []
+        self._touched_during_refresh: Optional[Set[str]] = None
+
+        self._load()
+
+    # ------------------------------------------------------------------
+    # persistence
+    # ------------------------------------------------------------------
+
+    def _load(self) -> None:
+        try:
+            data = json.loads(self.state_path.read_text("utf-8"))
+        except (OSError, ValueError):
+            return
+        if data.get("version") != STATS_VERSION or data.get("root") != self.root:
+            return
+        self.aggregates = FileAggregates.from_entries(
+            (rel, size) for rel, size in data.get("files", {}).items()
+        )
+        self.updated_at = data.get("updated_at")
+        self.source = "snapshot"
+
+    def save(self) -> None:
+        with self._lock:
+            payload = {
+                "version": STATS_VERSION,
+                "root": self.root,
+                "updated_at": self.updated_at,
+                "files": {rel: size for rel, (size, _kind) in self.aggregates.files.items()},
+            }
+            self._dirty = False
+            self._last_save = time.monotonic()
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(payload, separators=(",", ":")), "utf-8")
+        os.replace(tmp, self.state_path)
+
+    # ------------------------------------------------------------------
+    # incremental updates
+    # ------------------------------------------------------------------
+
+    def _rel(self, path: str) -> Optional[str]:
+        rel = os.path.relpath(os.path.abspath(path), self.root)
+        if rel.startswith(".."):
+            return None
+        return rel.replace(os.sep, "/")
+
+    def apply_paths(self, paths: Iterable[str]) -> List[str]:
+        """
+        Riallinea gli aggregati per i path indicati (creati, modificati o
+        rimossi): uno stat per path, scansione solo per directory nuove.
+        Restituisce le directory trovate, da aggiungere al watch.
+        """
+        paths = list(paths)
+        new_dirs: List[str] = []
+        updates: List[Tuple[str, Optional[int], bool]] = []   # rel, size, is_dir
+        for path in paths:
+            rel = self._rel(path)
+            if rel is None or any(part in IGNORED_DIRS for part in rel.split("/")):
+                continue
+            try:
+                st = os.stat(path, follow_symlinks=False)
+            except OSError:
+                updates.append((rel, None, False))
+                continue
+            # dallo lstat, come _scan: i symlink non vengono seguiti né contati
+            if stat.S_ISDIR(st.st_mode):
+                new_dirs.append(path)
+                updates.append((rel, None, True))
+            elif stat.S_ISREG(st.st_mode):
+                updates.append((rel, st.st_size, False))
+            else:
+                updates.append((rel, None, False))
+
+        scanned: Dict[str, List[Tuple[str, int]]] = {}
+        for directory in new_dirs:
+            scanned[directory] = [
+                (self._rel(entry.path), entry.stat(follow_symlinks=False).st_size)
+                for entry in iter_tree_files(directory)
+            ]
+
+        with self._lock:
+            for rel, size, is_dir in updates:
+                if is_dir or size is None:
+                    # directory nuova/spostata qui, o path sparito: via il vecchio sottoalbero
+                    if rel == ".":
+                        self.aggregates = FileAggregates()
+                    else:
+                        self.aggregates.remove(rel)
+                        self.aggregates.remove_tree(rel)
+                if size is not None:
+                    self.aggregates.upsert(rel, size)
+            for entries in scanned.values():
+                for rel, size in entries:
+                    self.aggregates.upsert(rel, size)
+            if self._touched_during_refresh is not None:
+                self._touched_during_refresh.update(paths)
+            self.updated_at = time.time()
+            self._dirty = True
+        return new_dirs
+
+    def _on_watch_changes(self, paths: Set[str]) -> None:
+        loop = asyncio.get_running_loop()
+
+        async def apply() -> None:
+            new_dirs = await asyncio.to_thread(self.apply_paths, paths)
+            if self._watcher is not None:
+                for directory in new_dirs:
+                    await self._watcher.add_tree(directory)
+            if self._dirty and time.monotonic() - self._last_save > SAVE_INTERVAL:
+                await asyncio.to_thread(self.save)
+
+        # riferimento fino alla fine: il loop tiene solo riferimenti deboli ai task
+        task = loop.create_task(apply())
+        self._apply_tasks.add(task)
+        task.add_done_callback(self._apply_done)
+
+    def _apply_done(self, task: asyncio.Task) -> None:
+        self._apply_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(
+                "Workspace stats update failed",
+                exc_info=task.exception(),
+                extra={"root": self.root},
+            )
+
+    def ensure_watching(self) -> None:
+        """Avvia (una volta) watch e refresh iniziale; richiede un event loop."""
+        if self._watcher is None:
+            self._watcher = TreeWatcher(self.root, self._on_watch_changes)
+            # la visita dell'albero gira in un thread: la richiesta non la aspetta
+            self._watch_task = asyncio.get_running_loop().create_task(self._start_watch(self._watcher))
+        if self.source != "scan" and self._refresh_task is None:
+            self._start_refresh()
+
+    async def _start_watch(self, watcher: TreeWatcher) -> None:
+        try:
+            await watcher.start()
+        except OSError:
+            logger.warning("Workspace watch failed", exc_info=True, extra={"root": self.root})
+
+    def close(self) -> None:
+        if self._watcher is not None:
+            self._watcher.close()
+            self._watcher = None
+
+    # ------------------------------------------------------------------
+    # full refresh
+    # ------------------------------------------------------------------
+
+    def _scan(self, queue_put) -> FileAggregates:
+        agg = FileAggregates()
+        for entry in iter_tree_files(self.root):
+            try:
+                size = entry.stat(follow_symlinks=False).st_size
+            except OSError:
+                continue
+            agg.upsert(self._rel(entry.path), size)
+            if len(agg.files) % PROGRESS_EVERY == 0:
+                queue_put({"progress": {"files": len(agg.files), "bytes": agg.total_bytes}})
+        return agg
+
+    def _start_refresh(self) -> asyncio.Task:
+        loop = asyncio.get_running_loop()
+
+        def publish(event: Dict[str, Any]) -> None:
+            for queue in list(self._subscribers):
+                queue.put_nowait(event)
+
+        def publish_threadsafe(event: Dict[str, Any]) -> None:
+            loop.call_soon_threadsafe(publish, event)
+
+        async def run() -> None:
+            started = time.perf_counter()
+            with self._lock:
+                self._touched_during_refresh = set()
+            try:
+                agg = await asyncio.to_thread(self._scan, publish_threadsafe)
+                with self._lock:
+                    self.aggregates = agg
+                    touched, self._touched_during_refresh = self._touched_during_refresh, None
+                    self.updated_at = time.time()
+                    self.source = "scan"
+                if touched:
+                    # eventi arrivati durante la scansione: riapplicati sul nuovo aggregato
+                    await asyncio.to_thread(self.apply_paths, touched)
+                await asyncio.to_thread(self.save)
+                logger.info(
+                    "Workspace stats refreshed",
+                    extra={
+                        "workspace_id": self.workspace_id,
+                        "files": len(agg.files),
+                        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+                    },
+                )
+            except Exception as exc:
+                with self._lock:
+                    self._touched_during_refresh = None
+                logger.exception("Workspace stats refresh failed", extra={"workspace_id": self.workspace_id})
+                publish({"error": str(exc)})
+            finally:
+                self._refresh_task = None
+                publish({"done": True})
+
+        self._refresh_task = loop.create_task(run())
+        return self._refresh_task
+
+    async def refresh(self) -> AsyncIterator[Dict[str, Any]]:
+        """Ricalcolo completo in background; produce il progresso, poi lo snapshot."""
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.append(queue)
+        try:
+            if self._refresh_task is None:
+                self._start_refresh()
+            while True:
+                event = await queue.get()
+                if event.get("done"):
+                    break
+                yield event
+        finally:
+            self._subscribers.remove(queue)
+        yield {"stats": await asyncio.to_thread(self.snapshot)}
+
+    # ------------------------------------------------------------------
+    # read
+    # ------------------------------------------------------------------
+
+    def index_sizes(self) -> Dict[str, int]:
+        return {
+            "knowledge": path_size(default_knowledge_dir(self.workspace_id)),
+            "code_symbols": path_size(default_index_path(self.root)),
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            summary = self.aggregates.summary()
+            meta = {
+                "updated_at": self.updated_at,
+                "source": self.source,
+                "refreshing": self._refresh_task is not None,
+                "watching": bool(self._watcher and self._watcher.active),
+                "watch_complete": bool(self._watcher and self._watcher.complete),
+            }
+        return {
+            "workspace_id": self.workspace_id,
+            "root": self.root,
+            **summary,
+            "indexes": self.index_sizes(),
+            **meta,
+        }
+
+
+_STATS: Dict[str, WorkspaceStats] = {}
+_STATS_GUARD = threading.Lock()
+
+
+def get_workspace_stats(workspace_id: str, root: str) -> WorkspaceStats:
+    with _STATS_GUARD:
+        stats = _STATS.get(workspace_id)
+        if stats is None or stats.root != os.path.abspath(root):
+            if stats is not None:
+                stats.close()
+            stats = _STATS[workspace_id] = WorkspaceStats(workspace_id, root)
+        return stats
+
+
+def drop_workspace_stats(workspace_id: str) -> None:
+    """Workspace cancellato: ferma il watch e rimuove lo snapshot."""
+    with _STATS_GUARD:
+        stats = _STATS.pop(workspace_id, None)
+    if stats is not None:
+        stats.close()
+        state_path = stats.state_path
+    else:
+        state_path = default_state_dir() / "workspace-stats" / f"{workspace_id}.json"
+    try:
+        state_path.unlink()
+    except OSError:
+        pass
@@ -0,0 +1,387 @@
+from __future__ import annotations
+
+import errno
+import fcntl
+import json
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from ice_api.services.code.symbols import default_index_path
+from ice_api.services.knowledge.engine import default_knowledge_dir, export_collection
+from ice_api.services.logs.scan import default_state_dir
+
+logger = logging.getLogger("ice.api.services.workspace.templates")
+
+TEMPLATE_VERSION = 1
+CLONE_WORKERS = 8               # copie di file in parallelo (I/O bound, il GIL è rilasciato)
+CLONE_MODES = ("auto", "reflink", "hardlink", "copy")
+
+_FICLONE = 0x40049409           # ioctl Linux: clone copy-on-write (btrfs, xfs, ...)
+_NAME_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]{0,127}$")
+
+# errori con cui il filesystem rifiuta reflink/hardlink: si ripiega sulla copia
+_UNSUPPORTED = {
+    errno.EOPNOTSUPP, errno.ENOTSUP, errno.EXDEV, errno.EINVAL,
+    errno.ENOTTY, errno.EPERM, errno.EMLINK, errno.ENOSYS,
+}
+
+# ============================================================================
+# TEMPLATE LAYOUT
+# ============================================================================
+# <state>/workspace-templates/<nome>/
+#   template.json         manifest (settings del workspace, conteggi, indici)
+#   tree/                 scheletro dei file
+#   indexes/code.sqlite   indice simboli, path riferiti a tree/
+#   indexes/knowledge/    collezione knowledge, path riferiti a tree/
+#   indexes/stats.json    snapshot workspace.stats
+#
+# Gli indici sono copiati e "ribasati" (prefisso dei path sostituito)
+# sulla root del nuovo workspace. Il clone preserva gli mtime: al primo
+# code.index / knowledge.sync i file risultano invariati e non vengono
+# rianalizzati.
+# ============================================================================
+
+
+def templates_dir() -> Path:
+    return default_state_dir() / "workspace-templates"
+
+
+def template_path(name: str) -> Path:
+    if not _NAME_RE.match(name or ""):
+        raise ValueError(f"Invalid template name: {name!r}")
+    return templates_dir() / name
+
+
+# ============================================================================
+# TREE CLONING
+# ============================================================================
+
+def _reflink(src: str, dst: str) -> None:
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+        except OSError:
+            fdst.close()
+            os.unlink(dst)
+            raise
+    shutil.copystat(src, dst, follow_symlinks=False)
+
+
+def _clone_file(src: str, dst: str, method: str) -> str:
+    """Clona un file con `method`; restituisce il metodo effettivamente usato."""
+    if method == "reflink":
+        try:
+            _reflink(src, dst)
+            return "reflink"
+        except OSError as exc:
+            if exc.errno not in _UNSUPPORTED:
+                raise
+    elif method == "hardlink":
+        try:
+            os.link(src, dst)
+            return "hardlink"
+        except OSError as exc:
+            if exc.errno not in _UNSUPPORTED:
+                raise
+    shutil.copy2(src, dst)
+    return "copy"
+
+
+def clone_tree(
+    src: str,
+    dst: str,
+    *,
+    mode: str = "auto",
+    workers: int = CLONE_WORKERS,
+    overwrite: bool = False,
+) -> Dict[str, Any]:
+    """
+    Clona l'albero src dentro dst (che può già esistere).
+
+    - auto/reflink: clone copy-on-write se il filesystem lo supporta,
+      altrimenti copia
+    - hardlink: file condivisi con src; solo per sorgenti che non
+      vengono modificate sul posto, altrimenti le modifiche si vedono
+      da entrambe le parti
+    - copy: copia (sendfile) con `workers` file in parallelo
+
+    Il metodo è verificato sul primo file; i file già presenti in dst
+    sono lasciati invariati, salvo overwrite.
+    """
+    if mode not in CLONE_MODES:
+        raise ValueError(f"Invalid clone mode: {mode!r} (expected one of {', '.join(CLONE_MODES)})")
+    src = os.path.abspath(src)
+    dst = os.path.abspath(dst)
+
+    counts: Dict[str, Any] = {
+        "files": 0, "dirs": 0, "symlinks": 0, "bytes": 0, "skipped": 0,
+        "reflink": 0, "hardlink": 0, "copy": 0,
+    }
+    files: List[Tuple[str, str, int]] = []
+
+    for dirpath, dirnames, filenames in os.walk(src):
+        rel = os.path.relpath(dirpath, src)
+        target_dir = dst if rel == "." else os.path.join(dst, rel)
+        os.makedirs(target_dir, exist_ok=True)
+        counts["dirs"] += 1
+        for name in dirnames + filenames:
+            path = os.path.join(dirpath, name)
+            target = os.path.join(target_dir, name)
+            if os.path.islink(path):
+                if os.path.lexists(target):
+                    if not overwrite:
+                        counts["skipped"] += 1
+                        continue
+                    os.unlink(target)
+                os.symlink(os.readlink(path), target)
+                counts["symlinks"] += 1
+                continue
+            if name in dirnames:
+                continue
+            if os.path.lexists(target):
+                if not overwrite:
+                    counts["skipped"] += 1
+                    continue
+                os.unlink(target)
+            files.append((path, target, os.lstat(path).st_size))
+        # symlink a directory: os.walk non li segue
+        dirnames[:] = [d for d in dirnames if not os.path.islink(os.path.join(dirpath, d))]
+
+    if not files:
+        return counts
+
+    method = "copy" if mode == "copy" else ("hardlink" if mode == "hardlink" else "reflink")
+    # il primo file decide: se il filesystem rifiuta, il resto va in copia
+    first = _clone_file(files[0][0], files[0][1], method)
+    counts[first] += 1
+    method = first
+
+    def run(item: Tuple[str, str, int]) -> str:
+        return _clone_file(item[0], item[1], method)
+
+    rest = files[1:]
+    if method == "copy" and len(rest) > 1 and workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            used = list(pool.map(run, rest, chunksize=16))
+    else:
+        used = [run(item) for item in rest]
+    for how in used:
+        counts[how] += 1
+
+    counts["files"] = len(files)
+    counts["bytes"] = sum(size for _s, _t, size in files)
+    counts["method"] = method
+    return counts
+
+
+# ============================================================================
+# INDEXES
+# ============================================================================
+
+def _backup_sqlite(src: Path, dst: Path) -> None:
+    """Copia coerente di un database SQLite (anche in WAL e aperto altrove)."""
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    source = sqlite3.connect(str(src))
+    try:
+        target = sqlite3.connect(str(dst))
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+    finally:
+        source.close()
+
+
+def _rebase_paths(db_path: Path, columns: Sequence[Tuple[str, str]], old_root: str, new_root: str) -> None:
+    """Sostituisce il prefisso old_root con new_root nelle colonne path indicate."""
+    old = os.path.join(os.path.abspath(old_root), "")
+    new = os.path.join(os.path.abspath(new_root), "")
+    conn = sqlite3.connect(str(db_path))
+    try:
+        with conn:
+            for table, column in columns:
+                conn.execute(
+                    f"UPDATE {table} SET {column} = ? || substr({column}, ?) "
+                    f"WHERE {column} >= ? AND {column} < ?",
+                    (new, len(old) + 1, old, old + "\U0010ffff"),
+                )
+    finally:
+        conn.close()
+
+
+_CODE_PATHS = (("files", "path"),)
+_KNOWLEDGE_PATHS = (("files", "path"), ("chunks", "source"))
+
+
+def _stats_snapshot_path(workspace_id: str) -> Path:
+    return default_state_dir() / "workspace-stats" / f"{workspace_id}.json"
+
+
+def _capture_indexes(root: str, workspace_id: Optional[str], dst: Path, tree: Path) -> List[str]:
+    captured: List[str] = []
+
+    code_index = default_index_path(root)
+    if code_index.exists():
+        _backup_sqlite(code_index, dst / "code.sqlite")
+        _rebase_paths(dst / "code.sqlite", _CODE_PATHS, root, str(tree))
+        captured.append("code")
+
+    if not workspace_id:
+        return captured
+
+    if export_collection(workspace_id, dst / "knowledge"):
+        _rebase_paths(dst / "knowledge" / "chunks.sqlite", _KNOWLEDGE_PATHS, root, str(tree))
+        captured.append("knowledge")
+
+    try:
+        snapshot = json.loads(_stats_snapshot_path(workspace_id).read_text("utf-8"))
+    except (OSError, ValueError):
+        snapshot = None
+    if snapshot and snapshot.get("root") == os.path.abspath(root):
+        snapshot["root"] = str(tree)
+        (dst / "stats.json").write_text(json.dumps(snapshot, separators=(",", ":")), "utf-8")
+        captured.append("stats")
+
+    return captured
+
+
+def _restore_indexes(src: Path, tree: Path, root: str, workspace_id: str) -> List[str]:
+    restored: List[str] = []
+
+    if (src / "code.sqlite").exists():
+        target = default_index_path(root)
+        if not target.exists():
+            target.parent.mkdir(parents=True, exist_ok=True)
+            tmp = target.with_suffix(f".tmp-{uuid.uuid4().hex[:8]}")
+            shutil.copyfile(src / "code.sqlite", tmp)
+            _rebase_paths(tmp, _CODE_PATHS, str(tree), root)
+            os.replace(tmp, target)
+            restored.append("code")
+
+    if (src / "knowledge" / "chunks.sqlite").exists():
+        target = default_knowledge_dir(workspace_id)
+        if not (target / "chunks.sqlite").exists():
+            clone_tree(str(src / "knowledge"), str(target))
+            _rebase_paths(target / "chunks.sqlite", _KNOWLEDGE_PATHS, str(tree), root)
+            restored.append("knowledge")
+
+    if (src / "stats.json").exists():
+        target = _stats_snapshot_path(workspace_id)
+        if not target.exists():
+            snapshot = json.loads((src / "stats.json").read_text("utf-8"))
+            snapshot["root"] = os.path.abspath(root)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_text(json.dumps(snapshot, separators=(",", ":")), "utf-8")
+            restored.append("stats")
+
+    return restored
+
+
+# ============================================================================
+# TEMPLATES
+# ============================================================================
+
+def load_template(name: str) -> Dict[str, Any]:
+    path = template_path(name)
+    try:
+        manifest = json.loads((path / "template.json").read_text("utf-8"))
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Workspace template not found: {name}") from None
+    if manifest.get("version") != TEMPLATE_VERSION:
+        raise ValueError(f"Unsupported workspace template version: {manifest.get('version')}")
+    return manifest
+
+
+def list_templates() -> List[Dict[str, Any]]:
+    directory = templates_dir()
+    if not directory.is_dir():
+        return []
+    templates = []
+    for entry in sorted(directory.iterdir()):
+        if entry.name.startswith(".") or not entry.is_dir():
+            continue
+        try:
+            templates.append(load_template(entry.name))
+        except (OSError, ValueError):
+            continue
+    return templates
+
+
+def save_template(
+    name: str,
+    root: str,
+    *,
+    workspace_id: Optional[str] = None,
+    settings: Optional[Dict[str, Any]] = None,
+    description: str = "",
+    mode: str = "auto",
+) -> Dict[str, Any]:
+    """
+    Crea (o sostituisce) un template dallo stato corrente di un workspace:
+    file e indici. Il template è costruito a parte e pubblicato con un rename.
+    """
+    final = template_path(name)
+    root = os.path.abspath(root)
+    if not os.path.isdir(root):
+        raise FileNotFoundError(f"Workspace root not found: {root}")
+
+    staging = final.parent / f".{name}.tmp-{uuid.uuid4().hex[:8]}"
+    staging.mkdir(parents=True)
+    try:
+        counts = clone_tree(root, str(staging / "tree"), mode=mode)
+        indexes = _capture_indexes(root, workspace_id, staging / "indexes", final / "tree")
+        manifest = {
+            "version": TEMPLATE_VERSION,
+            "name": name,
+            "description": description,
+            "settings": dict(settings or {}),
+            "source_workspace_id": workspace_id,
+            "created_at": time.time(),
+            "files": counts["files"],
+            "bytes": counts["bytes"],
+            "indexes": indexes,
+        }
+        (staging / "template.json").write_text(json.dumps(manifest, indent=2), "utf-8")
+
+        previous = None
+        if final.exists():
+            previous = final.parent / f".{name}.old-{uuid.uuid4().hex[:8]}"
+            os.rename(final, previous)
+        os.rename(staging, final)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    if previous is not None:
+        shutil.rmtree(previous, ignore_errors=True)
+
+    logger.info(
+        "Workspace template saved",
+        extra={"template": name, "files": counts["files"], "indexes": indexes},
+    )
+    return manifest
+
+
+def instantiate_template(
+    name: str,
+    root: str,
+    workspace_id: str,
+    *,
+    mode: str = "auto",
+    workers: int = CLONE_WORKERS,
+) -> Dict[str, Any]:
+    """Popola la root di un workspace appena creato dal template `name`."""
+    path = template_path(name)
+    load_template(name)
+    root = os.path.abspath(root)
+    counts = clone_tree(str(path / "tree"), root, mode=mode, workers=workers)
+    counts["indexes"] = _restore_indexes(path / "indexes", path / "tree", root, workspace_id)
+    counts["template"] = name
+    return counts
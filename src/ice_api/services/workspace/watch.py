@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import asyncio
+import ctypes
+import errno
+import logging
+import os
+from typing import Callable, Dict, Iterable, Optional, Set
+
+from ice_api.utils.inotify import (
+    DIR_MASK,
+    IN_CLOEXEC,
+    IN_IGNORED,
+    IN_NONBLOCK,
+    IN_Q_OVERFLOW,
+    iter_events,
+    load_libc,
+)
+
+logger = logging.getLogger("ice.api.services.workspace.watch")
+
+FLUSH_WINDOW = 0.5          # secondi per coalescere un burst di eventi
+
+# directory pesanti e rumorose: né contate né osservate
+IGNORED_DIRS = {".git", ".hg", ".svn", "__pycache__", ".venv", "venv", "node_modules", ".tox", ".mypy_cache"}
+
+
+class TreeWatcher:
+    """
+    Watch inotify ricorsivo di un albero (un watch per directory).
+
+    Gli eventi non sono interpretati: i path toccati sono raccolti per
+    FLUSH_WINDOW secondi e passati in blocco a on_changes, che decide
+    con uno stat cosa è cambiato. Le nuove directory vanno aggiunte con
+    add_tree() (di norma dentro on_changes).
+
+    start() e add_tree() sono coroutine: la visita dell'albero e gli
+    inotify_add_watch (un os.walk sull'intero workspace) girano in un
+    thread, mai sull'event loop.
+
+    Con inotify assente, o esaurito il limite di watch, `complete` è False:
+    le statistiche restano corrette solo fino al prossimo refresh.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        on_changes: Callable[[Set[str]], None],
+        *,
+        loop: Optional[asyncio.AbstractEventLoop] = None,
+    ) -> None:
+        self.root = os.path.abspath(root)
+        self.complete = False
+        self._on_changes = on_changes
+        self._loop = loop or asyncio.get_running_loop()
+        self._libc = load_libc()
+        self._fd = -1
+        self._dir_by_wd: Dict[int, str] = {}
+        self._wd_by_dir: Dict[str, int] = {}
+        self._pending: Set[str] = set()
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def active(self) -> bool:
+        return self._fd >= 0
+
+    async def start(self) -> bool:
+        if self._libc is None:
+            return False
+        fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            return False
+        self._fd = fd
+        self.complete = True
+        await self.add_tree(self.root)
+        if self._fd != fd:
+            # chiuso durante la visita
+            return False
+        # gli eventi arrivati durante la visita restano nel fd fino a qui
+        self._loop.add_reader(fd, self._on_readable)
+        return True
+
+    def close(self) -> None:
+        if self._fd < 0:
+            return
+        self._loop.remove_reader(self._fd)
+        os.close(self._fd)
+        self._fd = -1
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+        self._dir_by_wd.clear()
+        self._wd_by_dir.clear()
+
+    async def add_tree(self, top: str) -> None:
+        await asyncio.to_thread(self._add_tree, top)
+
+    def _add_tree(self, top: str) -> None:
+        for dirpath, dirnames, _files in os.walk(top):
+            dirnames[:] = [d for d in dirnames if d not in IGNORED_DIRS]
+            if not self._add_watch(dirpath):
+                dirnames[:] = []
+
+    def _add_watch(self, directory: str) -> bool:
+        if self._fd < 0 or directory in self._wd_by_dir:
+            return self._fd >= 0
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), DIR_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err == errno.ENOSPC and self.complete:
+                logger.warning(
+                    "inotify watch limit reached, workspace stats partially watched",
+                    extra={"root": self.root, "watches": len(self._wd_by_dir)},
+                )
+                self.complete = False
+            return False
+        self._wd_by_dir[directory] = wd
+        self._dir_by_wd[wd] = directory
+        return True
+
+    def _on_readable(self) -> None:
+        try:
+            data = os.read(self._fd, 256 * 1024)
+        except BlockingIOError:
+            return
+
+        for wd, mask, name in iter_events(data):
+            if mask & IN_Q_OVERFLOW:
+                # eventi persi: l'albero intero va ricontrollato
+                self._pending.add(self.root)
+                continue
+            directory = self._dir_by_wd.get(wd)
+            if directory is None:
+                continue
+            if mask & IN_IGNORED:
+                # directory rimossa: il kernel ha già tolto il watch
+                self._dir_by_wd.pop(wd, None)
+                self._wd_by_dir.pop(directory, None)
+                continue
+            if name:
+                self._pending.add(os.path.join(directory, os.fsdecode(name)))
+
+        if self._pending and self._flush_handle is None:
+            self._flush_handle = self._loop.call_later(FLUSH_WINDOW, self._flush)
+
+    def _flush(self) -> None:
+        self._flush_handle = None
+        paths, self._pending = self._pending, set()
+        try:
+            self._on_changes(paths)
+        except Exception:
+            logger.exception("Workspace watch callback failed", extra={"root": self.root})
+
+
+def iter_tree_files(top: str) -> Iterable[os.DirEntry]:
+    """File regolari sotto top (directory ignorate escluse), senza seguire symlink."""
+    stack = [top]
+    while stack:
+        directory = stack.pop()
+        try:
+            it = os.scandir(directory)
+        except OSError:
+            continue
+        with it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in IGNORED_DIRS:
+                            stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        yield entry
+                except OSError:
+                    continue
@@ -10,12 +10,16 @@ __all__ = [
     "LifecyclePhase",
     "IPCMessageKind",
     "ResultStatus",
+    "StepStatus",
+    "JobStatus",
     # identifiers
     "ActionName",
     "AgentName",
     "WorkspaceId",
     "SessionId",
     "UserId",
+    "WorkflowId",
+    "StepId",
     # primitives
     "PrimitiveType",
     "ValueConstraint",
@@ -23,4 +27,6 @@ __all__ = [
     "ActionContext",
     "ActionCall",
     "ActionResult",
+    "WorkflowStep",
+    "WorkflowPlan",
 ]
@@ -9,6 +9,8 @@ from ice_api.types.identifiers import (
     WorkspaceId,
     SessionId,
     UserId,
+    WorkflowId,
+    StepId,
 )
 
 
@@ -100,3 +102,40 @@ class ActionResult:
         )
         if self.status == ResultStatus.SUCCESS:
             self.status = ResultStatus.FAILED
+
+
+# ============================================================================
+# WORKFLOW PLAN
+# ============================================================================
+
+@dataclass
+class WorkflowStep:
+    """
+    Nodo di un piano di workflow: una ActionCall con le sue dipendenze.
+
+    - depends_on: step che devono essere completati prima
+    - rollback:   ActionCall opzionale che annulla gli effetti dello step
+    - cost:       stima relativa della durata (per il critical path)
+    """
+
+    id: StepId
+    call: ActionCall
+    depends_on: List[StepId] = field(default_factory=list)
+    rollback: Optional[ActionCall] = None
+    cost: float = 1.0
+
+
+@dataclass
+class WorkflowPlan:
+    """
+    Piano di workflow come DAG di WorkflowStep.
+    """
+
+    workflow_id: WorkflowId
+    steps: List[WorkflowStep] = field(default_factory=list)
+
+    def get_step(self, step_id: StepId) -> Optional[WorkflowStep]:
+        for step in self.steps:
+            if step.id == step_id:
+                return step
+        return None
@@ -27,6 +27,23 @@ class ResultStatus(str, Enum):
     PENDING = "pending"
 
 
+class StepStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    SKIPPED = "skipped"
+    ROLLED_BACK = "rolled_back"
+
+
+class JobStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
 class LifecyclePhase(str, Enum):
     PREBOOT = "preboot"
     BOOTSTRAP = "bootstrap"
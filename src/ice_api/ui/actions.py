@@ -4,8 +4,61 @@ from collections import defaultdict, deque
 from pathlib import Path
 from typing import Callable, Dict, Any, Awaitable
 import logging
+import asyncio
 import os
 import time
+import uuid
+
+from ice_api.ipc.errors import OrchestratorRoutingError
+from ice_api.services.agents import AGENTS
+from ice_api.services.code import SymbolIndex, read_file_range
+from ice_api.services.code.reader import DEFAULT_MAX_BYTES
+from ice_api.services.cv import (
+    ARTIFACTS,
+    CVPipelineError,
+    items_from_params,
+    ocr_pages,
+    ocr_version,
+    submit_pipeline,
+    template_version,
+)
+from ice_api.services.jobs import JOBS
+from ice_api.services.knowledge import get_engine, has_numpy
+from ice_api.services.logs import (
+    follow_file,
+    get_index,
+    parse_columns,
+    parse_records,
+    scan_logs,
+    tail_lines,
+)
+from ice_api.services.logs.index import to_epoch
+from ice_api.services.logs.scan import walk_sources
+from ice_api.services.routing import ROUTES
+from ice_api.services.workflow import (
+    WorkflowEngine,
+    WorkflowPlanError,
+    current_step_id,
+    plan_from_dict,
+)
+from ice_api.services.workspace import (
+    WORKSPACE_LIST,
+    drop_workspace_stats,
+    get_workspace_stats,
+    instantiate_template,
+    list_templates,
+    load_template,
+    move_to_trash,
+    restore_from_trash,
+    resume_pending,
+    save_template,
+    submit_delete,
+)
+from ice_api.services.workspace.deletion import DEFAULT_IO_RATE
+from ice_api.types.common import ActionCall
+from ice_api.ui.profiling import PROFILER
+from ice_api.ui.streaming import unbounded
+from ice_api.utils.tracing import TRACER
 
 
 logger = logging.getLogger("ice.api.ui.actions")
@@ -55,6 +108,17 @@ def action(name: str):
     return decorator
 
 
+def _owner(runtime, action_name: str, method: str | None = None):
+    """
+    Agente proprietario dell'azione (o suo metodo), da ActionSpec.owner_agent
+    nella routing table.
+    """
+    route = ROUTES.route(action_name)
+    if route is None:
+        raise OrchestratorRoutingError(action_name)
+    return AGENTS.for_action(runtime, route.spec, method)
+
+
 # =============================================================================
 # DOCS ACTIONS
 # =============================================================================
@@ -89,27 +153,6 @@ def docs_read(params: dict, _runtime):
 _SYSTEM_CHAT_HISTORY = defaultdict(lambda: deque(maxlen=10))
 
 
-def _get_system_agent(runtime):
-    agent = None
-    if hasattr(runtime, "get_agent"):
-        try:
-            agent = runtime.get_agent("system-agent")
-        except Exception:
-            agent = None
-    if agent is None:
-        system_service = getattr(runtime, "system_service", None)
-        if system_service is not None:
-            agent = getattr(system_service, "system_agent", None)
-            if agent is None and hasattr(system_service, "get_agent"):
-                try:
-                    agent = system_service.get_agent("system-agent")
-                except Exception:
-                    agent = None
-    if agent is None:
-        raise RuntimeError("SystemAgent is not available on runtime")
-    return agent
-
-
 async def stream_system_chat(
     *,
     message: str,
@@ -142,7 +185,7 @@ async def stream_system_chat(
         messages.append({"role": "assistant", "content": h["assistant"]})
     messages.append({"role": "user", "content": message})
 
-    agent = _get_system_agent(runtime)
+    agent = _owner(runtime, "system.chat.stream")
 
     result = await agent.chat(
         ctx=None,
@@ -185,47 +228,275 @@ async def system_chat_stream(params: dict, runtime):
     return {"ok": True}
 
 
+# =============================================================================
+# JOBS
+# =============================================================================
+
+@action("system.job.status")
+async def system_job_status(params: dict, _runtime):
+    """Stato di un job (job_id) o dei job noti, filtrabili per kind."""
+    job_id = params.get("job_id")
+    if job_id:
+        job = JOBS.get(job_id)
+        if job is None:
+            return {"ok": False, "error": f"Unknown job: {job_id}"}
+        return {"ok": True, "job": job.to_dict()}
+    return {"ok": True, "jobs": [job.to_dict() for job in JOBS.list(kind=params.get("kind"))]}
+
+
+@action("system.job.cancel")
+async def system_job_cancel(params: dict, _runtime):
+    """Cancel cooperativo: il job si ferma al prossimo punto di controllo."""
+    job_id = params.get("job_id")
+    if not job_id:
+        return {"ok": False, "error": "Missing job_id"}
+    if not JOBS.cancel(job_id):
+        job = JOBS.get(job_id)
+        if job is None:
+            return {"ok": False, "error": f"Unknown job: {job_id}"}
+        return {"ok": False, "error": f"Job already {job.status.value}", "job": job.to_dict()}
+    return {"ok": True, "job_id": job_id}
+
+
+# =============================================================================
+# AGENTS
+# =============================================================================
+
+@action("system.agents.stats")
+async def system_agents_stats(params: dict, _runtime):
+    """Chiamate, coda e carico per agente."""
+    try:
+        stats = ROUTES.stats(params.get("agent"))
+    except ValueError as exc:
+        return {"ok": False, "error": str(exc)}
+    if params.get("include_routes"):
+        stats["routes"] = ROUTES.table()
+    return {"ok": True, **stats}
+
+
+@action("system.agents.configure")
+async def system_agents_configure(params: dict, _runtime):
+    mode = params.get("mode")
+    if not mode:
+        return {"ok": False, "error": "Missing mode"}
+    try:
+        ROUTES.set_mode(mode)
+    except ValueError as exc:
+        return {"ok": False, "error": str(exc)}
+    return {"ok": True, "mode": ROUTES.mode}
+
+
+# =============================================================================
+# PROFILING
+# =============================================================================
+
+@action("system.profile.slowest")
+async def system_profile_slowest(params: dict, _runtime):
+    """Richieste più lente (fasi in ms) e profili cProfile catturati."""
+    include_profile = bool(params.get("include_profile", False))
+    request_id = params.get("request_id")
+    if request_id:
+        profile = PROFILER.find(request_id)
+        if profile is None:
+            return {"ok": False, "error": f"No profile for request: {request_id}"}
+        return {"ok": True, "request": profile.to_dict(include_profile=True)}
+    limit = params.get("limit")
+    return {
+        "ok": True,
+        "settings": PROFILER.settings(),
+        "stats": dict(PROFILER.stats),
+        "slowest": PROFILER.slowest(int(limit) if limit else None, include_profile=include_profile),
+        "captured": PROFILER.captured(include_profile=include_profile),
+    }
+
+
+@action("system.profile.configure")
+async def system_profile_configure(params: dict, _runtime):
+    try:
+        settings = PROFILER.configure(
+            enabled=params.get("enabled"),
+            slowest=params.get("slowest"),
+            threshold_ms=params.get("threshold_ms"),
+            sample_rate=params.get("sample_rate"),
+        )
+    except (TypeError, ValueError) as exc:
+        return {"ok": False, "error": str(exc)}
+    if params.get("clear"):
+        PROFILER.clear()
+    return {"ok": True, "settings": settings}
+
+
 # =============================================================================
 # WORKSPACE ACTIONS
 # =============================================================================
 
 @action("workspace.list")
-async def workspace_list(_params: dict, runtime):
-    workspaces = runtime.session_manager.list_workspaces()
-    return {
+@action("system.workspace.list")
+async def workspace_list(params: dict, runtime):
+    """
+    Lista dallo snapshot versionato:
+    - since_version: solo aggiunti/rimossi/modificati da quella versione
+    - cursor/limit: paginazione (senza limit, lista completa)
+    """
+    WORKSPACE_LIST.refresh(runtime.session_manager.list_workspaces)
+
+    since = params.get("since_version")
+    if since is not None:
+        diff = WORKSPACE_LIST.diff(int(since))
+        if diff is not None:
+            return {"ok": True, "mode": "diff", **diff}
+        # versione fuori dalla storia: il client riceve la lista completa
+
+    limit = params.get("limit")
+    try:
+        page = WORKSPACE_LIST.page(
+            cursor=params.get("cursor"),
+            limit=int(limit) if limit else None,
+        )
+    except ValueError as exc:
+        return {"ok": False, "error": str(exc)}
+    return {"ok": True, "mode": "full", **page}
+
+
+CREATE_MANY_CONCURRENCY = 4     # workspace creati in parallelo da workspace.create_many
+CREATE_MANY_CONCURRENCY_MAX = 64  # come max_value di "concurrency" nel catalogo
+CREATE_MANY_MAX = 500
+
+
+async def _create_workspace(params: dict, runtime) -> dict:
+    """Crea un workspace e, se richiesto, lo popola da un template (file + indici)."""
+    template = params.get("template")
+    manifest = await asyncio.to_thread(load_template, template) if template else {}
+    settings = dict(manifest.get("settings") or {})
+
+    name = params.get("name") or f"workspace-{int(time.time())}"
+    description = params.get("description", manifest.get("description", ""))
+    tags = params.get("tags", [])
+    ws_type = params.get("type") or settings.get("workspace_type") or "multi_agent"
+    settings["workspace_type"] = ws_type
+
+    ws = await runtime.session_manager.create_workspace(
+        name=name,
+        description=description,
+        tags=tags,
+        settings=settings,
+    )
+    # la lista cambia anche senza emit_event (niente workspace.list.updated)
+    WORKSPACE_LIST.invalidate()
+    result = {
         "ok": True,
-        "workspaces": [
-            {"id": ws.workspace_id, "path": str(ws.base_path)}
-            for ws in workspaces
-        ],
+        "workspace_id": ws.id,
+        "name": ws.name,
+        "root": str(ws.base_path),
+        "workspace_type": ws.workspace_type,
+        "backends": ws.list_backends(),
     }
+    if template:
+        try:
+            result["template"] = await asyncio.to_thread(
+                instantiate_template,
+                template,
+                str(ws.base_path),
+                ws.id,
+                mode=params.get("clone_mode", "auto"),
+            )
+        except Exception:
+            # workspace a metà: meglio non lasciarlo in lista
+            await runtime.session_manager.delete_workspace(ws.id, True)
+            WORKSPACE_LIST.invalidate()
+            raise
+    return result
 
 
 @action("workspace.create")
 async def workspace_create(params: dict, runtime):
-    name = params.get("name") or f"workspace-{int(time.time())}"
-    description = params.get("description", "")
-    tags = params.get("tags", [])
-    ws_type = params.get("type", "multi_agent")
+    try:
+        return await _create_workspace(params, runtime)
+    except Exception as exc:
+        logger.exception("workspace.create failed", exc_info=exc)
+        return {"ok": False, "error": str(exc)}
+
+
+@action("workspace.create_many")
+async def workspace_create_many(params: dict, runtime):
+    """
+    Crea più workspace in parallelo, al massimo `concurrency` alla volta:
+    - workspaces: lista di {name, description, tags, type, template}
+    - oppure count (+ name_prefix) workspace identici
+    template, clone_mode e type a livello di richiesta valgono per tutte le voci.
+    """
+    specs = params.get("workspaces")
+    if specs is None:
+        try:
+            count = int(params.get("count") or 0)
+        except (TypeError, ValueError):
+            return {"ok": False, "error": f"Invalid count: {params.get('count')!r}"}
+        if count > CREATE_MANY_MAX:
+            return {"ok": False, "error": f"Too many workspaces (max {CREATE_MANY_MAX})"}
+        prefix = params.get("name_prefix") or f"workspace-{int(time.time())}"
+        specs = [{"name": f"{prefix}-{i + 1}"} for i in range(count)]
+    if not specs:
+        return {"ok": False, "error": "Missing workspaces or count"}
+    if len(specs) > CREATE_MANY_MAX:
+        return {"ok": False, "error": f"Too many workspaces (max {CREATE_MANY_MAX})"}
+
+    defaults = {k: params[k] for k in ("template", "clone_mode", "type") if params.get(k)}
+    if defaults.get("template"):
+        try:
+            await asyncio.to_thread(load_template, defaults["template"])
+        except (OSError, ValueError) as exc:
+            return {"ok": False, "error": str(exc)}
 
     try:
-        ws = await runtime.session_manager.create_workspace(
-            name=name,
-            description=description,
-            tags=tags,
-            settings={"workspace_type": ws_type},
+        concurrency = int(params.get("concurrency") or CREATE_MANY_CONCURRENCY)
+    except (TypeError, ValueError):
+        return {"ok": False, "error": f"Invalid concurrency: {params.get('concurrency')!r}"}
+    semaphore = asyncio.Semaphore(max(1, min(concurrency, CREATE_MANY_CONCURRENCY_MAX)))
+
+    async def create_one(spec: dict) -> dict:
+        async with semaphore:
+            try:
+                return await _create_workspace({**defaults, **spec}, runtime)
+            except Exception as exc:
+                logger.exception("workspace.create_many item failed", extra={"name": spec.get("name")})
+                return {"ok": False, "name": spec.get("name"), "error": str(exc)}
+
+    results = await asyncio.gather(*(create_one(spec) for spec in specs))
+    created = [r for r in results if r.get("ok")]
+    failed = [r for r in results if not r.get("ok")]
+    response = {"ok": bool(created), "created": created, "failed": failed}
+    if not created:
+        response["error"] = "No workspace created"
+    return response
+
+
+@action("workspace.template.save")
+async def workspace_template_save(params: dict, runtime):
+    name = params.get("name")
+    wid = params.get("workspace_id") or runtime.session_manager.current_workspace_id
+    if not name:
+        return {"ok": False, "error": "Missing template name"}
+    if not wid:
+        return {"ok": False, "error": "Missing workspace_id"}
+    try:
+        ws = runtime.session_manager.get_workspace(wid)
+        manifest = await asyncio.to_thread(
+            save_template,
+            name,
+            str(ws.base_path),
+            workspace_id=wid,
+            settings={"workspace_type": getattr(ws, "workspace_type", "multi_agent")},
+            description=params.get("description", ""),
         )
-        return {
-            "ok": True,
-            "workspace_id": ws.id,
-            "name": ws.name,
-            "root": str(ws.base_path),
-            "workspace_type": ws.workspace_type,
-            "backends": ws.list_backends(),
-        }
     except Exception as exc:
-        logger.exception("workspace.create failed", exc_info=exc)
+        logger.exception("workspace.template.save failed", extra={"workspace_id": wid})
         return {"ok": False, "error": str(exc)}
+    return {"ok": True, "template": manifest}
+
+
+@action("workspace.template.list")
+async def workspace_template_list(_params: dict, _runtime):
+    return {"ok": True, "templates": await asyncio.to_thread(list_templates)}
 
 
 @action("workspace.load")
@@ -261,8 +532,507 @@ async def workspace_delete(params: dict, runtime):
     delete_from_disk = params.get("delete_from_disk", True)
     if not wid:
         return {"ok": False, "error": "Missing workspace_id"}
-    await runtime.session_manager.delete_workspace(wid, delete_from_disk)
-    return {"ok": True, "workspace_id": wid}
+    if not delete_from_disk:
+        await runtime.session_manager.delete_workspace(wid, False)
+        WORKSPACE_LIST.invalidate()
+        drop_workspace_stats(wid)
+        return {"ok": True, "workspace_id": wid}
+
+    # 1) tombstone logico: sparisce subito dalla lista, la directory è
+    #    rinominata (rename atomico) e solo dopo deregistrata: se il
+    #    rename fallisce il workspace resta intatto e registrato
+    # 2) cancellazione fisica in background, a IO limitato (job)
+    _resume_deletions()
+    WORKSPACE_LIST.hide(wid)
+    job_id = uuid.uuid4().hex
+    try:
+        path = str(runtime.session_manager.get_workspace(wid).base_path)
+        trash = await asyncio.to_thread(move_to_trash, path, job_id)
+    except Exception as exc:
+        WORKSPACE_LIST.unhide(wid)
+        logger.exception("workspace.delete failed", extra={"workspace_id": wid})
+        return {"ok": False, "workspace_id": wid, "error": str(exc)}
+
+    try:
+        await runtime.session_manager.delete_workspace(wid, False)
+    except Exception as exc:
+        # deregistrazione fallita: la directory torna al suo posto
+        if trash is not None:
+            try:
+                await asyncio.to_thread(restore_from_trash, trash, path)
+            except OSError:
+                logger.exception(
+                    "Workspace directory could not be restored",
+                    extra={"workspace_id": wid, "path": path, "trash_path": trash},
+                )
+        WORKSPACE_LIST.unhide(wid)
+        logger.exception("workspace.delete failed", extra={"workspace_id": wid})
+        return {"ok": False, "workspace_id": wid, "error": str(exc)}
+    drop_workspace_stats(wid)
+
+    io_rate = params.get("io_rate")
+    job = submit_delete(
+        wid,
+        trash,
+        io_rate=float(io_rate) if io_rate is not None else DEFAULT_IO_RATE,
+        job_id=job_id,
+        on_finished=WORKSPACE_LIST.unhide,
+    )
+    return {"ok": True, "workspace_id": wid, "job_id": job.job_id, "status": job.status.value}
+
+
+_DELETIONS_RESUMED = False
+
+
+def _resume_deletions() -> None:
+    """Al primo delete del processo riprende le cancellazioni rimaste a metà."""
+    global _DELETIONS_RESUMED
+    if not _DELETIONS_RESUMED:
+        _DELETIONS_RESUMED = True
+        resume_pending(on_finished=WORKSPACE_LIST.unhide)
+
+
+@action("workspace.stats")
+async def workspace_stats(params: dict, runtime):
+    wid = params.get("workspace_id") or runtime.session_manager.current_workspace_id
+    if not wid:
+        return {"ok": False, "error": "Missing workspace_id"}
+    try:
+        ws = runtime.session_manager.get_workspace(wid)
+    except Exception as exc:
+        return {"ok": False, "error": str(exc)}
+
+    stats = await asyncio.to_thread(get_workspace_stats, wid, str(ws.base_path))
+    stats.ensure_watching()
+
+    if params.get("refresh"):
+        # async generator: progresso del ricalcolo, poi lo snapshot finale
+        return stats.refresh()
+
+    backends = ws.list_backends() if hasattr(ws, "list_backends") else []
+    return {
+        "ok": True,
+        **await asyncio.to_thread(stats.snapshot),
+        "backends": backends,
+    }
+
+
+# =============================================================================
+# LOGS ACTIONS
+# =============================================================================
+
+@action("logs.scan")
+async def logs_scan(params: dict, _runtime):
+    path = params.get("path")
+    if not path:
+        return {"ok": False, "error": "Missing path"}
+    if not os.path.isdir(path):
+        return {"ok": False, "error": f"Not a directory: {path}"}
+
+    return scan_logs(
+        path,
+        recursive=params.get("recursive", True),
+        pattern=params.get("pattern"),
+        incremental=bool(params.get("incremental", False)),
+    )
+
+
+@action("logs.tail")
+async def logs_tail(params: dict, _runtime):
+    path = params.get("file")
+    if not path:
+        return {"ok": False, "error": "Missing file"}
+    lines = int(params.get("lines", 100))
+    encoding = params.get("encoding", "utf-8")
+
+    if params.get("follow"):
+        # async generator: il dispatcher inoltra ogni batch come chunk
+        return unbounded(follow_file(path, lines=lines, encoding=encoding))
+
+    try:
+        content = await asyncio.to_thread(tail_lines, path, lines, encoding=encoding)
+    except FileNotFoundError:
+        return {"ok": False, "error": f"File not found: {path}"}
+    return {"ok": True, "file": path, "lines": content}
+
+
+def _take(iterator, n: int) -> list:
+    batch = []
+    for item in iterator:
+        batch.append(item)
+        if len(batch) >= n:
+            break
+    return batch
+
+
+@action("logs.parse")
+async def logs_parse(params: dict, _runtime):
+    path = params.get("file")
+    if not path:
+        return {"ok": False, "error": "Missing file"}
+    if not os.path.isfile(path):
+        return {"ok": False, "error": f"File not found: {path}"}
+
+    log_format = params.get("format") or "auto"
+    batch_size = int(params.get("batch_size", 1000))
+
+    async def run():
+        if params.get("columnar"):
+            batches = parse_columns(path, log_format=log_format, batch_lines=batch_size)
+            while True:
+                batch = await asyncio.to_thread(next, batches, None)
+                if batch is None:
+                    break
+                yield batch.to_dict()
+        else:
+            records = parse_records(path, log_format=log_format)
+            while True:
+                batch = await asyncio.to_thread(_take, records, batch_size)
+                if not batch:
+                    break
+                yield {"records": [r.to_dict() for r in batch]}
+
+    return run()
+
+
+@action("logs.index")
+async def logs_index(params: dict, _runtime):
+    path = params.get("path")
+    if not path:
+        return {"ok": False, "error": "Missing path"}
+    if not os.path.exists(path):
+        return {"ok": False, "error": f"Path not found: {path}"}
+
+    index = get_index(params.get("index") or "default")
+
+    async def run():
+        if os.path.isdir(path):
+            files = []
+            async for batch in walk_sources(path, pattern=params.get("pattern")):
+                files.extend(src.path for src in batch)
+        else:
+            files = [path]
+
+        progress = index.add_files(files)
+        while True:
+            record = await asyncio.to_thread(next, progress, None)
+            if record is None:
+                break
+            yield record
+        yield {"summary": index.stats()}
+
+    return run()
+
+
+@action("logs.search")
+async def logs_search(params: dict, _runtime):
+    query = params.get("query")
+    if not query:
+        return {"ok": False, "error": "Missing query"}
+    try:
+        since = to_epoch(params.get("since"))
+        until = to_epoch(params.get("until"))
+    except ValueError as exc:
+        return {"ok": False, "error": f"Invalid time range: {exc}"}
+
+    index = get_index(params.get("index") or "default")
+    hits = await asyncio.to_thread(
+        index.search,
+        query,
+        since=since,
+        until=until,
+        limit=int(params.get("limit", 100)),
+    )
+    return {"ok": True, "hits": hits}
+
+
+# =============================================================================
+# CODE ACTIONS
+# =============================================================================
+
+@action("code.read_file")
+async def code_read_file(params: dict, _runtime):
+    path = params.get("path")
+    if not path:
+        return {"ok": False, "error": "Missing path"}
+
+    def _int(name):
+        value = params.get(name)
+        return None if value is None else int(value)
+
+    try:
+        result = await asyncio.to_thread(
+            read_file_range,
+            path,
+            encoding=params.get("encoding") or "utf-8",
+            start_line=_int("start_line"),
+            end_line=_int("end_line"),
+            start_byte=_int("start_byte"),
+            end_byte=_int("end_byte"),
+            max_bytes=DEFAULT_MAX_BYTES if params.get("max_bytes") is None else _int("max_bytes"),
+        )
+    except FileNotFoundError:
+        return {"ok": False, "error": f"File not found: {path}"}
+    except (LookupError, ValueError) as exc:
+        return {"ok": False, "error": str(exc)}
+    return {"ok": True, **result}
+
+
+@action("code.explain")
+async def code_explain(params: dict, runtime):
+    code = params.get("code")
+    if not code:
+        return {"ok": False, "error": "Missing code"}
+    return await _owner(runtime, "code.explain", "explain")(
+        code=code,
+        language=params.get("language"),
+    )
+
+
+def _workspace_root(params: dict, runtime) -> str | None:
+    """Root esplicita (param "path") o base_path del workspace attivo."""
+    if params.get("path"):
+        return params["path"]
+    try:
+        wid = runtime.session_manager.current_workspace_id
+        ws = runtime.session_manager.get_workspace(wid) if wid else None
+    except Exception:
+        return None
+    base = getattr(ws, "base_path", None)
+    return str(base) if base else None
+
+
+@action("code.index")
+async def code_index(params: dict, runtime):
+    root = _workspace_root(params, runtime)
+    if not root or not os.path.isdir(root):
+        return {"ok": False, "error": "Missing or invalid path"}
+
+    stats = await asyncio.to_thread(
+        SymbolIndex(root).update,
+        full=bool(params.get("full", False)),
+    )
+    return {"ok": True, "root": os.path.abspath(root), **stats}
+
+
+@action("code.symbols")
+async def code_symbols(params: dict, runtime):
+    root = _workspace_root(params, runtime)
+    if not root:
+        return {"ok": False, "error": "Missing path"}
+    index = SymbolIndex(root)
+
+    if params.get("file"):
+        symbols = await asyncio.to_thread(index.file_symbols, params["file"])
+        return {"ok": True, "symbols": symbols}
+
+    name = params.get("name")
+    if not name:
+        return {"ok": False, "error": "Missing file or name"}
+
+    result = {
+        "ok": True,
+        "definitions": await asyncio.to_thread(index.definitions, name),
+    }
+    if params.get("include_refs"):
+        result["references"] = await asyncio.to_thread(index.references, name)
+    return result
+
+
+@action("code.search")
+async def code_search(params: dict, runtime):
+    query = params.get("query")
+    if not query:
+        return {"ok": False, "error": "Missing query"}
+    root = _workspace_root(params, runtime)
+    if not root:
+        return {"ok": False, "error": "Missing path"}
+
+    results = await asyncio.to_thread(
+        SymbolIndex(root).search,
+        query,
+        kind=params.get("kind"),
+        limit=int(params.get("limit", 50)),
+    )
+    return {"ok": True, "results": results}
+
+
+# =============================================================================
+# KNOWLEDGE ACTIONS
+# =============================================================================
+
+KNOWLEDGE_REQUIRES_NUMPY = "knowledge requires numpy (pip install ice-api[knowledge])"
+
+def _knowledge_engine(params: dict, runtime):
+    """Collezione esplicita o quella del workspace attivo."""
+    name = params.get("collection")
+    if not name:
+        try:
+            name = runtime.session_manager.current_workspace_id
+        except Exception:
+            name = None
+    return get_engine(
+        name or "default",
+        embedder=getattr(runtime, "embedder", None),
+    )
+
+
+@action("knowledge.ingest")
+async def knowledge_ingest(params: dict, runtime):
+    path = params.get("path")
+    if not path:
+        return {"ok": False, "error": "Missing path"}
+    if not os.path.exists(path):
+        return {"ok": False, "error": f"Path not found: {path}"}
+    if not has_numpy():
+        return {"ok": False, "error": KNOWLEDGE_REQUIRES_NUMPY}
+
+    engine = await asyncio.to_thread(_knowledge_engine, params, runtime)
+    chunk_size = int(params.get("chunk_size", 1000))
+    overlap = int(params.get("overlap", 150))
+
+    async def run():
+        if os.path.isdir(path):
+            files = []
+            async for batch in walk_sources(path, pattern=params.get("pattern")):
+                files.extend(src.path for src in batch)
+        else:
+            files = [path]
+
+        for file in files:
+            progress = engine.ingest_file(file, chunk_size=chunk_size, overlap=overlap)
+            while True:
+                record = await asyncio.to_thread(next, progress, None)
+                if record is None:
+                    break
+                if record.get("done"):
+                    yield record
+        yield {"summary": await asyncio.to_thread(engine.stats)}
+
+    return run()
+
+
+@action("knowledge.sync")
+async def knowledge_sync(params: dict, runtime):
+    root = _workspace_root(params, runtime)
+    if not root or not os.path.isdir(root):
+        return {"ok": False, "error": "Missing or invalid path"}
+    if not has_numpy():
+        return {"ok": False, "error": KNOWLEDGE_REQUIRES_NUMPY}
+
+    engine = await asyncio.to_thread(_knowledge_engine, params, runtime)
+
+    async def run():
+        sources = []
+        async for batch in walk_sources(root, pattern=params.get("pattern")):
+            # niente directory nascoste (.git, .venv, ...)
+            sources.extend(
+                src for src in batch
+                if not any(
+                    part.startswith(".")
+                    for part in os.path.relpath(src.path, root).split(os.sep)
+                )
+            )
+
+        progress = engine.sync_sources(
+            sources,
+            root=root,
+            chunk_size=int(params.get("chunk_size", 1000)),
+            overlap=int(params.get("overlap", 150)),
+        )
+        while True:
+            record = await asyncio.to_thread(next, progress, None)
+            if record is None:
+                break
+            yield record
+
+    return run()
+
+
+@action("knowledge.query")
+async def knowledge_query(params: dict, runtime):
+    query = params.get("query")
+    if not query:
+        return {"ok": False, "error": "Missing query"}
+
+    engine = await asyncio.to_thread(_knowledge_engine, params, runtime)
+    try:
+        results = await asyncio.to_thread(
+            engine.query,
+            query,
+            k=int(params.get("k", 10)),
+            mode=params.get("mode") or "hybrid",
+        )
+    except (ValueError, RuntimeError) as exc:
+        return {"ok": False, "error": str(exc)}
+    return {"ok": True, "results": results}
+
+
+# =============================================================================
+# WORKFLOW ACTIONS
+# =============================================================================
+
+def _workflow_engine(params: dict, runtime) -> WorkflowEngine:
+    # import locale: il dispatcher importa questo modulo
+    from ice_api.ui.dispatcher import dispatch_nested
+
+    workspace_id = params.get("workspace_id")
+
+    async def execute(call: ActionCall):
+        # ogni step passa dal dispatcher: workspace, corsie, cache, eventi
+        with TRACER.span(f"workflow.step {call.name}", attributes={"ice.action": call.name}):
+            return await dispatch_nested(
+                call.name,
+                call.params,
+                runtime,
+                workspace_id=workspace_id,
+                step_id=current_step_id(),
+            )
+
+    return WorkflowEngine(execute, max_workers=int(params.get("max_workers", 4)))
+
+
+@action("workflow.plan")
+async def workflow_plan(params: dict, runtime):
+    """Piano generato dal planner-agent, validato prima di restituirlo (eseguibile con workflow.execute)."""
+    goal = (params.get("goal") or "").strip()
+    if not goal:
+        return {"ok": False, "error": "Missing goal"}
+
+    result = await _owner(runtime, "workflow.plan", "plan")(goal=goal)
+    raw = result.get("plan", result) if isinstance(result, dict) else None
+    if not isinstance(raw, dict) or "steps" not in raw:
+        return result
+    try:
+        plan_from_dict(raw)
+    except (WorkflowPlanError, KeyError, TypeError, ValueError) as exc:
+        return {"ok": False, "error": f"Invalid plan: {exc}", "plan": raw}
+    return {"ok": True, "goal": goal, "plan": raw}
+
+
+@action("workflow.execute")
+async def workflow_execute(params: dict, runtime):
+    try:
+        plan = plan_from_dict(params.get("plan") or {})
+    except (WorkflowPlanError, KeyError, TypeError, ValueError) as exc:
+        return {"ok": False, "error": f"Invalid plan: {exc}"}
+
+    return _workflow_engine(params, runtime).run(
+        plan,
+        skip=set(params.get("skip") or ()),
+        resume=params.get("resume", True),
+        rollback_on_failure=bool(params.get("rollback_on_failure", False)),
+    )
+
+
+@action("workflow.rollback")
+async def workflow_rollback(params: dict, runtime):
+    try:
+        plan = plan_from_dict(params.get("plan") or {})
+    except (WorkflowPlanError, KeyError, TypeError, ValueError) as exc:
+        return {"ok": False, "error": f"Invalid plan: {exc}"}
+
+    return _workflow_engine(params, runtime).rollback(plan)
 
 
 # =============================================================================
@@ -271,24 +1041,89 @@ async def workspace_delete(params: dict, runtime):
 
 @action("cv.generate_json")
 async def cv_generate_json(params: dict, runtime):
-    return await runtime.get_agent("cv-agent").generate_json(**params)
+    result = await _owner(runtime, "cv.generate_json", "generate_json")(**params)
+    cv_id = (result.get("cv_id") if isinstance(result, dict) else None) or params.get("cv_id")
+    if cv_id and not (isinstance(result, dict) and result.get("ok") is False):
+        # contenuto aggiornato: gli artifact renderizzati non valgono più
+        await asyncio.to_thread(ARTIFACTS.invalidate, cv_id)
+    return result
 
 
 @action("cv.ocr")
 async def cv_ocr(params: dict, runtime):
-    return await runtime.get_agent("cv-agent").ocr(params.get("paths", []))
+    """
+    OCR per pagina in streaming: un chunk per pagina appena pronta
+    (dalla cache se già vista), poi il riepilogo.
+    """
+    paths = params.get("paths") or []
+    if isinstance(paths, str):
+        paths = [paths]
+    if not paths:
+        return {"ok": False, "error": "Missing paths"}
+    agent = _owner(runtime, "cv.ocr")
+    return ocr_pages(
+        _owner(runtime, "cv.ocr", "ocr"),
+        paths,
+        version=ocr_version(params, agent),
+    )
+
+
+async def _cv_artifact(kind: str, params: dict, runtime):
+    """
+    HTML/PDF dalla cache degli artifact (per revisione e versione template);
+    if_none_match con l'etag già in possesso del client evita il contenuto.
+    """
+    cv_id = params.get("cv_id")
+    if not cv_id:
+        return {"ok": False, "error": "Missing cv_id"}
+    action = "cv.render_html" if kind == "html" else "cv.export_pdf"
+    agent = _owner(runtime, action)
+    render = _owner(runtime, action, "render_html" if kind == "html" else "export_pdf")
+    return await ARTIFACTS.get_or_render(
+        cv_id,
+        kind,
+        lambda: render(cv_id),
+        template_version=template_version(params, agent),
+        if_none_match=params.get("if_none_match"),
+    )
 
 
 @action("cv.render_html")
 async def cv_render_html(params: dict, runtime):
-    return await runtime.get_agent("cv-agent").render_html(params["cv_id"])
+    return await _cv_artifact("html", params, runtime)
 
 
 @action("cv.export_pdf")
 async def cv_export_pdf(params: dict, runtime):
-    return await runtime.get_agent("cv-agent").export_pdf(params["cv_id"])
+    return await _cv_artifact("pdf", params, runtime)
 
 
 @action("cv.cleanup")
 async def cv_cleanup(params: dict, runtime):
-    return await runtime.get_agent("cv-agent").cleanup(params["cv_id"])
+    cv_id = params.get("cv_id")
+    if not cv_id:
+        return {"ok": False, "error": "Missing cv_id"}
+    result = await _owner(runtime, "cv.cleanup", "cleanup")(cv_id)
+    if not (isinstance(result, dict) and result.get("ok") is False):
+        await asyncio.to_thread(ARTIFACTS.invalidate, cv_id)
+    return result
+
+
+@action("cv.pipeline")
+async def cv_pipeline(params: dict, runtime):
+    """
+    OCR -> JSON -> HTML -> PDF come job in background: restituisce subito
+    job_id; progresso via eventi cv.pipeline.progress / cv.pipeline.finished,
+    polling con system.job.status, stop con system.job.cancel.
+    """
+    try:
+        items = items_from_params(params)
+        job = submit_pipeline(
+            _owner(runtime, "cv.pipeline"),
+            items,
+            stages=params.get("stages"),
+            concurrency=params.get("concurrency"),
+        )
+    except CVPipelineError as exc:
+        return {"ok": False, "error": str(exc)}
+    return {"ok": True, "job_id": job.job_id, "status": job.status.value, "items": len(items)}
@@ -5,6 +5,8 @@ from __future__ import annotations
 from contextvars import ContextVar
 from typing import Optional
 
+from ice_api.utils.tracing import Span, current_span
+
 
 class UIContext:
     """
@@ -39,6 +41,28 @@ class SessionContext:
     def set_panel_context(self, panel: str) -> None:
         self.panel_context = panel
 
+    # trace della richiesta in corso: lo span vive in una ContextVar
+    # (utils.tracing) e segue i task figli della richiesta
+
+    @staticmethod
+    def current_span() -> Optional[Span]:
+        return current_span()
+
+    @property
+    def trace_id(self) -> str | None:
+        span = current_span()
+        return span.trace_id if span is not None else None
+
+    @property
+    def span_id(self) -> str | None:
+        span = current_span()
+        return span.span_id if span is not None else None
+
+    @property
+    def correlation_id(self) -> str | None:
+        span = current_span()
+        return span.correlation_id if span is not None else None
+
     @classmethod
     def current(cls) -> Optional["SessionContext"]:
         return _current_context.get()
@@ -1,32 +1,98 @@
 from __future__ import annotations
 
-import asyncio
+import inspect
 import logging
-from typing import Any, Dict, Callable, Awaitable
-
-from ice_api.ipc.errors import WorkspaceNotFoundError
+from contextvars import ContextVar
+from typing import Any, Dict, Callable, Awaitable, Optional
+
+from ice_api.actions.catalog import build_default_actions
+from ice_api.actions.consistency import check_registry
+from ice_api.ipc.errors import (
+    ActionExecutionError,
+    ActionNotFoundError,
+    ApiError,
+    StreamUnavailableError,
+    WorkspaceNotFoundError,
+    WorkspaceRequiredError,
+    error_message,
+    error_response,
+)
+from ice_api.services.jobs import JOBS
+from ice_api.services.result_cache import RESULT_CACHE, cache_key, cache_policy
+from ice_api.services.routing import ROUTES
+from ice_api.services.workspace import WORKSPACE_LIST
 from ice_api.ui.actions import ACTIONS, stream_system_chat
 from ice_api.ui.context import SessionContext
+from ice_api.ui.profiling import PROFILER
+from ice_api.ui.streaming import collect_stream, forward_stream, is_unbounded
+from ice_api.utils.logging_queue import async_logging_enabled, logging_stats, setup_logging
+from ice_api.utils.tracing import SPAN_SERVER, TRACER, install_log_context, stamp_events
 
 logger = logging.getLogger("ice.api.ui.dispatcher")
 
+# trace_id / correlation_id sui log record emessi durante una richiesta
+install_log_context()
+
+# logging ice.api.* su coda + thread (utils.logging_queue), opt-in
+if async_logging_enabled() and logging_stats() is None:
+    setup_logging()
+
 # ============================================================================
 # ACTIONS THAT DO NOT REQUIRE AN ACTIVE WORKSPACE
 # ============================================================================
 
 NO_WORKSPACE_REQUIRED = {
     "workspace.create",
+    "workspace.create_many",
     "workspace.delete",
     "workspace.unload",
     "workspace.list",
+    "workspace.template.save",
+    "workspace.template.list",
     "system.chat.stream",
+    "system.job.status",
+    "system.job.cancel",
+    "system.agents.stats",
+    "system.agents.configure",
+    "system.profile.slowest",
+    "system.profile.configure",
     "cv.generate_json",
     "cv.ocr",
     "cv.render_html",
     "cv.export_pdf",
     "cv.cleanup",
+    "cv.pipeline",
 }
 
+# ============================================================================
+# DECLARATIVE SPECS (per le policy dichiarate in ActionSpec.metadata)
+# ============================================================================
+
+ACTION_SPECS = {spec.name: spec for spec in build_default_actions()}
+
+# azione -> agente proprietario -> handler (vedi services.routing)
+ROUTES.compile(ACTION_SPECS.values(), ACTIONS)
+
+_REGISTRY = check_registry(ACTION_SPECS.values(), ACTIONS)
+if not _REGISTRY.ok:
+    # catalogo e handler divergono: benchmarks/bench_actions.py li elenca
+    logger.warning("Action catalog and registry disagree", extra=_REGISTRY.to_dict())
+
+
+# emit_event della richiesta in corso: le azioni annidate (step di
+# workflow) mandano i loro eventi allo stesso client
+_request_emit: ContextVar[Optional[Callable[[dict], Awaitable[None]]]] = ContextVar(
+    "ice_api_request_emit", default=None
+)
+# id della richiesta in corso: gli eventi delle azioni annidate lo
+# riportano come parent_request_id
+_request_id: ContextVar[Optional[str]] = ContextVar("ice_api_request_id", default=None)
+
+
+def _model_id(params: dict, runtime) -> str | None:
+    return params.get("model") or getattr(runtime, "model_id", None)
+
+
 # ============================================================================
 # MAIN DISPATCH ENTRYPOINT
 # ============================================================================
@@ -46,18 +112,106 @@ async def dispatch(
     """
 
     action_name = request.get("action") or request.get("method")
+
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("DISPATCH_REQUEST", extra={"action": action_name})
+
+    # span della richiesta: figlio del traceparent del client, se presente;
+    # gli eventi emessi portano il suo correlation_id
+    with TRACER.span(
+        f"dispatch {action_name}",
+        kind=SPAN_SERVER,
+        headers=request.get("headers"),
+        correlation_id=request.get("correlation_id"),
+    ) as span:
+        span.set("ice.action", action_name)
+        span.set("ice.request_id", request.get("id"))
+        if emit_event is not None:
+            emit_event = stamp_events(emit_event, span.correlation_id)
+
+        # profiling opt-in (ui.profiling): NULL_PROFILE se non richiesto
+        prof = PROFILER.start(action_name, request)
+        token = _request_emit.set(emit_event)
+        id_token = _request_id.set(request.get("id"))
+        try:
+            result = await _dispatch(request, action_name, runtime, emit_event, prof)
+        finally:
+            _request_id.reset(id_token)
+            _request_emit.reset(token)
+            PROFILER.finish(prof)
+
+        if isinstance(result, dict) and result.get("ok") is False:
+            span.fail(error_message(result.get("error")))
+        return result
+
+
+async def dispatch_nested(
+    action_name: str,
+    params: dict,
+    runtime,
+    *,
+    workspace_id: str | None = None,
+    request_id: str | None = None,
+    step_id: str | None = None,
+) -> dict | None:
+    """
+    Azione invocata da un'altra azione (step di workflow).
+
+    Stesso percorso di dispatch: attivazione del workspace, corsie degli
+    agenti, result cache ed eventi post-azione, inviati all'emit_event
+    della richiesta padre. Senza emit_event gli step in streaming
+    restituiscono i chunk bufferizzati (gli stream infiniti sono
+    rifiutati con StreamUnavailableError).
+
+    Senza request_id l'azione usa l'id della richiesta padre; i suoi
+    eventi portano parent_request_id e step_id.
+    """
+    parent_id = _request_id.get()
+    request: Dict[str, Any] = {
+        "action": action_name,
+        "params": params,
+        "id": request_id or parent_id,
+    }
+    if workspace_id:
+        request["workspace_id"] = workspace_id
+    emit_event = _request_emit.get()
+    if emit_event is not None:
+        emit_event = _tag_nested_events(emit_event, parent_id, step_id)
+    return await dispatch(request, runtime, emit_event=emit_event)
+
+
+def _tag_nested_events(
+    emit_event: Callable[[dict], Awaitable[None]],
+    parent_id: str | None,
+    step_id: str | None,
+) -> Callable[[dict], Awaitable[None]]:
+    async def emit(event: dict) -> None:
+        if isinstance(event, dict):
+            event.setdefault("parent_request_id", parent_id)
+            if step_id is not None:
+                event.setdefault("step_id", step_id)
+        await emit_event(event)
+
+    return emit
+
+
+async def _dispatch(
+    request: dict,
+    action_name: str | None,
+    runtime,
+    emit_event: Callable[[dict], Awaitable[None]] | None,
+    prof,
+) -> dict | None:
     params = request.get("params", {}) or {}
     request_id = request.get("id")
 
-    logger.debug("DISPATCH_REQUEST", extra={"action": action_name})
-
     # ---------------------------------------------------------------------
     # STREAMING SYSTEM CHAT (SPECIAL CASE)
     # ---------------------------------------------------------------------
 
     if action_name == "system.chat.stream":
         if not emit_event:
-            return {"ok": False, "error": "Streaming requires emit_event"}
+            return error_response(StreamUnavailableError.wire(action=action_name))
 
         conversation_id = params.get("conversation_id") or "default"
         message = (params.get("message") or "").strip()
@@ -66,44 +220,48 @@ async def dispatch(
         if ctx and request_id:
             setattr(ctx, "request_id", request_id)
 
-        await stream_system_chat(
-            message=message,
-            conversation_id=conversation_id,
-            runtime=runtime,
-            emit_event=emit_event,
-            request_id=request_id,
-        )
+        with prof.phase("handler"):
+            await stream_system_chat(
+                message=message,
+                conversation_id=conversation_id,
+                runtime=runtime,
+                emit_event=emit_event,
+                request_id=request_id,
+            )
         return None
 
     # ---------------------------------------------------------------------
     # ACTION LOOKUP
     # ---------------------------------------------------------------------
 
-    action = ACTIONS.get(action_name)
-    if not action:
+    with prof.phase("validation"):
+        route = ROUTES.route(action_name)
+        if route:
+            workspace_id = (
+                request.get("workspace_id")
+                or params.get("workspace_id")
+                or runtime.session_manager.current_workspace_id
+            )
+            requires_workspace = action_name not in NO_WORKSPACE_REQUIRED
+            current_ctx = SessionContext.current()
+
+    if not route:
         logger.error("Unknown action requested", extra={"action": action_name})
-        return {"ok": False, "error": f"Unknown action: {action_name}"}
+        # payload memorizzato: nessuna eccezione né formattazione per richiesta
+        return error_response(ActionNotFoundError.wire(action=action_name))
 
     # ---------------------------------------------------------------------
     # WORKSPACE CONTEXT RESOLUTION
     # ---------------------------------------------------------------------
 
-    workspace_id = (
-        request.get("workspace_id")
-        or params.get("workspace_id")
-        or runtime.session_manager.current_workspace_id
-    )
-
-    requires_workspace = action_name not in NO_WORKSPACE_REQUIRED
-    current_ctx = SessionContext.current()
-
     if requires_workspace and not workspace_id:
-        return {"ok": False, "error": "Missing workspace_id"}
+        return error_response(WorkspaceRequiredError.wire(action=action_name))
 
     if requires_workspace:
         if not current_ctx or current_ctx.workspace_id != workspace_id:
             try:
-                current_ctx = await runtime.session_manager.activate_workspace(workspace_id)
+                with prof.phase("activation"):
+                    current_ctx = await runtime.session_manager.activate_workspace(workspace_id)
             except Exception as exc:
                 if not isinstance(exc, WorkspaceNotFoundError):
                     exc = WorkspaceNotFoundError(workspace_id)
@@ -112,7 +270,7 @@ async def dispatch(
                     exc_info=True,
                     extra={"workspace_id": workspace_id},
                 )
-                return {"ok": False, "error": str(exc)}
+                return error_response(exc)
 
     # Optional panel / UI context (still abstract)
     panel_context = request.get("panel_context") or params.get("panel_context")
@@ -124,18 +282,44 @@ async def dispatch(
     # ---------------------------------------------------------------------
 
     try:
-        result = action(params, runtime)
-        if asyncio.iscoroutine(result):
-            result = await result
+        with prof.phase("handler"):
+            spec = ACTION_SPECS.get(action_name)
+            policy = cache_policy(spec)
+            if policy is not None:
+                # azioni pure dichiarate cacheabili: cache + de-duplicazione
+                result = await RESULT_CACHE.get_or_compute(
+                    cache_key(spec, params, _model_id(params, runtime)),
+                    policy,
+                    lambda: ROUTES.call(route, params, runtime),
+                )
+            else:
+                result = await ROUTES.call(route, params, runtime)
+
+        # handler in streaming: async generator -> chunk inoltrati subito
+        if inspect.isasyncgen(result):
+            with prof.phase("events"):
+                if not emit_event:
+                    if is_unbounded(result):
+                        # non termina da solo: bufferizzarlo bloccherebbe la richiesta
+                        await result.aclose()
+                        return error_response(StreamUnavailableError.wire(action=action_name))
+                    return await collect_stream(result)
+                return await forward_stream(
+                    result,
+                    action_name=action_name,
+                    request_id=request_id,
+                    emit_event=emit_event,
+                )
 
         if emit_event and isinstance(result, dict) and result.get("ok"):
-            await _emit_post_action_events(
-                action_name=action_name,
-                result=result,
-                runtime=runtime,
-                emit_event=emit_event,
-                fallback_workspace_id=workspace_id,
-            )
+            with prof.phase("events"):
+                await _emit_post_action_events(
+                    action_name=action_name,
+                    result=result,
+                    runtime=runtime,
+                    emit_event=emit_event,
+                    fallback_workspace_id=workspace_id,
+                )
 
         return result
 
@@ -144,7 +328,9 @@ async def dispatch(
             "Action execution failed",
             extra={"action": action_name, "workspace_id": workspace_id},
         )
-        return {"ok": False, "error": str(exc)}
+        if not isinstance(exc, ApiError):
+            exc = ActionExecutionError(action_name, agent=route.agent, exception=exc)
+        return error_response(exc)
 
 # ============================================================================
 # POST-ACTION EVENTS
@@ -162,21 +348,31 @@ async def _emit_post_action_events(
     Emits standard lifecycle events after certain actions.
     """
 
+    if result.get("job_id"):
+        # azione avviata come job: progresso e fine arrivano come eventi
+        JOBS.listen(result["job_id"], emit_event)
+
     if action_name in {"workspace.create", "workspace.load"}:
         await _emit_workspace_loaded(runtime, result, emit_event)
 
-    if action_name in {"workspace.create", "workspace.delete"}:
+    if action_name in {"workspace.create", "workspace.create_many", "workspace.delete"}:
         wid = (
             result.get("workspace_id")
             or result.get("workspace")
             or fallback_workspace_id
         )
-        await emit_event(
-            {
-                "event": "workspace.list.updated",
-                "workspace_id": wid,
-            }
-        )
+        # la snapshot è già stata invalidata dall'handler
+        previous = WORKSPACE_LIST.version
+        version = WORKSPACE_LIST.refresh(runtime.session_manager.list_workspaces)
+        if version != previous:
+            # i client con questa versione non devono rileggere la lista
+            await emit_event(
+                {
+                    "event": "workspace.list.updated",
+                    "workspace_id": wid,
+                    "version": version,
+                }
+            )
 
 
 async def _emit_workspace_loaded(runtime, result: dict, emit_event):
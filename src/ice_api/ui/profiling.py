@@ -0,0 +1,280 @@
+from __future__ import annotations
+
+import cProfile
+import heapq
+import io
+import itertools
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger("ice.api.ui.profiling")
+
+PHASES = ("validation", "activation", "handler", "events")
+DEFAULT_SLOWEST = 20
+PROFILE_TOP = 40                # righe di pstats conservate per profilo
+PROFILE_FLAG = "x-ice-profile"  # header (o campo "profile" della richiesta)
+
+SpanStart = Callable[[str, "RequestProfile"], None]
+SpanEnd = Callable[[str, "RequestProfile", float], None]
+
+# ============================================================================
+# DISPATCH PROFILING (OPT-IN)
+# ============================================================================
+# Disattivato di default: senza profiler abilitato, hook o flag nella
+# richiesta il dispatcher usa NULL_PROFILE e il costo è un controllo.
+#
+#   fasi        validation -> activation -> handler -> events, in ms
+#   hook        start/end per ogni fase (tracing, metriche esterne)
+#   slowest     le N richieste più lente con il dettaglio delle fasi
+#   cProfile    per la richiesta con flag (header x-ice-profile o
+#               "profile": true), oppure a campione (sample_rate) tenuto
+#               solo se la richiesta supera threshold_ms
+#
+# cProfile misura il thread dell'event loop: durante la cattura include
+# anche le altre richieste in corso. Una sola cattura alla volta; le
+# richieste che arrivano nel frattempo non vengono profilate.
+# ============================================================================
+
+
+@dataclass
+class RequestProfile:
+    action: Optional[str]
+    request_id: Optional[str] = None
+    started_at: float = field(default_factory=time.time)
+    phases: Dict[str, float] = field(default_factory=dict)
+    total_ms: float = 0.0
+    forced: bool = False                # profilo richiesto dal client
+    profile: Optional[str] = None       # pstats (cumulative), se catturato
+
+    _profiler: Any = field(default=None, repr=False)
+    _t0: float = field(default_factory=time.perf_counter, repr=False)
+    _owner: Any = field(default=None, repr=False)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        owner = self._owner
+        owner._emit_start(name, self)
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - t0) * 1000
+            self.phases[name] = self.phases.get(name, 0.0) + elapsed
+            owner._emit_end(name, self, elapsed)
+
+    def to_dict(self, *, include_profile: bool = False) -> Dict[str, Any]:
+        data = {
+            "action": self.action,
+            "request_id": self.request_id,
+            "started_at": self.started_at,
+            "total_ms": round(self.total_ms, 3),
+            "phases": {name: round(ms, 3) for name, ms in self.phases.items()},
+            "profiled": self.profile is not None,
+        }
+        if include_profile and self.profile is not None:
+            data["profile"] = self.profile
+        return data
+
+
+class _NullProfile:
+    """Richiesta non profilata: nessuna misura, nessuna allocazione."""
+
+    action = None
+    request_id = None
+    _NULL = nullcontext()
+
+    def phase(self, _name: str):
+        return self._NULL
+
+
+NULL_PROFILE = _NullProfile()
+
+
+def _flagged(request: Dict[str, Any]) -> bool:
+    if request.get("profile"):
+        return True
+    headers = request.get("headers") or {}
+    if not isinstance(headers, dict):
+        return False
+    value = headers.get(PROFILE_FLAG)
+    if value is None:
+        value = next((v for k, v in headers.items() if str(k).lower() == PROFILE_FLAG), None)
+    return str(value).lower() in ("1", "true", "yes") if value is not None else False
+
+
+class DispatchProfiler:
+    def __init__(self) -> None:
+        self.enabled = os.environ.get("ICE_API_PROFILING", "") in ("1", "true", "yes")
+        self.slowest_size = DEFAULT_SLOWEST
+        self.threshold_ms: Optional[float] = None
+        self.sample_rate = 0.0
+        self._hooks: Dict[int, Tuple[Optional[SpanStart], Optional[SpanEnd]]] = {}
+        self._hook_ids = itertools.count(1)
+        # min-heap (total_ms, seq, profilo): in cima la più veloce delle lente
+        self._slowest: List[Tuple[float, int, RequestProfile]] = []
+        self._seq = itertools.count()
+        self._captured: Deque[RequestProfile] = deque(maxlen=DEFAULT_SLOWEST)
+        self._capturing = False
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "captured": 0, "skipped_captures": 0}
+
+    # ------------------------------------------------------------------
+    # configuration
+    # ------------------------------------------------------------------
+
+    def configure(
+        self,
+        *,
+        enabled: Optional[bool] = None,
+        slowest: Optional[int] = None,
+        threshold_ms: Optional[float] = None,
+        sample_rate: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        with self._lock:
+            if enabled is not None:
+                self.enabled = bool(enabled)
+            if slowest is not None:
+                self.slowest_size = max(1, int(slowest))
+                while len(self._slowest) > self.slowest_size:
+                    heapq.heappop(self._slowest)
+                self._captured = deque(self._captured, maxlen=self.slowest_size)
+            if threshold_ms is not None:
+                self.threshold_ms = float(threshold_ms) if threshold_ms > 0 else None
+            if sample_rate is not None:
+                self.sample_rate = min(1.0, max(0.0, float(sample_rate)))
+        return self.settings()
+
+    def settings(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "slowest": self.slowest_size,
+            "threshold_ms": self.threshold_ms,
+            "sample_rate": self.sample_rate,
+            "hooks": len(self._hooks),
+        }
+
+    def add_span_hook(self, on_start: Optional[SpanStart] = None, on_end: Optional[SpanEnd] = None) -> int:
+        """Registra callback per inizio/fine di ogni fase; restituisce l'id per remove_span_hook."""
+        hook_id = next(self._hook_ids)
+        self._hooks[hook_id] = (on_start, on_end)
+        return hook_id
+
+    def remove_span_hook(self, hook_id: int) -> None:
+        self._hooks.pop(hook_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._slowest.clear()
+            self._captured.clear()
+
+    # ------------------------------------------------------------------
+    # hooks
+    # ------------------------------------------------------------------
+
+    def _emit_start(self, phase: str, profile: RequestProfile) -> None:
+        for on_start, _ in list(self._hooks.values()):
+            if on_start is None:
+                continue
+            try:
+                on_start(phase, profile)
+            except Exception:
+                logger.warning("Span hook failed", exc_info=True, extra={"phase": phase})
+
+    def _emit_end(self, phase: str, profile: RequestProfile, elapsed_ms: float) -> None:
+        for _, on_end in list(self._hooks.values()):
+            if on_end is None:
+                continue
+            try:
+                on_end(phase, profile, elapsed_ms)
+            except Exception:
+                logger.warning("Span hook failed", exc_info=True, extra={"phase": phase})
+
+    # ------------------------------------------------------------------
+    # per request
+    # ------------------------------------------------------------------
+
+    def start(self, action: Optional[str], request: Dict[str, Any]) -> Any:
+        forced = _flagged(request)
+        if not (self.enabled or self._hooks or forced):
+            return NULL_PROFILE
+
+        profile = RequestProfile(action=action, request_id=request.get("id"), forced=forced, _owner=self)
+        sampled = self.threshold_ms is not None and self.sample_rate > 0 and random.random() < self.sample_rate
+        if forced or sampled:
+            if self._capturing:
+                self.stats["skipped_captures"] += 1
+            else:
+                profiler = cProfile.Profile()
+                try:
+                    profiler.enable()
+                except ValueError:
+                    # un altro profiler è già attivo nel processo
+                    self.stats["skipped_captures"] += 1
+                else:
+                    self._capturing = True
+                    profile._profiler = profiler
+        return profile
+
+    def finish(self, profile: Any) -> None:
+        if profile is NULL_PROFILE:
+            return
+        profile.total_ms = (time.perf_counter() - profile._t0) * 1000
+
+        profiler, profile._profiler = profile._profiler, None
+        if profiler is not None:
+            profiler.disable()
+            self._capturing = False
+            keep = profile.forced or (self.threshold_ms is not None and profile.total_ms >= self.threshold_ms)
+            if keep:
+                out = io.StringIO()
+                pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_TOP)
+                profile.profile = out.getvalue()
+
+        with self._lock:
+            self.stats["requests"] += 1
+            if profile.profile is not None:
+                self.stats["captured"] += 1
+                self._captured.append(profile)
+            if not self.enabled:
+                return
+            entry = (profile.total_ms, next(self._seq), profile)
+            if len(self._slowest) < self.slowest_size:
+                heapq.heappush(self._slowest, entry)
+            elif profile.total_ms > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, entry)
+
+    # ------------------------------------------------------------------
+    # introspection
+    # ------------------------------------------------------------------
+
+    def slowest(self, limit: Optional[int] = None, *, include_profile: bool = False) -> List[Dict[str, Any]]:
+        with self._lock:
+            entries = sorted(self._slowest, key=lambda e: e[0], reverse=True)
+        entries = entries[:limit] if limit else entries
+        return [profile.to_dict(include_profile=include_profile) for _, _, profile in entries]
+
+    def captured(self, *, include_profile: bool = False) -> List[Dict[str, Any]]:
+        with self._lock:
+            profiles = list(self._captured)
+        return [profile.to_dict(include_profile=include_profile) for profile in reversed(profiles)]
+
+    def find(self, request_id: str) -> Optional[RequestProfile]:
+        with self._lock:
+            for profile in reversed(self._captured):
+                if profile.request_id == request_id:
+                    return profile
+            for _, _, profile in self._slowest:
+                if profile.request_id == request_id:
+                    return profile
+        return None
+
+
+PROFILER = DispatchProfiler()
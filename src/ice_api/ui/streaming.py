@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import logging
+import time
+import weakref
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+from ice_api.types.enums import ResultStatus
+
+logger = logging.getLogger("ice.api.ui.streaming")
+
+# =============================================================================
+# STREAMED ACTION RESULTS
+# =============================================================================
+# Un handler può restituire un async generator invece di un dict:
+# ogni valore prodotto diventa un chunk inoltrato subito al client.
+#
+# Sequenza di eventi (stesso request_id):
+#   {"type": "action.stream", "event": "start", "status": "pending", ...}
+#   {"type": "action.stream", "event": "chunk", "seq": 0, "data": ...}
+#   ...
+#   {"type": "action.stream", "event": "end", "status": "success", "chunks": N}
+#
+# Se il generator fallisce dopo aver emesso dati lo status finale è
+# "partial", se fallisce prima del primo chunk è "failed".
+# =============================================================================
+
+STREAM_EVENT_TYPE = "action.stream"
+
+# chunk massimi bufferizzati da collect_stream (trasporti senza emit_event)
+COLLECT_MAX_CHUNKS = 10_000
+
+# stream che non terminano da soli (es. logs.tail con follow=True):
+# senza emit_event il dispatcher li rifiuta invece di bufferizzarli
+_UNBOUNDED: "weakref.WeakSet[AsyncIterator[Any]]" = weakref.WeakSet()
+
+
+def unbounded(stream: AsyncIterator[Any]) -> AsyncIterator[Any]:
+    """Marca uno stream come infinito (richiede un canale di eventi)."""
+    _UNBOUNDED.add(stream)
+    return stream
+
+
+def is_unbounded(stream: AsyncIterator[Any]) -> bool:
+    return stream in _UNBOUNDED
+
+
+def stream_start_event(action_name: str, request_id: str | None) -> dict:
+    return {
+        "type": STREAM_EVENT_TYPE,
+        "event": "start",
+        "action": action_name,
+        "request_id": request_id,
+        "status": ResultStatus.PENDING.value,
+    }
+
+
+def stream_chunk_event(
+    action_name: str,
+    request_id: str | None,
+    seq: int,
+    data: Any,
+) -> dict:
+    return {
+        "type": STREAM_EVENT_TYPE,
+        "event": "chunk",
+        "action": action_name,
+        "request_id": request_id,
+        "seq": seq,
+        "data": data,
+    }
+
+
+def stream_end_event(
+    action_name: str,
+    request_id: str | None,
+    status: ResultStatus,
+    chunks: int,
+    *,
+    error: str | None = None,
+    elapsed_ms: float | None = None,
+) -> dict:
+    event = {
+        "type": STREAM_EVENT_TYPE,
+        "event": "end",
+        "action": action_name,
+        "request_id": request_id,
+        "status": status.value,
+        "chunks": chunks,
+    }
+    if error is not None:
+        event["error"] = error
+    if elapsed_ms is not None:
+        event["elapsed_ms"] = elapsed_ms
+    return event
+
+
+async def forward_stream(
+    stream: AsyncIterator[Any],
+    *,
+    action_name: str,
+    request_id: str | None,
+    emit_event: Callable[[dict], Awaitable[None]],
+) -> dict:
+    """
+    Inoltra i chunk di un async generator man mano che vengono prodotti.
+
+    Restituisce il riepilogo finale (lo stesso contenuto dell'evento "end")
+    come risposta della dispatch.
+    """
+    started = time.perf_counter()
+    seq = 0
+    status = ResultStatus.SUCCESS
+    error: str | None = None
+
+    await emit_event(stream_start_event(action_name, request_id))
+
+    try:
+        async for data in stream:
+            await emit_event(stream_chunk_event(action_name, request_id, seq, data))
+            seq += 1
+    except Exception as exc:
+        logger.exception(
+            "Streamed action failed",
+            extra={"action": action_name, "chunks": seq},
+        )
+        status = ResultStatus.PARTIAL if seq else ResultStatus.FAILED
+        error = str(exc)
+    finally:
+        # chiusura esplicita anche se emit_event fallisce (client disconnesso)
+        aclose = getattr(stream, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+    elapsed_ms = round((time.perf_counter() - started) * 1000, 3)
+    await emit_event(
+        stream_end_event(
+            action_name,
+            request_id,
+            status,
+            seq,
+            error=error,
+            elapsed_ms=elapsed_ms,
+        )
+    )
+
+    summary = {
+        "ok": status == ResultStatus.SUCCESS,
+        "streamed": True,
+        "request_id": request_id,
+        "status": status.value,
+        "chunks": seq,
+    }
+    if error is not None:
+        summary["error"] = error
+    return summary
+
+
+async def collect_stream(
+    stream: AsyncIterator[Any],
+    *,
+    max_chunks: int = COLLECT_MAX_CHUNKS,
+) -> dict:
+    """
+    Fallback per trasporti senza emit_event: bufferizza i chunk.
+
+    Oltre max_chunks lo stream viene chiuso e il risultato marcato
+    truncated.
+    """
+    chunks = []
+    truncated = False
+    try:
+        async for data in stream:
+            if len(chunks) >= max_chunks:
+                truncated = True
+                break
+            chunks.append(data)
+    finally:
+        aclose = getattr(stream, "aclose", None)
+        if aclose is not None:
+            await aclose()
+    result = {"ok": True, "chunks": chunks}
+    if truncated:
+        result["truncated"] = True
+    return result
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import struct
+import sys
+from typing import Iterator, Tuple
+
+# ============================================================================
+# INOTIFY (LINUX, VIA CTYPES)
+# ============================================================================
+# Binding minimi condivisi da logs.tail (file seguiti) e workspace.watch
+# (albero del workspace). Fuori da Linux load_libc() restituisce None e i
+# chiamanti ripiegano sul polling.
+# ============================================================================
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+# eventi osservati su una directory: contenuto, metadati, create/rename/delete
+DIR_MASK = (
+    IN_MODIFY
+    | IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+)
+
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def load_libc():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+        libc.inotify_rm_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+def iter_events(data: bytes) -> Iterator[Tuple[int, int, bytes]]:
+    """(wd, mask, name) per ogni evento in un buffer letto dal fd inotify."""
+    offset = 0
+    while offset + EVENT_HEADER.size <= len(data):
+        wd, mask, _cookie, length = EVENT_HEADER.unpack_from(data, offset)
+        offset += EVENT_HEADER.size
+        name = data[offset:offset + length].rstrip(b"\0")
+        offset += length
+        yield wd, mask, name
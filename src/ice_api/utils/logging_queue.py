@@ -0,0 +1,330 @@
+from __future__ import annotations
+
+import atexit
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from collections import OrderedDict
+from logging.handlers import QueueHandler, QueueListener
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+LOGGER_NAME = "ice.api"
+QUEUE_SIZE = 10_000             # record in attesa; oltre si scarta contando
+BATCH_SIZE = 256                # record scritti per giro del listener
+ERROR_BURST = 10                # record identici (WARNING+) ammessi per finestra
+ERROR_WINDOW = 60.0             # secondi
+RATE_KEYS = 1024                # chiavi di rate limit ricordate (LRU)
+
+DEFAULT_FORMAT = "%(asctime)s %(levelname)s %(name)s %(message)s"
+
+# ============================================================================
+# ASYNC LOGGING FOR ice.api
+# ============================================================================
+# I logger ice.api.* scrivono in una coda; un thread (QueueListener)
+# formatta e scrive. Nel thread chiamante (l'event loop) restano solo:
+#
+#   - creazione del LogRecord (solo se il livello è abilitato)
+#   - rate limit degli errori ripetuti: stesso logger, livello, punto
+#     di chiamata, messaggio e tipo di eccezione -> al massimo
+#     ERROR_BURST record per ERROR_WINDOW; il primo record della
+#     finestra successiva riporta quanti ne sono stati soppressi
+#   - put_nowait sulla coda: se è piena il record è scartato e contato
+#
+# Traceback e messaggi sono formattati nel listener, e i record di un
+# giro vanno ai BatchFileHandler con una sola write + flush. I record
+# scartati per coda piena sono segnalati da un WARNING del listener.
+#
+# Attivazione: setup_logging() dal processo che ospita l'API, oppure
+# ICE_API_ASYNC_LOGGING=1 (installata all'import del dispatcher). I
+# record in coda sono scritti all'uscita del processo.
+# ============================================================================
+
+
+class _RateLimiter:
+    def __init__(self, burst: int, window: float) -> None:
+        self.burst = burst
+        self.window = window
+        # chiave -> [inizio finestra, record nella finestra, soppressi]
+        self._keys: "OrderedDict[Tuple[Any, ...], List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.suppressed = 0
+
+    def allow(self, record: logging.LogRecord) -> bool:
+        exc_type = record.exc_info[0].__name__ if record.exc_info and record.exc_info[0] else None
+        key = (record.name, record.levelno, record.pathname, record.lineno, str(record.msg),
+               getattr(record, "action", None), exc_type)
+        now = time.monotonic()
+        with self._lock:
+            state = self._keys.get(key)
+            if state is None or now - state[0] >= self.window:
+                skipped = int(state[2]) if state is not None else 0
+                self._keys[key] = [now, 1, 0]
+                self._keys.move_to_end(key)
+                if len(self._keys) > RATE_KEYS:
+                    self._keys.popitem(last=False)
+                if skipped:
+                    record.suppressed = skipped
+                return True
+            if state[1] < self.burst:
+                state[1] += 1
+                return True
+            state[2] += 1
+            self.suppressed += 1
+            return False
+
+
+class AsyncQueueHandler(QueueHandler):
+    """QueueHandler non bloccante, con rate limit degli errori e scarto contato."""
+
+    def __init__(self, log_queue: "queue.Queue[Any]", *, error_burst: int = ERROR_BURST,
+                 error_window: float = ERROR_WINDOW) -> None:
+        super().__init__(log_queue)
+        self._limiter = _RateLimiter(error_burst, error_window)
+        self._dropped = 0
+        self._dropped_lock = threading.Lock()
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self._dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # la coda è in-process: niente copia né formattazione del traceback
+        # qui, lo fa il listener. Il messaggio è fissato subito perché gli
+        # argomenti potrebbero cambiare prima della scrittura.
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            record.msg = f"{record.msg} (suppressed {suppressed} identical records)"
+        return record
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if record.levelno >= logging.WARNING and not self._limiter.allow(record):
+            return
+        super().emit(record)
+
+    def take_dropped(self) -> int:
+        with self._dropped_lock:
+            dropped, self._dropped = self._dropped, 0
+        return dropped
+
+    @property
+    def suppressed(self) -> int:
+        return self._limiter.suppressed
+
+
+class BatchFileHandler(logging.FileHandler):
+    """FileHandler che scrive un batch di record con una sola write e un flush."""
+
+    def emit_batch(self, records: Sequence[logging.LogRecord]) -> None:
+        lines = []
+        for record in records:
+            if record.levelno < self.level or not self.filter(record):
+                continue
+            try:
+                lines.append(self.format(record) + self.terminator)
+            except Exception:
+                self.handleError(record)
+        if not lines:
+            return
+        self.acquire()
+        try:
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write("".join(lines))
+            self.stream.flush()
+        except Exception:
+            self.handleError(records[-1])
+        finally:
+            self.release()
+
+
+class TraceFormatter(logging.Formatter):
+    """Formato standard più correlation_id, quando il record è dentro una richiesta."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        correlation_id = getattr(record, "correlation_id", None)
+        if correlation_id:
+            first, newline, rest = text.partition("\n")
+            text = f"{first} [cid={correlation_id}]{newline}{rest}"
+        return text
+
+
+class BatchingQueueListener(QueueListener):
+    """QueueListener che svuota la coda a batch e segnala i record scartati."""
+
+    def __init__(self, log_queue: "queue.Queue[Any]", handlers: Sequence[logging.Handler],
+                 *, source: AsyncQueueHandler, batch_size: int = BATCH_SIZE) -> None:
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self.source = source
+        self.batch_size = batch_size
+        self._stop_seen = False
+        self.stats = {"written": 0, "batches": 0, "dropped": 0}
+
+    def dequeue(self, block: bool) -> Any:
+        if self._stop_seen:
+            return self._sentinel
+        first = self.queue.get(block)
+        if first is self._sentinel:
+            return first
+        batch = [first]
+        while len(batch) < self.batch_size:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is self._sentinel:
+                # restituito al prossimo dequeue: il task_done lo fa _monitor
+                self._stop_seen = True
+                break
+            # _monitor chiama task_done una volta per dequeue
+            self.queue.task_done()
+            batch.append(item)
+        return batch
+
+    def handle(self, batch: Any) -> None:
+        records: List[logging.LogRecord] = batch if isinstance(batch, list) else [batch]
+        dropped = self.source.take_dropped()
+        if dropped:
+            self.stats["dropped"] += dropped
+            records = records + [logging.makeLogRecord({
+                "name": LOGGER_NAME,
+                "levelno": logging.WARNING,
+                "levelname": "WARNING",
+                "msg": f"Logging queue full: {dropped} records dropped",
+            })]
+        for handler in self.handlers:
+            emit_batch = getattr(handler, "emit_batch", None)
+            if emit_batch is not None:
+                emit_batch(records)
+                continue
+            for record in records:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+        self.stats["written"] += len(records)
+        self.stats["batches"] += 1
+
+    def enqueue_sentinel(self) -> None:
+        # bloccante: con la coda piena il sentinel non va perso
+        self.queue.put(self._sentinel)
+
+    def stop(self) -> None:
+        super().stop()
+        self._stop_seen = False
+
+
+class LoggingPipeline:
+    def __init__(self, logger: logging.Logger, handler: AsyncQueueHandler,
+                 listener: BatchingQueueListener, propagate: bool, level: int) -> None:
+        self.logger = logger
+        self.handler = handler
+        self.listener = listener
+        self._propagate = propagate
+        self._level = level
+        self._stopped = False
+
+    def stop(self) -> None:
+        """Scrive i record in coda e ripristina il logger."""
+        if self._stopped:
+            return
+        self._stopped = True
+        self.logger.removeHandler(self.handler)
+        self.logger.propagate = self._propagate
+        self.logger.setLevel(self._level)
+        self.listener.stop()
+        for handler in self.listener.handlers:
+            handler.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self.handler.queue.qsize(),
+            "suppressed": self.handler.suppressed,
+            **self.listener.stats,
+        }
+
+
+_PIPELINE: Optional[LoggingPipeline] = None
+_PIPELINE_GUARD = threading.Lock()
+
+
+def setup_logging(
+    *,
+    level: int | str | None = None,
+    path: str | Path | None = None,
+    handlers: Optional[Sequence[logging.Handler]] = None,
+    queue_size: int = QUEUE_SIZE,
+    batch_size: int = BATCH_SIZE,
+    error_burst: int = ERROR_BURST,
+    error_window: float = ERROR_WINDOW,
+    propagate: bool = False,
+) -> LoggingPipeline:
+    """
+    Installa la coda sui logger ice.api (idempotente: una nuova chiamata
+    sostituisce la configurazione precedente).
+
+    Default da ambiente: ICE_API_LOG_LEVEL (INFO) e ICE_API_LOG_FILE
+    (senza file, stderr). handlers sostituisce le destinazioni di default.
+    """
+    global _PIPELINE
+
+    level = level or os.environ.get("ICE_API_LOG_LEVEL", "INFO")
+    if isinstance(level, str):
+        level = logging.getLevelName(level.upper())
+        if not isinstance(level, int):
+            level = logging.INFO
+    path = path or os.environ.get("ICE_API_LOG_FILE")
+
+    if handlers is None:
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            target: logging.Handler = BatchFileHandler(path, encoding="utf-8", delay=True)
+        else:
+            target = logging.StreamHandler(sys.stderr)
+        target.setFormatter(TraceFormatter(DEFAULT_FORMAT))
+        handlers = [target]
+
+    with _PIPELINE_GUARD:
+        if _PIPELINE is not None:
+            _PIPELINE.stop()
+
+        log_queue: "queue.Queue[Any]" = queue.Queue(maxsize=queue_size)
+        handler = AsyncQueueHandler(log_queue, error_burst=error_burst, error_window=error_window)
+        listener = BatchingQueueListener(log_queue, handlers, source=handler, batch_size=batch_size)
+
+        logger = logging.getLogger(LOGGER_NAME)
+        pipeline = LoggingPipeline(logger, handler, listener, logger.propagate, logger.level)
+        logger.setLevel(level)
+        logger.addHandler(handler)
+        logger.propagate = propagate
+        listener.start()
+        _PIPELINE = pipeline
+    return pipeline
+
+
+def shutdown_logging() -> None:
+    """Scrive i record in coda e ripristina i logger ice.api."""
+    global _PIPELINE
+    with _PIPELINE_GUARD:
+        if _PIPELINE is not None:
+            _PIPELINE.stop()
+            _PIPELINE = None
+
+
+def logging_stats() -> Optional[Dict[str, Any]]:
+    return _PIPELINE.stats() if _PIPELINE is not None else None
+
+
+def async_logging_enabled() -> bool:
+    return os.environ.get("ICE_API_ASYNC_LOGGING", "") in ("1", "true", "yes")
+
+
+atexit.register(shutdown_logging)
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Iterable, List, Optional
+
+logger = logging.getLogger("ice.api.utils.process_pool")
+
+# ============================================================================
+# SHARED PROCESS POOL
+# ============================================================================
+# Pool di processi condiviso da un servizio (code.index, cv.ocr), creato
+# al primo uso con un worker per core.
+#
+# forkserver (spawn dove non c'è): il processo server ha già un event
+# loop e thread attivi, e un fork li copierebbe a metà (lock presi ->
+# deadlock).
+#
+# Un worker morto (crash, OOM kill, bootstrap del forkserver fallito)
+# rompe l'intero executor: ogni submit successivo solleverebbe
+# BrokenProcessPool fino al riavvio. map()/run() scartano il pool rotto,
+# ne creano uno nuovo e riprovano una volta.
+# ============================================================================
+
+
+def _mp_context():
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+class SharedProcessPool:
+    def __init__(self, name: str, *, max_workers: Optional[int] = None) -> None:
+        self.name = name
+        self.max_workers = max_workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._guard = threading.Lock()
+
+    def get(self) -> ProcessPoolExecutor:
+        with self._guard:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers or os.cpu_count() or 2,
+                    mp_context=_mp_context(),
+                )
+            return self._pool
+
+    def reset(self, broken: ProcessPoolExecutor) -> None:
+        """Scarta il pool rotto (se è ancora quello corrente): il prossimo get() ne crea uno nuovo."""
+        with self._guard:
+            if self._pool is broken:
+                self._pool = None
+        logger.warning("Process pool broken, recreating", extra={"pool": self.name})
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def map(self, fn: Callable[..., Any], items: Iterable[Any], *, chunksize: int = 1) -> List[Any]:
+        items = list(items)
+        pool = self.get()
+        try:
+            return list(pool.map(fn, items, chunksize=chunksize))
+        except BrokenProcessPool:
+            self.reset(pool)
+            return list(self.get().map(fn, items, chunksize=chunksize))
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        pool = self.get()
+        try:
+            return await loop.run_in_executor(pool, fn, *args)
+        except BrokenProcessPool:
+            self.reset(pool)
+            return await loop.run_in_executor(self.get(), fn, *args)
+
+    def shutdown(self) -> None:
+        with self._guard:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,363 @@
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Mapping, Optional, Tuple
+
+from ice_api.version import __version__
+
+logger = logging.getLogger("ice.api.tracing")
+
+# OTLP SpanKind
+SPAN_INTERNAL = 1
+SPAN_SERVER = 2
+SPAN_CLIENT = 3
+
+EXPORT_BATCH = 256              # span per riga del file OTLP
+EXPORT_INTERVAL = 1.0           # secondi massimi prima di scrivere un batch parziale
+TRACEPARENT = "traceparent"     # header W3C Trace Context
+
+# ============================================================================
+# TRACING
+# ============================================================================
+# Lo span corrente vive in una ContextVar: i task asyncio creati durante
+# una richiesta (job, step di workflow, chiamate agli agenti) lo
+# ereditano, quindi una richiesta multi-agente resta un unico trace.
+#
+#   trace_id / span_id     generati sempre (costo: un getrandbits)
+#   correlation_id         quello del client se presente, altrimenti il
+#                          trace_id; finisce negli eventi emessi, negli
+#                          header IPC e nei log record
+#   traceparent            propagazione W3C tra processi (inject/extract)
+#
+# Export (opzionale, ICE_API_TRACE_FILE o TRACER.configure): gli span
+# chiusi vanno in una coda e un thread li scrive a batch come righe
+# JSON OTLP (ExportTraceServiceRequest), leggibili dall'OpenTelemetry
+# Collector (file receiver) e dagli strumenti OTLP/JSON.
+# ============================================================================
+
+
+def _trace_id() -> str:
+    return "%032x" % random.getrandbits(128)
+
+
+def _span_id() -> str:
+    return "%016x" % random.getrandbits(64)
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str] = None
+    correlation_id: Optional[str] = None
+    kind: int = SPAN_INTERNAL
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: Optional[int] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    def set(self, key: str, value: Any) -> None:
+        if value is not None:
+            self.attributes[key] = value
+
+    def fail(self, message: str) -> None:
+        self.error = message
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or time.time_ns()),
+            "attributes": [_otlp_attribute(k, v) for k, v in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("ice_api_current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def current_correlation_id() -> Optional[str]:
+    """correlation_id della richiesta in corso (default degli header IPC)."""
+    span = _current_span.get()
+    return span.correlation_id if span is not None else None
+
+
+# ============================================================================
+# PROPAGATION
+# ============================================================================
+
+def extract(headers: Optional[Mapping[str, Any]]) -> Optional[Tuple[str, str]]:
+    """(trace_id, parent span_id) da un header traceparent valido, altrimenti None."""
+    if not headers:
+        return None
+    value = headers.get(TRACEPARENT)
+    if value is None:
+        value = next((v for k, v in headers.items() if str(k).lower() == TRACEPARENT), None)
+    if not isinstance(value, str):
+        return None
+    parts = value.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    trace_id, parent_id = parts[1].lower(), parts[2].lower()
+    try:
+        int(trace_id, 16), int(parent_id, 16)
+    except ValueError:
+        return None
+    if trace_id == "0" * 32 or parent_id == "0" * 16:
+        return None
+    return trace_id, parent_id
+
+
+def inject(headers: Dict[str, Any]) -> Dict[str, Any]:
+    """Aggiunge traceparent e correlation_id dello span corrente (chiamate IPC in uscita)."""
+    span = _current_span.get()
+    if span is not None:
+        headers[TRACEPARENT] = span.traceparent
+        headers.setdefault("correlation_id", span.correlation_id)
+    return headers
+
+
+def stamp_events(
+    emit_event: Callable[[dict], Awaitable[None]],
+    correlation_id: Optional[str],
+) -> Callable[[dict], Awaitable[None]]:
+    """emit_event che aggiunge correlation_id agli eventi che non ce l'hanno."""
+    if correlation_id is None:
+        return emit_event
+
+    async def emit(event: dict) -> None:
+        if isinstance(event, dict) and "correlation_id" not in event:
+            event["correlation_id"] = correlation_id
+        await emit_event(event)
+
+    return emit
+
+
+# ============================================================================
+# LOG RECORDS
+# ============================================================================
+
+def install_log_context() -> None:
+    """
+    trace_id/span_id/correlation_id sui LogRecord creati durante uno span.
+
+    Agisce nella record factory: solo i record effettivamente creati
+    (livello abilitato) pagano la lettura della ContextVar.
+    """
+    previous = logging.getLogRecordFactory()
+    if getattr(previous, "_ice_trace_context", False):
+        return
+
+    def factory(*args: Any, **kwargs: Any) -> logging.LogRecord:
+        record = previous(*args, **kwargs)
+        span = _current_span.get()
+        if span is not None:
+            record.trace_id = span.trace_id
+            record.span_id = span.span_id
+            record.correlation_id = span.correlation_id
+        return record
+
+    factory._ice_trace_context = True       # type: ignore[attr-defined]
+    logging.setLogRecordFactory(factory)
+
+
+# ============================================================================
+# EXPORT
+# ============================================================================
+
+class FileSpanExporter:
+    """Span chiusi -> righe OTLP/JSON, scritte da un thread a batch."""
+
+    def __init__(self, path: Path, *, service_name: str = "ice-api") -> None:
+        self.path = Path(path)
+        self.service_name = service_name
+        self._queue: "queue.SimpleQueue[Any]" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._guard = threading.Lock()
+        self.stats = {"exported": 0, "batches": 0, "errors": 0}
+
+    def export(self, span: Span) -> None:
+        if self._thread is None:
+            self._start()
+        self._queue.put(span)
+
+    def _start(self) -> None:
+        with self._guard:
+            if self._thread is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._thread = threading.Thread(target=self._run, name="ice-trace-export", daemon=True)
+                self._thread.start()
+
+    def _payload(self, spans: List[Span]) -> str:
+        return json.dumps(
+            {
+                "resourceSpans": [
+                    {
+                        "resource": {
+                            "attributes": [
+                                _otlp_attribute("service.name", self.service_name),
+                                _otlp_attribute("service.version", __version__),
+                            ]
+                        },
+                        "scopeSpans": [
+                            {
+                                "scope": {"name": "ice.api", "version": __version__},
+                                "spans": [span.to_otlp() for span in spans],
+                            }
+                        ],
+                    }
+                ]
+            },
+            separators=(",", ":"),
+            default=str,
+        )
+
+    def _write(self, spans: List[Span]) -> None:
+        try:
+            with open(self.path, "a", encoding="utf-8") as handle:
+                handle.write(self._payload(spans) + "\n")
+            self.stats["exported"] += len(spans)
+            self.stats["batches"] += 1
+        except OSError:
+            self.stats["errors"] += 1
+            logger.warning("Span export failed", exc_info=True, extra={"path": str(self.path)})
+
+    def _run(self) -> None:
+        batch: List[Span] = []
+        deadline = time.monotonic() + EXPORT_INTERVAL
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = None
+            if isinstance(item, Span):
+                batch.append(item)
+                if len(batch) < EXPORT_BATCH:
+                    continue
+            elif isinstance(item, threading.Event):
+                if batch:
+                    self._write(batch)
+                    batch = []
+                item.set()
+                continue
+            if batch:
+                self._write(batch)
+                batch = []
+            deadline = time.monotonic() + EXPORT_INTERVAL
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Scrive subito gli span in coda (shutdown, test)."""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+
+# ============================================================================
+# TRACER
+# ============================================================================
+
+class Tracer:
+    def __init__(self) -> None:
+        self.exporter: Optional[FileSpanExporter] = None
+        path = os.environ.get("ICE_API_TRACE_FILE")
+        if path:
+            self.configure(path)
+
+    def configure(self, path: Optional[str | Path]) -> None:
+        """Attiva (path) o disattiva (None) l'export degli span su file."""
+        if self.exporter is not None:
+            self.exporter.flush()
+        self.exporter = FileSpanExporter(Path(path)) if path else None
+
+    @contextmanager
+    def span(
+        self,
+        name: str,
+        *,
+        kind: int = SPAN_INTERNAL,
+        attributes: Optional[Dict[str, Any]] = None,
+        headers: Optional[Mapping[str, Any]] = None,
+        correlation_id: Optional[str] = None,
+    ) -> Iterator[Span]:
+        """
+        Span figlio di quello corrente; con headers (traceparent) continua
+        un trace remoto, altrimenti senza span corrente ne apre uno nuovo.
+        """
+        parent = _current_span.get()
+        remote = extract(headers) if headers else None
+        if remote is not None:
+            trace_id, parent_id = remote
+        elif parent is not None:
+            trace_id, parent_id = parent.trace_id, parent.span_id
+        else:
+            trace_id, parent_id = _trace_id(), None
+        if correlation_id is None:
+            correlation_id = parent.correlation_id if parent is not None and remote is None else trace_id
+
+        span = Span(
+            name=name,
+            trace_id=trace_id,
+            span_id=_span_id(),
+            parent_id=parent_id,
+            correlation_id=correlation_id,
+            kind=kind,
+            attributes=dict(attributes) if attributes else {},
+        )
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as exc:
+            if span.error is None:
+                span.error = f"{type(exc).__name__}: {exc}"
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end_ns = time.time_ns()
+            if self.exporter is not None:
+                self.exporter.export(span)
+
+    def flush(self) -> None:
+        if self.exporter is not None:
+            self.exporter.flush()
+
+
+TRACER = Tracer()
+atexit.register(TRACER.flush)